@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Animated heatmaps of a frame range: APNG, GIF or a PNG sequence
+
+Every frame of the range becomes a heatmap of the distance or SNR of its
+first peak, or of the noise of the zones, with scale x scale pixels per zone
+on the blue (low) to red (high) scale of the viewer, over one range for the
+whole animation. Zones without a target are light grey.
+
+The frames are loaded into a FrameStore and rasterized and compressed in
+blocks by a process pool; the blocks are written in order as they finish.
+The encoders need only NumPy and zlib:
+
+    out.png / out.apng   animated PNG (zlib, like sprites.py)
+    out.gif              GIF with a 256 colour palette (LZW)
+    out/                 one PNG per frame, e.g. for ffmpeg (MP4)
+
+The frames are shown for the time between their read_time, i.e. in real
+time (--speed to play faster, --fps for a fixed rate). Requires numpy.
+'''
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import os
+import struct
+import time
+
+import numpy as np
+
+import tmf8829log
+from frame_store import FrameStore
+from sprites import MISSING_COLOR, deflate_image, encode_png, heat_lut, png_chunk, png_header
+
+FIELDS = ('distance', 'snr', 'noise')
+FORMATS = ('apng', 'gif', 'png')
+BLOCK_FRAMES = 64           # frames rasterized per task of the process pool
+DEFAULT_INTERVAL = 33.0     # ms between frames without read_time or period
+
+# 255 heat colours and the missing colour as last entry, shared by all formats
+PALETTE = np.concatenate([heat_lut(255), np.array([MISSING_COLOR], dtype=np.uint8)])
+MISSING_INDEX = len(PALETTE) - 1
+
+
+def palette_indices(values, valid, value_range):
+    """Palette indices (frames, zones) uint8 of values, MISSING_INDEX where not valid"""
+    low, high = value_range
+    with np.errstate(invalid='ignore'):
+        level = np.clip((values - low) / max(high - low, 1e-9), 0, 1)
+    indices = np.round(np.where(valid, level, 0) * (MISSING_INDEX - 1)).astype(np.uint8)
+    indices[~valid] = MISSING_INDEX
+    return indices
+
+
+def lzw_encode(indices, min_code_size=8):
+    """GIF LZW data of palette indices (bytes), as sub-blocks with code size byte and terminator"""
+    clear = 1 << min_code_size
+    end = clear + 1
+    code_size = min_code_size + 1
+    next_code = end + 1
+    table = {}
+    out = bytearray()
+    buffer, bits = clear, code_size
+    prefix = indices[0]
+    for index in indices[1:]:
+        key = prefix << 8 | index
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        buffer |= prefix << bits
+        bits += code_size
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > 1 << code_size and code_size < 12:
+                code_size += 1
+        else:
+            # Table full: start over
+            buffer |= clear << bits
+            bits += code_size
+            table.clear()
+            code_size = min_code_size + 1
+            next_code = end + 1
+        prefix = index
+    buffer |= prefix << bits
+    bits += code_size
+    if next_code == 1 << code_size and code_size < 12:
+        # The decoder adds an entry for the last code before it reads the end code
+        code_size += 1
+    buffer |= end << bits
+    bits += code_size
+    while bits > 0:
+        out.append(buffer & 0xFF)
+        buffer >>= 8
+        bits -= 8
+    blocks = bytearray([min_code_size])
+    for start in range(0, len(out), 255):
+        part = out[start:start + 255]
+        blocks.append(len(part))
+        blocks += part
+    blocks.append(0)
+    return bytes(blocks)
+
+
+def _encode_block(indices, rows, cols, scale, fmt, level):
+    """Encoded frames of a block of palette indices (frames, zones): PNG data per frame
+
+    Returns:
+        list of bytes: zlib image data ('apng'), LZW data ('gif') or PNG files ('png')
+    """
+    images = indices.reshape(len(indices), rows, cols)
+    if scale > 1:
+        images = images.repeat(scale, axis=1).repeat(scale, axis=2)
+    if fmt == 'gif':
+        return [lzw_encode(image.ravel().tolist()) for image in images]
+    encode = deflate_image if fmt == 'apng' else encode_png
+    return [encode(PALETTE[image], level) for image in images]
+
+
+def frame_delays(store, speed=1.0, fps=None):
+    """Display time (ms) of every frame: the read_time to the next frame, divided by speed"""
+    if fps:
+        return np.full(store.frames, 1000.0 / fps)
+    intervals = np.diff(store.read_times) / 1000.0
+    with np.errstate(invalid='ignore'):
+        intervals[~(intervals > 0)] = np.nan
+    if np.isfinite(intervals).any():
+        typical = float(np.nanmedian(intervals))
+    else:
+        period = store.header.get('configuration', {}).get('period')
+        typical = float(period) if isinstance(period, (int, float)) and period > 0 else DEFAULT_INTERVAL
+    delays = np.append(intervals, typical)
+    delays[np.isnan(delays)] = typical
+    return delays / speed
+
+
+def field_values(store, field):
+    """(values, valid) arrays (frames, zones) of the first peak of a peak field or of a zone field"""
+    if field in store.zone_fields:
+        values = store.zone_fields[field]
+        valid = np.isfinite(values)
+    elif field in store.peak_fields and 'distance' in store.peak_fields:
+        values = store.field(field, 0)
+        with np.errstate(invalid='ignore'):
+            valid = store.field('distance', 0) > 0
+    else:
+        raise ValueError(f"The log has no '{field}' values")
+    return values, valid & store.present[:, None]
+
+
+def render_frames(store, field='distance', value_range=None, scale=16, fmt='apng', workers=None, level=6):
+    """Encoded heatmaps of all frames of a FrameStore, rasterized in a process pool
+
+    Args:
+        store: FrameStore with the field (and distance for peak fields)
+        field: 'distance', 'snr' or 'noise'
+        value_range: (low, high) of the colour scale (default: 1st to 99th
+                     percentile of the frames)
+        scale: pixels per zone
+        fmt: 'apng', 'gif' or 'png' (see _encode_block())
+        workers: processes (default: number of CPUs, 1: no pool)
+        level: zlib level of the PNG formats
+
+    Returns:
+        ((low, high), generator of the encoded frames in order)
+    """
+    values, valid = field_values(store, field)
+    if value_range is None:
+        finite = values[valid]
+        value_range = tuple(np.percentile(finite, [1, 99])) if finite.size else (0.0, 1.0)
+    value_range = (float(value_range[0]), float(value_range[1]))
+    indices = palette_indices(values, valid, value_range)
+    blocks = [indices[start:start + BLOCK_FRAMES] for start in range(0, len(indices), BLOCK_FRAMES)]
+    args = (store.rows, store.cols, scale, fmt, level)
+    workers = workers or os.cpu_count() or 1
+
+    def frames():
+        if workers == 1 or len(blocks) == 1:
+            for block in blocks:
+                yield from _encode_block(block, *args)
+            return
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            pending = collections.deque()
+            for block in blocks:
+                pending.append(pool.submit(_encode_block, block, *args))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    return value_range, frames()
+
+
+def write_apng(f, frames, count, width, height, delays):
+    """Write encoded frames ('apng') as animated PNG, looping forever"""
+    f.write(png_header(width, height) + png_chunk(b'acTL', struct.pack('>II', count, 0)))
+    sequence = 0
+    for number, (data, delay) in enumerate(zip(frames, delays)):
+        control = struct.pack('>IIIIIHHBB', sequence, width, height, 0, 0, min(round(delay), 65535), 1000, 0, 0)
+        f.write(png_chunk(b'fcTL', control))
+        sequence += 1
+        if number == 0:
+            f.write(png_chunk(b'IDAT', data))
+        else:
+            f.write(png_chunk(b'fdAT', struct.pack('>I', sequence) + data))
+            sequence += 1
+    f.write(png_chunk(b'IEND', b''))
+
+
+def write_gif(f, frames, width, height, delays):
+    """Write encoded frames ('gif') as GIF with the global PALETTE, looping forever"""
+    f.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, MISSING_INDEX, 0) + PALETTE.tobytes())
+    f.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', 0) + b'\x00')
+    for data, delay in zip(frames, delays):
+        # Delays are in 1/100 s, browsers slow down anything below 2
+        f.write(b'!\xf9\x04' + struct.pack('<BHBB', 0x04, max(2, round(delay / 10)), 0, 0))
+        f.write(b',' + struct.pack('<HHHHB', 0, 0, width, height, 0) + data)
+    f.write(b';')
+
+
+def output_format(output):
+    """'apng', 'gif' or 'png' (a directory of PNG files) by the output name"""
+    extension = os.path.splitext(output)[1].lower()
+    if extension in ('.png', '.apng'):
+        return 'apng'
+    if extension == '.gif':
+        return 'gif'
+    return 'png'
+
+
+def export_animation(store, output, field='distance', value_range=None, scale=16, speed=1.0, fps=None,
+                     workers=None):
+    """Write the heatmaps of a FrameStore as APNG, GIF or PNG sequence (by the output name, see output_format())
+
+    Returns:
+        (format, (low, high), delays in ms)
+    """
+    if not store.frames:
+        raise ValueError('No frames to export')
+    fmt = output_format(output)
+    delays = frame_delays(store, speed, fps)
+    value_range, frames = render_frames(store, field, value_range, scale, fmt, workers)
+    width, height = store.cols * scale, store.rows * scale
+    if fmt == 'png':
+        directory = os.path.normpath(output)
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.basename(directory)
+        for number, png in enumerate(frames):
+            with open(os.path.join(directory, f'{stem}_{number:06d}.png'), 'wb') as f:
+                f.write(png)
+    else:
+        with open(output, 'wb') as f:
+            if fmt == 'apng':
+                write_apng(f, frames, store.frames, width, height, delays)
+            else:
+                write_gif(f, frames, width, height, delays)
+    return fmt, value_range, delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Animated heatmaps of a TMF8829 log as APNG, GIF or PNG sequence')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', required=True,
+                        help='out.png or out.apng (animated PNG), out.gif, or a directory for one PNG per frame')
+    parser.add_argument('-f', '--field', choices=FIELDS, default='distance',
+                        help='Heatmap of the first peak distance or snr, or of the zone noise (default: distance)')
+    parser.add_argument('--start', type=int, default=0, help='First frame (index in the log, default: 0)')
+    parser.add_argument('--stop', type=int, help='End frame, exclusive (default: end of the log)')
+    parser.add_argument('--step', type=int, default=1, help='Use every STEP-th frame (default: 1)')
+    parser.add_argument('--scale', type=int, default=16, help='Pixels per zone (default: 16)')
+    parser.add_argument('--range', type=float, nargs=2, metavar=('LOW', 'HIGH'),
+                        help='Colour scale (default: 1st to 99th percentile of the frames)')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed, 1 = real time (default: 1)')
+    parser.add_argument('--fps', type=float, help='Fixed frame rate instead of the read_time of the frames')
+    parser.add_argument('-j', '--workers', type=int, help='Processes rasterizing frames (default: number of CPUs)')
+    args = parser.parse_args()
+
+    if args.start < 0 or (args.stop is not None and args.stop < args.start) or args.step < 1:
+        parser.error('Select frames with 0 <= START <= STOP and STEP >= 1')
+    if args.scale < 1 or args.speed <= 0 or (args.fps is not None and args.fps <= 0):
+        parser.error('--scale, --speed and --fps must be positive')
+
+    start = time.perf_counter()
+    log = tmf8829log.Log(keys=[])
+    frames = itertools.islice(tmf8829log.iter_frames(args.input, log), args.start, args.stop, args.step)
+    fields = ('distance', args.field) if args.field != 'noise' else ('noise',)
+    store = FrameStore.from_frames(frames, fields=fields, peaks=1)
+    # configuration follows Result_Set in JSON logs, --stop ends the read before it
+    store.header = log.header if 'configuration' in log.header else tmf8829log.salvage.read_header(args.input)
+    loaded = time.perf_counter()
+    try:
+        fmt, value_range, delays = export_animation(store, args.output, args.field, args.range, args.scale,
+                                                    args.speed, args.fps, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    exported = time.perf_counter()
+
+    duration = delays.sum() / 1000
+    print(f"✓ {args.input} -> {args.output}")
+    print(f"  {store.frames} frames of {store.cols * args.scale}x{store.rows * args.scale} px ({fmt}), "
+          f"{args.field} {value_range[0]:.0f} … {value_range[1]:.0f}, {duration:.1f} s playback")
+    print(f"  load {loaded - start:.3f} s, render and encode {exported - loaded:.3f} s")
+    if fmt == 'png':
+        directory = os.path.normpath(args.output)
+        stem = os.path.basename(directory)
+        print(f"  MP4: ffmpeg -framerate {1000 / np.median(delays):.3g} -i {os.path.join(directory, stem)}_%06d.png "
+              f"-pix_fmt yuv420p {stem}.mp4")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Scaling benchmark for the TMF8829 JSON log tools
+
+Generates synthetic logs (see generate_log.py) of increasing size, runs every
+tool on them in a separate process and records wall time, frames/s and peak
+RSS into a JSON results file.
+'''
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import generate_log
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Command line of every benchmarked tool: name -> function(log, output directory)
+TOOLS = {
+    'json_to_html': lambda log, out: ['json_to_html.py', '-i', log, '-o', os.path.join(out, 'viewer.html')],
+    'json_to_csv': lambda log, out: ['json_to_csv.py', log, os.path.join(out, 'log.csv')],
+    'split_json': lambda log, out: ['split_json.py', '-i', log, '-o', out, '-n', '1000'],
+    'scan_json': lambda log, out: ['scan_json.py', '-i', log],
+    'json_to_sqlite': lambda log, out: ['json_to_sqlite.py', '-i', log, '-o', os.path.join(out, 'log.sqlite')],
+    'pipeline': lambda log, out: ['pipeline.py', '-i', log, '--html', os.path.join(out, 'viewer.html'),
+                                  '--csv', os.path.join(out, 'log.csv'), '--split', out, '-n', '1000'],
+}
+
+
+def run_tool(argv):
+    """Run a tool script and measure it
+
+    Returns:
+        (wall time in s, peak RSS in MB or None, return code, stderr text)
+    """
+    command = [sys.executable, os.path.join(SCRIPT_DIR, argv[0])] + argv[1:]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    if hasattr(os, 'wait4'):
+        # wait4 reports the resource usage of exactly this child
+        stderr = process.stderr.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        peak_rss = usage.ru_maxrss / scale
+    else:
+        _, stderr = process.communicate()
+        wall = time.perf_counter() - start
+        peak_rss = None
+
+    return wall, peak_rss, process.returncode, stderr.decode('utf-8', errors='replace')
+
+
+def benchmark(frame_counts, tools, work_dir, output_file, cols=16, rows=16, nr_peaks=1,
+              histograms=True, keep=False):
+    """Run the benchmark suite
+
+    Args:
+        frame_counts: list of log sizes in frames
+        tools: names of the tools to run (keys of TOOLS)
+        work_dir: directory for generated logs and tool outputs
+        output_file: JSON results file
+        cols, rows, nr_peaks, histograms: shape of the generated logs
+        keep: keep tool outputs instead of deleting them after each run
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+
+    for frames in frame_counts:
+        # Generated logs are reused between runs, they are deterministic
+        log_name = f"synthetic_{cols}x{rows}_p{nr_peaks}_{'h' if histograms else 'nh'}_{frames}.json.gz"
+        log_file = os.path.join(work_dir, log_name)
+        if not os.path.exists(log_file):
+            generate_log.generate_log(log_file, frames, cols, rows, nr_peaks, histograms)
+        log_size = os.path.getsize(log_file) / (1024 * 1024)
+
+        for tool in tools:
+            out_dir = os.path.join(work_dir, f"{tool}_{frames}")
+            os.makedirs(out_dir, exist_ok=True)
+
+            wall, peak_rss, returncode, stderr = run_tool(TOOLS[tool](log_file, out_dir))
+            result = {
+                'tool': tool,
+                'frames': frames,
+                'log_mb': round(log_size, 3),
+                'wall_s': round(wall, 3),
+                'frames_per_s': round(frames / wall, 1) if wall > 0 else None,
+                'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+                'returncode': returncode,
+            }
+            results.append(result)
+
+            rss_text = f"{peak_rss:.1f} MB" if peak_rss is not None else "n/a"
+            print(f"{tool:<14} {frames:>8} frames  {wall:>9.3f} s  {result['frames_per_s'] or 0:>10.1f} frames/s  peak RSS {rss_text}")
+            if returncode != 0:
+                print(f"  {tool} failed with exit code {returncode}:\n{stderr}")
+
+            if not keep:
+                shutil.rmtree(out_dir, ignore_errors=True)
+
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'commit': _git_commit(),
+        'log': {'resolution': f"{cols}x{rows}", 'nr_peaks': nr_peaks, 'histograms': histograms},
+        'results': results,
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    print(f"Results written to {output_file}")
+
+
+def _git_commit():
+    """Return the current git commit of the tools or None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the TMF8829 JSON log tools on synthetic logs')
+    parser.add_argument('-f', '--frames', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Log sizes in frames (default: 1000 10000 100000)')
+    parser.add_argument('-t', '--tools', nargs='+', choices=sorted(TOOLS), default=list(TOOLS),
+                        help='Tools to benchmark (default: all)')
+    parser.add_argument('-w', '--work-dir', default='benchmark_work',
+                        help='Directory for generated logs and outputs (default: benchmark_work)')
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                        help='JSON results file (default: benchmark_results.json)')
+    parser.add_argument('-r', '--resolution', type=generate_log.parse_resolution, default=(16, 16),
+                        help='Zone resolution COLSxROWS (default: 16x16)')
+    parser.add_argument('-p', '--nr-peaks', type=int, default=1, choices=[1, 2, 3, 4],
+                        help='Number of peaks per zone (default: 1)')
+    parser.add_argument('--no-histograms', action='store_true',
+                        help='Generate logs without histograms (much smaller at 100k frames)')
+    parser.add_argument('--keep', action='store_true', help='Keep tool outputs')
+    args = parser.parse_args()
+
+    cols, rows = args.resolution
+    benchmark(args.frames, args.tools, args.work_dir, args.output, cols, rows, args.nr_peaks,
+              not args.no_histograms, args.keep)
+
+if __name__ == "__main__":
+    main()
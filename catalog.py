@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Catalog of TMF8829 captures in one or more directories
+
+The catalog is a SQLite file holding the device info, configuration, frame
+count, frame number range and time span of every log. It is built with the
+streaming scan of scan_json.py, which reads the header and the info of each
+frame only. Updates rescan only new or modified files and drop deleted ones.
+JSON files that are not logs, such as the reports and sidecars of the
+tools, are stored with an error and left out of find results.
+
+    python catalog.py update captures/
+    python catalog.py find --serial 1746703494 --fw 1.2.194 --histograms
+    python catalog.py find -w nr_peaks=2 -w period=33 --min-frames 1000
+'''
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sqlite3
+import time
+
+import scan_json
+from tmf8829log import LOG_EXTENSIONS, compact_configuration
+
+CATALOG_FILE = 'tmf8829_catalog.sqlite'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS captures (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    scanned REAL,
+    error TEXT,
+    serial TEXT,
+    fw_version TEXT,
+    logger_version TEXT,
+    frames INTEGER,
+    first_frame INTEGER,
+    last_frame INTEGER,
+    missing_frames INTEGER,
+    start_time INTEGER,
+    duration_s REAL,
+    frame_rate REAL,
+    rows INTEGER,
+    cols INTEGER,
+    peaks_per_zone INTEGER,
+    histogram_frames INTEGER,
+    device TEXT,
+    configuration TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS captures_serial ON captures (serial);
+CREATE INDEX IF NOT EXISTS captures_fw_version ON captures (fw_version);
+'''
+
+_COLUMNS = ('path', 'size', 'mtime_ns', 'scanned', 'error', 'serial', 'fw_version', 'logger_version',
+            'frames', 'first_frame', 'last_frame', 'missing_frames', 'start_time', 'duration_s', 'frame_rate',
+            'rows', 'cols', 'peaks_per_zone', 'histogram_frames', 'device', 'configuration', 'summary')
+
+
+def _version(value):
+    """fw version [1, 2, 194, 0] -> '1.2.194.0'"""
+    if isinstance(value, list):
+        return '.'.join(str(v) for v in value)
+    return None if value in (None, '') else str(value).strip()
+
+
+def find_logs(directories):
+    """Yield all log files below the given directories"""
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.endswith(LOG_EXTENSIONS):
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+def scan_capture(path):
+    """Scan one log and return its catalog row as a dict (runs in a worker process)"""
+    stat = os.stat(path)
+    row = dict.fromkeys(_COLUMNS)
+    row.update(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, scanned=time.time())
+    header = {}
+    try:
+        summary = scan_json.scan_log(path, header=header)
+    except Exception as e:
+        # Kept so that broken files are not rescanned until they change
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    device = summary['device'] or {}
+    frame_number = summary['frame_number'] or {}
+    read_time = summary['read_time'] or {}
+    resolution = summary['resolution'] or {}
+    row.update(
+        serial=_version(device.get('serial number')),
+        fw_version=_version(device.get('fw version')),
+        logger_version=_version(device.get('logger version')),
+        frames=summary['frames'],
+        first_frame=frame_number.get('first'),
+        last_frame=frame_number.get('last'),
+        missing_frames=summary['missing_frames'],
+        start_time=read_time.get('first'),
+        # read_time ticks are microseconds
+        duration_s=read_time['span'] / 1e6 if read_time else None,
+        frame_rate=summary['frame_rate'],
+        rows=resolution.get('rows'),
+        cols=resolution.get('cols'),
+        peaks_per_zone=summary['peaks_per_zone'],
+        histogram_frames=max(summary['histogram_frames'].values(), default=0),
+        device=json.dumps(device),
+        # Blob as hex string, identical configurations share summary.config_blob.sha1
+        configuration=json.dumps(compact_configuration(header.get('configuration', {}))),
+        summary=json.dumps({key: value for key, value in summary.items()
+                            if key not in ('device', 'configuration')}),
+    )
+    return row
+
+
+def open_catalog(catalog_file):
+    db = sqlite3.connect(catalog_file)
+    db.executescript(_SCHEMA)
+    return db
+
+
+def update_catalog(catalog_file, directories, workers=None, prune=True):
+    """Add new and modified logs below directories to the catalog
+
+    Args:
+        catalog_file: SQLite catalog, created if missing
+        directories: directories searched recursively for logs
+        workers: processes scanning logs in parallel (default: number of CPUs)
+        prune: remove entries of logs below directories that no longer exist
+
+    Returns:
+        (scanned, unchanged, removed) file counts
+    """
+    db = open_catalog(catalog_file)
+    known = {path: (size, mtime_ns) for path, size, mtime_ns in
+             db.execute('SELECT path, size, mtime_ns FROM captures')}
+
+    found = set()
+    changed = []
+    for path in find_logs(directories):
+        found.add(path)
+        stat = os.stat(path)
+        if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+            changed.append(path)
+
+    removed = []
+    if prune:
+        roots = [os.path.join(os.path.abspath(directory), '') for directory in directories]
+        removed = [path for path in known if path not in found and path.startswith(tuple(roots))]
+        db.executemany('DELETE FROM captures WHERE path = ?', [(path,) for path in removed])
+
+    insert = f"INSERT OR REPLACE INTO captures ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(changed) > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            rows = pool.map(scan_capture, changed, chunksize=4)
+            for index, row in enumerate(rows):
+                _report(index, len(changed), row)
+                db.execute(insert, [row[column] for column in _COLUMNS])
+    else:
+        for index, path in enumerate(changed):
+            row = scan_capture(path)
+            _report(index, len(changed), row)
+            db.execute(insert, [row[column] for column in _COLUMNS])
+    db.commit()
+    db.close()
+    return len(changed), len(found) - len(changed), len(removed)
+
+
+def _report(index, total, row):
+    status = f"error: {row['error']}" if row['error'] else f"{row['frames']} frames"
+    print(f"  [{index + 1}/{total}] {row['path']} ({status})")
+
+
+def _value(text):
+    """Command line value as stored in the JSON columns (numbers stay numbers)"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def find_captures(catalog_file, serial=None, fw=None, histograms=None, where=(), min_frames=None,
+                  include_errors=False):
+    """Query the catalog
+
+    Args:
+        serial: device serial number
+        fw: firmware version or version prefix, e.g. '1.2.194'
+        histograms: True/False to require histograms enabled/disabled in the configuration
+        where: 'key=value' conditions on configuration or device info entries
+        min_frames: minimum number of frames
+        include_errors: also return logs that could not be scanned
+
+    Returns:
+        list of row dicts ordered by path
+    """
+    conditions = []
+    params = []
+    if serial is not None:
+        conditions.append('serial = ?')
+        params.append(str(serial))
+    if fw is not None:
+        conditions.append("(fw_version = ? OR fw_version LIKE ? || '.%')")
+        params += [fw, fw]
+    if histograms is not None:
+        conditions.append("coalesce(json_extract(configuration, '$.histograms'), 0) " +
+                          ('!= 0' if histograms else '= 0'))
+    for condition in where:
+        key, sep, text = condition.partition('=')
+        if not sep:
+            raise ValueError(f"Condition '{condition}' is not of the form key=value")
+        path = '$."' + key.strip().replace('"', '\\"') + '"'
+        entry = "coalesce(json_extract(configuration, ?), json_extract(device, ?))"
+        value = _value(text.strip())
+        if isinstance(value, str):
+            # Device info strings are padded, e.g. 'EVM version': '2.2.5   '
+            entry = f"trim({entry})"
+        conditions.append(entry + " = ?")
+        params += [path, path, json.dumps(value, separators=(',', ':')) if isinstance(value, (list, dict)) else value]
+    if min_frames is not None:
+        conditions.append('frames >= ?')
+        params.append(min_frames)
+    if not include_errors:
+        conditions.append('error IS NULL')
+
+    query = 'SELECT * FROM captures'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    db = open_catalog(catalog_file)
+    db.row_factory = sqlite3.Row
+    rows = [dict(row) for row in db.execute(query + ' ORDER BY path', params)]
+    db.close()
+    return rows
+
+
+def print_captures(rows):
+    """Print catalog rows as a table"""
+    print(f"{'frames':>7} {'duration':>9} {'serial':>11} {'fw':>11} {'res':>5} {'hist':>4}  path")
+    for row in rows:
+        if row['error']:
+            print(f"{'-':>7} {'-':>9} {'-':>11} {'-':>11} {'-':>5} {'-':>4}  {row['path']} ({row['error']})")
+            continue
+        duration = f"{row['duration_s']:.1f} s" if row['duration_s'] is not None else '-'
+        resolution = f"{row['cols']}x{row['rows']}" if row['rows'] else '-'
+        print(f"{row['frames']:>7} {duration:>9} {row['serial'] or '-':>11} {row['fw_version'] or '-':>11} "
+              f"{resolution:>5} {'yes' if row['histogram_frames'] else 'no':>4}  {row['path']}")
+    print(f"{len(rows)} capture(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Catalog of TMF8829 captures for quick searches')
+    parser.add_argument('-d', '--catalog', default=CATALOG_FILE,
+                        help=f'Catalog file (default: {CATALOG_FILE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    update = commands.add_parser('update', help='Add new and modified logs of directories to the catalog')
+    update.add_argument('directories', nargs='+', help='Directories searched recursively for logs')
+    update.add_argument('-j', '--workers', type=int, help='Processes scanning logs (default: number of CPUs)')
+    update.add_argument('--keep-missing', action='store_true', help='Keep entries of deleted logs')
+
+    find = commands.add_parser('find', help='List captures matching all given conditions')
+    find.add_argument('--serial', help='Device serial number')
+    find.add_argument('--fw', help='Firmware version or prefix, e.g. 1.2.194')
+    find.add_argument('--histograms', action='store_true', default=None, help='Histograms enabled')
+    find.add_argument('--no-histograms', dest='histograms', action='store_false', help='Histograms disabled')
+    find.add_argument('-w', '--where', action='append', default=[], metavar='KEY=VALUE',
+                      help='Configuration or device info entry, e.g. nr_peaks=2 (repeatable)')
+    find.add_argument('--min-frames', type=int, help='Minimum number of frames')
+    find.add_argument('--errors', action='store_true', help='Include logs that could not be scanned')
+    find.add_argument('--json', action='store_true', help='Print the matches as JSON')
+    find.add_argument('--paths', action='store_true', help='Print only the paths of the matches')
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        start = time.perf_counter()
+        scanned, unchanged, removed = update_catalog(args.catalog, args.directories, args.workers,
+                                                     not args.keep_missing)
+        print(f"Catalog {args.catalog}: {scanned} scanned, {unchanged} unchanged, {removed} removed "
+              f"in {time.perf_counter() - start:.3f} s")
+        return
+
+    try:
+        rows = find_captures(args.catalog, args.serial, args.fw, args.histograms, args.where,
+                             args.min_frames, args.errors)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        for row in rows:
+            for key in ('device', 'configuration', 'summary'):
+                row[key] = json.loads(row[key]) if row[key] else None
+        print(json.dumps(rows, indent=2))
+    elif args.paths:
+        for row in rows:
+            print(row['path'])
+    else:
+        print_captures(rows)
+
+if __name__ == "__main__":
+    main()
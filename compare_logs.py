@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+A/B comparison of two TMF8829 captures
+
+The frames of capture B are aligned to those of capture A by index, by
+frame_number or by time (read_time relative to the first frame, nearest
+frame within half a frame period). For every aligned pair and zone the
+differences B - A of distance, snr (first peak, where both detect a target)
+and noise are computed, and the mp_histo histograms are compared by their
+normalized difference sum|B - A| / sum(A + B) and the shift of the
+strongest peak centroid (see histo_analysis.py).
+
+json_to_html.py -i A.json --compare B.json builds one viewer of capture A
+with the differences as heatmap layers (int16 quantized) and a summary
+table. Requires numpy.
+'''
+
+import argparse
+import base64
+import os
+import time
+
+import numpy as np
+
+import tmf8829log
+from frame_store import FrameStore
+
+ALIGN_MODES = ('index', 'frame_number', 'time')
+FIELDS = ('distance', 'snr', 'noise')
+BLOCK_PAIRS = 256       # frame pairs of histograms compared at once
+
+# Layer name -> decimals kept by the int16 quantization in the viewer payload
+_LAYER_DIGITS = {'distance': 0, 'snr': 0, 'noise': 0, 'histogram difference': 3, 'histogram peak shift': 2}
+_I2_MISSING = -32768
+
+
+def align_frames(store_a, store_b, mode='index'):
+    """Pairs of frame positions (index_a, index_b) of two FrameStores
+
+    Args:
+        mode: 'index' (position in the log), 'frame_number' or 'time'
+              (read_time since the first frame, nearest B frame within half
+              the median A frame period)
+    """
+    if mode == 'index':
+        count = min(store_a.frames, store_b.frames)
+        return np.arange(count), np.arange(count)
+    if mode == 'frame_number':
+        _, index_a, index_b = np.intersect1d(store_a.frame_numbers, store_b.frame_numbers, return_indices=True)
+        keep = store_a.frame_numbers[index_a] >= 0
+        return index_a[keep], index_b[keep]
+    if mode == 'time':
+        times_a = store_a.read_times - np.nanmin(store_a.read_times)
+        times_b = store_b.read_times - np.nanmin(store_b.read_times)
+        valid_b = np.flatnonzero(~np.isnan(times_b))
+        order = valid_b[np.argsort(times_b[valid_b], kind='stable')]
+        sorted_b = times_b[order]
+        index_a = np.flatnonzero(~np.isnan(times_a))
+        if not len(order) or not len(index_a):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        times = times_a[index_a]
+        position = np.searchsorted(sorted_b, times)
+        left = np.clip(position - 1, 0, len(order) - 1)
+        right = np.clip(position, 0, len(order) - 1)
+        nearest = np.where(np.abs(sorted_b[left] - times) <= np.abs(sorted_b[right] - times), left, right)
+        period = np.median(np.diff(np.sort(times))) if len(times) > 1 else np.inf
+        keep = np.abs(sorted_b[nearest] - times) <= period / 2
+        return index_a[keep], order[nearest[keep]]
+    raise ValueError(f"Unknown alignment '{mode}', use one of {', '.join(ALIGN_MODES)}")
+
+
+def _field_diff(store_a, store_b, index_a, index_b, name):
+    """B - A of one field over the aligned pairs, NaN where it is not comparable"""
+    a = store_a.field(name)[index_a].astype(np.float64)
+    b = store_b.field(name)[index_b].astype(np.float64)
+    if name in store_a.peak_fields:
+        with np.errstate(invalid='ignore'):
+            both = (store_a.field('distance')[index_a] > 0) & (store_b.field('distance')[index_b] > 0)
+        return np.where(both, b - a, np.nan)
+    return b - a
+
+
+def _histogram_diff(frames_a, frames_b, index_a, index_b, zones):
+    """Normalized difference and peak centroid shift of mp_histo per pair and zone
+
+    The mp_histo shape of the first pair with histograms is compared, pairs
+    with histograms of another size are left NaN.
+    """
+    import histo_analysis
+
+    difference = np.full((len(index_a), zones), np.nan, dtype=np.float32)
+    shift = np.full((len(index_a), zones), np.nan, dtype=np.float32)
+    pairs = [pair for pair, (ia, ib) in enumerate(zip(index_a, index_b))
+             if frames_a[ia].has_histogram('mp_histo') and frames_b[ib].has_histogram('mp_histo')]
+    if not pairs:
+        return None
+    shape = histo_analysis.histogram_shape(frames_a[index_a[pairs[0]]])
+    if shape[0] > zones or histo_analysis.histogram_shape(frames_b[index_b[pairs[0]]]) != shape:
+        return None
+
+    # Macro pixel m belongs to zone m, see histo_analysis.py
+    macro_pixels = shape[0]
+    for start in range(0, len(pairs), BLOCK_PAIRS):
+        block = pairs[start:start + BLOCK_PAIRS]
+        try:
+            a = histo_analysis.macro_pixel_histograms([frames_a[index_a[pair]] for pair in block], shape)
+            b = histo_analysis.macro_pixel_histograms([frames_b[index_b[pair]] for pair in block], shape)
+        except ValueError:
+            # mp_histo of another size in the block: its pairs stay NaN, the others are compared
+            block = [pair for pair in block if histo_analysis.histogram_shape(frames_a[index_a[pair]]) == shape and
+                     histo_analysis.histogram_shape(frames_b[index_b[pair]]) == shape]
+            if not block:
+                continue
+            a = histo_analysis.macro_pixel_histograms([frames_a[index_a[pair]] for pair in block], shape)
+            b = histo_analysis.macro_pixel_histograms([frames_b[index_b[pair]] for pair in block], shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            difference[block, :macro_pixels] = np.abs(b - a).sum(axis=-1) / (a + b).sum(axis=-1)
+        shift[block, :macro_pixels] = (histo_analysis.find_peaks(b, max_peaks=1)['centroid'][..., 0] -
+                                       histo_analysis.find_peaks(a, max_peaks=1)['centroid'][..., 0])
+    return {'histogram difference': difference, 'histogram peak shift': shift}
+
+
+def _encode_i2(values, digits):
+    """float array -> (base64 int16, scale) with NaN stored as -32768"""
+    scale = 10.0 ** -digits
+    finite = values[np.isfinite(values)]
+    largest = np.abs(finite).max() if finite.size else 0
+    while largest / scale > 32767:
+        scale *= 10
+    quantized = np.where(np.isfinite(values), np.rint(np.nan_to_num(values) / scale), _I2_MISSING)
+    return base64.b64encode(quantized.astype('<i2').tobytes()).decode('ascii'), scale
+
+
+class LogComparison:
+    """Differences B - A of two captures
+
+    Attributes:
+        rows, cols: zone grid
+        mode: alignment mode
+        frames_a, frames_b: number of frames of A and B
+        index_a, index_b: aligned frame positions
+        frame_numbers_b: frame_number of the B frame aligned to every A frame (-1 if none)
+        diffs: dict name -> float array (pairs, zones) of B - A, NaN if not comparable
+        detection_a, detection_b: share of zones with a target over the aligned frames
+    """
+
+    def __init__(self, store_a, store_b, frames_a=None, frames_b=None, mode='index', names=('A', 'B')):
+        if (store_a.rows, store_a.cols) != (store_b.rows, store_b.cols):
+            raise ValueError(f"Zone grids differ: {store_a.cols}x{store_a.rows} and {store_b.cols}x{store_b.rows}")
+        self.rows, self.cols = store_a.rows, store_a.cols
+        self.mode = mode
+        self.names = names
+        self.frames_a, self.frames_b = store_a.frames, store_b.frames
+        self.index_a, self.index_b = align_frames(store_a, store_b, mode)
+        self.frame_numbers_b = np.full(store_a.frames, -1, dtype=np.int64)
+        self.frame_numbers_b[self.index_a] = store_b.frame_numbers[self.index_b]
+
+        self.diffs = {}
+        for name in FIELDS:
+            if (name in store_a.zone_fields or name in store_a.peak_fields) and \
+                    (name in store_b.zone_fields or name in store_b.peak_fields):
+                self.diffs[name] = _field_diff(store_a, store_b, self.index_a, self.index_b, name).astype(np.float32)
+        if frames_a is not None and frames_b is not None and len(self.index_a):
+            histograms = _histogram_diff(frames_a, frames_b, self.index_a, self.index_b, self.rows * self.cols)
+            if histograms:
+                self.diffs.update(histograms)
+
+        self.detection_a = self.detection_b = None
+        if 'distance' in store_a.peak_fields and 'distance' in store_b.peak_fields and len(self.index_a):
+            with np.errstate(invalid='ignore'):
+                self.detection_a = float((store_a.field('distance')[self.index_a] > 0).mean())
+                self.detection_b = float((store_b.field('distance')[self.index_b] > 0).mean())
+
+    @property
+    def pairs(self):
+        return len(self.index_a)
+
+    def summary(self):
+        """List of per-field dicts: name, count, mean, median |diff|, p95 |diff|, rms"""
+        rows = []
+        for name, values in self.diffs.items():
+            finite = values[np.isfinite(values)].astype(np.float64)
+            if not finite.size:
+                rows.append({'name': name, 'count': 0})
+                continue
+            magnitude = np.abs(finite)
+            rows.append({
+                'name': name,
+                'count': int(finite.size),
+                'mean': float(finite.mean()),
+                'median_abs': float(np.median(magnitude)),
+                'p95_abs': float(np.percentile(magnitude, 95)),
+                'rms': float(np.sqrt((finite * finite).mean())),
+            })
+        return rows
+
+    def print_summary(self):
+        name_a, name_b = self.names
+        print(f"A: {name_a} ({self.frames_a} frames)")
+        print(f"B: {name_b} ({self.frames_b} frames)")
+        print(f"Aligned by {self.mode}: {self.pairs} frame pairs, {self.cols}x{self.rows} zones")
+        if self.detection_a is not None:
+            print(f"Detection rate: A {self.detection_a:.1%}, B {self.detection_b:.1%}")
+        print(f"{'B - A':<22} {'count':>9} {'mean':>10} {'median|d|':>10} {'p95|d|':>10} {'rms':>10}")
+        for row in self.summary():
+            if not row['count']:
+                print(f"{row['name']:<22} {0:>9}")
+                continue
+            print(f"{row['name']:<22} {row['count']:>9} {row['mean']:>10.3f} {row['median_abs']:>10.3f} "
+                  f"{row['p95_abs']:>10.3f} {row['rms']:>10.3f}")
+
+    def save(self, path):
+        """Save alignment and differences as compressed .npz"""
+        np.savez_compressed(path, index_a=self.index_a, index_b=self.index_b, grid=np.array([self.rows, self.cols]),
+                            **{name.replace(' ', '_'): values for name, values in self.diffs.items()})
+
+    def viewer_payload(self):
+        """Summary shown by the HTML viewer of capture A"""
+        return {
+            'names': [os.path.basename(name) for name in self.names],
+            'mode': self.mode,
+            'pairs': self.pairs,
+            'framesB': self.frames_b,
+            'frameNumbersB': self.frame_numbers_b.tolist(),
+            'detection': [self.detection_a, self.detection_b],
+            'summary': self.summary(),
+        }
+
+    def viewer_layers(self):
+        """Heatmap layers of the differences per A frame and averaged over all pairs"""
+        zones = self.rows * self.cols
+        layers = []
+        for name, values in self.diffs.items():
+            digits = _LAYER_DIGITS.get(name, 2)
+            per_frame = np.full((self.frames_a, zones), np.nan, dtype=np.float32)
+            per_frame[self.index_a] = values
+            with np.errstate(invalid='ignore'):
+                finite = np.isfinite(values)
+                mean = np.where(finite.any(axis=0), np.where(finite, values, 0).sum(axis=0) /
+                                np.maximum(finite.sum(axis=0), 1), np.nan)
+            label = f"B - A {name}" if not name.startswith('histogram') else f"B vs A {name}"
+            for layer_name, data, count, step in ((label, per_frame, self.frames_a, 1),
+                                                  (f"{label} (mean)", mean[None], 1, self.frames_a)):
+                encoded, scale = _encode_i2(data, digits + (1 if count == 1 else 0))
+                layers.append({
+                    'name': layer_name,
+                    'window': step,
+                    'step': step,
+                    'count': count,
+                    'digits': digits + (1 if count == 1 else 0),
+                    'dtype': 'i2',
+                    'scale': scale,
+                    'data': encoded,
+                })
+        return layers
+
+
+def compare_logs(log_a, log_b, mode='index', names=('A', 'B')):
+    """Compare two loaded logs (tmf8829log.Log), see LogComparison"""
+    store_a = FrameStore.from_frames(log_a.frames, fields=set(FIELDS))
+    store_b = FrameStore.from_frames(log_b.frames, fields=set(FIELDS))
+    return LogComparison(store_a, store_b, log_a.frames, log_b.frames, mode, names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two TMF8829 captures (B - A)')
+    parser.add_argument('log_a', help='Capture A (.json, .json.gz, .ndjson, .ndjson.gz)')
+    parser.add_argument('log_b', help='Capture B')
+    parser.add_argument('-a', '--align', choices=ALIGN_MODES, default='index',
+                        help='Frame alignment (default: index)')
+    parser.add_argument('-o', '--output', help='Save alignment and differences as .npz')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    log_a = tmf8829log.load(args.log_a)
+    log_b = tmf8829log.load(args.log_b)
+    loaded = time.perf_counter()
+    try:
+        comparison = compare_logs(log_a, log_b, args.align, (args.log_a, args.log_b))
+    except ValueError as e:
+        parser.error(str(e))
+    compared = time.perf_counter()
+
+    comparison.print_summary()
+    if args.output:
+        comparison.save(args.output)
+        print(f"✓ {args.output}")
+    print(f"Loaded in {loaded - start:.3f} s, compared in {compared - loaded:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Temporal filtering of the peak values of a TMF8829 log
+
+Every zone and peak slot is filtered over time, independently for each of
+the selected peak fields (distance, x, y, z by default):
+
+    --min-snr S     samples with snr below S are rejected: they are not used
+                    by the filters and hold the last filtered value of their
+                    zone and peak (the value as read until one is accepted)
+    --median N      median of the last N accepted samples
+    --ema ALPHA     exponential moving average, after the median if both
+
+Peaks without a target (distance 0) are neither used nor changed. The log is
+streamed: only a ring buffer of the last N frames is kept, as one NumPy array
+of frames x zones x peaks x fields. The output is a log with the same
+structure (JSON or NDJSON, by the output name) that all tools can open. Its
+frames are written as one minified line each (histograms and unfiltered
+results copied as read) and compressed at the default gzip level 6.
+Requires numpy.
+'''
+
+import argparse
+import tempfile
+import time
+import warnings
+from array import array
+
+import numpy as np
+
+import tmf8829log
+from frame_store import COLUMN_DTYPES
+
+FIELDS = ('distance', 'x', 'y', 'z')
+COMPRESS_LEVEL = 6      # zlib default, level 9 takes several times longer for a few percent
+
+
+class TemporalFilter:
+    """Per-zone temporal filter fed one frame at a time
+
+    Args:
+        fields: peak fields to filter
+        median: frames of the running median (None: no median)
+        ema: smoothing factor of the exponential moving average, 0 < ema <= 1 (None: no EMA)
+        min_snr: reject samples with a lower snr (None: keep all)
+    """
+
+    def __init__(self, fields=FIELDS, median=None, ema=None, min_snr=None):
+        if median is not None and median < 1:
+            raise ValueError("The median needs at least one frame")
+        if ema is not None and not 0 < ema <= 1:
+            raise ValueError("The EMA factor must be in (0, 1]")
+        self.fields = tuple(fields)
+        self.median = median
+        self.ema = ema
+        self.min_snr = min_snr
+        self.frames = 0
+        self.filtered = 0           # frames passed through the filters
+        self.rejected = 0           # samples rejected by snr
+        self.changed = 0            # output values that differ from the input
+        self._shape = None
+        self._history = None        # ring buffer (median, zones, peaks, fields)
+        self._position = 0
+        self._average = None        # EMA state (zones, peaks, fields)
+        self._last = None           # last filter output (zones, peaks, fields)
+
+    def _reset(self, shape):
+        self._shape = shape
+        self._history = np.full((self.median or 1,) + shape, np.nan) if self.median else None
+        self._position = 0
+        self._average = np.full(shape, np.nan) if self.ema else None
+        self._last = np.full(shape, np.nan)
+
+    def _peak_values(self, frame, name, zones, peaks, mask):
+        """zones x peaks array of a peak field, NaN for missing peaks"""
+        column = frame.packed_column(name)
+        values = np.frombuffer(column, dtype=COLUMN_DTYPES[column.typecode]).astype(np.float64)
+        if mask is None:
+            return values.reshape(zones, peaks)
+        grid = np.full((zones, peaks), np.nan)
+        grid[mask] = values
+        return grid
+
+    def apply(self, frame):
+        """Return the filtered frame (frames that cannot be filtered are returned unchanged)"""
+        self.frames += 1
+        layout = frame.layout
+        if layout is None or not frame.rows or 'distance' not in layout.peak_keys:
+            return frame
+        fields = [name for name in self.fields if name in layout.peak_keys]
+        counts = frame.peak_counts
+        zones = frame.rows * frame.cols
+        if isinstance(counts, int):
+            peaks, mask = counts, None
+        else:
+            peaks = max(counts, default=0)
+            mask = np.arange(peaks) < np.frombuffer(counts, dtype=np.uint8)[:, None]
+        if not fields or not peaks:
+            return frame
+
+        shape = (zones, peaks, len(fields))
+        if shape != self._shape:
+            self._reset(shape)
+
+        values = np.stack([self._peak_values(frame, name, zones, peaks, mask) for name in fields], axis=-1)
+        with np.errstate(invalid='ignore'):
+            target = self._peak_values(frame, 'distance', zones, peaks, mask) > 0
+            accepted = target
+            if self.min_snr is not None and 'snr' in layout.peak_keys:
+                accepted = target & (self._peak_values(frame, 'snr', zones, peaks, mask) >= self.min_snr)
+                self.rejected += int((target & ~accepted).sum())
+        samples = np.where(accepted[..., None], values, np.nan)
+
+        output = samples
+        if self.median:
+            self._history[self._position] = samples
+            self._position = (self._position + 1) % self.median
+            with warnings.catch_warnings():
+                # Zones without accepted samples in the window stay NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                output = np.nanmedian(self._history, axis=0)
+        if self.ema:
+            average = self._average
+            update = ~np.isnan(output)
+            started = ~np.isnan(average)
+            average[update & started] += self.ema * (output[update & started] - average[update & started])
+            average[update & ~started] = output[update & ~started]
+            output = average
+
+        # Slots without accepted samples hold the last filter output
+        output = np.where(np.isnan(output), self._last, output)
+        self._last = output
+
+        # Only peaks with a target get filtered values
+        result = np.where(target[..., None] & ~np.isnan(output), output, values)
+        replace = {}
+        for index, name in enumerate(fields):
+            column = frame.packed_column(name)
+            new = result[..., index] if mask is None else result[..., index][mask]
+            if column.typecode == 'q':
+                new = np.rint(new)
+            new = np.ascontiguousarray(new.ravel(), dtype=COLUMN_DTYPES[column.typecode])
+            packed = array(column.typecode)
+            packed.frombytes(new.tobytes())
+            self.changed += int((new != np.frombuffer(column, dtype=new.dtype)).sum())
+            replace[name] = packed
+        self.filtered += 1
+        return frame.replace_columns(replace)
+
+
+def default_output(input_file):
+    """log.json.gz -> log_filtered.json.gz"""
+    stem, ext = tmf8829log.split_log_name(input_file)
+    return stem + '_filtered' + (ext or '.json')
+
+
+def filter_log(input_file, output_file, temporal_filter, threaded=False):
+    """Stream a log through a TemporalFilter into a new log
+
+    Frames are spooled to a temporary file until the header entries, which
+    may follow Result_Set, are known.
+
+    Returns:
+        number of frames written
+    """
+    ndjson = output_file.endswith(('.ndjson', '.ndjson.gz'))
+    log = tmf8829log.Log(keys=[])
+    count = 0
+    with tempfile.TemporaryFile('w+b' if ndjson else 'w+', **({} if ndjson else {'encoding': 'utf-8'})) as spool:
+        for frame in tmf8829log.iter_frames(input_file, log, threaded):
+            frame = temporal_filter.apply(frame)
+            if ndjson:
+                spool.write(tmf8829log.ndjson.frame_line(frame))
+            else:
+                spool.write(tmf8829log.compact_frame(frame, count == 0))
+            count += 1
+
+        spool.seek(0)
+        if ndjson:
+            with tmf8829log.NdjsonWriter(output_file, log, compresslevel=COMPRESS_LEVEL) as writer:
+                for line in spool:
+                    writer.write_line(line)
+        else:
+            with tmf8829log.open_output(output_file, threaded, compresslevel=COMPRESS_LEVEL) as f:
+                tmf8829log.write_log(log, f, result_set=spool)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Temporal filtering of the peak values of a TMF8829 log')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Filtered log (default: <log>_filtered.<ext>)')
+    parser.add_argument('--median', type=int, metavar='N', help='Running median over N frames')
+    parser.add_argument('--ema', type=float, metavar='ALPHA', help='Exponential moving average factor (0..1]')
+    parser.add_argument('--min-snr', type=float, metavar='SNR', help='Reject samples with a lower snr')
+    parser.add_argument('-f', '--fields', nargs='+', default=list(FIELDS),
+                        help=f"Peak fields to filter (default: {' '.join(FIELDS)})")
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress and compress in background threads')
+    args = parser.parse_args()
+
+    if args.median is None and args.ema is None and args.min_snr is None:
+        parser.error('Select at least one of --median, --ema and --min-snr')
+    try:
+        temporal_filter = TemporalFilter(args.fields, args.median, args.ema, args.min_snr)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output or default_output(args.input)
+    start = time.perf_counter()
+    count = filter_log(args.input, output, temporal_filter, args.threaded)
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ {args.input} -> {output}")
+    print(f"  {count} frames, {temporal_filter.filtered} filtered, {temporal_filter.changed} values changed, "
+          f"{temporal_filter.rejected} samples rejected by snr")
+    print(f"  {elapsed:.3f} s ({count / elapsed if elapsed else 0:,.0f} frames/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Columnar store of the results of a TMF8829 log
+
+FrameStore holds every selected results field of all frames in one NumPy
+array: zone fields (noise, xtalk) as frames x zones, peak fields (distance,
+snr, ...) as frames x zones x peaks. Missing values - frames without results,
+zones with fewer peaks - are NaN, so analyses run over whole arrays without
+per-frame Python loops. Frames are consumed one at a time and converted in
+blocks, the log does not need to stay in memory. Requires numpy.
+'''
+
+import numpy as np
+
+import tmf8829log
+
+BLOCK_FRAMES = 1024     # frames converted to arrays at once
+# NumPy dtype of the array typecodes of packed columns (Frame.packed_column())
+COLUMN_DTYPES = {'q': np.int64, 'd': np.float64}
+
+
+class FrameStore:
+    """Results of all frames of a log as arrays
+
+    Attributes:
+        rows, cols: zone grid (frames with another grid count as missing)
+        frame_numbers: int64 array, -1 for frames without frame_number
+        read_times: float64 array of info read_time (microseconds), NaN if missing
+        present: bool array, True for frames with results on the grid
+        zone_fields: dict name -> float array (frames, zones)
+        peak_fields: dict name -> float array (frames, zones, peaks)
+        header: top-level entries of the log (configuration, info)
+    """
+
+    def __init__(self, rows, cols, frame_numbers, present, zone_fields, peak_fields, header=None, read_times=None):
+        self.rows = rows
+        self.cols = cols
+        self.frame_numbers = frame_numbers
+        self.present = present
+        self.zone_fields = zone_fields
+        self.peak_fields = peak_fields
+        self.header = header or {}
+        self.read_times = read_times if read_times is not None else np.full(len(frame_numbers), np.nan)
+
+    @property
+    def frames(self):
+        return len(self.frame_numbers)
+
+    @property
+    def zones(self):
+        return self.rows * self.cols
+
+    def field(self, name, peak=0):
+        """frames x zones array of a zone field, or of one peak of a peak field"""
+        if name in self.zone_fields:
+            return self.zone_fields[name]
+        values = self.peak_fields[name]
+        if peak >= values.shape[2]:
+            return np.full(values.shape[:2], np.nan, dtype=values.dtype)
+        return values[:, :, peak]
+
+    @classmethod
+    def from_frames(cls, frames, fields=None, peaks=None, dtype=np.float32):
+        """Build a store from an iterable of Frames
+
+        Args:
+            frames: Frames, e.g. a Log or tmf8829log.iter_frames()
+            fields: names of the results fields to keep (default: all)
+            peaks: number of peaks kept of peak fields (default: all)
+            dtype: float type of the arrays
+        """
+        builder = _Builder(fields, peaks, dtype)
+        block = []
+        for frame in frames:
+            block.append(frame)
+            if len(block) == BLOCK_FRAMES:
+                builder.add_block(block)
+                block = []
+        if block:
+            builder.add_block(block)
+        return builder.finish()
+
+    @classmethod
+    def load(cls, path, fields=None, peaks=None, dtype=np.float32):
+        """Build a store from a log file, streaming its frames"""
+        log = tmf8829log.Log(keys=[])
+        store = cls.from_frames(tmf8829log.iter_frames(path, log), fields, peaks, dtype)
+        store.header = log.header
+        return store
+
+    def __repr__(self):
+        return (f"FrameStore({self.frames} frames, {self.cols}x{self.rows}, "
+                f"fields={list(self.zone_fields) + list(self.peak_fields)})")
+
+
+class _Builder:
+    """Collects blocks of frames into arrays for FrameStore.from_frames()"""
+
+    def __init__(self, fields, peaks, dtype):
+        self.fields = fields
+        self.peaks = peaks
+        self.dtype = dtype
+        self.rows = self.cols = None
+        self.zone_names = None
+        self.peak_names = None
+        self.frame_numbers = []
+        self.read_times = []
+        self.present = []
+        self.zone_blocks = []
+        self.peak_blocks = []
+
+    def _setup(self, frame):
+        """Take grid and field names from the first frame with results"""
+        self.rows, self.cols = frame.rows, frame.cols
+        if frame.layout is not None:
+            zone_names = [key for key, _ in frame.layout.zone_fields]
+            peak_names = list(frame.layout.peak_keys)
+        else:
+            # Irregular grids: fields of all zones and peaks, the first zones may have no peaks
+            zones = [zone for row in frame.results for zone in row]
+            zone_names = list(dict.fromkeys(key for zone in zones for key in zone if key != 'peaks'))
+            peak_names = list(dict.fromkeys(key for zone in zones for peak in zone.get('peaks') or ()
+                                            for key in peak))
+        if self.fields is not None:
+            zone_names = [key for key in zone_names if key in self.fields]
+            peak_names = [key for key in peak_names if key in self.fields]
+        self.zone_names = zone_names
+        self.peak_names = peak_names
+
+    def add_block(self, block):
+        if self.rows is None:
+            for frame in block:
+                if frame.rows:
+                    self._setup(frame)
+                    break
+        zones = (self.rows or 0) * (self.cols or 0)
+
+        count = len(block)
+        present = np.zeros(count, dtype=bool)
+        self.frame_numbers.append(np.array([frame.frame_number if frame.frame_number is not None else -1
+                                            for frame in block], dtype=np.int64))
+        self.read_times.append(np.array([(frame.info or {}).get('read_time', np.nan) for frame in block],
+                                        dtype=np.float64))
+
+        # Peaks of this block, blocks are padded to the same count in finish()
+        max_peaks = 0
+        for frame in block:
+            counts = frame.peak_counts
+            if counts is None:
+                max_peaks = max(max_peaks, max((len(zone.get('peaks') or []) for row in frame.results or []
+                                                for zone in row), default=0))
+            else:
+                max_peaks = max(max_peaks, counts if isinstance(counts, int) else max(counts, default=0))
+        if self.peaks is not None:
+            max_peaks = min(max_peaks, self.peaks)
+
+        zone_arrays = {name: np.full((count, zones), np.nan, dtype=self.dtype) for name in self.zone_names or []}
+        peak_arrays = {name: np.full((count, zones, max_peaks), np.nan, dtype=self.dtype)
+                       for name in self.peak_names or []}
+
+        # Frames sharing a layout and a uniform peak count are converted together
+        groups = {}
+        for index, frame in enumerate(block):
+            if not frame.rows or (frame.rows, frame.cols) != (self.rows, self.cols):
+                continue
+            present[index] = True
+            counts = frame.peak_counts
+            if counts is None or not isinstance(counts, int):
+                self._add_frame(frame, index, zone_arrays, peak_arrays, max_peaks)
+            else:
+                groups.setdefault((id(frame.layout), counts), []).append(index)
+
+        for (_, counts), indices in groups.items():
+            frames = [block[index] for index in indices]
+            for name, array in zone_arrays.items():
+                values = self._stack(frames, name)
+                if values is not None:
+                    array[indices] = values.reshape(len(indices), zones)
+            kept = min(counts, max_peaks)
+            for name, array in peak_arrays.items():
+                values = self._stack(frames, name) if kept else None
+                if values is not None:
+                    array[indices, :, :kept] = values.reshape(len(indices), zones, counts)[:, :, :kept]
+
+        self.present.append(present)
+        self.zone_blocks.append(zone_arrays)
+        self.peak_blocks.append(peak_arrays)
+
+    @staticmethod
+    def _stack(frames, name):
+        """Packed columns of a field of frames as one array (frames must share a layout)"""
+        column = frames[0].packed_column(name)
+        if column is None:
+            return None
+        return np.frombuffer(b''.join([frame.packed_column(name) for frame in frames]),
+                             dtype=COLUMN_DTYPES[column.typecode])
+
+    def _add_frame(self, frame, index, zone_arrays, peak_arrays, max_peaks):
+        """Irregular frames (unpacked results or varying peak counts) one at a time"""
+        for name, array in zone_arrays.items():
+            array[index] = [np.nan if value is None else float(value) for value in _column(frame, name, 0)]
+        for name, array in peak_arrays.items():
+            for peak in range(max_peaks):
+                array[index, :, peak] = [np.nan if value is None else float(value)
+                                         for value in _column(frame, name, peak)]
+
+    def finish(self):
+        peaks = max((array.shape[2] for arrays in self.peak_blocks for array in arrays.values()), default=0)
+
+        zone_fields = {name: np.concatenate([arrays[name] for arrays in self.zone_blocks])
+                       for name in self.zone_names or []}
+        peak_fields = {}
+        for name in self.peak_names or []:
+            parts = []
+            for arrays in self.peak_blocks:
+                array = arrays[name]
+                if array.shape[2] < peaks:
+                    pad = np.full(array.shape[:2] + (peaks - array.shape[2],), np.nan, dtype=self.dtype)
+                    array = np.concatenate([array, pad], axis=2)
+                parts.append(array)
+            peak_fields[name] = np.concatenate(parts)
+
+        frame_numbers = np.concatenate(self.frame_numbers) if self.frame_numbers else np.zeros(0, dtype=np.int64)
+        present = np.concatenate(self.present) if self.present else np.zeros(0, dtype=bool)
+        read_times = np.concatenate(self.read_times) if self.read_times else np.zeros(0)
+        return FrameStore(self.rows or 0, self.cols or 0, frame_numbers, present, zone_fields, peak_fields,
+                          read_times=read_times)
+
+
+def _column(frame, name, peak):
+    """Frame.column() that tolerates fields missing in a frame"""
+    try:
+        return frame.column(name, peak)
+    except KeyError:
+        return [None] * (frame.rows * frame.cols)
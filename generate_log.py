@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Generate synthetic TMF8829 JSON log files
+
+The output has the same structure and formatting as the logs written by the
+ams-OSRAM evaluation software (Result_Set / configuration / info, indent=4).
+The same arguments always produce byte-identical files. The values of a
+frame are drawn as arrays from a NumPy generator seeded with the seed and
+the frame index. Requires numpy.
+'''
+
+import argparse
+import gzip
+
+import numpy as np
+
+import geometry
+from tmf8829log import format_json
+
+# Register image of the sample configuration (tmf8829_log_1770799073)
+_SAMPLE_BLOB = bytes.fromhex(
+    '21000807023f023c3901000105000600035d0000f9000000000000000000da00'
+    '02020e00500000005802000000000202010600000e507800000000000f00ffff'
+    'ffffffffffff0000ffff0000000000000f0f0f00000002000000000000000000'
+    '0000000000000000000000000000820000000000000000000000000000000000'
+    '0000bb0000000000000000000000d0070a060800000000000000000000000000'
+    '000000000000000000000000000000000000000000000000000000000000'
+)
+
+_SAMPLE_CONFIGURATION = {
+    'add_100_mm_offset': 0, 'bdv_temp_sensor': 1, 'bin_shift': 2, 'confidence_threshold': 6,
+    'cpu_sleep': 1, 'current': 93, 'dead_time': 60, 'detect_snr': 10, 'device_sleep': 0,
+    'dither_increment': 0, 'dither_rounds': 0, 'dual_mode': 0, 'ext_clk_input': 0,
+    'ext_en_output': 0, 'ext_inv_output': 0, 'fov_correction': 2, 'fp_mode': 2, 'full_noise': 0,
+    'gpio0': 0, 'gpio1': 0, 'gpio2': 0, 'gpio3': 0, 'gpio4': 0, 'gpio5': 0, 'gpio6': 0,
+    'hi_len': 0, 'high_accuracy_iterations': 600, 'histogram_bins': 218, 'histograms': 1,
+    'hv_cp_overload_detect': 0, 'i2c_slave_address': 130, 'int_persistence': 0,
+    'int_threshold_high': 65535, 'int_threshold_low': 0, 'int_zone_mask': -1, 'iterations': 1800,
+    'last_cfg_register': 0, 'lp_osc_device_sleep': 1, 'min_distance_uq': 120, 'motion_adjacent': 8,
+    'motion_distance': 2000, 'mp_bottom_x': 15, 'mp_bottom_y': 15, 'mp_top_x': 0, 'mp_top_y': 0,
+    'noise_strength': 1, 'nr_peaks': 1, 'parameter_a': 0, 'parameter_b': 0, 'peak_bins': 2,
+    'peak_detect_start': 80, 'period': 33, 'poisson': 14, 'post_processing': 0, 'pre_delay': 0,
+    'prox_distance': 0, 'publish': 0, 'pulse_width': 3, 'ref_bin_shift': 2, 'ref_mp': 15,
+    'ref_peak_bins': 2, 'ref_spad_select': 2, 'release_snr': 6, 'select': 1, 'settling': 80,
+    'signal_level': 0, 'signal_strength': 1, 'spad_cropping': 0, 'spad_select': 63,
+    'spr_spec_amp': 0, 'spr_spec_cfg': 0, 'spr_spec_single_edge': 0, 'sub_result': 0,
+    't0_vcsel': 2, 't1_vcsel': 1, 'tdc_offset': 14, 'vc_spr_spec_amp': 0, 'vc_spr_spec_cfg': 0,
+    'vc_spr_spec_single_edge': 0, 'vcdrv_offset': 0, 'vcsel_period': 249, 'xtalk': 1,
+    'xtalk_distance_mm': 0, 'xtalk_edge': 187, 'xtalk_max': 0,
+}
+
+_SAMPLE_INFO = {
+    'EVM version': '2.2.5   ',
+    'fw version': [1, 2, 194, 0],
+    'host type': 4,
+    'host version': [3, 0],
+    'logger version': '4',
+    'protocol version': 2,
+    'serial number': 1746703494,
+}
+
+HISTOGRAM_BINS = 64
+USED_BINS = 55          # bins 55..63 are always zero in logged histograms
+SUB_HISTOGRAMS = 16     # mp_histo entries per macro pixel, identical in the sample log
+REF_HISTOGRAMS = 8
+BANK_SIZE = 61          # number of precomputed background histograms
+
+
+def make_configuration(cols=16, rows=16, nr_peaks=1, histograms=True):
+    """Return a configuration section based on the sample log
+
+    The macro pixel window is the whole 16x16 array for every resolution
+    (mp_top_x/y 0, mp_bottom_x/y 15), the zones split it evenly.
+    """
+    configuration = dict(_SAMPLE_CONFIGURATION)
+    configuration.update({
+        'blob': ['0x%02x' % b for b in _SAMPLE_BLOB],
+        'histograms': 1 if histograms else 0,
+        'nr_peaks': nr_peaks,
+    })
+    return dict(sorted(configuration.items()))
+
+
+class LogGenerator:
+    """Deterministic source of synthetic frames
+
+    The scene is a slowly moving back wall with an object sweeping across the
+    field of view. Zone directions are the pinhole model of geometry.py for
+    the configuration of the log, so x/y/z are consistent with the distance
+    of every peak and with the geometry engine at every resolution. Like in
+    the sample log, mp_histo holds the macro pixels of the first row of
+    zones, each as SUB_HISTOGRAMS equal sub-histograms with every peak of
+    the zone at the bin of its distance. The further peaks are three times
+    weaker each: histo_analysis.py finds the first two, the third and fourth
+    mostly stay below its detection threshold and count as mismatches.
+    """
+
+    def __init__(self, cols=16, rows=16, nr_peaks=1, histograms=True, seed=0,
+                 drop_rate=0.0, warning_rate=0.05):
+        self.cols = cols
+        self.rows = rows
+        self.nr_peaks = nr_peaks
+        self.histograms = histograms
+        self.seed = seed
+        self.drop_rate = drop_rate
+        self.warning_rate = warning_rate
+
+        # Unit direction of every zone for the macro pixel window of the configuration
+        self.directions = geometry.model_directions(make_configuration(cols, rows, nr_peaks, histograms), rows, cols)
+        zone_rows, zone_cols = np.divmod(np.arange(rows * cols), cols)
+        self.zone_cols = zone_cols
+        self.object_rows = (rows / 3 <= zone_rows) & (zone_rows < 2 * rows / 3)
+
+        # Precomputed histogram shapes keep generation fast for large logs
+        rng = np.random.default_rng(seed)
+        self.mp_bank = np.zeros((BANK_SIZE, HISTOGRAM_BINS), dtype=np.int64)
+        self.mp_bank[:, :USED_BINS] = np.maximum(0, rng.normal(125, 12, (BANK_SIZE, USED_BINS)).astype(np.int64))
+        self.mp_bank[:, 3] += 230
+        self.mp_bank[:, 4] += 70
+        shape = np.array([2, 1, 5600, 29700, 10300, 900, 108, 26, 18, 13, 11, 6])
+        self.ref_bank = np.zeros((BANK_SIZE, HISTOGRAM_BINS), dtype=np.int64)
+        self.ref_bank[:, :len(shape)] = (shape * rng.uniform(0.9, 1.1, (BANK_SIZE, len(shape)))).astype(np.int64)
+        self.ref_bank[:, len(shape):USED_BINS] = rng.integers(0, 5, (BANK_SIZE, USED_BINS - len(shape)))
+
+        self.frame_number = 1
+        self.read_time = 53000000
+        self.temperature = 25.0
+
+    def _peaks(self, distance, signal_scale, noise):
+        """Peak fields of all zones as arrays, distance 0 where a zone has no target"""
+        target = distance > 0
+        with np.errstate(divide='ignore'):
+            signal = np.where(target, np.minimum(65535, (1.4e9 / (distance * distance) * signal_scale)), 0)
+        signal = signal.astype(np.int64)
+        snr = np.minimum(255, signal / (2 * np.sqrt(noise))).astype(np.int64)
+        xyz = [['%.2f' % value for value in np.where(target, distance * axis, 0.0).tolist()]
+               for axis in self.directions.T]
+        return distance.tolist(), signal.tolist(), snr.tolist(), xyz, signal
+
+    def frame(self, index):
+        """Return the frame dict for frame index (frames must be requested in order)"""
+        rng = np.random.default_rng((self.seed, index))
+        cols, rows = self.cols, self.rows
+        zones = rows * cols
+
+        wall = 2500 + 300 * np.sin(index / 50)
+        object_col = (index * 0.2) % cols
+        object_distance = 600 + 200 * np.sin(index / 30)
+
+        in_object = (np.abs(self.zone_cols - object_col) < 2.5) & self.object_rows
+        true_distance = np.where(in_object, object_distance, wall) / self.directions[:, 2]
+        distance = np.maximum(1, (true_distance + rng.normal(0, 5 + true_distance / 200)).astype(np.int64))
+        noise = np.maximum(20, rng.normal(110, 30, zones).astype(np.int64))
+        xtalk = np.maximum(0, rng.normal(350, 80, zones).astype(np.int64))
+
+        peaks = [self._peaks(distance, 1.0, noise)]
+        for p in range(1, self.nr_peaks):
+            second = distance + 400 * p + rng.normal(0, 20, zones).astype(np.int64)
+            peaks.append(self._peaks(np.where(rng.random(zones) < 0.5, second, 0), 3.0 ** -p, noise))
+
+        zone_peaks = [[{'distance': d, 'signal': s, 'snr': n, 'x': x, 'y': y, 'z': z}
+                       for d, s, n, x, y, z in zip(values[0], values[1], values[2], *values[3])]
+                      for values in peaks]
+        zone_results = [{'noise': n, 'peaks': list(p), 'xtalk': x}
+                        for n, x, p in zip(noise.tolist(), xtalk.tolist(), zip(*zone_peaks))]
+        results = [zone_results[row * cols:(row + 1) * cols] for row in range(rows)]
+
+        # Frame bookkeeping, optionally with dropped frames
+        self.frame_number += 3
+        if self.drop_rate and rng.random() < self.drop_rate:
+            self.frame_number += 3 * int(rng.integers(1, 4))
+        self.read_time += int(33000 + rng.normal(0, 3000))
+        systick_t0 = self.read_time - int(rng.normal(25000, 3000))
+        self.temperature = min(60.0, max(15.0, self.temperature + rng.normal(0.002, 0.05)))
+
+        frame = {
+            'info': {
+                'frame_number': self.frame_number,
+                'read_time': self.read_time,
+                'systick_t0': systick_t0,
+                'systick_t1': systick_t0 - int(rng.normal(16000, 2000)),
+                'temperature': int(round(self.temperature)),
+                'warnings': 1 if rng.random() < self.warning_rate else 0,
+            },
+        }
+        if self.histograms:
+            # Background shape of the bank with every peak of every macro pixel added
+            macro_pixels = np.arange(cols)
+            bins = self.mp_bank[(index * 131 + macro_pixels * 17) % BANK_SIZE]
+            for peak_distance, _, _, _, peak_signal in peaks:
+                peak_distance = np.asarray(peak_distance[:cols])
+                target = peak_distance > 0
+                peak_bin = np.minimum(USED_BINS - 3, 5 + peak_distance * 45 // 5000)
+                amplitude = np.where(target, np.minimum(4000, peak_signal[:cols] * 4), 0)
+                bins[macro_pixels, peak_bin - 1] += amplitude // 4
+                bins[macro_pixels, peak_bin] += amplitude
+                bins[macro_pixels, peak_bin + 1] += amplitude // 2
+            frame['mp_histo'] = [[{'bin': histogram}] * SUB_HISTOGRAMS for histogram in bins.tolist()]
+            frame['ref_histo'] = [{'bin': histogram} for histogram in
+                                  self.ref_bank[(index * 7 + np.arange(REF_HISTOGRAMS)) % BANK_SIZE].tolist()]
+        frame['results'] = results
+        return frame
+
+
+def format_frame(frame, level=2):
+    """format_json(frame, level) that formats the equal sub-histograms of a macro pixel once"""
+    pads = ['\n' + ' ' * (4 * depth) for depth in range(level + 4)]
+    entries = []
+    for key, value in frame.items():
+        if key == 'mp_histo':
+            macro_pixels = []
+            for sub_histograms in value:
+                histogram = pads[level + 3] + format_json(sub_histograms[0], level + 3)
+                macro_pixels.append(pads[level + 2] + '[' + ','.join([histogram] * len(sub_histograms)) +
+                                    pads[level + 2] + ']')
+            text = '[' + ','.join(macro_pixels) + pads[level + 1] + ']'
+        else:
+            text = format_json(value, level + 1)
+        entries.append(pads[level + 1] + format_json(key) + ': ' + text)
+    return '{' + ','.join(entries) + pads[level] + '}'
+
+
+def generate_log(output_file, frames=1000, cols=16, rows=16, nr_peaks=1, histograms=True,
+                 seed=0, drop_rate=0.0, warning_rate=0.05):
+    """Write a synthetic TMF8829 JSON log
+
+    Args:
+        output_file: Path of the log (.json or .json.gz)
+        frames: Number of frames in Result_Set
+        cols, rows: Zone resolution
+        nr_peaks: Number of peaks per zone
+        histograms: Include mp_histo and ref_histo
+        seed: Random seed, equal arguments give byte-identical files
+        drop_rate: Probability of a gap in frame_number after a frame
+        warning_rate: Probability of a frame with warnings
+    """
+    generator = LogGenerator(cols, rows, nr_peaks, histograms, seed, drop_rate, warning_rate)
+
+    if output_file.endswith('.gz'):
+        # Fixed mtime and no file name in the header keep the output reproducible
+        raw = open(output_file, 'wb')
+        binary = gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=6, mtime=0)
+    else:
+        raw = None
+        binary = open(output_file, 'wb')
+
+    try:
+        binary.write(b'{\n    "Result_Set": [')
+        for index in range(frames):
+            separator = ',' if index else ''
+            binary.write((separator + '\n        ' + format_frame(generator.frame(index))).encode('utf-8'))
+        binary.write(b'\n    ]' if frames else b']')
+        binary.write((',\n    "configuration": ' + format_json(make_configuration(cols, rows, nr_peaks, histograms), 1) +
+                      ',\n    "info": ' + format_json([_SAMPLE_INFO], 1) + '\n}\n').encode('utf-8'))
+    finally:
+        binary.close()
+        if raw is not None:
+            raw.close()
+
+    print(f"Synthetic log generated: {output_file}")
+    print(f"  Frames: {frames}, resolution: {cols}x{rows}, nr_peaks: {nr_peaks}, histograms: {'yes' if histograms else 'no'}")
+
+
+def parse_resolution(text):
+    """Parse 'COLSxROWS' (e.g. '16x16')"""
+    try:
+        cols, rows = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{text}', expected COLSxROWS")
+    if cols < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{text}'")
+    return cols, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic TMF8829 JSON log file')
+    parser.add_argument('-o', '--output', required=True, help='Output log file (.json or .json.gz)')
+    parser.add_argument('-n', '--frames', type=int, default=1000, help='Number of frames (default: 1000)')
+    parser.add_argument('-r', '--resolution', type=parse_resolution, default=(16, 16),
+                        help='Zone resolution COLSxROWS (default: 16x16)')
+    parser.add_argument('-p', '--nr-peaks', type=int, default=1, choices=[1, 2, 3, 4],
+                        help='Number of peaks per zone (default: 1)')
+    parser.add_argument('--no-histograms', action='store_true', help='Omit mp_histo and ref_histo')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='Probability of dropped frames after each frame (default: 0)')
+    parser.add_argument('--warning-rate', type=float, default=0.05,
+                        help='Probability of a frame with warnings (default: 0.05)')
+    args = parser.parse_args()
+
+    cols, rows = args.resolution
+    generate_log(args.output, args.frames, cols, rows, args.nr_peaks, not args.no_histograms,
+                 args.seed, args.drop_rate, args.warning_rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Zone geometry: x/y/z of the peaks from their distance
+
+Logs written without x/y/z only carry the (radial) distance of every peak.
+The direction of every zone follows from the configuration: the zones
+evenly split the macro pixel window mp_top_x/y .. mp_bottom_x/y of the
+16x16 macro pixel array, whose centers lie on a pinhole grid with a tangent
+pitch of 1/12 in x and 1/16 in y around the optical axis (fitted to logs
+with x/y/z, fov_correction 2). Then
+
+    x, y, z = distance * direction[zone]
+
+for whole distance arrays (frames x zones x peaks) with one broadcasted
+multiply. The unit direction vectors are computed once per configuration
+and grid and cached by the geometry entries of the configuration
+(GEOMETRY_KEYS). A log that carries x/y/z calibrates the directions of its
+configuration (--calibrate), e.g. for other spad_select or fov_correction
+settings; the calibration is used for logs of the same configuration
+without x/y/z. Requires numpy.
+'''
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from frame_store import FrameStore
+
+GEOMETRY_KEYS = ('mp_top_x', 'mp_top_y', 'mp_bottom_x', 'mp_bottom_y', 'spad_select', 'fov_correction')
+MP_COUNT = (16, 16)             # macro pixels of the array (x, y)
+MP_PITCH = (1 / 12, 1 / 16)     # tangent of the angle between neighbouring macro pixels (x, y)
+
+_cache = {}
+
+
+class ZoneGeometry:
+    """Unit direction vector of every zone of a grid
+
+    Attributes:
+        rows, cols: zone grid
+        directions: float64 array (zones, 3), row major like the results
+        key: geometry_key() of the configuration and grid
+        source: 'model' or 'calibrated'
+    """
+
+    def __init__(self, rows, cols, directions, key=None, source='model'):
+        self.rows = rows
+        self.cols = cols
+        self.directions = directions
+        self.key = key
+        self.source = source
+
+    def xyz(self, distance):
+        """x/y/z of distances
+
+        Args:
+            distance: array (..., zones, peaks), e.g. frames x zones x peaks
+
+        Returns:
+            array distance.shape + (3,) of the same float type
+        """
+        distance = np.asarray(distance)
+        dtype = distance.dtype if distance.dtype.kind == 'f' else np.float64
+        return distance.astype(dtype, copy=False)[..., None] * self.directions.astype(dtype)[:, None, :]
+
+    def __repr__(self):
+        return f"ZoneGeometry({self.cols}x{self.rows}, {self.source})"
+
+
+def geometry_key(configuration, rows, cols):
+    """Hashable key of the configuration entries that change the zone directions"""
+    configuration = configuration or {}
+    return tuple(configuration.get(key) for key in GEOMETRY_KEYS) + (rows, cols)
+
+
+def _window(configuration, axis):
+    """(first, end) macro pixel of the configured window along axis 'x' or 'y'"""
+    count = MP_COUNT[axis == 'y']
+    top = configuration.get(f'mp_top_{axis}')
+    bottom = configuration.get(f'mp_bottom_{axis}')
+    if not isinstance(top, int) or not isinstance(bottom, int) or not 0 <= top <= bottom < count:
+        return 0, count
+    return top, bottom + 1
+
+
+def model_directions(configuration, rows, cols):
+    """Unit direction vectors (zones, 3) of the pinhole model of a configuration"""
+    configuration = configuration or {}
+    tangents = []
+    for axis, zones, count, pitch in (('x', cols, MP_COUNT[0], MP_PITCH[0]), ('y', rows, MP_COUNT[1], MP_PITCH[1])):
+        first, end = _window(configuration, axis)
+        centers = first + (np.arange(zones) + 0.5) * (end - first) / zones
+        tangents.append((centers - count / 2) * pitch)
+    tx, ty = np.meshgrid(tangents[0], tangents[1])
+    directions = np.stack([tx.ravel(), ty.ravel(), np.ones(rows * cols)], axis=-1)
+    return directions / np.linalg.norm(directions, axis=-1, keepdims=True)
+
+
+def zone_geometry(configuration, rows, cols):
+    """ZoneGeometry of a configuration and grid, cached by geometry_key()"""
+    key = geometry_key(configuration, rows, cols)
+    geometry = _cache.get(key)
+    if geometry is None:
+        geometry = ZoneGeometry(rows, cols, model_directions(configuration, rows, cols), key)
+        _cache[key] = geometry
+    return geometry
+
+
+def calibrate(store, configuration=None):
+    """Fit the zone directions of a FrameStore with distance and x/y/z
+
+    The median direction of every zone replaces the model for the
+    configuration of the store; zones without targets keep the model.
+
+    Returns:
+        the calibrated ZoneGeometry
+    """
+    for name in ('distance', 'x', 'y', 'z'):
+        if name not in store.peak_fields:
+            raise ValueError(f"The log has no '{name}' peak values")
+    if configuration is None:
+        configuration = store.header.get('configuration', {})
+    distance = store.peak_fields['distance'].astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distance[~(distance > 0)] = np.nan
+        measured = np.stack([store.peak_fields[name] / distance for name in ('x', 'y', 'z')], axis=-1)
+    # frames x zones x peaks x 3 -> zones x samples x 3
+    samples = measured.transpose(1, 0, 2, 3).reshape(store.zones, -1, 3)
+    valid = np.isfinite(samples).all(axis=-1)
+    directions = model_directions(configuration, store.rows, store.cols)
+    fitted = valid.any(axis=1)
+    if fitted.any():
+        samples = np.where(valid[..., None], samples, np.nan)
+        median = np.nanmedian(samples[fitted], axis=1)
+        directions[fitted] = median / np.linalg.norm(median, axis=-1, keepdims=True)
+    key = geometry_key(configuration, store.rows, store.cols)
+    geometry = ZoneGeometry(store.rows, store.cols, directions, key, 'calibrated')
+    _cache[key] = geometry
+    return geometry
+
+
+def fill_xyz(store, configuration=None):
+    """Add x/y/z computed from the distance to a FrameStore without them
+
+    Returns:
+        the ZoneGeometry used, None if the store already has x/y/z
+    """
+    if all(name in store.peak_fields for name in ('x', 'y', 'z')):
+        return None
+    if 'distance' not in store.peak_fields:
+        raise ValueError("The log has no 'distance' peak values")
+    if configuration is None:
+        configuration = store.header.get('configuration', {})
+    geometry = zone_geometry(configuration, store.rows, store.cols)
+    distance = store.peak_fields['distance']
+    with np.errstate(invalid='ignore'):
+        distance = np.where(distance > 0, distance, np.nan).astype(distance.dtype)
+    xyz = geometry.xyz(distance)
+    for index, name in enumerate(('x', 'y', 'z')):
+        store.peak_fields[name] = xyz[..., index]
+    return geometry
+
+
+def save_calibration(path, geometries):
+    """Write calibrated ZoneGeometries as JSON"""
+    entries = [{'key': list(geometry.key), 'directions': np.round(geometry.directions, 7).tolist()}
+               for geometry in geometries]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'keys': list(GEOMETRY_KEYS) + ['rows', 'cols'], 'geometries': entries}, f)
+
+
+def load_calibration(path):
+    """Read a calibration written by save_calibration() into the cache
+
+    Returns:
+        the loaded ZoneGeometries
+    """
+    with open(path, encoding='utf-8') as f:
+        calibration = json.load(f)
+    geometries = []
+    for entry in calibration['geometries']:
+        key = tuple(entry['key'])
+        rows, cols = key[-2:]
+        geometry = ZoneGeometry(rows, cols, np.array(entry['directions'], dtype=np.float64), key, 'calibrated')
+        _cache[key] = geometry
+        geometries.append(geometry)
+    return geometries
+
+
+def check(store, geometry):
+    """Deviation (mm) of the computed from the logged x/y/z: (median, max)"""
+    distance = store.peak_fields['distance']
+    with np.errstate(invalid='ignore'):
+        target = distance > 0
+    xyz = geometry.xyz(np.where(target, distance, np.nan))
+    logged = np.stack([store.peak_fields[name] for name in ('x', 'y', 'z')], axis=-1)
+    error = np.linalg.norm(xyz - logged, axis=-1)[target & np.isfinite(logged).all(axis=-1)]
+    if not error.size:
+        return None, None
+    return float(np.median(error)), float(error.max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zone directions of a TMF8829 log: x/y/z from the distance')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('--calibrate', metavar='FILE',
+                        help='Fit the zone directions to the x/y/z of the log and save them (JSON)')
+    parser.add_argument('--calibration', metavar='FILE',
+                        help='Use zone directions saved with --calibrate')
+    args = parser.parse_args()
+
+    if args.calibration:
+        load_calibration(args.calibration)
+    start = time.perf_counter()
+    store = FrameStore.load(args.input, fields=('distance', 'x', 'y', 'z'))
+    loaded = time.perf_counter()
+    configuration = store.header.get('configuration', {})
+    geometry = zone_geometry(configuration, store.rows, store.cols)
+    print(f"{store.frames} frames, {store.cols}x{store.rows} zones, "
+          f"mp window x {_window(configuration, 'x')}, y {_window(configuration, 'y')}, {geometry.source} directions")
+
+    if all(name in store.peak_fields for name in ('x', 'y', 'z')):
+        median, maximum = check(store, geometry)
+        if median is not None:
+            print(f"  computed vs logged x/y/z: median {median:.2f} mm, max {maximum:.2f} mm")
+        if args.calibrate:
+            geometry = calibrate(store, configuration)
+            save_calibration(args.calibrate, [geometry])
+            median, maximum = check(store, geometry)
+            print(f"✓ Calibration saved: {args.calibrate} (median {median:.2f} mm, max {maximum:.2f} mm)")
+    elif args.calibrate:
+        parser.error('--calibrate requires a log with x/y/z')
+    else:
+        computed = time.perf_counter()
+        fill_xyz(store, configuration)
+        elapsed = time.perf_counter() - computed
+        print(f"  the log has no x/y/z, computed from the distance in {elapsed * 1000:.1f} ms")
+    print(f"  loaded in {loaded - start:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Peak analysis of the mp_histo and ref_histo histograms of a TMF8829 log
+
+mp_histo lists macro pixels, each with its sub-histograms. The sub-histograms
+of a macro pixel are averaged, macro pixel m belongs to zone m of the results
+(row-major), so a log with histograms of fewer macro pixels than zones - the
+sample log carries the first row of zones - analyses those zones only.
+
+For every frame and macro pixel the histogram is reduced to:
+
+    background  median count of the bins from MIN_BIN up to the last used bin
+    peaks       up to MAX_PEAKS local maxima DETECTION_SIGMA * sqrt(background)
+                above the background, strongest first: bin, height, centroid
+                (3-bin, background subtracted), width (FWHM, interpolated)
+                and a saturation flag (3-bin flat top or above a given count)
+
+The ref_histo channels give the reference peak position of each frame (the
+zero distance) and its drift against the first frame. Histogram peaks are
+converted to millimetres with distance = mm_per_bin * (centroid - reference)
++ offset, fitted against the firmware distances unless given, and every
+firmware peak is matched to the nearest histogram peak.
+
+Histograms are parsed straight into NumPy arrays and analysed in blocks of
+frames with whole-array operations. Results are saved as .npz (and .csv),
+json_to_html.py --histo-analysis embeds them as heatmap layers of the viewer.
+Requires numpy.
+'''
+
+import argparse
+import base64
+import csv
+import json
+import time
+
+import numpy as np
+
+import tmf8829log
+from frame_store import FrameStore
+
+MIN_BIN = 5             # bins below hold the crosstalk / reference peak
+MAX_PEAKS = 4
+DETECTION_SIGMA = 5.0   # peak threshold above background, in sqrt(background)
+WIDTH_SPAN = 8          # bins searched on each side of a peak for the half maximum
+TOLERANCE_BINS = 1.5    # firmware and histogram distance mismatch, in bins
+BLOCK_FRAMES = 256      # frames analysed at once
+
+_NOT_NUMBER = b'[]{}:"bin'
+
+
+def parse_histogram(raw, size):
+    """Counts of a compact histogram payload in order, as int64 array
+
+    Args:
+        raw: compact JSON bytes as returned by Frame.histogram_json()
+        size: expected number of counts (channels * bins)
+    """
+    # Payloads only hold brackets, "bin" keys and non-negative integers: without
+    # the brackets and keys the counts stay separated by exactly one comma
+    values = np.array(json.loads(b'[' + raw.translate(None, _NOT_NUMBER) + b']'), dtype=np.int64)
+    if values.size != size:
+        raise ValueError(f"Histogram holds {values.size} counts instead of {size}")
+    return values
+
+
+def histogram_shape(frame, key='mp_histo'):
+    """(macro pixels, sub-histograms, bins) of mp_histo, (channels, 1, bins) of ref_histo"""
+    histo = frame.histogram(key)
+    if key == 'mp_histo':
+        return len(histo), len(histo[0]), len(histo[0][0]['bin'])
+    return len(histo), 1, len(histo[0]['bin'])
+
+
+def macro_pixel_histograms(frames, shape):
+    """mp_histo of frames as float32 array (frames, macro pixels, bins), sub-histograms averaged
+
+    Args:
+        frames: Frames carrying mp_histo
+        shape: histogram_shape() of their mp_histo
+    """
+    macro_pixels, sub_histograms, bins = shape
+    size = macro_pixels * sub_histograms * bins
+    histograms = np.stack([parse_histogram(frame.histogram_json('mp_histo'), size) for frame in frames])
+    return histograms.reshape(len(frames), macro_pixels, sub_histograms, bins).mean(axis=2, dtype=np.float32)
+
+
+def _gather(values, index):
+    """values[..., index] for (n, channels, bins) values and (n, channels, k) indices"""
+    return np.take_along_axis(values, np.clip(index, 0, values.shape[-1] - 1), axis=-1)
+
+
+def find_peaks(histograms, min_bin=MIN_BIN, max_peaks=MAX_PEAKS, sigma=DETECTION_SIGMA, saturation=None):
+    """Background and peaks of histograms
+
+    Args:
+        histograms: float array (n, channels, bins)
+        min_bin: first bin searched for peaks
+        max_peaks: peaks reported per histogram, strongest first
+        sigma: detection threshold above background in sqrt(background)
+        saturation: count at which a peak counts as saturated (default: 3-bin flat top)
+
+    Returns:
+        dict of arrays: background (n, channels); bin, height, centroid, width,
+        saturated (n, channels, max_peaks) with bin -1 / NaN where no peak was found
+    """
+    n, channels, bins = histograms.shape
+    nonzero = np.flatnonzero(histograms.any(axis=(0, 1)))
+    used = nonzero[-1] + 1 if nonzero.size else bins
+    region = histograms[..., min_bin:used]
+    background = np.median(region, axis=-1)
+    threshold = background + sigma * np.sqrt(np.maximum(background, 1.0))
+
+    left = np.concatenate([np.full((n, channels, 1), -np.inf, dtype=region.dtype), region[..., :-1]], axis=-1)
+    right = np.concatenate([region[..., 1:], np.full((n, channels, 1), -np.inf, dtype=region.dtype)], axis=-1)
+    maxima = (region > left) & (region >= right) & (region > threshold[..., None])
+    score = np.where(maxima, region, -np.inf)
+    order = np.argsort(-score, axis=-1, kind='stable')[..., :max_peaks]
+    found = np.isfinite(np.take_along_axis(score, order, axis=-1))
+    if order.shape[-1] < max_peaks:
+        pad = max_peaks - order.shape[-1]
+        order = np.concatenate([order, np.zeros((n, channels, pad), dtype=order.dtype)], axis=-1)
+        found = np.concatenate([found, np.zeros((n, channels, pad), dtype=bool)], axis=-1)
+    peak_bin = order + min_bin
+    height = _gather(histograms, peak_bin)
+    signal = height - background[..., None]
+
+    # Centroid of the peak bin and its neighbours above background
+    offsets = np.arange(-1, 2)
+    window = (peak_bin[..., None] + offsets).reshape(n, channels, -1)
+    weights = np.maximum(_gather(histograms, window) - background[..., None], 0).reshape(n, channels, max_peaks, 3)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroid = (weights * (peak_bin[..., None] + offsets)).sum(axis=-1) / weights.sum(axis=-1)
+
+    # Full width at half maximum, interpolated between the bins around the crossings
+    half = background[..., None] + signal / 2
+    steps = np.arange(WIDTH_SPAN + 1)
+    sides = []
+    for direction in (1, -1):
+        index = (peak_bin[..., None] + direction * steps).reshape(n, channels, -1)
+        values = _gather(histograms, index).reshape(n, channels, max_peaks, -1)
+        inside = (index >= 0) & (index < bins)
+        below = (values < half[..., None]) & inside.reshape(values.shape)
+        first = np.argmax(below[..., 1:], axis=-1) + 1
+        crossed = below[..., 1:].any(axis=-1)
+        before = np.take_along_axis(values, (first - 1)[..., None], axis=-1)[..., 0]
+        after = np.take_along_axis(values, first[..., None], axis=-1)[..., 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            position = first - 1 + (before - half) / (before - after)
+        sides.append(np.where(crossed, position, np.nan))
+    width = sides[0] + sides[1]
+
+    if saturation is None:
+        neighbours = _gather(histograms, np.concatenate([peak_bin - 1, peak_bin + 1], axis=-1))
+        saturated = (neighbours[..., :max_peaks] == height) & (neighbours[..., max_peaks:] == height)
+    else:
+        saturated = height >= saturation
+
+    return {
+        'background': background.astype(np.float32),
+        'bin': np.where(found, peak_bin, -1).astype(np.int16),
+        'height': np.where(found, height, np.nan).astype(np.float32),
+        'centroid': np.where(found, centroid, np.nan).astype(np.float32),
+        'width': np.where(found, width, np.nan).astype(np.float32),
+        'saturated': found & saturated,
+    }
+
+
+class HistogramAnalysis:
+    """Histogram peak analysis of the frames of a log that carry mp_histo
+
+    Arrays over macro pixels cover the first macro_pixels zones of the grid.
+
+    Attributes:
+        rows, cols: zone grid of the results
+        frame_index: position in the log of every analysed frame
+        frame_numbers: frame_number of every analysed frame (-1 if missing)
+        peaks: dict of find_peaks() arrays over (frames, macro pixels[, peaks])
+        ref_position: mean ref_histo peak centroid per frame (NaN without ref_histo)
+        ref_drift: ref_histo peak centroid per frame and channel minus the first frame
+        fw_distance: firmware distances (frames, macro pixels, firmware peaks), NaN if none
+        calibration: (mm_per_bin, offset_mm) of the histogram distances, None if
+                     the fit gave no positive bin width
+        rejected_calibration: the fitted (mm_per_bin, offset_mm) that was rejected
+        distance: histogram peak distances in mm (frames, macro pixels, peaks)
+        matched: histogram peak nearest to each firmware peak, -1 if none
+        residual: firmware minus matched histogram distance in mm
+        mismatch: firmware peaks without histogram peak within the tolerance
+    """
+
+    def __init__(self, rows, cols, frame_index, frame_numbers, peaks, ref_position, ref_drift, fw_distance):
+        self.rows = rows
+        self.cols = cols
+        self.frame_index = frame_index
+        self.frame_numbers = frame_numbers
+        self.peaks = peaks
+        self.ref_position = ref_position
+        self.ref_drift = ref_drift
+        self.fw_distance = fw_distance
+        self.calibration = None
+        self.rejected_calibration = None
+        self.distance = None
+        self.matched = None
+        self.residual = None
+        self.mismatch = None
+
+    @property
+    def frames(self):
+        return len(self.frame_index)
+
+    @property
+    def macro_pixels(self):
+        return self.peaks['background'].shape[1]
+
+    def _relative(self):
+        """Histogram peak centroids relative to the reference peak of their frame"""
+        centroid = self.peaks['centroid'].astype(np.float64)
+        if np.isnan(self.ref_position).all():
+            return centroid
+        return centroid - np.nan_to_num(self.ref_position)[:, None, None]
+
+    def _match(self, distance):
+        """Nearest histogram peak of every firmware peak and the distance between them"""
+        delta = self.fw_distance[..., :, None] - distance[..., None, :]
+        nearest = np.argmin(np.where(np.isnan(delta), np.inf, np.abs(delta)), axis=-1)
+        residual = np.take_along_axis(delta, nearest[..., None], axis=-1)[..., 0]
+        matched = np.where(np.isnan(residual), -1, nearest)
+        return matched, residual
+
+    def cross_check(self, mm_per_bin=None, offset_mm=None, tolerance_bins=TOLERANCE_BINS):
+        """Convert histogram peaks to mm and compare them with the firmware distances
+
+        Without mm_per_bin the conversion is fitted: the strongest histogram
+        peak against firmware peak 0 first, then twice more on the matched
+        pairs without outliers (beyond 3 median absolute deviations). A
+        fitted bin width that is not positive means the histogram and
+        firmware peaks do not correspond: no distances are computed and no
+        peak counts as mismatch.
+
+        Raises:
+            ValueError: mm_per_bin given and not positive
+        """
+        if mm_per_bin is not None and mm_per_bin <= 0:
+            raise ValueError(f"The bin width must be positive, not {mm_per_bin} mm")
+        relative = self._relative()
+        if mm_per_bin is None:
+            x = relative[..., 0].ravel()
+            y = self.fw_distance[..., 0].ravel()
+            for _ in range(3):
+                keep = np.isfinite(x) & np.isfinite(y)
+                if keep.sum() < 2 or np.ptp(x[keep]) == 0:
+                    break
+                mm_per_bin, offset_mm = np.polyfit(x[keep], y[keep], 1)
+                matched, residual = self._match(mm_per_bin * relative + offset_mm)
+                spread = np.nanmedian(np.abs(residual)) * 3 if np.isfinite(residual).any() else np.inf
+                inlier = np.abs(residual) <= max(spread, abs(mm_per_bin))
+                x = np.take_along_axis(relative, np.maximum(matched, 0), axis=-1)[inlier]
+                y = self.fw_distance[inlier]
+            if mm_per_bin is None:
+                mm_per_bin, offset_mm = np.nan, np.nan
+            if not mm_per_bin > 0:
+                self.calibration = None
+                self.rejected_calibration = (float(mm_per_bin), float(offset_mm))
+                self.distance = np.full(relative.shape, np.nan, dtype=np.float32)
+                self.matched = np.full(self.fw_distance.shape, -1)
+                self.residual = np.full(self.fw_distance.shape, np.nan, dtype=np.float32)
+                self.mismatch = np.zeros(self.fw_distance.shape, dtype=bool)
+                return
+        elif offset_mm is None:
+            fw = self.fw_distance[..., 0] - mm_per_bin * relative[..., 0]
+            offset_mm = np.nanmedian(fw) if np.isfinite(fw).any() else 0.0
+
+        self.calibration = (float(mm_per_bin), float(offset_mm))
+        self.distance = (mm_per_bin * relative + offset_mm).astype(np.float32)
+        self.matched, residual = self._match(self.distance.astype(np.float64))
+        self.residual = residual.astype(np.float32)
+        tolerance = tolerance_bins * abs(mm_per_bin)
+        with np.errstate(invalid='ignore'):
+            self.mismatch = ~np.isnan(self.fw_distance) & ~(np.abs(self.residual) <= tolerance)
+
+    def save(self, path):
+        """Save all arrays as compressed .npz"""
+        arrays = {f"peak_{name}": value for name, value in self.peaks.items() if name != 'background'}
+        np.savez_compressed(path, frame_index=self.frame_index, frame_numbers=self.frame_numbers,
+                            grid=np.array([self.rows, self.cols]), background=self.peaks['background'],
+                            ref_position=self.ref_position, ref_drift=self.ref_drift,
+                            fw_distance=self.fw_distance,
+                            calibration=np.array(self.calibration or (np.nan, np.nan)),
+                            distance=self.distance, matched=self.matched, residual=self.residual,
+                            mismatch=self.mismatch, **arrays)
+
+    def save_csv(self, path):
+        """One row per histogram peak found"""
+        frame, zone, peak = np.nonzero(self.peaks['bin'] >= 0)
+        columns = {
+            'frame_number': self.frame_numbers[frame],
+            'row': zone // self.cols,
+            'col': zone % self.cols,
+            'peak': peak,
+            'bin': self.peaks['bin'][frame, zone, peak],
+            'centroid': self.peaks['centroid'][frame, zone, peak].astype(np.float64).round(3),
+            'width': self.peaks['width'][frame, zone, peak].astype(np.float64).round(3),
+            'height': self.peaks['height'][frame, zone, peak],
+            'background': self.peaks['background'][frame, zone],
+            'saturated': self.peaks['saturated'][frame, zone, peak].astype(int),
+            'distance_mm': self.distance[frame, zone, peak].astype(np.float64).round(1),
+        }
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*[column.tolist() for column in columns.values()]))
+
+    def viewer_layers(self, frames):
+        """Per-frame heatmap layers for the HTML viewer, frames without histograms are empty
+
+        Args:
+            frames: number of frames of the log
+        """
+        zones = self.rows * self.cols
+        values = {
+            'histogram background': self.peaks['background'],
+            'histogram peak centroid': self.peaks['centroid'][..., 0],
+            'histogram peak width': self.peaks['width'][..., 0],
+            'histogram peak distance': self.distance[..., 0],
+            'fw - histogram distance': self.residual[..., 0],
+        }
+        layers = []
+        for name, value in values.items():
+            full = np.full((frames, zones), np.nan, dtype='<f4')
+            full[self.frame_index, :self.macro_pixels] = value
+            layers.append({
+                'name': name,
+                'window': 1,
+                'step': 1,
+                'count': frames,
+                'digits': 1 if name.endswith(('background', 'distance')) else 2,
+                'data': base64.b64encode(full.tobytes()).decode('ascii'),
+            })
+        return layers
+
+
+def _analyze_block(block, shapes, fw_peaks, options):
+    """Run find_peaks() on a block of frames carrying mp_histo"""
+    macro_pixels = shapes['mp_histo'][0]
+    peaks = find_peaks(macro_pixel_histograms(block, shapes['mp_histo']), **options)
+
+    ref_position = np.full(len(block), np.nan)
+    ref_centroid = None
+    if 'ref_histo' in shapes:
+        channels, _, ref_bins = shapes['ref_histo']
+        ref = np.zeros((len(block), channels, ref_bins), dtype=np.float32)
+        present = np.zeros(len(block), dtype=bool)
+        for index, frame in enumerate(block):
+            if frame.has_histogram('ref_histo'):
+                ref[index] = parse_histogram(frame.histogram_json('ref_histo'), channels * ref_bins).reshape(
+                    channels, ref_bins)
+                present[index] = True
+        reference = find_peaks(ref, min_bin=0, max_peaks=1, sigma=0.0)
+        ref_centroid = np.where(present[:, None], reference['centroid'][..., 0], np.nan)
+        with np.errstate(invalid='ignore'):
+            ref_position = np.nanmean(ref_centroid, axis=1) if channels else ref_position
+
+    store = FrameStore.from_frames(block, fields={'distance'}, peaks=fw_peaks)
+    if 'distance' in store.peak_fields and store.zones >= macro_pixels:
+        fw_distance = np.stack([store.field('distance', peak)[:, :macro_pixels] for peak in range(fw_peaks)],
+                               axis=-1)
+        with np.errstate(invalid='ignore'):
+            fw_distance = np.where(fw_distance > 0, fw_distance, np.nan)
+    else:
+        fw_distance = np.full((len(block), macro_pixels, fw_peaks), np.nan, dtype=np.float32)
+    return peaks, ref_position, ref_centroid, fw_distance
+
+
+def analyze_histograms(frames, min_bin=MIN_BIN, max_peaks=MAX_PEAKS, sigma=DETECTION_SIGMA, saturation=None,
+                       fw_peaks=MAX_PEAKS):
+    """Analyse the histograms of all frames
+
+    Args:
+        frames: Frames, e.g. a Log or tmf8829log.iter_frames()
+        min_bin, max_peaks, sigma, saturation: see find_peaks()
+        fw_peaks: firmware peaks per zone compared with the histogram peaks
+
+    Returns:
+        HistogramAnalysis (not yet cross-checked, see HistogramAnalysis.cross_check())
+    """
+    options = {'min_bin': min_bin, 'max_peaks': max_peaks, 'sigma': sigma, 'saturation': saturation}
+    shapes = {}
+    grid = None
+    frame_index = []
+    frame_numbers = []
+    results = []
+    block = []
+
+    for index, frame in enumerate(frames):
+        if not frame.has_histogram('mp_histo'):
+            continue
+        if not shapes:
+            shapes['mp_histo'] = histogram_shape(frame, 'mp_histo')
+            if frame.has_histogram('ref_histo'):
+                shapes['ref_histo'] = histogram_shape(frame, 'ref_histo')
+        if grid is None and frame.rows:
+            grid = frame.rows, frame.cols
+        frame_index.append(index)
+        frame_numbers.append(frame.frame_number if frame.frame_number is not None else -1)
+        block.append(frame)
+        if len(block) == BLOCK_FRAMES:
+            results.append(_analyze_block(block, shapes, fw_peaks, options))
+            block = []
+    if block:
+        results.append(_analyze_block(block, shapes, fw_peaks, options))
+    if not results:
+        raise ValueError("The log has no mp_histo histograms")
+
+    macro_pixels = shapes['mp_histo'][0]
+    rows, cols = grid or (1, macro_pixels)
+    if macro_pixels > rows * cols:
+        raise ValueError(f"mp_histo has {macro_pixels} macro pixels, the results only {rows * cols} zones")
+    peaks = {name: np.concatenate([result[0][name] for result in results]) for name in results[0][0]}
+    ref_position = np.concatenate([result[1] for result in results])
+    if 'ref_histo' in shapes:
+        ref_centroid = np.concatenate([result[2] for result in results])
+        first = np.argmax(~np.isnan(ref_centroid).all(axis=1))
+        ref_drift = (ref_centroid - ref_centroid[first]).astype(np.float32)
+    else:
+        ref_drift = np.zeros((len(frame_index), 0), dtype=np.float32)
+    fw_distance = np.concatenate([result[3] for result in results]).astype(np.float64)
+    return HistogramAnalysis(rows, cols, np.array(frame_index, dtype=np.int64),
+                             np.array(frame_numbers, dtype=np.int64), peaks, ref_position.astype(np.float32),
+                             ref_drift, fw_distance)
+
+
+def print_summary(analysis):
+    """Print the key figures of an analysis"""
+    peaks = analysis.peaks
+    found = peaks['bin'] >= 0
+    zones = analysis.macro_pixels
+    print(f"Histograms: {analysis.frames} frames, {zones} macro pixels of {analysis.cols}x{analysis.rows} zones")
+    print(f"  background: median {np.median(peaks['background']):.1f} counts")
+    print(f"  peaks per macro pixel: {found.sum() / (analysis.frames * zones):.2f}, "
+          f"saturated: {int(peaks['saturated'].sum())}")
+    if found.any():
+        print(f"  width (FWHM): median {np.nanmedian(peaks['width']):.2f} bins")
+    if analysis.ref_drift.size and not np.isnan(analysis.ref_drift).all():
+        print(f"  ref_histo peak: {np.nanmean(analysis.ref_position):.3f} bins, drift "
+              f"{np.nanmin(analysis.ref_drift):+.3f} .. {np.nanmax(analysis.ref_drift):+.3f} bins")
+    if analysis.calibration is not None:
+        mm_per_bin, offset_mm = analysis.calibration
+        fw = ~np.isnan(analysis.fw_distance)
+        print(f"  distance = {mm_per_bin:.2f} mm/bin * (centroid - reference) {offset_mm:+.1f} mm")
+        if fw.any():
+            residual = np.abs(analysis.residual[fw])
+            print(f"  firmware peaks: {int(fw.sum())}, |fw - histogram| median {np.nanmedian(residual):.1f} mm, "
+                  f"mismatches {int(analysis.mismatch.sum())} ({analysis.mismatch.sum() / fw.sum():.1%})")
+            rate = analysis.mismatch.sum(axis=(0, 2)) / np.maximum(fw.sum(axis=(0, 2)), 1)
+            worst = np.argsort(-rate, kind='stable')[:5]
+            if rate[worst[0]] > 0:
+                print("  zones with most mismatches: " +
+                      ', '.join(f"({zone % analysis.cols},{zone // analysis.cols}) {rate[zone]:.0%}"
+                                for zone in worst if rate[zone] > 0))
+    elif analysis.rejected_calibration is not None:
+        mm_per_bin, _ = analysis.rejected_calibration
+        print(f"  no firmware cross-check: the fitted bin width {mm_per_bin:.2f} mm/bin is not positive, "
+              f"histogram and firmware peaks do not correspond (see --mm-per-bin)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak analysis of the histograms of a TMF8829 log')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Save the results as .npz (default: <log>_histo_analysis.npz)')
+    parser.add_argument('--csv', help='Also write one CSV row per histogram peak')
+    parser.add_argument('--min-bin', type=int, default=MIN_BIN, help=f'First bin searched for peaks (default: {MIN_BIN})')
+    parser.add_argument('--sigma', type=float, default=DETECTION_SIGMA,
+                        help=f'Detection threshold in sqrt(background) (default: {DETECTION_SIGMA})')
+    parser.add_argument('--saturation', type=int, help='Count at which a peak is saturated (default: flat top)')
+    parser.add_argument('--mm-per-bin', type=float, help='Histogram bin width in mm (default: fitted)')
+    parser.add_argument('--offset-mm', type=float, help='Distance offset in mm (default: fitted)')
+    args = parser.parse_args()
+
+    if args.mm_per_bin is not None and args.mm_per_bin <= 0:
+        parser.error('--mm-per-bin must be positive')
+
+    start = time.perf_counter()
+    log = tmf8829log.Log(keys=[])
+    try:
+        analysis = analyze_histograms(tmf8829log.iter_frames(args.input, log), args.min_bin, sigma=args.sigma,
+                                      saturation=args.saturation)
+    except ValueError as e:
+        parser.error(f"{args.input}: {e}")
+    analysis.cross_check(args.mm_per_bin, args.offset_mm)
+    elapsed = time.perf_counter() - start
+
+    output = args.output
+    if output is None:
+        output = tmf8829log.split_log_name(args.input)[0] + '_histo_analysis.npz'
+    analysis.save(output)
+    if args.csv:
+        analysis.save_csv(args.csv)
+
+    print_summary(analysis)
+    print(f"\n✓ {output}{' and ' + args.csv if args.csv else ''} in {elapsed:.3f} s")
+
+if __name__ == "__main__":
+    main()
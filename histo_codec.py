@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Compact codec for TMF8829 histogram streams
+
+A stream holds the histograms of many frames that all share one shape
+(frames x histograms x bins). Encoding takes three steps:
+
+  1. frame-to-frame delta of every histogram (first frame against zero)
+  2. trailing zero trimming of each delta vector
+  3. zigzag + LEB128 variable-length integers
+
+Layout of an encoded stream:
+
+    b'THC1' varint(frames) varint(histograms) varint(bins)
+    present[frames]                 one byte per frame, 1 = histograms present
+    varint(length)[frames*histos]   kept length of each trimmed delta vector
+    varint(zigzag(delta))[...]      the kept delta values, frame-major
+
+Encoding and decoding are vectorized with NumPy. The viewer generated by
+json_to_html.py contains the matching JavaScript decoder.
+'''
+
+import argparse
+import base64
+import gzip
+import json
+import time
+
+import numpy as np
+
+MAGIC = b'THC1'
+
+
+def _varint_encode(values):
+    """Encode non-negative integers as LEB128 varints
+
+    Args:
+        values: 1-D array of non-negative integers
+
+    Returns:
+        bytes with one varint per value
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if values.size == 0:
+        return b''
+
+    # Number of 7 bit groups needed for each value
+    nbytes = np.ones(values.size, dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        nbytes += rest > 0
+        rest >>= np.uint64(7)
+
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        sel = nbytes > k
+        group = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = (group | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def _varint_decode(buf, count):
+    """Decode count LEB128 varints from the start of a uint8 array
+
+    Args:
+        buf: 1-D uint8 array
+        count: number of varints to decode
+
+    Returns:
+        (values, consumed) - uint64 array and the number of bytes used
+    """
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64), 0
+
+    ends = np.flatnonzero(buf < 0x80)
+    if ends.size < count:
+        raise ValueError("Histogram stream is truncated")
+    ends = ends[:count]
+    consumed = int(ends[-1]) + 1
+    data = buf[:consumed].astype(np.uint64) & np.uint64(0x7f)
+
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    sizes = ends - starts + 1
+
+    # Gather the k-th 7 bit group of every value that is long enough
+    values = data[starts]
+    for k in range(1, int(sizes.max())):
+        sel = np.flatnonzero(sizes > k)
+        values[sel] |= data[starts[sel] + k] << np.uint64(7 * k)
+    return values, consumed
+
+
+def encode(histograms, present=None):
+    """Encode a histogram stream
+
+    Args:
+        histograms: integer array-like of shape (frames, histograms, bins)
+        present: optional bool sequence per frame; frames flagged False are
+                 stored as absent and their histograms are ignored
+
+    Returns:
+        encoded stream as bytes
+    """
+    hist = np.asarray(histograms, dtype=np.int64)
+    if hist.ndim != 3:
+        raise ValueError(f"Expected (frames, histograms, bins) array, got shape {hist.shape}")
+    frames, histos, bins = hist.shape
+
+    if present is None:
+        present = np.ones(frames, dtype=bool)
+    present = np.asarray(present, dtype=bool)
+    hist = np.where(present[:, None, None], hist, 0)
+
+    delta = np.diff(hist, axis=0, prepend=np.zeros((1, histos, bins), dtype=np.int64))
+
+    # Keep each delta vector up to its last non-zero element
+    nonzero = delta != 0
+    lengths = np.where(nonzero.any(axis=-1), bins - np.argmax(nonzero[..., ::-1], axis=-1), 0)
+    kept = delta[np.arange(bins) < lengths[..., None]]
+    zigzag = (kept << 1) ^ (kept >> 63)
+
+    return b''.join([
+        MAGIC,
+        _varint_encode([frames, histos, bins]),
+        present.astype(np.uint8).tobytes(),
+        _varint_encode(lengths.ravel()),
+        _varint_encode(zigzag.astype(np.uint64)),
+    ])
+
+
+def decode(stream):
+    """Decode a histogram stream
+
+    Args:
+        stream: bytes produced by encode()
+
+    Returns:
+        (histograms, present) - int64 array of shape (frames, histograms, bins)
+        and bool array per frame
+    """
+    if stream[:4] != MAGIC:
+        raise ValueError("Not a histogram codec stream")
+    buf = np.frombuffer(stream, dtype=np.uint8, offset=4)
+
+    shape, pos = _varint_decode(buf, 3)
+    frames, histos, bins = (int(v) for v in shape)
+    present = buf[pos:pos + frames].astype(bool)
+    pos += frames
+
+    lengths, used = _varint_decode(buf[pos:], frames * histos)
+    pos += used
+    lengths = lengths.astype(np.int64).reshape(frames, histos)
+
+    zigzag, used = _varint_decode(buf[pos:], int(lengths.sum()))
+    kept = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+
+    delta = np.zeros((frames, histos, bins), dtype=np.int64)
+    delta[np.arange(bins) < lengths[..., None]] = kept
+    return np.cumsum(delta, axis=0), present
+
+
+def _collect(result_set, key):
+    """Gather one histogram type of all frames into a dense array
+
+    Returns:
+        (array, present, rows, cols) or None if no frame carries the histogram
+    """
+    shape = None
+    for frame in result_set:
+        histo = frame.get(key)
+        if histo:
+            if key == 'mp_histo':
+                shape = (len(histo), len(histo[0]), len(histo[0][0]['bin']))
+            else:
+                shape = (len(histo), 1, len(histo[0]['bin']))
+            break
+    if shape is None:
+        return None
+
+    rows, cols, bins = shape
+    dense = np.zeros((len(result_set), rows * cols, bins), dtype=np.int64)
+    present = np.zeros(len(result_set), dtype=bool)
+    for index, frame in enumerate(result_set):
+        histo = frame.get(key)
+        if not histo:
+            continue
+        if key == 'mp_histo':
+            flat = [item['bin'] for row in histo for item in row]
+        else:
+            flat = [item['bin'] for item in histo]
+        if len(flat) != rows * cols or any(len(b) != bins for b in flat):
+            raise ValueError(f"{key} shape changes within the log (frame index {index})")
+        dense[index] = flat
+        present[index] = True
+    return dense, present, rows, cols
+
+
+def encode_result_set(result_set):
+    """Encode mp_histo and ref_histo of a Result_Set
+
+    Args:
+        result_set: list of frame dicts as stored in the JSON log
+
+    Returns:
+        dict with an entry per histogram type ('mp_histo', 'ref_histo'), each
+        holding rows, cols and the base64 encoded stream
+    """
+    payload = {}
+    for key in ('mp_histo', 'ref_histo'):
+        collected = _collect(result_set, key)
+        if collected is None:
+            continue
+        dense, present, rows, cols = collected
+        payload[key] = {
+            'rows': rows,
+            'cols': cols,
+            'data': base64.b64encode(encode(dense, present)).decode('ascii'),
+        }
+    return payload
+
+
+def decode_result_set(payload):
+    """Decode the output of encode_result_set() back to arrays
+
+    Returns:
+        dict histogram type -> (array of shape (frames, rows, cols, bins), present)
+    """
+    decoded = {}
+    for key, entry in payload.items():
+        hist, present = decode(base64.b64decode(entry['data']))
+        decoded[key] = (hist.reshape(hist.shape[0], entry['rows'], entry['cols'], -1), present)
+    return decoded
+
+
+def strip_histograms(result_set):
+    """Return shallow frame copies without mp_histo/ref_histo"""
+    return [{k: v for k, v in frame.items() if k not in ('mp_histo', 'ref_histo')}
+            for frame in result_set]
+
+
+def compare(json_file, repeat=5):
+    """Measure codec size and decode speed against the plain JSON layout
+
+    Args:
+        json_file: Path to a TMF8829 JSON log (.json or .json.gz)
+        repeat: number of timing runs, the best one is reported
+    """
+    open_func = gzip.open if json_file.endswith('.gz') else open
+    with open_func(json_file, 'rt', encoding='utf-8') as f:
+        result_set = json.load(f).get('Result_Set', [])
+
+    histos = [{k: frame[k] for k in ('mp_histo', 'ref_histo') if k in frame} for frame in result_set]
+    plain = json.dumps(histos).encode('utf-8')
+    payload = encode_result_set(result_set)
+    streams = {key: base64.b64decode(entry['data']) for key, entry in payload.items()}
+    encoded_size = sum(len(s) for s in streams.values())
+
+    def best_of(func):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    plain_time = best_of(lambda: json.loads(plain))
+    codec_time = best_of(lambda: [decode(s) for s in streams.values()])
+
+    print(f"Frames: {len(result_set)}")
+    print(f"  Plain JSON:      {len(plain):>10} bytes ({len(gzip.compress(plain)):>9} gzipped)")
+    print(f"  Codec:           {encoded_size:>10} bytes ({sum(len(gzip.compress(s)) for s in streams.values()):>9} gzipped)")
+    print(f"  Codec (base64):  {sum(len(e['data']) for e in payload.values()):>10} bytes")
+    print(f"  Decode plain:    {plain_time * 1000:>10.2f} ms")
+    print(f"  Decode codec:    {codec_time * 1000:>10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure histogram codec size and decode speed on a TMF8829 JSON log')
+    parser.add_argument('-i', '--input', required=True, help='Path to JSON file (or .json.gz)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of timing runs (default: 5)')
+    args = parser.parse_args()
+
+    compare(args.input, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -10,106 +10,99 @@
 # Revision log 
 # 0.1 Initial revision
 # 1.0 Updatae to newer json file format logger VERSION = 0x0003
+# 1.1 Logger versions 3 and 4 checked once per file, rows decoded from the packed columns (tmf8829log.Schema)
+# 1.2 --salvage converts the complete frames of truncated logs (tmf8829log.salvage)
+# 1.3 Rows of frames read as JSON text are written from their dicts without packing them
 
 ''' Convert a json file to csv'''
 
 import sys
 import time
-import json
+import argparse
 import csv
-import gzip
-from tkinter import filedialog as tk_fd
+
+import profiling
+import tmf8829log
 
 histogram_counter = 0
 
-def writeFrameData(data:dict) -> None:
+def writeFrameData(log:tmf8829log.Log, csvout, schema:tmf8829log.Schema=None) -> None:
+
+    if not "Result_Set" in log.keys:
+        return
+
+    # Logger version and results fields are checked once, unknown layouts fail here
+    if schema is None:
+        schema = tmf8829log.Schema.detect(log)
+    for frame in log:
+        writeFrame(frame, csvout, schema)
+
+def writeResults(results:list, csvout, schema:tmf8829log.Schema, frame_number=None) -> None:
+
+    # Header from the peaks of the first zone; the fields of each key order are checked and looked up once
+    first_zone = results[0][0] if results and results[0] else {}
+    header_key = ["#PIXEL"] + schema.fields(tuple(first_zone), False, frame_number)[0]
+    for i, peak in enumerate(first_zone.get('peaks') or []):
+        header_key.extend(f"{name}{i}" for name in schema.fields(tuple(peak), True, frame_number)[0])
+    csvout.writerow(header_key)
+
+    rows = []
+    pixel = 0
+    for result in results:
+        for result_line in result:
+            row_val = (f"#PIXEL{pixel:04}",) + schema.fields(tuple(result_line), False, frame_number)[1](result_line)
+            for peak in result_line.get('peaks') or ():
+                row_val += schema.fields(tuple(peak), True, frame_number)[1](peak)
+            rows.append(row_val)
+            pixel += 1
+    csvout.writerows(rows)
+
+def writeFrame(frame:tmf8829log.Frame, csvout, schema:tmf8829log.Schema=None) -> None:
 
     global histogram_counter
 
-    if not "Result_Set" in data:
-        return
+    if "results" in frame:
+        if schema is None:
+            schema = tmf8829log.Schema()
+        histogram_counter = 0
 
-    for frame in data["Result_Set"]:
-            
-        if "results" in frame:
-            histogram_counter = 0
-            pixel = 0
-
-            header_key = []
-            header_key.append("#PIXEL")
-
-            # generate row with keys
-            row_keys = frame["results"][0][0].keys()
-            if 'noise' in row_keys:
-                header_key.append("noise")
-            if  'xtalk' in row_keys:
-                header_key.append("xtalk")
-            if 'peaks' in row_keys:
-                for i, peak in enumerate(frame["results"][0][0]['peaks']):
-                    if 'distance' in peak:
-                        header_key.append(f"distance{i}")
-                    if  'snr' in peak:
-                        header_key.append(f"snr{i}")
-                    if  'signal' in peak:
-                        header_key.append(f"signal{i}")
-                    if  'x' in peak:
-                        header_key.append(f"x{i}")
-                    if  'y' in peak:
-                        header_key.append(f"y{i}")
-                    if  'z' in peak:
-                        header_key.append(f"z{i}")                        
-            csvout.writerow(header_key)
-            
-            # log the results
-
-            for result in frame["results"]:
-                for result_line in result:
-                    row_val = []
-                    row_val.append(f"#PIXEL{pixel:04}")
-                    if 'noise' in result_line:
-                        row_val.append(result_line["noise"])
-                    if 'xtalk' in result_line:
-                        row_val.append(result_line["xtalk"])
-                    if 'peaks' in result_line:
-                        for peak in result_line["peaks"]:
-                            if 'distance' in peak:
-                                row_val.append(peak["distance"])
-                            if 'snr' in peak:
-                                row_val.append(peak["snr"])
-                            if 'signal' in peak:
-                                row_val.append(peak["signal"])
-                            if 'x' in peak:
-                                row_val.append(peak["x"])
-                            if 'y' in peak:
-                                row_val.append(peak["y"])
-                            if 'z' in peak:
-                                row_val.append(peak["z"])                                
-                    csvout.writerow(row_val)
-                    pixel += 1
-
-        if "mp_histo" in frame:
-            header_key = []
-            header_key.append("#RAWBIN")
-            for i in range(64):
-                header_key.append(i)
-            csvout.writerow(header_key)
-
-            for mp_data in frame["mp_histo"]:
-                for histogram in mp_data:
-                    row_val = []
-                    row_val.append(f"#RAW{histogram_counter:03}")
-                    histogram_counter +=1 
-                    for value in histogram["bin"]:
-                        row_val.append(value)
-                    csvout.writerow(row_val)
-
-def dumpSection( data:dict, section_name:str, section_tag:str ) -> None:
+        if frame.packed:
+            # Rows come from the packed columns through the decoder of the frame layout
+            decoder = schema.decoder(frame)
+            csvout.writerow(decoder.header(frame))
+            csvout.writerows(decoder.rows(frame))
+        else:
+            # Results read as JSON text (packing them would cost more than it saves) or
+            # not a regular grid (e.g. zones without peaks, mixed value types): rows from the dicts
+            writeResults(frame["results"], csvout, schema, frame.frame_number)
+
+    if "mp_histo" in frame:
+        header_key = []
+        header_key.append("#RAWBIN")
+        for i in range(64):
+            header_key.append(i)
+        csvout.writerow(header_key)
+
+        rows = []
+        for mp_data in frame["mp_histo"]:
+            for histogram in mp_data:
+                rows.append([f"#RAW{histogram_counter:03}"] + histogram["bin"])
+                histogram_counter += 1
+        csvout.writerows(rows)
+
+def dumpSection( data:dict, section_name:str, section_tag:str, csvout ) -> None:
     if section_name in data.keys():
         row_key = []
         row_value = []
         row_key.append(section_tag)
         row_value.append(section_tag)
         for key, value in data[section_name].items():
+            if key == 'blob' and isinstance(value, list):
+                # One compact cell instead of the text of the list of hex strings
+                try:
+                    value = '0x' + tmf8829log.decode_blob(value).hex()
+                except ValueError:
+                    pass
             row_key.append(key)
             row_value.append(value)
         csvout.writerow(row_key)
@@ -117,59 +110,91 @@ def dumpSection( data:dict, section_name:str, section_tag:str ) -> None:
 
 if __name__ == "__main__":
 
-    if len(sys.argv) == 1:
-        filenames = tk_fd.askopenfilenames(title='Open files', initialdir='./', filetypes=[('Json File', '.json .gz')])
+    parser = argparse.ArgumentParser(description='Convert a TMF8829 JSON log file to csv',
+                                     epilog='Without arguments a file dialog opens to select one or more log files.')
+    parser.add_argument('input', nargs='?', help='Input file (.json, .json.gz, .ndjson or .ndjson.gz)')
+    parser.add_argument('output', nargs='?', help='Output csv file')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress and write in background threads overlapping with parsing')
+    parser.add_argument('--salvage', action='store_true',
+                        help='Convert the complete frames of a truncated or damaged log instead of failing')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiling.from_args(args, 'json_to_csv')
+
+    if args.input is None:
+        from tkinter import filedialog as tk_fd
+
+        filenames = tk_fd.askopenfilenames(title='Open files', initialdir='./', filetypes=[('Json File', '.json .ndjson .gz')])
 
         if len(filenames) == 0:
             print("Aborted by user.")
             sys.exit()
     else:                                  
-        if len(sys.argv) < 3:
+        if args.output is None:
             print("Missing argument!")
             print("Usage : json_2_csv.py inputfile.json/json.gz outputfile.csv")
             sys.exit()
         filenames = []
-        filenames.append(sys.argv[1])
+        filenames.append(args.input)
 
     # record start time
     start = time.time()
 
-    for file in filenames:
+    with profiler.hot_path():
+        for file in filenames:
+
+            profiler.reset(file)
+            with profiler.phase('parse'):
+                measurement_data = tmf8829log.load(file, args.threaded, salvage=args.salvage)  # Read the json data (.json or .json.gz)
+            profiler.add_input(file, measurement_data.decompressed_bytes)
+            if measurement_data.damage is not None and measurement_data.damage.damaged:
+                print('\n'.join(measurement_data.damage.describe()))
+            profiler.frames = len(measurement_data)
+
+            # Fail before writing anything if the log version or results layout is unknown
+            try:
+                schema = tmf8829log.Schema.detect(measurement_data)
+            except tmf8829log.SchemaError as e:
+                print(f"Error: {file}: {e}")
+                sys.exit(1)
+
+            # open CSV writer
+            if args.input is None:
+                if file.endswith(".ndjson.gz"):
+                    csv_file_name = file[:-len(".ndjson.gz")] + ".csv"
+                elif file.endswith(".ndjson"):
+                    csv_file_name = file[:-len(".ndjson")] + ".csv"
+                elif (file[-2:] == "gz"):
+                    csv_file_name = file.replace("json.gz","csv")
+                elif (file[-4:] == "json"):
+                    csv_file_name = file.replace("json","csv")
+            else:
+                csv_file_name = args.output
+
+            with profiler.phase('write'):
+                f = tmf8829log.open_output(csv_file_name, args.threaded, encoding='UTF8', newline='')
+
+                f.write( "sep=,\n")
+                csvout = csv.writer( f, delimiter=',')
+
+                dumpSection(measurement_data.header, "configuration", "#CONFIG", csvout)
+                try:
+                    writeFrameData(measurement_data, csvout, schema)
+                except tmf8829log.SchemaError as e:
+                    # A later frame with another layout
+                    f.close()
+                    print(f"Error: {file}: {e}")
+                    sys.exit(1)
+
+                # csv file close
+                f.close()
+            profiler.add_output(csv_file_name)
 
-        if file[-2:] == "gz":                      # Check if we have a gzip compressed file or an uncompressed json file    
-            with gzip.open(file,"r") as gzip_data: # Open the gzip archive
-                json_data = gzip_data.read()               # Read the gzip data into json_data ( byte array )
-            json_str = json_data.decode("utf-8")           # Decode the byte array -> string
-            measurement_data = json.loads(json_str)        # Read the json data
-
-        elif file[-4:] == "json":
-            with open(file) as json_file:
-                measurement_data = json.load(json_file)
-
-        # open CSV writer
-        if len(sys.argv) == 1:    
-            if (file[-2:] == "gz"):
-                csv_file_name = file.replace("json.gz","csv")
-            elif (file[-4:] == "json"):
-                csv_file_name = file.replace("json","csv")
-
-            f = open(csv_file_name,'w', encoding='UTF8', newline='' )
-        else:
-            f = open(sys.argv[2],'w', encoding='UTF8', newline='' )
-
-        f.write( "sep=,\n")
-        csvout = csv.writer( f, delimiter=',')
-
-        dumpSection(measurement_data, "configuration", "#CONFIG")
-        writeFrameData(measurement_data)
-
-        if len(sys.argv) == 1:
             print("Data written to {}".format(csv_file_name))
-        else:
-            print("Data written to {}".format(sys.argv[2]))
+            profiler.report()
 
-        # csv file close
-        f.close()
+    profiler.close()
 
     # record end time
     end = time.time()
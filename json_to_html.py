@@ -14,9 +14,13 @@ Generate HTML visualization from TMF8829 JSON log
 import json
 import argparse
 import os
-import gzip
 
-def process_directory(input_dir, output_dir=None):
+import profiling
+import tmf8829log
+
+def process_directory(input_dir, output_dir=None, histo_codec=False, profiler=None, threaded=False,
+                      zone_stats=None, histo_analysis=False, point_cloud=False, sprites=None, timing=False,
+                      salvage=False):
     """Process all JSON files in a directory"""
     if not os.path.isdir(input_dir):
         print(f"Error: {input_dir} is not a valid directory")
@@ -27,10 +31,10 @@ def process_directory(input_dir, output_dir=None):
         os.makedirs(output_dir)
         print(f"Created output directory: {output_dir}")
 
-    # Find all JSON files (including .json.gz) in the directory
+    # Find all JSON files (including .json.gz and NDJSON logs) in the directory
     json_files = []
     for item in os.listdir(input_dir):
-        if item.endswith('.json') or item.endswith('.json.gz'):
+        if item.endswith(('.json', '.json.gz', '.ndjson', '.ndjson.gz')):
             json_files.append(os.path.join(input_dir, item))
 
     if not json_files:
@@ -49,16 +53,22 @@ def process_directory(input_dir, output_dir=None):
                 # Remove .json.gz or .json extension
                 if filename.endswith('.json.gz'):
                     html_filename = filename[:-8] + '_gz_viewer.html'
+                elif filename.endswith('.ndjson.gz'):
+                    html_filename = filename[:-10] + '_gz_viewer.html'
                 else:
                     html_filename = os.path.splitext(filename)[0] + '_viewer.html'
                 output_file = os.path.join(output_dir, html_filename)
             else:
                 if json_file.endswith('.json.gz'):
                     output_file = json_file[:-8] + '_gz_viewer.html'
+                elif json_file.endswith('.ndjson.gz'):
+                    output_file = json_file[:-10] + '_gz_viewer.html'
                 else:
                     output_file = os.path.splitext(json_file)[0] + '_viewer.html'
 
-            generate_html(json_file, output_file)
+            generate_html(json_file, output_file, histo_codec, profiler, threaded, zone_stats,
+                          histo_analysis, point_cloud=point_cloud, sprites=sprites, timing=timing,
+                          salvage=salvage)
             success_count += 1
         except Exception as e:
             print(f"Error processing {json_file}: {e}")
@@ -66,101 +76,308 @@ def process_directory(input_dir, output_dir=None):
     print("-" * 50)
     print(f"Successfully processed {success_count}/{len(json_files)} file(s)")
 
-def generate_html(json_file, output_file=None):
-    """Generate HTML visualization from JSON data"""
-    # Detect if file is gzipped and read accordingly
-    if json_file.endswith('.gz'):
-        with gzip.open(json_file, 'rt', encoding='utf-8') as f:
-            data = json.load(f)
-    else:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+def generate_html(json_file, output_file=None, histo_codec=False, profiler=None, threaded=False,
+                  zone_stats=None, histo_analysis=False, compare=None, align='index', point_cloud=False,
+                  sprites=None, timing=False, salvage=False):
+    """Generate HTML visualization from JSON data
+
+    Args:
+        json_file: Path to JSON file (or .json.gz)
+        output_file: Path of the HTML file (default: derived from json_file)
+        histo_codec: Embed histograms delta/varint encoded (see histo_codec.py)
+                     instead of plain JSON arrays
+        profiler: profiling.Profiler collecting phase timings (optional)
+        threaded: decompress the log in a background thread while parsing
+        zone_stats: embed per-zone statistics heatmaps, None: off, 0: whole capture,
+                    N: windows of N frames (see zone_stats.py)
+        histo_analysis: embed histogram peak analysis heatmaps (see histo_analysis.py)
+        compare: second log (B) compared with this one (A), see compare_logs.py
+        align: frame alignment of the comparison: 'index', 'frame_number' or 'time'
+        point_cloud: embed float32 x/y/z buffers for the WebGL point cloud (see point_cloud.py)
+        sprites: embed heatmap thumbnails of every frame for the slider preview
+                 and filmstrip, None: off, 'distance' or 'snr' (see sprites.py)
+        timing: embed the frame timing report and timeline (see timing.py)
+        salvage: load the complete frames of a truncated or damaged log (see salvage_log.py)
+    """
+    if profiler is None:
+        profiler = profiling.Profiler('json_to_html')
+    profiler.reset(json_file)
+
+    # The results of the frames are kept as JSON text and packed into columns on first use
+    with profiler.phase('parse'):
+        log = tmf8829log.load(json_file, threaded, salvage=salvage)
+    profiler.add_input(json_file, log.decompressed_bytes)
+    if log.damage is not None and log.damage.damaged:
+        print('\n'.join(log.damage.describe()))
+
+    comparison = None
+    if compare is not None:
+        import compare_logs
+        with profiler.phase('parse'):
+            log_b = tmf8829log.load(compare, threaded)
+        profiler.add_input(compare, log_b.decompressed_bytes)
+        with profiler.phase('transform'):
+            comparison = compare_logs.compare_logs(log, log_b, align, (json_file, compare))
+        comparison.print_summary()
+        del log_b
 
     if output_file is None:
-        if json_file.endswith('.json.gz'):
-            output_file = json_file[:-7] + '_viewer.html'
-        else:
-            output_file = os.path.splitext(json_file)[0] + '_viewer.html'
+        output_file = default_output(json_file)
 
-    result_set = data.get('Result_Set', [])
-    configuration = data.get('configuration', {})
-    info_list = data.get('info', [])
-    # Handle info field which can be a list with one element
-    device_info = info_list[0] if isinstance(info_list, list) and len(info_list) > 0 else info_list if isinstance(info_list, dict) else {}
-    device_info_json = json.dumps(device_info) if device_info else '{{}}'
+    write_html(log, output_file, histo_codec, profiler, zone_stats, histo_analysis, comparison, point_cloud,
+               sprites, timing=timing)
 
-    html_content = f"""<!DOCTYPE html>
+    print(f"HTML viewer generated: {output_file}")
+    print(f"Total frames: {len(log)}")
+    print("Open the HTML file in a web browser to view the data.")
+    profiler.report()
+
+def default_output(json_file):
+    """HTML file name next to the log: name_viewer.html"""
+    if json_file.endswith('.json.gz'):
+        return json_file[:-7] + '_viewer.html'
+    if json_file.endswith('.ndjson.gz'):
+        return json_file[:-10] + '_viewer.html'
+    return os.path.splitext(json_file)[0] + '_viewer.html'
+
+def write_html(log, output_file, histo_codec=False, profiler=None, zone_stats=None, histo_analysis=False,
+               comparison=None, point_cloud=False, sprites=None, bundle=None, navigation='', timing=False):
+    """Write the HTML viewer of a loaded log
+
+    Args:
+        log: tmf8829log.Log
+        output_file: Path of the HTML file
+        histo_codec: Embed histograms delta/varint encoded (see histo_codec.py)
+        profiler: profiling.Profiler collecting phase timings (optional)
+        zone_stats: embed per-zone statistics heatmaps, None: off, 0: whole capture,
+                    N: windows of N frames (requires numpy)
+        histo_analysis: embed histogram peak analysis heatmaps (requires numpy)
+        comparison: compare_logs.LogComparison of this log (A) with another
+                    one (B), embedded as difference layers and summary
+        point_cloud: embed float32 x/y/z buffers of all peaks for the WebGL
+                     point cloud view (requires numpy)
+        sprites: embed PNG sprite sheets with a heatmap thumbnail of every
+                 frame of this field ('distance' or 'snr', requires numpy)
+        bundle: (CSS, JavaScript) URLs of a shared viewer bundle (see
+                viewer_site.py), None: style and script inlined
+        navigation: HTML above the viewer, e.g. links between the pages of a site
+        timing: embed the frame rate, interval, latency, dropped frames,
+                temperature and warnings report with a per-frame timeline
+    """
+    if profiler is None:
+        profiler = profiling.Profiler('json_to_html')
+
+    with profiler.phase('transform'):
+        profiler.frames = len(log)
+        configuration = log.configuration
+        device_info = log.device_info
+        device_info_json = json.dumps(device_info) if device_info else '{}'
+
+        # Optionally move the histograms into the compact codec payload
+        histo_codec_json = 'null'
+        embed_histograms = True
+        if histo_codec:
+            import histo_codec as codec
+            try:
+                histo_payload = codec.encode_result_set(log.frames)
+            except ValueError as e:
+                print(f"Histogram codec not applicable, embedding plain histograms: {e}")
+            else:
+                if histo_payload:
+                    histo_codec_json = json.dumps(histo_payload)
+                    embed_histograms = False
+
+        # Differences to a second log, per-zone statistics and histogram analysis as heatmap layers
+        analysis_layers = None
+        comparison_json = 'null'
+        if comparison is not None:
+            analysis_layers = {'rows': comparison.rows, 'cols': comparison.cols,
+                               'layers': comparison.viewer_layers()}
+            comparison_json = json.dumps(comparison.viewer_payload())
+        if zone_stats is not None:
+            from frame_store import FrameStore
+            import zone_stats as stats_module
+            try:
+                stats = stats_module.compute_zone_stats(FrameStore.from_frames(log.frames), zone_stats or None)
+            except ValueError as e:
+                print(f"Zone statistics not available: {e}")
+            else:
+                if analysis_layers is None:
+                    analysis_layers = {'rows': stats.rows, 'cols': stats.cols, 'layers': []}
+                if (stats.rows, stats.cols) == (analysis_layers['rows'], analysis_layers['cols']):
+                    analysis_layers['layers'] += stats.viewer_layers()
+        if histo_analysis:
+            import histo_analysis as analysis_module
+            try:
+                analysis = analysis_module.analyze_histograms(log.frames)
+            except ValueError as e:
+                print(f"Histogram analysis not available: {e}")
+            else:
+                analysis.cross_check()
+                if analysis_layers is None:
+                    analysis_layers = {'rows': analysis.rows, 'cols': analysis.cols, 'layers': []}
+                if (analysis.rows, analysis.cols) == (analysis_layers['rows'], analysis_layers['cols']):
+                    analysis_layers['layers'] += analysis.viewer_layers(len(log))
+                else:
+                    print("Histogram analysis skipped: mp_histo grid differs from the results grid")
+        analysis_layers_json = json.dumps(analysis_layers) if analysis_layers else 'null'
+
+        # Zone directions for the XYZ display of logs without x/y/z (see geometry.py). The first
+        # packed frame decides, the frames of logs with x/y/z are not packed for this check.
+        zone_directions_json = 'null'
+        first = next((frame for frame in log.frames if frame.layout is not None and frame.rows), None)
+        if first is not None and 'x' not in first.layout.peak_keys and 'distance' in first.layout.peak_keys:
+            try:
+                import geometry
+            except ImportError:
+                print("x/y/z not computed from the distance: numpy is not installed")
+            else:
+                grids = {(frame.rows, frame.cols) for frame in log.frames if frame.layout is not None and frame.rows}
+                zone_directions_json = json.dumps({
+                    f'{rows}x{cols}': [round(float(value), 6) for value in
+                                       geometry.zone_geometry(configuration, rows, cols).directions.ravel()]
+                    for rows, cols in grids})
+
+        # x/y/z of all peaks as one float32 vertex buffer per frame for the WebGL point cloud
+        point_cloud_json = 'null'
+        if point_cloud:
+            from frame_store import FrameStore
+            import point_cloud as cloud_module
+            try:
+                cloud = cloud_module.PointCloud.from_store(
+                    FrameStore.from_frames(log.frames, fields=cloud_module.STORE_FIELDS), configuration)
+            except ValueError as e:
+                print(f"Point cloud not available: {e}")
+            else:
+                point_cloud_json = json.dumps(cloud.viewer_payload())
+                del cloud
+
+        # Heatmap thumbnails of all frames for scrubbing
+        sprites_json = 'null'
+        if sprites:
+            from frame_store import FrameStore
+            import sprites as sprites_module
+            try:
+                sheets = sprites_module.build_sprites(
+                    FrameStore.from_frames(log.frames, fields=('distance', sprites), peaks=1), sprites)
+            except ValueError as e:
+                print(f"Sprites not available: {e}")
+            else:
+                sprites_json = json.dumps(sheets.viewer_payload())
+
+        # Frame timing from the info blocks: dropped frames, intervals, temperature and warnings
+        timing_json = 'null'
+        if timing:
+            import timing as timing_module
+            timing_analysis = timing_module.TimingAnalysis(configuration)
+            for frame in log.frames:
+                timing_analysis.add(frame.info)
+            timing_json = json.dumps(timing_analysis.viewer_payload())
+
+        # Same text as json.dumps() of the frame list, built one frame at a time
+        frames_json = '[' + ', '.join(frame.to_json(embed_histograms) for frame in log) + ']'
+
+    with profiler.phase('serialize'):
+        data_script = f"""        const data = {frames_json};
+        const config = {json.dumps(tmf8829log.compact_configuration(configuration))};
+        const deviceInfo = {device_info_json};
+        const histoCodec = {histo_codec_json};
+        const analysisLayers = {analysis_layers_json};
+        const comparison = {comparison_json};
+        const pointCloud = {point_cloud_json};
+        const zoneDirections = {zone_directions_json};
+        const sprites = {sprites_json};
+        const timing = {timing_json};
+"""
+        if bundle is None:
+            head = f"    <style>\n{viewer_style()}    </style>\n"
+            scripts = f"    <script>\n{data_script}{viewer_script()}    </script>\n"
+        else:
+            head = f'    <link rel="stylesheet" href="{bundle[0]}">\n'
+            scripts = f'    <script>\n{data_script}    </script>\n    <script src="{bundle[1]}"></script>\n'
+        html_content = f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>TMF8829 JSON Viewer</title>
-    <style>
-        * {{
+{head}</head>
+{viewer_body(len(log), navigation)}{scripts}</body>
+</html>
+"""
+
+    with profiler.phase('write'):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+    profiler.add_output(output_file)
+
+def viewer_style():
+    """CSS of the viewer page"""
+    return """        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
 
-        body {{
+        body {
             font-family: Arial, sans-serif;
             background-color: #f5f5f5;
             padding: 20px;
-        }}
+        }
 
-        .container {{
+        .container {
             max-width: 1400px;
             margin: 0 auto;
             background-color: white;
             padding: 20px;
             border-radius: 10px;
             box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }}
+        }
 
-        h1 {{
+        h1 {
             text-align: center;
             color: #333;
             margin-bottom: 20px;
-        }}
+        }
 
-        .controls {{
+        .controls {
             background-color: #f0f0f0;
             padding: 8px;
             border-radius: 8px;
             margin-bottom: 15px;
-        }}
+        }
 
-        .control-row {{
+        .control-row {
             display: flex;
             align-items: center;
             gap: 12px;
             margin-bottom: 5px;
-        }}
+        }
 
-        .control-row:last-child {{
+        .control-row:last-child {
             margin-bottom: 0;
-        }}
+        }
 
-        label {{
+        label {
             font-weight: bold;
             color: #555;
             min-width: 120px;
             font-size: 10px;
-        }}
+        }
 
-        input[type="range"] {{
+        input[type="range"] {
             flex: 1;
             max-width: 400px;
-        }}
+        }
 
-        select {{
+        select {
             padding: 5px 10px;
             border-radius: 4px;
             border: 1px solid #ccc;
             font-size: 10px;
-        }}
+        }
 
-        button {{
+        button {
             padding: 4px 12px;
             background-color: #4CAF50;
             color: white;
@@ -169,50 +386,50 @@ def generate_html(json_file, output_file=None):
             cursor: pointer;
             font-weight: bold;
             font-size: 10px;
-        }}
+        }
 
-        button:hover {{
+        button:hover {
             background-color: #45a049;
-        }}
+        }
 
-        button:disabled {{
+        button:disabled {
             background-color: #cccccc;
             cursor: not-allowed;
-        }}
+        }
 
-        input[type="checkbox"] {{
+        input[type="checkbox"] {
             margin-right: 5px;
             cursor: pointer;
-        }}
+        }
 
-        input[type="checkbox"]:disabled {{
+        input[type="checkbox"]:disabled {
             cursor: not-allowed;
-        }}
+        }
 
-        .checkbox-group {{
+        .checkbox-group {
             display: flex;
             align-items: center;
             gap: 8px;
-        }}
+        }
 
-        .checkbox-subgroup {{
+        .checkbox-subgroup {
             display: flex;
             align-items: center;
             gap: 10px;
             margin-left: 20px;
-        }}
+        }
 
-        .checkbox-label {{
+        .checkbox-label {
             cursor: pointer;
             user-select: none;
             font-size: 10px;
-        }}
+        }
 
-        .checkbox-label:has(input:disabled) {{
+        .checkbox-label:has(input:disabled) {
             color: #999;
-        }}
+        }
 
-        .info {{
+        .info {
             background-color: #e3f2fd;
             padding: 5px 10px;
             border-radius: 5px;
@@ -220,28 +437,39 @@ def generate_html(json_file, output_file=None):
             color: #1976d2;
             font-size: 10px;
             line-height: 1.2;
-        }}
+        }
 
-        .info.warning {{
+        .info.warning {
             color: #d32f2f;
             font-weight: bold;
-        }}
+        }
 
-        .grid-container {{
+        .grid-container {
             overflow: auto;
             border: 2px solid #333;
             border-radius: 5px;
             max-height: 90vh;
-        }}
+        }
 
-        .grid {{
+        .grid {
             display: grid;
             gap: 2px;
             padding: 10px;
             background-color: #fff;
-        }}
+        }
+
+        .grid.virtual, .histo-grid.virtual {
+            display: block;
+            position: relative;
+        }
 
-        .cell {{
+        .virtual > .cell, .virtual > .histo-cell {
+            position: absolute;
+            box-sizing: border-box;
+            overflow: hidden;
+        }
+
+        .cell {
             border: 1px solid #999;
             padding: 4px 6px;
             min-width: 80px;
@@ -251,60 +479,60 @@ def generate_html(json_file, output_file=None):
             display: flex;
             flex-direction: column;
             justify-content: center;
-        }}
+        }
 
-        .cell-header {{
+        .cell-header {
             position: absolute;
             top: 1px;
             right: 3px;
             font-size: 9px;
             color: #666;
-        }}
+        }
 
-        .cell-data {{
+        .cell-data {
             font-size: 10px;
             line-height: 1.3;
             word-wrap: break-word;
-        }}
+        }
 
-        .peak {{
+        .peak {
             padding: 1px 2px;
             border-radius: 2px;
             margin: 1px 0;
-        }}
+        }
 
-        .peak-high {{
+        .peak-high {
             color: #006400;
             background-color: #90EE90;
-        }}
+        }
 
-        .peak-medium {{
+        .peak-medium {
             color: #8B4500;
             background-color: #FFD700;
-        }}
+        }
 
-        .peak-low {{
+        .peak-low {
             color: #8B0000;
             background-color: #FFB6C1;
-        }}
+        }
 
-        .peak-none {{
+        .peak-none {
             color: #666;
-        }}
+        }
 
-        .no-data {{
+        .no-data {
             color: #999;
             font-style: italic;
-        }}
+        }
 
-        .frame-count {{
+        .frame-count {
             text-align: center;
             color: #666;
             margin-top: 15px;
             font-size: 14px;
-        }}
+        }
 
-        .legend {{
+        .legend {
             background-color: #f9f9f9;
             padding: 10px;
             border-radius: 5px;
@@ -314,22 +542,22 @@ def generate_html(json_file, output_file=None):
             align-items: center;
             gap: 15px;
             flex-wrap: wrap;
-        }}
+        }
 
-        .legend-title {{
+        .legend-title {
             font-weight: bold;
             color: #333;
             margin-right: 5px;
-        }}
+        }
 
-        .legend-item {{
+        .legend-item {
             display: inline-flex;
             align-items: center;
             gap: 5px;
             margin-left: 10px;
-        }}
+        }
 
-        .legend-color {{
+        .legend-color {
             width: 30px;
             height: 20px;
             border-radius: 2px;
@@ -337,68 +565,68 @@ def generate_html(json_file, output_file=None):
             display: inline-flex;
             align-items: center;
             justify-content: center;
-        }}
+        }
 
-        .version-info {{
+        .version-info {
             background-color: #fff3cd;
             padding: 8px 12px;
             border-radius: 5px;
             margin-bottom: 10px;
             color: #856404;
             font-size: 10px;
-        }}
+        }
 
-        .histo-container {{
+        .histo-container {
             margin-top: 10px;
             border: 2px solid #333;
             border-radius: 5px;
             padding: 10px;
             background-color: #fff;
-        }}
+        }
 
-        .histo-header {{
+        .histo-header {
             font-size: 12px;
             font-weight: bold;
             margin-bottom: 10px;
             color: #333;
-        }}
+        }
 
-        .histo-grid {{
+        .histo-grid {
             display: grid;
             gap: 5px;
             overflow: auto;
             max-height: 730px;
             padding: 5px;
-        }}
+        }
 
-        .histo-cell {{
+        .histo-cell {
             border: 1px solid #ccc;
             border-radius: 4px;
             padding: 5px;
             background-color: #fafafa;
             cursor: pointer;
             transition: transform 0.2s, box-shadow 0.2s;
-        }}
+        }
 
-        .histo-cell:hover {{
+        .histo-cell:hover {
             transform: scale(1.02);
             box-shadow: 0 2px 8px rgba(0,0,0,0.15);
             border-color: #4CAF50;
-        }}
+        }
 
-        .histo-cell-header {{
+        .histo-cell-header {
             font-size: 9px;
             color: #666;
             margin-bottom: 3px;
             font-weight: bold;
-        }}
+        }
 
-        .histo-chart {{
+        .histo-chart {
             width: 120px;
             height: 60px;
-        }}
+        }
 
-        .modal {{
+        .modal {
             display: none;
             position: fixed;
             z-index: 1000;
@@ -409,13 +637,13 @@ def generate_html(json_file, output_file=None):
             background-color: rgba(0,0,0,0.8);
             justify-content: center;
             align-items: center;
-        }}
+        }
 
-        .modal.show {{
+        .modal.show {
             display: flex;
-        }}
+        }
 
-        .modal-content {{
+        .modal-content {
             background-color: white;
             border-radius: 10px;
             padding: 20px;
@@ -425,9 +653,9 @@ def generate_html(json_file, output_file=None):
             position: relative;
             display: flex;
             flex-direction: column;
-        }}
+        }
 
-        .modal-close {{
+        .modal-close {
             position: absolute;
             top: 10px;
             right: 15px;
@@ -435,34 +663,86 @@ def generate_html(json_file, output_file=None):
             cursor: pointer;
             color: #666;
             font-weight: bold;
-        }}
+        }
 
-        .modal-close:hover {{
+        .modal-close:hover {
             color: #000;
-        }}
+        }
 
-        .modal-chart-container {{
+        .modal-chart-container {
             width: 800px;
             min-height: 600px;
             overflow-y: auto;
             position: relative;
-        }}
+        }
+
+        .filmstrip {
+            display: flex;
+            gap: 2px;
+            overflow: hidden;
+            margin-top: 5px;
+        }
+
+        .sprite {
+            flex: none;
+            image-rendering: pixelated;
+            background-repeat: no-repeat;
+            border: 2px solid transparent;
+            cursor: pointer;
+        }
+
+        .sprite.current {
+            border-color: #4CAF50;
+        }
+
+        .timing {
+            margin-top: 8px;
+        }
+
+        .timing-summary {
+            margin-bottom: 3px;
+            font-size: 12px;
+            color: #555;
+        }
+
+        .timing-canvas {
+            display: block;
+            width: 100%;
+            height: 80px;
+            border: 1px solid #ddd;
+            cursor: pointer;
+        }
+
+        .sprite-preview {
+            display: none;
+            position: fixed;
+            z-index: 500;
+            padding: 2px;
+            border: 1px solid #333;
+            background-color: white;
+            font-size: 9px;
+            text-align: center;
+            pointer-events: none;
+        }
 
-        .modal-title {{
+        .modal-title {
             font-size: 18px;
             font-weight: bold;
             margin-bottom: 15px;
             margin-right: 40px;
             color: #333;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
+        }
+"""
+
+def viewer_body(frame_count, navigation=''):
+    """HTML of the viewer controls and grids for a log of frame_count frames, navigation: HTML on top"""
+    return f"""<body>
+{navigation}    <div class="container">
         <div class="version-info" id="versionInfo"></div>
 
         <div class="controls">
             <div class="info" id="frameDetails"></div>
+            <div class="info" id="compareSummary" style="display: none;"></div>
 
             <div class="control-row">
                 <div class="checkbox-group">
@@ -504,15 +784,33 @@ def generate_html(json_file, output_file=None):
                             <option value="ref">Ref</option>
                         </select>
                     </label>
+                    <label class="checkbox-label" id="analysisControl" style="display: none;">
+                        Heatmap
+                        <select id="analysisLayerSelect" style="margin-left: 8px;">
+                            <option value="-1">Off</option>
+                        </select>
+                    </label>
+                    <label class="checkbox-label" id="pointCloudControl" style="display: none;">
+                        <input type="checkbox" id="showPointCloud">
+                        3D
+                        <select id="pointCloudColorSelect" style="margin-left: 8px;">
+                        </select>
+                    </label>
                 </div>
-                <input type="range" id="frameSlider" min="0" max="{len(result_set)-1}" value="0" step="1">
-                <span id="frameInfo">0 / {len(result_set)-1}</span>
+                <input type="range" id="frameSlider" min="0" max="{frame_count - 1}" value="0" step="1">
+                <span id="frameInfo">0 / {frame_count - 1}</span>
                 <button id="prevBtn" onclick="prevFrame()">◀ Previous</button>
                 <button id="nextBtn" onclick="nextFrame()">Next ▶</button>
             </div>
+            <div class="filmstrip" id="filmstrip" style="display: none;"></div>
+            <div class="timing" id="timingContainer" style="display: none;">
+                <div class="timing-summary" id="timingSummary"></div>
+                <canvas class="timing-canvas" id="timingCanvas"
+                        title="grey: frame interval (green dashed: nominal period), red: dropped frames, orange: warnings, blue: temperature. Click to open a frame."></canvas>
+            </div>
         </div>
 
-        <div class="grid-container">
+        <div class="grid-container" id="gridContainer">
             <div class="grid" id="dataGrid"></div>
         </div>
 
@@ -520,6 +818,11 @@ def generate_html(json_file, output_file=None):
             <div class="histo-grid" id="histoGrid"></div>
         </div>
 
+        <div class="histo-container" id="pointCloudContainer" style="display: none;">
+            <div class="histo-header" id="pointCloudInfo"></div>
+            <canvas id="pointCloudCanvas" style="width: 100%; height: 600px; cursor: grab;"></canvas>
+        </div>
+
         <div class="controls" style="margin-top: 15px;">
             <div class="control-row">
                 <div class="checkbox-group">
@@ -562,14 +865,19 @@ def generate_html(json_file, output_file=None):
                         </select>
                     </label>
                 </div>
-                <input type="range" id="frameSlider2" min="0" max="{len(result_set)-1}" value="0" step="1">
-                <span id="frameInfo2">0 / {len(result_set)-1}</span>
+                <input type="range" id="frameSlider2" min="0" max="{frame_count - 1}" value="0" step="1">
+                <span id="frameInfo2">0 / {frame_count - 1}</span>
                 <button id="prevBtn2" onclick="prevFrame()">◀ Previous</button>
                 <button id="nextBtn2" onclick="nextFrame()">Next ▶</button>
             </div>
         </div>
     </div>
 
+    <div class="sprite-preview" id="spritePreview">
+        <div class="sprite" id="spritePreviewImage"></div>
+        <div id="spritePreviewLabel"></div>
+    </div>
+
     <div class="modal" id="histoModal">
         <div class="modal-content">
             <span class="modal-close" onclick="closeModal()">&times;</span>
@@ -578,85 +886,167 @@ def generate_html(json_file, output_file=None):
         </div>
     </div>
 
-    <script>
-        const data = {json.dumps(result_set)};
-        const config = {json.dumps(configuration)};
-        const deviceInfo = {device_info_json};
-        let currentFrame = 0;
+"""
+
+def viewer_script():
+    """JavaScript of the viewer, run after the data constants of the page (data, config, ...)"""
+    return """        let currentFrame = 0;
         let numPeaksToShow = config.nr_peaks || 4;
         let hasHistogram = false;
 
+        // Histogram bins are plain arrays or, when decoded from histoCodec, typed array views
+        function isBinArray(bins) {
+            return Array.isArray(bins) || ArrayBuffer.isView(bins);
+        }
+
+        // Decode one stream written by histo_codec.py (delta + trailing zero trim + zigzag varint)
+        function decodeHistogramStream(b64) {
+            const raw = atob(b64);
+            const bytes = new Uint8Array(raw.length);
+            for (let i = 0; i < raw.length; i++) {
+                bytes[i] = raw.charCodeAt(i);
+            }
+
+            let pos = 4;  // skip magic 'THC1'
+            function readVarint() {
+                let value = 0;
+                let scale = 1;
+                let b;
+                do {
+                    b = bytes[pos++];
+                    value += (b & 0x7f) * scale;
+                    scale *= 128;
+                } while (b & 0x80);
+                return value;
+            }
+
+            const frames = readVarint();
+            const histos = readVarint();
+            const bins = readVarint();
+            const present = bytes.subarray(pos, pos + frames);
+            pos += frames;
+            const lengths = new Uint32Array(frames * histos);
+            for (let i = 0; i < lengths.length; i++) {
+                lengths[i] = readVarint();
+            }
+
+            const hist = new Uint32Array(frames * histos * bins);
+            const frameSize = histos * bins;
+            for (let f = 0; f < frames; f++) {
+                for (let h = 0; h < histos; h++) {
+                    const base = f * frameSize + h * bins;
+                    const len = lengths[f * histos + h];
+                    for (let k = 0; k < bins; k++) {
+                        let delta = 0;
+                        if (k < len) {
+                            const z = readVarint();
+                            delta = (z % 2) ? -(z + 1) / 2 : z / 2;
+                        }
+                        hist[base + k] = (f > 0 ? hist[base - frameSize + k] : 0) + delta;
+                    }
+                }
+            }
+            return { frames, bins, present, hist };
+        }
+
+        // Restore frame.mp_histo / frame.ref_histo from the codec payload
+        function attachHistograms() {
+            if (!histoCodec) return;
+
+            ['mp_histo', 'ref_histo'].forEach(key => {
+                const entry = histoCodec[key];
+                if (!entry) return;
+
+                const stream = decodeHistogramStream(entry.data);
+                const bins = stream.bins;
+                data.forEach((frame, f) => {
+                    if (!stream.present[f]) return;
+                    const rows = [];
+                    for (let r = 0; r < entry.rows; r++) {
+                        const row = [];
+                        for (let c = 0; c < entry.cols; c++) {
+                            const start = ((f * entry.rows + r) * entry.cols + c) * bins;
+                            row.push({ bin: stream.hist.subarray(start, start + bins) });
+                        }
+                        // ref_histo holds one histogram per row
+                        rows.push(key === 'mp_histo' ? row : row[0]);
+                    }
+                    frame[key] = rows;
+                });
+            });
+        }
+
         // Check if data contains histogram for current frame
-        function checkHistogramAvailability(frame = null) {{
+        function checkHistogramAvailability(frame = null) {
             // If no frame provided, check first frame for initial state
-            if (frame === null) {{
+            if (frame === null) {
                 frame = data[0];
-            }}
+            }
 
             hasHistogram = false;
 
-            if (frame) {{
+            if (frame) {
                 // Check mp_histo
-                if (frame.mp_histo && frame.mp_histo.length > 0) {{
+                if (frame.mp_histo && frame.mp_histo.length > 0) {
                     // mp_histo[row] is an array of dicts, each with 'bin' key
-                    for (let i = 0; i < frame.mp_histo.length; i++) {{
+                    for (let i = 0; i < frame.mp_histo.length; i++) {
                         const row = frame.mp_histo[i];
-                        if (Array.isArray(row) && row.length > 0) {{
+                        if (Array.isArray(row) && row.length > 0) {
                             // Check first item in the row
                             const item = row[0];
-                            if (item && item.bin && Array.isArray(item.bin) && item.bin.length > 0) {{
+                            if (item && item.bin && isBinArray(item.bin) && item.bin.length > 0) {
                                 hasHistogram = true;
                                 break;
-                            }}
-                        }}
-                    }}
-                }}
+                            }
+                        }
+                    }
+                }
 
                 // Check ref_histo if mp_histo doesn't have data
-                if (!hasHistogram && frame.ref_histo && frame.ref_histo.length > 0) {{
+                if (!hasHistogram && frame.ref_histo && frame.ref_histo.length > 0) {
                     // ref_histo[row] is a dict with 'bin' key
-                    for (let i = 0; i < frame.ref_histo.length; i++) {{
+                    for (let i = 0; i < frame.ref_histo.length; i++) {
                         const item = frame.ref_histo[i];
-                        if (item && item.bin && Array.isArray(item.bin) && item.bin.length > 0) {{
+                        if (item && item.bin && isBinArray(item.bin) && item.bin.length > 0) {
                             hasHistogram = true;
                             break;
-                        }}
-                    }}
-                }}
-            }}
+                        }
+                    }
+                }
+            }
             const histogramCheckbox = document.getElementById('showHistogram');
             const histoTypeSelect = document.getElementById('histoTypeSelect');
             const histogramCheckbox2 = document.getElementById('showHistogram2');
             const histoTypeSelect2 = document.getElementById('histoTypeSelect2');
 
-            if (hasHistogram) {{
+            if (hasHistogram) {
                 histogramCheckbox.disabled = false;
                 histoTypeSelect.disabled = false;
                 histogramCheckbox2.disabled = false;
                 histoTypeSelect2.disabled = false;
-            }} else {{
+            } else {
                 histogramCheckbox.disabled = true;
                 histoTypeSelect.disabled = true;
                 histogramCheckbox2.disabled = true;
                 histoTypeSelect2.disabled = true;
-            }}
-        }}
+            }
+        }
 
         // Initialize version info
-        function initVersionInfo() {{
+        function initVersionInfo() {
             const versionDiv = document.getElementById('versionInfo');
             let versionText = 'Version Information: ';
 
             // Helper function to format version (handle arrays and empty strings)
-            function formatVersion(val) {{
-                if (!val || (typeof val === 'string' && val.trim() === '')) {{
+            function formatVersion(val) {
+                if (!val || (typeof val === 'string' && val.trim() === '')) {
                     return 'N/A';
-                }}
-                if (Array.isArray(val)) {{
+                }
+                if (Array.isArray(val)) {
                     return val.join('.');
-                }}
+                }
                 return val;
-            }}
+            }
 
             // Try different possible field names
             const hostVersion = formatVersion(deviceInfo['host version'] || deviceInfo['EVM version'] || deviceInfo['host_version']);
@@ -664,18 +1054,18 @@ def generate_html(json_file, output_file=None):
             const loggerVersion = formatVersion(deviceInfo['logger version'] || deviceInfo['logger_version']);
             const serialNumber = formatVersion(deviceInfo['serial number'] || deviceInfo['serial_number']);
 
-            versionText += `Host: ${{hostVersion}} | FW: ${{fwVersion}} | Logger: ${{loggerVersion}} | Serial: ${{serialNumber}}`;
+            versionText += `Host: ${hostVersion} | FW: ${fwVersion} | Logger: ${loggerVersion} | Serial: ${serialNumber}`;
             versionDiv.textContent = versionText;
-        }}
+        }
 
         // Initialize numPeaksSelect dropdown
-        function initNumPeaksSelect() {{
+        function initNumPeaksSelect() {
             // Fixed options: 1, 2, 3, 4
             const maxObjects = 4;
             const defaultPeaks = config.nr_peaks || 4;
             const selects = ['numPeaksSelect', 'numPeaksSelect2'];
 
-            selects.forEach(selectId => {{
+            selects.forEach(selectId => {
                 const select = document.getElementById(selectId);
                 if (!select) return;
 
@@ -683,23 +1073,23 @@ def generate_html(json_file, output_file=None):
                 select.innerHTML = '';
 
                 // Add options from 1 to 4
-                for (let i = 1; i <= maxObjects; i++) {{
+                for (let i = 1; i <= maxObjects; i++) {
                     const option = document.createElement('option');
                     option.value = i;
                     option.textContent = i;
-                    if (i === defaultPeaks) {{
+                    if (i === defaultPeaks) {
                         option.selected = true;
-                    }}
+                    }
                     select.appendChild(option);
-                }}
-            }});
+                }
+            });
 
             // Set initial value
             numPeaksToShow = parseInt(document.getElementById('numPeaksSelect').value);
-        }}
+        }
 
         // Display options
-        let displayOptions = {{
+        let displayOptions = {
             showNoise: false,
             showPeaks: true,
             showXtalk: false,
@@ -708,22 +1098,773 @@ def generate_html(json_file, output_file=None):
             showXYZ: false,
             showSignal: false,
             showHistogram: false,
-            histoType: 'mp'
-        }};
+            histoType: 'mp',
+            analysisLayer: -1
+        };
+
+        // Decode the analysis layers (zone_stats.py) and fill the heatmap select
+        function initAnalysisLayers() {
+            if (!analysisLayers) return;
+
+            const select = document.getElementById('analysisLayerSelect');
+            analysisLayers.layers.forEach((layer, index) => {
+                const raw = atob(layer.data);
+                const bytes = new Uint8Array(raw.length);
+                for (let i = 0; i < raw.length; i++) {
+                    bytes[i] = raw.charCodeAt(i);
+                }
+                if (layer.dtype === 'i2') {
+                    // int16 quantized, -32768 marks missing values
+                    const quantized = new Int16Array(bytes.buffer);
+                    layer.values = new Float32Array(quantized.length);
+                    quantized.forEach((value, i) => {
+                        layer.values[i] = value === -32768 ? NaN : value * layer.scale;
+                    });
+                } else {
+                    layer.values = new Float32Array(bytes.buffer);
+                }
+
+                const option = document.createElement('option');
+                option.value = index;
+                option.textContent = layer.name;
+                select.appendChild(option);
+            });
+            document.getElementById('analysisControl').style.display = '';
+        }
+
+        // Summary table of an A/B comparison, the distance difference layer is shown first
+        function initComparison() {
+            if (!comparison) return;
+
+            const summary = document.getElementById('compareSummary');
+            const format = value => (value === undefined || value === null) ? '-' : value.toFixed(3);
+            let html = `A: ${comparison.names[0]} (${data.length} frames) | B: ${comparison.names[1]} ` +
+                `(${comparison.framesB} frames) | aligned by ${comparison.mode}: ${comparison.pairs} pairs`;
+            if (comparison.detection[0] !== null) {
+                html += ` | detection A ${(comparison.detection[0] * 100).toFixed(1)}% ` +
+                    `B ${(comparison.detection[1] * 100).toFixed(1)}%`;
+            }
+            html += '<table style="margin-top: 4px; border-collapse: collapse;"><tr><th align="left">B - A</th>' +
+                '<th>count</th><th>mean</th><th>median |d|</th><th>p95 |d|</th><th>rms</th></tr>';
+            comparison.summary.forEach(row => {
+                html += `<tr><td>${row.name}</td><td align="right">${row.count}</td>` +
+                    `<td align="right">${format(row.mean)}</td><td align="right">${format(row.median_abs)}</td>` +
+                    `<td align="right">${format(row.p95_abs)}</td><td align="right">${format(row.rms)}</td></tr>`;
+            });
+            summary.innerHTML = html + '</table>';
+            summary.style.display = '';
+
+            if (analysisLayers && analysisLayers.layers.length > 0) {
+                displayOptions.analysisLayer = 0;
+                document.getElementById('analysisLayerSelect').value = '0';
+            }
+        }
+
+        // Values of the selected analysis layer for the current frame, with their range
+        function currentAnalysisValues() {
+            if (!analysisLayers || displayOptions.analysisLayer < 0) return null;
+
+            const layer = analysisLayers.layers[displayOptions.analysisLayer];
+            const zones = analysisLayers.rows * analysisLayers.cols;
+            const index = Math.min(Math.floor(currentFrame / layer.step), layer.count - 1);
+            const values = layer.values.subarray(index * zones, (index + 1) * zones);
+            let min = Infinity;
+            let max = -Infinity;
+            values.forEach(value => {
+                if (!isNaN(value)) {
+                    min = Math.min(min, value);
+                    max = Math.max(max, value);
+                }
+            });
+            return { layer, index, values, min, max };
+        }
+
+        // Blue (low) to red (high)
+        function heatColor(value, min, max) {
+            const t = max > min ? (value - min) / (max - min) : 0.5;
+            return `hsl(${Math.round((1 - t) * 240)}, 75%, 80%)`;
+        }
+
+        // WebGL point cloud (point_cloud.py): the x/y/z of all peaks of a frame are one slice of a
+        // float32 buffer, changing the frame uploads that slice into the vertex buffer
+        const pointCloudView = {
+            gl: null,
+            xyz: null,
+            values: {},
+            colorBy: null,
+            labels: {},
+            uploaded: null,
+            yaw: 0,
+            pitch: 0,
+            zoom: 1,
+            drag: null,
+            pending: false
+        };
+
+        function decodeFloat32(base64) {
+            const raw = atob(base64);
+            const bytes = new Uint8Array(raw.length);
+            for (let i = 0; i < raw.length; i++) {
+                bytes[i] = raw.charCodeAt(i);
+            }
+            return new Float32Array(bytes.buffer);
+        }
+
+        function initPointCloud() {
+            if (!pointCloud) return;
+
+            const view = pointCloudView;
+            view.xyz = decodeFloat32(pointCloud.xyz);
+            const select = document.getElementById('pointCloudColorSelect');
+            Object.keys(pointCloud.values).forEach(name => {
+                view.values[name] = decodeFloat32(pointCloud.values[name].data);
+                const option = document.createElement('option');
+                option.value = name;
+                view.labels[name] = name === 'snr' ? 'SNR' : name.charAt(0).toUpperCase() + name.slice(1);
+                option.textContent = view.labels[name];
+                select.appendChild(option);
+            });
+            view.colorBy = Object.keys(pointCloud.values)[0];
+            document.getElementById('pointCloudControl').style.display = '';
+
+            // Drag to orbit around the center of the capture, wheel to zoom, double click to reset
+            const canvas = document.getElementById('pointCloudCanvas');
+            canvas.addEventListener('mousedown', function(e) {
+                view.drag = { x: e.clientX, y: e.clientY };
+                canvas.style.cursor = 'grabbing';
+            });
+            window.addEventListener('mousemove', function(e) {
+                if (!view.drag) return;
+                view.yaw += (e.clientX - view.drag.x) * 0.01;
+                view.pitch = Math.max(-1.5, Math.min(1.5, view.pitch + (e.clientY - view.drag.y) * 0.01));
+                view.drag = { x: e.clientX, y: e.clientY };
+                requestPointCloudDraw();
+            });
+            window.addEventListener('mouseup', function() {
+                view.drag = null;
+                canvas.style.cursor = 'grab';
+            });
+            canvas.addEventListener('wheel', function(e) {
+                e.preventDefault();
+                view.zoom = Math.max(0.1, Math.min(20, view.zoom * Math.exp(-e.deltaY * 0.001)));
+                requestPointCloudDraw();
+            }, { passive: false });
+            canvas.addEventListener('dblclick', function() {
+                view.yaw = 0;
+                view.pitch = 0;
+                view.zoom = 1;
+                requestPointCloudDraw();
+            });
+        }
+
+        // Shaders and buffers are created when the view is shown the first time
+        function setupPointCloudGL() {
+            const view = pointCloudView;
+            const gl = document.getElementById('pointCloudCanvas').getContext('webgl');
+            if (!gl) return false;
+
+            const compile = (type, source) => {
+                const shader = gl.createShader(type);
+                gl.shaderSource(shader, source);
+                gl.compileShader(shader);
+                if (!gl.getShaderParameter(shader, gl.COMPILE_STATUS)) {
+                    throw new Error(gl.getShaderInfoLog(shader));
+                }
+                return shader;
+            };
+            // Points without a target have the value -1 and are moved out of the clip space
+            const vertexSource = `
+                attribute vec3 position;
+                attribute float value;
+                uniform mat4 matrix;
+                uniform vec2 range;
+                uniform float pointSize;
+                varying float level;
+                void main() {
+                    if (value < 0.0) {
+                        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+                        gl_PointSize = 0.0;
+                        level = 0.0;
+                        return;
+                    }
+                    gl_Position = matrix * vec4(position, 1.0);
+                    gl_PointSize = pointSize;
+                    level = clamp((value - range.x) / max(range.y - range.x, 1e-6), 0.0, 1.0);
+                }`;
+            // Blue (low) to red (high) like the heatmaps, round points
+            const fragmentSource = `
+                precision mediump float;
+                varying float level;
+                void main() {
+                    vec2 offset = gl_PointCoord - 0.5;
+                    if (dot(offset, offset) > 0.25) discard;
+                    float hue = (1.0 - level) * 4.0;
+                    vec3 rgb = clamp(abs(mod(hue + vec3(0.0, 4.0, 2.0), 6.0) - 3.0) - 1.0, 0.0, 1.0);
+                    gl_FragColor = vec4(rgb * 0.9, 1.0);
+                }`;
+            const program = gl.createProgram();
+            gl.attachShader(program, compile(gl.VERTEX_SHADER, vertexSource));
+            gl.attachShader(program, compile(gl.FRAGMENT_SHADER, fragmentSource));
+            gl.linkProgram(program);
+            gl.useProgram(program);
+
+            const points = pointCloud.points;
+            view.positionBuffer = gl.createBuffer();
+            gl.bindBuffer(gl.ARRAY_BUFFER, view.positionBuffer);
+            gl.bufferData(gl.ARRAY_BUFFER, points * 3 * 4, gl.DYNAMIC_DRAW);
+            const position = gl.getAttribLocation(program, 'position');
+            gl.enableVertexAttribArray(position);
+            gl.vertexAttribPointer(position, 3, gl.FLOAT, false, 0, 0);
+
+            view.valueBuffer = gl.createBuffer();
+            gl.bindBuffer(gl.ARRAY_BUFFER, view.valueBuffer);
+            gl.bufferData(gl.ARRAY_BUFFER, points * 4, gl.DYNAMIC_DRAW);
+            const value = gl.getAttribLocation(program, 'value');
+            gl.enableVertexAttribArray(value);
+            gl.vertexAttribPointer(value, 1, gl.FLOAT, false, 0, 0);
+
+            view.uniforms = {
+                matrix: gl.getUniformLocation(program, 'matrix'),
+                range: gl.getUniformLocation(program, 'range'),
+                pointSize: gl.getUniformLocation(program, 'pointSize')
+            };
+            gl.enable(gl.DEPTH_TEST);
+            gl.clearColor(1, 1, 1, 1);
+            view.gl = gl;
+            return true;
+        }
+
+        // Column-major 4x4 matrices as used by WebGL
+        function multiplyMatrix(a, b) {
+            const out = new Float32Array(16);
+            for (let col = 0; col < 4; col++) {
+                for (let row = 0; row < 4; row++) {
+                    let sum = 0;
+                    for (let k = 0; k < 4; k++) {
+                        sum += a[k * 4 + row] * b[col * 4 + k];
+                    }
+                    out[col * 4 + row] = sum;
+                }
+            }
+            return out;
+        }
+
+        // Seen from the sensor (x right, y up, z into the screen) at yaw = pitch = 0, orbiting the center
+        function pointCloudMatrix(aspect) {
+            const view = pointCloudView;
+            const [cx, cy, cz] = pointCloud.center;
+            const radius = pointCloud.radius;
+            const distance = radius * 2.5 / view.zoom;
+            const near = distance / 100;
+            const far = distance + radius * 4;
+            const f = 1 / Math.tan(Math.PI / 8);
+            const cosYaw = Math.cos(view.yaw), sinYaw = Math.sin(view.yaw);
+            const cosPitch = Math.cos(view.pitch), sinPitch = Math.sin(view.pitch);
+
+            const center = new Float32Array([1, 0, 0, 0, 0, 1, 0, 0, 0, 0, -1, 0, -cx, -cy, cz, 1]);
+            const yaw = new Float32Array([cosYaw, 0, -sinYaw, 0, 0, 1, 0, 0, sinYaw, 0, cosYaw, 0, 0, 0, 0, 1]);
+            const pitch = new Float32Array([1, 0, 0, 0, 0, cosPitch, sinPitch, 0,
+                0, -sinPitch, cosPitch, 0, 0, 0, 0, 1]);
+            const back = new Float32Array([1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, -distance, 1]);
+            const projection = new Float32Array([f / aspect, 0, 0, 0, 0, f, 0, 0,
+                0, 0, (far + near) / (near - far), -1, 0, 0, 2 * far * near / (near - far), 0]);
+            return multiplyMatrix(projection, multiplyMatrix(back,
+                multiplyMatrix(pitch, multiplyMatrix(yaw, center))));
+        }
+
+        function requestPointCloudDraw() {
+            if (pointCloudView.pending) return;
+            pointCloudView.pending = true;
+            requestAnimationFrame(drawPointCloud);
+        }
+
+        function drawPointCloud() {
+            const view = pointCloudView;
+            view.pending = false;
+            const gl = view.gl;
+            if (!gl || !document.getElementById('showPointCloud').checked) return;
+
+            const canvas = gl.canvas;
+            const ratio = window.devicePixelRatio || 1;
+            const width = Math.round(canvas.clientWidth * ratio);
+            const height = Math.round(canvas.clientHeight * ratio);
+            if (canvas.width !== width || canvas.height !== height) {
+                canvas.width = width;
+                canvas.height = height;
+            }
+            gl.viewport(0, 0, width, height);
+
+            // Upload the vertex buffers of the current frame only when the frame or colour changed
+            const points = pointCloud.points;
+            const key = `${currentFrame}:${view.colorBy}`;
+            if (view.uploaded !== key) {
+                gl.bindBuffer(gl.ARRAY_BUFFER, view.positionBuffer);
+                gl.bufferSubData(gl.ARRAY_BUFFER, 0,
+                    view.xyz.subarray(currentFrame * points * 3, (currentFrame + 1) * points * 3));
+                gl.bindBuffer(gl.ARRAY_BUFFER, view.valueBuffer);
+                gl.bufferSubData(gl.ARRAY_BUFFER, 0,
+                    view.values[view.colorBy].subarray(currentFrame * points, (currentFrame + 1) * points));
+                view.uploaded = key;
+            }
+
+            const range = pointCloud.values[view.colorBy].range;
+            gl.uniformMatrix4fv(view.uniforms.matrix, false, pointCloudMatrix(width / Math.max(height, 1)));
+            gl.uniform2f(view.uniforms.range, range[0], range[1]);
+            gl.uniform1f(view.uniforms.pointSize, 4 * ratio);
+            gl.clear(gl.COLOR_BUFFER_BIT | gl.DEPTH_BUFFER_BIT);
+            gl.drawArrays(gl.POINTS, 0, points);
+        }
+
+        // Show or hide the 3D view and describe the current frame
+        function updatePointCloud() {
+            if (!pointCloud) return;
+
+            const container = document.getElementById('pointCloudContainer');
+            const info = document.getElementById('pointCloudInfo');
+            if (!document.getElementById('showPointCloud').checked) {
+                container.style.display = 'none';
+                return;
+            }
+            container.style.display = 'block';
+            if (!pointCloudView.gl && !setupPointCloudGL()) {
+                info.textContent = 'WebGL is not available in this browser';
+                return;
+            }
+
+            const points = pointCloud.points;
+            const values = pointCloudView.values[pointCloudView.colorBy].subarray(
+                currentFrame * points, (currentFrame + 1) * points);
+            let targets = 0;
+            values.forEach(value => {
+                if (value >= 0) targets++;
+            });
+            const range = pointCloud.values[pointCloudView.colorBy].range;
+            info.textContent = `Point cloud: ${targets} of ${points} peaks with target | ` +
+                `colour: ${pointCloudView.labels[pointCloudView.colorBy]} ` +
+                `${range[0].toFixed(0)} (blue) … ${range[1].toFixed(0)} (red) | ` +
+                'drag to orbit, wheel to zoom, double click to reset';
+            requestPointCloudDraw();
+        }
+
+        // Heatmap thumbnails (sprites.py): the PNG sheets become object URLs once
+        const FILMSTRIP_FRAMES = 21;
+        const spriteView = {
+            urls: [],
+            filmstrip: [],
+            timer: null
+        };
+
+        function initSprites() {
+            if (!sprites) return;
+
+            sprites.sheets.forEach(sheet => {
+                const raw = atob(sheet.png);
+                const bytes = new Uint8Array(raw.length);
+                for (let i = 0; i < raw.length; i++) {
+                    bytes[i] = raw.charCodeAt(i);
+                }
+                spriteView.urls.push(URL.createObjectURL(new Blob([bytes], { type: 'image/png' })));
+            });
+
+            const filmstrip = document.getElementById('filmstrip');
+            for (let i = 0; i < Math.min(FILMSTRIP_FRAMES, data.length); i++) {
+                const thumb = document.createElement('div');
+                thumb.className = 'sprite';
+                thumb.addEventListener('click', function() {
+                    currentFrame = parseInt(thumb.dataset.frame);
+                    updateDisplay();
+                });
+                filmstrip.appendChild(thumb);
+                spriteView.filmstrip.push(thumb);
+            }
+            filmstrip.style.display = '';
+
+            ['frameSlider', 'frameSlider2'].forEach(id => {
+                const slider = document.getElementById(id);
+                slider.addEventListener('mousemove', e => showSpritePreview(slider, e));
+                slider.addEventListener('mouseleave', function() {
+                    document.getElementById('spritePreview').style.display = 'none';
+                });
+                // The grid follows as soon as the slider is released
+                slider.addEventListener('change', function() {
+                    clearTimeout(spriteView.timer);
+                    updateDisplay();
+                });
+            });
+        }
+
+        // Thumbnail of a frame as background of an element of the given height in pixels
+        function setSprite(element, frame, height) {
+            const zoom = height / sprites.tileHeight;
+            const sheet = Math.floor(frame / sprites.perSheet);
+            const index = frame % sprites.perSheet;
+            const size = sprites.sheets[sheet];
+            element.style.width = `${sprites.tileWidth * zoom}px`;
+            element.style.height = `${height}px`;
+            element.style.backgroundImage = `url(${spriteView.urls[sheet]})`;
+            element.style.backgroundSize = `${size.width * zoom}px ${size.height * zoom}px`;
+            element.style.backgroundPosition = `-${(index % sprites.perRow) * sprites.tileWidth * zoom}px ` +
+                `-${Math.floor(index / sprites.perRow) * sprites.tileHeight * zoom}px`;
+        }
+
+        // Preview of the frame under the mouse above the slider
+        function showSpritePreview(slider, e) {
+            const rect = slider.getBoundingClientRect();
+            const fraction = Math.max(0, Math.min(1, (e.clientX - rect.left) / rect.width));
+            const frame = Math.round(fraction * (data.length - 1));
+            const preview = document.getElementById('spritePreview');
+            setSprite(document.getElementById('spritePreviewImage'), frame, 96);
+            document.getElementById('spritePreviewLabel').textContent = `frame ${frame}`;
+            preview.style.display = 'block';
+            preview.style.left = `${e.clientX - preview.offsetWidth / 2}px`;
+            preview.style.top = `${rect.top - preview.offsetHeight - 6}px`;
+        }
+
+        // Thumbnails of the frames around the current one
+        function updateFilmstrip() {
+            if (!sprites) return;
+
+            const count = spriteView.filmstrip.length;
+            const first = Math.max(0, Math.min(currentFrame - Math.floor(count / 2), data.length - count));
+            spriteView.filmstrip.forEach((thumb, i) => {
+                const frame = first + i;
+                thumb.dataset.frame = frame;
+                thumb.title = `frame ${frame}`;
+                thumb.classList.toggle('current', frame === currentFrame);
+                setSprite(thumb, frame, 40);
+            });
+        }
+
+        // Slider moved: with sprites only the frame number and filmstrip follow, the grid renders when it stops
+        function scrubFrame(frame) {
+            currentFrame = frame;
+            if (!sprites) {
+                updateDisplay();
+                return;
+            }
+            ['frameSlider', 'frameSlider2'].forEach(id => {
+                document.getElementById(id).value = frame;
+            });
+            ['frameInfo', 'frameInfo2'].forEach(id => {
+                document.getElementById(id).textContent = `${frame} / ${data.length - 1}`;
+            });
+            updateFilmstrip();
+            updateTiming();
+            clearTimeout(spriteView.timer);
+            spriteView.timer = setTimeout(updateDisplay, 150);
+        }
+
+        // Frame timing (timing.py): the timeline is drawn once per canvas width into an offscreen canvas,
+        // one pixel column per group of frames; a frame change only draws the cursor
+        const TIMING_HEIGHT = 80;
+        const TIMING_STRIP = 6;             // pixels of the warnings strip at the bottom
+        const timingView = {
+            series: {},
+            base: null
+        };
+
+        function initTiming() {
+            if (!timing) return;
+
+            Object.keys(timing.timeline).forEach(name => {
+                timingView.series[name] = decodeFloat32(timing.timeline[name]);
+            });
+            const canvas = document.getElementById('timingCanvas');
+            document.getElementById('timingContainer').style.display = '';
+            canvas.addEventListener('click', function(e) {
+                const rect = canvas.getBoundingClientRect();
+                const fraction = Math.max(0, Math.min(1, (e.clientX - rect.left) / rect.width));
+                currentFrame = Math.min(data.length - 1, Math.floor(fraction * data.length));
+                updateDisplay();
+            });
+            window.addEventListener('resize', function() {
+                timingView.base = null;
+                updateTiming();
+            });
+        }
+
+        // Timeline of all frames: interval bars, nominal period, dropped frames, warnings and temperature
+        function drawTimingBase(width, height) {
+            const base = document.createElement('canvas');
+            base.width = width;
+            base.height = height;
+            const ctx = base.getContext('2d');
+            if (!ctx) return null;
+
+            const series = timingView.series;
+            const report = timing.report;
+            const frames = data.length;
+            const plotHeight = height - TIMING_STRIP;
+            const intervalTop = report.interval_ms ? Math.max(report.interval_ms.p99 * 1.5, 1) : 1;
+            const temperatures = [];
+            ctx.fillStyle = '#fafafa';
+            ctx.fillRect(0, 0, width, height);
+            for (let x = 0; x < width; x++) {
+                const first = Math.floor(x * frames / width);
+                const last = Math.min(frames, Math.max(first + 1, Math.floor((x + 1) * frames / width)));
+                let interval = -Infinity;
+                let dropped = 0;
+                let warnings = 0;
+                let temperature = 0;
+                let count = 0;
+                for (let i = first; i < last; i++) {
+                    if (series.interval[i] > interval) interval = series.interval[i];
+                    if (series.dropped[i] > 0) dropped += series.dropped[i];
+                    if (series.warnings[i] > 0) warnings += series.warnings[i];
+                    if (!isNaN(series.temperature[i])) {
+                        temperature += series.temperature[i];
+                        count++;
+                    }
+                }
+                if (interval > -Infinity) {
+                    const h = Math.min(interval / intervalTop, 1) * plotHeight;
+                    ctx.fillStyle = '#bdbdbd';
+                    ctx.fillRect(x, plotHeight - h, 1, h);
+                }
+                if (dropped > 0) {
+                    ctx.fillStyle = '#e53935';
+                    ctx.fillRect(x, 0, 1, plotHeight);
+                }
+                if (warnings > 0) {
+                    ctx.fillStyle = '#fb8c00';
+                    ctx.fillRect(x, plotHeight, 1, TIMING_STRIP);
+                }
+                if (count) temperatures.push([x, temperature / count]);
+            }
+
+            if (report.nominal_rate) {
+                const y = Math.round(plotHeight - Math.min(1000 / report.nominal_rate / intervalTop, 1) * plotHeight);
+                ctx.strokeStyle = '#4CAF50';
+                ctx.setLineDash([4, 3]);
+                ctx.beginPath();
+                ctx.moveTo(0, y + 0.5);
+                ctx.lineTo(width, y + 0.5);
+                ctx.stroke();
+                ctx.setLineDash([]);
+            }
+            if (report.temperature && temperatures.length) {
+                const low = report.temperature.min;
+                const span = Math.max(report.temperature.max - low, 1);
+                ctx.strokeStyle = '#1e88e5';
+                ctx.beginPath();
+                temperatures.forEach(([x, t], i) => {
+                    const y = 2 + (1 - (t - low) / span) * (plotHeight - 4);
+                    if (i) ctx.lineTo(x + 0.5, y);
+                    else ctx.moveTo(x + 0.5, y);
+                });
+                ctx.stroke();
+            }
+            return base;
+        }
+
+        function updateTiming() {
+            if (!timing) return;
+
+            const canvas = document.getElementById('timingCanvas');
+            const width = Math.round(canvas.clientWidth);
+            if (!timingView.base || timingView.base.width !== width) {
+                if (!width) return;
+                canvas.width = width;
+                canvas.height = TIMING_HEIGHT;
+                timingView.base = drawTimingBase(width, TIMING_HEIGHT);
+            }
+            const ctx = canvas.getContext('2d');
+            if (ctx && timingView.base) {
+                ctx.drawImage(timingView.base, 0, 0);
+                ctx.fillStyle = '#000';
+                ctx.fillRect(Math.floor((currentFrame + 0.5) * width / data.length), 0, 1, TIMING_HEIGHT);
+            }
+
+            const report = timing.report;
+            const series = timingView.series;
+            const ms = value => isNaN(value) ? 'N/A' : `${value.toFixed(1)} ms`;
+            const parts = [];
+            if (report.frame_rate) {
+                parts.push(`${report.frame_rate.toFixed(2)} frames/s` +
+                    (report.nominal_rate ? ` (nominal ${report.nominal_rate.toFixed(2)})` : ''));
+            }
+            if (report.interval_ms) {
+                parts.push(`interval p50 ${report.interval_ms.p50.toFixed(1)} / p99 ${report.interval_ms.p99.toFixed(1)} ms, ` +
+                    `jitter ${report.jitter_ms.toFixed(2)} ms`);
+            }
+            parts.push(`dropped ${report.dropped.frames} frame(s) in ${report.dropped.runs} run(s)`);
+            parts.push(`${report.warnings.bursts.length} warning burst(s)`);
+            if (report.temperature) {
+                const drift = report.temperature.drift;
+                parts.push(`temperature ${drift >= 0 ? '+' : ''}${drift.toFixed(1)} °C`);
+            }
+            let current = `frame ${currentFrame}: interval ${ms(series.interval[currentFrame])}, ` +
+                `latency ${ms(series.latency[currentFrame])}`;
+            if (series.dropped[currentFrame] > 0) {
+                current += `, ${series.dropped[currentFrame]} dropped before`;
+            }
+            parts.push(current);
+            document.getElementById('timingSummary').textContent = 'Timing: ' + parts.join(' | ');
+        }
+
+        // Grids with more zones than VIRTUAL_GRID_ZONES are virtualized: only the cells in view (plus
+        // VIRTUAL_BUFFER rows and columns) exist, absolutely positioned over a spacer of the full grid
+        // size, and cells scrolled out of view are recycled, so a frame costs the same at any resolution
+        const VIRTUAL_GRID_ZONES = 256;
+        const VIRTUAL_BUFFER = 2;
+        let dataView = null;
+        let histoView = null;
+
+        function createVirtualGrid(gridId, scrollerId, cellClass, gap, padding, cellWidth, cellHeight) {
+            const view = {
+                grid: document.getElementById(gridId),
+                scroller: document.getElementById(scrollerId),
+                spacer: null,
+                cellClass, gap, padding,
+                minWidth: cellWidth,
+                minHeight: cellHeight,
+                cellWidth,
+                cellHeight,
+                rows: 0,
+                cols: 0,
+                key: null,
+                cells: new Map(),       // zone index -> cell element in view
+                free: [],               // cells scrolled out of view, reused for the next ones
+                renderCell: null,       // (cell, row, col) => fills a cell for the current frame
+                scheduled: false
+            };
+            view.scroller.addEventListener('scroll', () => {
+                if (!view.rows || view.scheduled) return;
+                view.scheduled = true;
+                requestAnimationFrame(() => {
+                    view.scheduled = false;
+                    if (view.rows) renderVirtualGrid(view, false);
+                });
+            });
+            return view;
+        }
+
+        function initVirtualGrids() {
+            // gap, padding and minimum cell size as in the .grid/.cell and .histo-grid/.histo-cell styles
+            dataView = createVirtualGrid('dataGrid', 'gridContainer', 'cell', 2, 10, 94, 70);
+            histoView = createVirtualGrid('histoGrid', 'histoGrid', 'histo-cell', 5, 5, 132, 90);
+            window.addEventListener('resize', () => {
+                [dataView, histoView].forEach(view => {
+                    if (view.rows) renderVirtualGrid(view, true);
+                });
+            });
+        }
+
+        // Remove all cells and leave virtual mode
+        function clearGrid(view) {
+            view.grid.innerHTML = '';
+            if (!view.rows) return;
+            view.grid.classList.remove('virtual');
+            view.cells.clear();
+            view.free = [];
+            view.spacer = null;
+            view.rows = 0;
+            view.cols = 0;
+            view.key = null;
+        }
+
+        // Show the current frame (view.renderCell) on a virtual grid; key: display settings of the cells
+        function showVirtualGrid(view, rows, cols, key) {
+            if (view.rows !== rows || view.cols !== cols || view.key !== key) {
+                // New layout: the cell size is measured again from the content
+                clearGrid(view);
+                view.grid.classList.add('virtual');
+                view.grid.style.gridTemplateColumns = '';
+                view.spacer = document.createElement('div');
+                view.grid.appendChild(view.spacer);
+                view.rows = rows;
+                view.cols = cols;
+                view.key = key;
+                view.cellWidth = view.minWidth;
+                view.cellHeight = view.minHeight;
+            }
+            renderVirtualGrid(view, true);
+        }
+
+        // Build the cells in view from recycled ones; refresh: render the cells already in view again too
+        function renderVirtualGrid(view, refresh) {
+            const { gap, padding, rows, cols, scroller } = view;
+            // Columns share the visible width like the 1fr columns of the plain grid
+            const columnWidth = Math.max(view.cellWidth, (scroller.clientWidth - 2 * padding - (cols - 1) * gap) / cols);
+            const stepX = columnWidth + gap;
+            const stepY = view.cellHeight + gap;
+            view.spacer.style.width = `${cols * stepX - gap}px`;
+            view.spacer.style.height = `${rows * stepY - gap}px`;
+
+            const top = scroller.scrollTop - padding;
+            const left = scroller.scrollLeft - padding;
+            const firstRow = Math.max(0, Math.floor(top / stepY) - VIRTUAL_BUFFER);
+            const lastRow = Math.min(rows - 1, Math.floor((top + scroller.clientHeight) / stepY) + VIRTUAL_BUFFER);
+            const firstCol = Math.max(0, Math.floor(left / stepX) - VIRTUAL_BUFFER);
+            const lastCol = Math.min(cols - 1, Math.floor((left + scroller.clientWidth) / stepX) + VIRTUAL_BUFFER);
+
+            view.cells.forEach((cell, index) => {
+                const row = Math.floor(index / cols);
+                const col = index % cols;
+                if (row < firstRow || row > lastRow || col < firstCol || col > lastCol) {
+                    cell.style.display = 'none';
+                    view.free.push(cell);
+                    view.cells.delete(index);
+                }
+            });
+
+            for (let row = firstRow; row <= lastRow; row++) {
+                for (let col = firstCol; col <= lastCol; col++) {
+                    const index = row * cols + col;
+                    let cell = view.cells.get(index);
+                    if (cell && !refresh) continue;
+                    if (!cell) {
+                        cell = view.free.pop();
+                        if (!cell) {
+                            cell = document.createElement('div');
+                            cell.className = view.cellClass;
+                            view.grid.appendChild(cell);
+                        }
+                        cell.style.display = '';
+                        view.cells.set(index, cell);
+                    }
+                    cell.style.left = `${padding + col * stepX}px`;
+                    cell.style.top = `${padding + row * stepY}px`;
+                    cell.style.width = `${columnWidth}px`;
+                    cell.style.height = `${view.cellHeight}px`;
+                    view.renderCell(cell, row, col);
+                }
+            }
+
+            // Cells grow to the largest content seen (until the layout changes)
+            let width = view.cellWidth;
+            let height = view.cellHeight;
+            view.cells.forEach(cell => {
+                width = Math.max(width, cell.scrollWidth + cell.offsetWidth - cell.clientWidth);
+                height = Math.max(height, cell.scrollHeight + cell.offsetHeight - cell.clientHeight);
+            });
+            if (width > columnWidth || height > view.cellHeight) {
+                view.cellWidth = Math.max(view.cellWidth, width);
+                view.cellHeight = height;
+                renderVirtualGrid(view, true);
+            }
+        }
 
         // Update peaks options enabled state based on showPeaks checkbox
-        function updatePeaksOptionsEnabled() {{
+        function updatePeaksOptionsEnabled() {
             const showPeaks = document.getElementById('showPeaks').checked;
             const peaksOptions = ['showDistance', 'showSNR', 'showXYZ', 'showSignal', 'numPeaksSelect',
                                   'showDistance2', 'showSNR2', 'showXYZ2', 'showSignal2', 'numPeaksSelect2'];
 
-            peaksOptions.forEach(optId => {{
+            peaksOptions.forEach(optId => {
                 const element = document.getElementById(optId);
                 element.disabled = !showPeaks;
-            }});
-        }}
+            });
+        }
 
         // Initialize
+        attachHistograms();
+        initAnalysisLayers();
+        initComparison();
+        initPointCloud();
+        initSprites();
+        initTiming();
+        initVirtualGrids();
         initVersionInfo();
         initNumPeaksSelect();
         checkHistogramAvailability();
@@ -731,150 +1872,298 @@ def generate_html(json_file, output_file=None):
         updateDisplay();
 
         // Event listeners for top controls
-        document.getElementById('frameSlider').addEventListener('input', function(e) {{
-            currentFrame = parseInt(e.target.value);
-            updateDisplay();
-        }});
+        document.getElementById('frameSlider').addEventListener('input', function(e) {
+            scrubFrame(parseInt(e.target.value));
+        });
 
         // Checkbox event listeners (top)
-        document.getElementById('showNoise').addEventListener('change', function(e) {{
+        document.getElementById('showNoise').addEventListener('change', function(e) {
             displayOptions.showNoise = e.target.checked;
             syncControl('showNoise2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showPeaks').addEventListener('change', function(e) {{
+        document.getElementById('showPeaks').addEventListener('change', function(e) {
             displayOptions.showPeaks = e.target.checked;
             syncControl('showPeaks2', e.target.checked);
             updatePeaksOptionsEnabled();
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showXtalk').addEventListener('change', function(e) {{
+        document.getElementById('showXtalk').addEventListener('change', function(e) {
             displayOptions.showXtalk = e.target.checked;
             syncControl('showXtalk2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showDistance').addEventListener('change', function(e) {{
+        document.getElementById('showDistance').addEventListener('change', function(e) {
             displayOptions.showDistance = e.target.checked;
             syncControl('showDistance2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showSNR').addEventListener('change', function(e) {{
+        document.getElementById('showSNR').addEventListener('change', function(e) {
             displayOptions.showSNR = e.target.checked;
             syncControl('showSNR2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showXYZ').addEventListener('change', function(e) {{
+        document.getElementById('showXYZ').addEventListener('change', function(e) {
             displayOptions.showXYZ = e.target.checked;
             syncControl('showXYZ2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showSignal').addEventListener('change', function(e) {{
+        document.getElementById('showSignal').addEventListener('change', function(e) {
             displayOptions.showSignal = e.target.checked;
             syncControl('showSignal2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('numPeaksSelect').addEventListener('change', function(e) {{
+        document.getElementById('numPeaksSelect').addEventListener('change', function(e) {
             numPeaksToShow = parseInt(e.target.value);
             document.getElementById('numPeaksSelect2').value = e.target.value;
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showHistogram').addEventListener('change', function(e) {{
+        document.getElementById('showHistogram').addEventListener('change', function(e) {
             displayOptions.showHistogram = e.target.checked;
             syncControl('showHistogram2', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('histoTypeSelect').addEventListener('change', function(e) {{
+        document.getElementById('histoTypeSelect').addEventListener('change', function(e) {
             displayOptions.histoType = e.target.value;
             document.getElementById('histoTypeSelect2').value = e.target.value;
             updateHistogramDisplay();
-        }});
+        });
 
-        // Event listeners for bottom controls (synced with top)
-        document.getElementById('frameSlider2').addEventListener('input', function(e) {{
-            currentFrame = parseInt(e.target.value);
+        document.getElementById('analysisLayerSelect').addEventListener('change', function(e) {
+            displayOptions.analysisLayer = parseInt(e.target.value);
             updateDisplay();
-        }});
+        });
+
+        document.getElementById('showPointCloud').addEventListener('change', function() {
+            updatePointCloud();
+        });
+
+        document.getElementById('pointCloudColorSelect').addEventListener('change', function(e) {
+            pointCloudView.colorBy = e.target.value;
+            updatePointCloud();
+        });
+
+        // Event listeners for bottom controls (synced with top)
+        document.getElementById('frameSlider2').addEventListener('input', function(e) {
+            scrubFrame(parseInt(e.target.value));
+        });
 
         // Checkbox event listeners (bottom)
-        document.getElementById('showNoise2').addEventListener('change', function(e) {{
+        document.getElementById('showNoise2').addEventListener('change', function(e) {
             displayOptions.showNoise = e.target.checked;
             syncControl('showNoise', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showPeaks2').addEventListener('change', function(e) {{
+        document.getElementById('showPeaks2').addEventListener('change', function(e) {
             displayOptions.showPeaks = e.target.checked;
             syncControl('showPeaks', e.target.checked);
             updatePeaksOptionsEnabled();
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showXtalk2').addEventListener('change', function(e) {{
+        document.getElementById('showXtalk2').addEventListener('change', function(e) {
             displayOptions.showXtalk = e.target.checked;
             syncControl('showXtalk', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showDistance2').addEventListener('change', function(e) {{
+        document.getElementById('showDistance2').addEventListener('change', function(e) {
             displayOptions.showDistance = e.target.checked;
             syncControl('showDistance', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showSNR2').addEventListener('change', function(e) {{
+        document.getElementById('showSNR2').addEventListener('change', function(e) {
             displayOptions.showSNR = e.target.checked;
             syncControl('showSNR', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showXYZ2').addEventListener('change', function(e) {{
+        document.getElementById('showXYZ2').addEventListener('change', function(e) {
             displayOptions.showXYZ = e.target.checked;
             syncControl('showXYZ', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showSignal2').addEventListener('change', function(e) {{
+        document.getElementById('showSignal2').addEventListener('change', function(e) {
             displayOptions.showSignal = e.target.checked;
             syncControl('showSignal', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('numPeaksSelect2').addEventListener('change', function(e) {{
+        document.getElementById('numPeaksSelect2').addEventListener('change', function(e) {
             numPeaksToShow = parseInt(e.target.value);
             document.getElementById('numPeaksSelect').value = e.target.value;
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('showHistogram2').addEventListener('change', function(e) {{
+        document.getElementById('showHistogram2').addEventListener('change', function(e) {
             displayOptions.showHistogram = e.target.checked;
             syncControl('showHistogram', e.target.checked);
             updateDisplay();
-        }});
+        });
 
-        document.getElementById('histoTypeSelect2').addEventListener('change', function(e) {{
+        document.getElementById('histoTypeSelect2').addEventListener('change', function(e) {
             displayOptions.histoType = e.target.value;
             document.getElementById('histoTypeSelect').value = e.target.value;
             updateHistogramDisplay();
-        }});
+        });
 
         // Helper function to sync controls
-        function syncControl(targetId, checked) {{
+        function syncControl(targetId, checked) {
             const target = document.getElementById(targetId);
-            if (target) {{
+            if (target) {
                 target.checked = checked;
-            }}
-        }}
+            }
+        }
+
+        // Fill a zone cell of the data grid (a new or a recycled element)
+        function renderDataCell(cell, frame, row, col, rows, cols, analysis) {
+            cell.innerHTML = '';
+            cell.style.background = '';
 
-        function updateDisplay() {{
+            const header = document.createElement('div');
+            header.className = 'cell-header';
+            header.textContent = `(${col},${row})`;
+            cell.appendChild(header);
+
+            const dataDiv = document.createElement('div');
+            dataDiv.className = 'cell-data';
+
+            if (frame.results[row] && frame.results[row][col]) {
+                const cellData = frame.results[row][col];
+                let hasData = false;
+
+                // Display the selected analysis layer as heatmap
+                if (analysis && rows === analysisLayers.rows && cols === analysisLayers.cols) {
+                    const value = analysis.values[row * cols + col];
+                    const valueDiv = document.createElement('div');
+                    valueDiv.className = 'peak';
+                    valueDiv.style.fontWeight = 'bold';
+                    if (isNaN(value)) {
+                        valueDiv.textContent = `${analysis.layer.name}: -`;
+                    } else {
+                        cell.style.background = heatColor(value, analysis.min, analysis.max);
+                        valueDiv.textContent = `${analysis.layer.name}: ${value.toFixed(analysis.layer.digits)}`;
+                    }
+                    dataDiv.appendChild(valueDiv);
+                    hasData = true;
+                }
+
+                // Display Noise
+                if (displayOptions.showNoise && 'noise' in cellData) {
+                    const noiseDiv = document.createElement('div');
+                    noiseDiv.className = 'peak';
+                    noiseDiv.style.color = '#666';
+                    noiseDiv.style.background = '#e0e0e0';
+                    noiseDiv.textContent = `Noise: ${cellData.noise}`;
+                    dataDiv.appendChild(noiseDiv);
+                    hasData = true;
+                }
+
+                // Display Peaks
+                if (displayOptions.showPeaks && cellData.peaks && cellData.peaks.length > 0) {
+                    // Use numPeaksToShow from dropdown to determine how many peaks to show
+                    cellData.peaks.slice(0, numPeaksToShow).forEach((peak, peakIndex) => {
+                        const peakDiv = document.createElement('div');
+                        peakDiv.className = 'peak';
+
+                        const distance = peak.distance;
+                        const snr = peak.snr;
+                        const signal = peak.signal;
+                        let x = peak.x;
+                        let y = peak.y;
+                        let z = peak.z;
+                        const directions = zoneDirections && zoneDirections[`${rows}x${cols}`];
+                        if (x === undefined && directions) {
+                            // The log has no x/y/z: distance times the zone direction (geometry.py)
+                            const index = (row * cols + col) * 3;
+                            x = distance * directions[index];
+                            y = distance * directions[index + 1];
+                            z = distance * directions[index + 2];
+                        }
+
+                        // Determine color based on SNR
+                        let peakClass = 'peak-none';
+                        if (snr > 20) peakClass = 'peak-high';
+                        else if (snr > 10) peakClass = 'peak-medium';
+                        else if (snr > 0) peakClass = 'peak-low';
+
+                        peakDiv.classList.add(peakClass);
+
+                        const peakNum = peakIndex + 1;
+
+                        // Build text with each field on a separate line, right-aligned to 7 chars
+                        let peakLines = [];
+
+                        if (displayOptions.showDistance) {
+                            const distanceText = `${distance}`;
+                            const padding = ' '.repeat(Math.max(0, 7 - distanceText.length));
+                            peakLines.push(`d${peakNum}:${padding}${distanceText}`);
+                        }
+                        if (displayOptions.showSNR) {
+                            const snrText = `${snr}`;
+                            const padding = ' '.repeat(Math.max(0, 7 - snrText.length));
+                            peakLines.push(`c${peakNum}:${padding}${snrText}`);
+                        }
+                        if (displayOptions.showSignal) {
+                            const signalText = `${signal}`;
+                            const padding = ' '.repeat(Math.max(0, 7 - signalText.length));
+                            peakLines.push(`s${peakNum}:${padding}${signalText}`);
+                        }
+                        if (displayOptions.showXYZ) {
+                            const xNum = parseFloat(x);
+                            const yNum = parseFloat(y);
+                            const zNum = parseFloat(z);
+                            const xText = xNum.toFixed(1);
+                            const yText = yNum.toFixed(1);
+                            const zText = zNum.toFixed(1);
+                            const xPadding = ' '.repeat(Math.max(0, 7 - xText.length));
+                            const yPadding = ' '.repeat(Math.max(0, 7 - yText.length));
+                            const zPadding = ' '.repeat(Math.max(0, 7 - zText.length));
+                            peakLines.push(`x${peakNum}:${xPadding}${xText}`);
+                            peakLines.push(`y${peakNum}:${yPadding}${yText}`);
+                            peakLines.push(`z${peakNum}:${zPadding}${zText}`);
+                        }
+
+                        peakDiv.innerHTML = peakLines.join('<br>');
+                        dataDiv.appendChild(peakDiv);
+                        hasData = true;
+                    });
+                }
+
+                // Display XTalk
+                if (displayOptions.showXtalk && 'xtalk' in cellData) {
+                    const xtalkDiv = document.createElement('div');
+                    xtalkDiv.className = 'peak';
+                    xtalkDiv.style.color = '#6b3fa0';
+                    xtalkDiv.style.background = '#e1bee7';
+                    xtalkDiv.textContent = `XTalk: ${cellData.xtalk}`;
+                    dataDiv.appendChild(xtalkDiv);
+                    hasData = true;
+                }
+
+                if (!hasData) {
+                    dataDiv.innerHTML = '<div class="no-data">No data</div>';
+                }
+            } else {
+                dataDiv.innerHTML = '<div class="no-data">No data</div>';
+            }
+
+            cell.appendChild(dataDiv);
+        }
+
+        function updateDisplay() {
             const frame = data[currentFrame];
             const grid = document.getElementById('dataGrid');
             const frameSlider = document.getElementById('frameSlider');
@@ -889,19 +2178,22 @@ def generate_html(json_file, output_file=None):
             // Update sliders and info
             frameSlider.value = currentFrame;
             frameSlider2.value = currentFrame;
-            frameInfo.textContent = `${{currentFrame}} / ${{data.length - 1}}`;
-            frameInfo2.textContent = `${{currentFrame}} / ${{data.length - 1}}`;
+            frameInfo.textContent = `${currentFrame} / ${data.length - 1}`;
+            frameInfo2.textContent = `${currentFrame} / ${data.length - 1}`;
+            updatePointCloud();
+            updateFilmstrip();
+            updateTiming();
 
             // Get resolution from current frame
             let resolution = 'N/A';
-            if (frame.results && frame.results.length > 0) {{
+            if (frame.results && frame.results.length > 0) {
                 const rows = frame.results.length;
                 const cols = frame.results[0] ? frame.results[0].length : 0;
-                resolution = `${{cols}}x${{rows}}`;
-            }}
+                resolution = `${cols}x${rows}`;
+            }
 
             // Update frame details with resolution
-            if (frame.info) {{
+            if (frame.info) {
                 const iterations = config.iterations || 'N/A';
                 const period = config.period || 'N/A';
                 const confThresh = config.confidence_threshold || 'N/A';
@@ -909,167 +2201,82 @@ def generate_html(json_file, output_file=None):
                 const haIterations = config.high_accuracy_iterations || 'N/A';
                 const warningText = (frame.info.warnings > 0) ? '⚠️ Frame has warnings | ' : '';
 
-                frameDetails.innerHTML = `${{warningText}}Frame: ${{frame.info.frame_number || 'N/A'}} | ` +
-                    `Res: ${{resolution}} | ` +
-                    `Iterations: ${{iterations}}k | ` +
-                    `HA_Iterations: ${{haIterations}}k | ` +
-                    `Period: ${{period}}ms | ` +
-                    `Conf Thresh: ${{confThresh}} | ` +
-                    `Temp: ${{frame.info.temperature}}°C | ` +
-                    `ReadTime: ${{readTime}} | ` +
+                frameDetails.innerHTML = `${warningText}Frame: ${frame.info.frame_number || 'N/A'} | ` +
+                    `Res: ${resolution} | ` +
+                    `Iterations: ${iterations}k | ` +
+                    `HA_Iterations: ${haIterations}k | ` +
+                    `Period: ${period}ms | ` +
+                    `Conf Thresh: ${confThresh} | ` +
+                    `Temp: ${frame.info.temperature}°C | ` +
+                    `ReadTime: ${readTime} | ` +
                     `<span class="legend-item"><span class="legend-color peak-high">c>20</span></span>` +
                     `<span class="legend-item"><span class="legend-color peak-medium">20≥c>10</span></span>` +
                     `<span class="legend-item"><span class="legend-color peak-low">10≥c>0</span></span>`;
 
                 // Add warning class if frame has warnings
-                if (frame.info.warnings > 0) {{
+                if (frame.info.warnings > 0) {
                     frameDetails.classList.add('warning');
-                }} else {{
+                } else {
                     frameDetails.classList.remove('warning');
-                }}
-            }} else {{
-                frameDetails.textContent = `Resolution: ${{resolution}} | Frame info not available`;
-            }}
-
-            // Clear grid
-            grid.innerHTML = '';
-
-            if (!frame.results) {{
+                }
+            } else {
+                frameDetails.textContent = `Resolution: ${resolution} | Frame info not available`;
+            }
+
+            if (comparison) {
+                const frameB = comparison.frameNumbersB[currentFrame];
+                frameDetails.innerHTML += ` | B frame: ${frameB >= 0 ? frameB : 'none'}`;
+            }
+
+            const analysis = currentAnalysisValues();
+            if (analysis) {
+                const layer = analysis.layer;
+                const first = analysis.index * layer.step;
+                const frames = layer.window > 1 ? `frames ${first}-${first + layer.window - 1}` : `frame ${first}`;
+                frameDetails.innerHTML += ` | ${layer.name} (${frames}): ` +
+                    (analysis.min <= analysis.max ?
+                        `${analysis.min.toFixed(layer.digits)} … ${analysis.max.toFixed(layer.digits)}` : 'no data');
+            }
+
+            if (!frame.results) {
+                clearGrid(dataView);
                 grid.innerHTML = '<div style="padding: 20px; color: #999;">No results data available</div>';
                 return;
-            }}
+            }
 
             // Determine resolution from current frame
             let rows = frame.results.length;
             let cols = frame.results[0] ? frame.results[0].length : 0;
 
-            // Set grid layout
-            grid.style.gridTemplateColumns = `repeat(${{cols}}, 1fr)`;
-
-            // Create cells
-            for (let row = 0; row < rows; row++) {{
-                for (let col = 0; col < cols; col++) {{
-                    const cell = document.createElement('div');
-                    cell.className = 'cell';
-
-                    const header = document.createElement('div');
-                    header.className = 'cell-header';
-                    header.textContent = `(${{col}},${{row}})`;
-                    cell.appendChild(header);
-
-                    const dataDiv = document.createElement('div');
-                    dataDiv.className = 'cell-data';
-
-                    if (frame.results[row] && frame.results[row][col]) {{
-                        const cellData = frame.results[row][col];
-                        let hasData = false;
-
-                        // Display Noise
-                        if (displayOptions.showNoise && 'noise' in cellData) {{
-                            const noiseDiv = document.createElement('div');
-                            noiseDiv.className = 'peak';
-                            noiseDiv.style.color = '#666';
-                            noiseDiv.style.background = '#e0e0e0';
-                            noiseDiv.textContent = `Noise: ${{cellData.noise}}`;
-                            dataDiv.appendChild(noiseDiv);
-                            hasData = true;
-                        }}
-
-                        // Display Peaks
-                        if (displayOptions.showPeaks && cellData.peaks && cellData.peaks.length > 0) {{
-                            // Use numPeaksToShow from dropdown to determine how many peaks to show
-                            cellData.peaks.slice(0, numPeaksToShow).forEach((peak, peakIndex) => {{
-                                const peakDiv = document.createElement('div');
-                                peakDiv.className = 'peak';
-
-                                const distance = peak.distance;
-                                const snr = peak.snr;
-                                const signal = peak.signal;
-                                const x = peak.x;
-                                const y = peak.y;
-                                const z = peak.z;
-
-                                // Determine color based on SNR
-                                let peakClass = 'peak-none';
-                                if (snr > 20) peakClass = 'peak-high';
-                                else if (snr > 10) peakClass = 'peak-medium';
-                                else if (snr > 0) peakClass = 'peak-low';
-
-                                peakDiv.classList.add(peakClass);
-
-                                const peakNum = peakIndex + 1;
-
-                                // Build text with each field on a separate line, right-aligned to 7 chars
-                                let peakLines = [];
-
-                                if (displayOptions.showDistance) {{
-                                    const distanceText = `${{distance}}`;
-                                    const padding = ' '.repeat(Math.max(0, 7 - distanceText.length));
-                                    peakLines.push(`d${{peakNum}}:${{padding}}${{distanceText}}`);
-                                }}
-                                if (displayOptions.showSNR) {{
-                                    const snrText = `${{snr}}`;
-                                    const padding = ' '.repeat(Math.max(0, 7 - snrText.length));
-                                    peakLines.push(`c${{peakNum}}:${{padding}}${{snrText}}`);
-                                }}
-                                if (displayOptions.showSignal) {{
-                                    const signalText = `${{signal}}`;
-                                    const padding = ' '.repeat(Math.max(0, 7 - signalText.length));
-                                    peakLines.push(`s${{peakNum}}:${{padding}}${{signalText}}`);
-                                }}
-                                if (displayOptions.showXYZ) {{
-                                    const xNum = parseFloat(x);
-                                    const yNum = parseFloat(y);
-                                    const zNum = parseFloat(z);
-                                    const xText = xNum.toFixed(1);
-                                    const yText = yNum.toFixed(1);
-                                    const zText = zNum.toFixed(1);
-                                    const xPadding = ' '.repeat(Math.max(0, 7 - xText.length));
-                                    const yPadding = ' '.repeat(Math.max(0, 7 - yText.length));
-                                    const zPadding = ' '.repeat(Math.max(0, 7 - zText.length));
-                                    peakLines.push(`x${{peakNum}}:${{xPadding}}${{xText}}`);
-                                    peakLines.push(`y${{peakNum}}:${{yPadding}}${{yText}}`);
-                                    peakLines.push(`z${{peakNum}}:${{zPadding}}${{zText}}`);
-                                }}
-
-                                peakDiv.innerHTML = peakLines.join('<br>');
-                                dataDiv.appendChild(peakDiv);
-                                hasData = true;
-                            }});
-                        }}
-
-                        // Display XTalk
-                        if (displayOptions.showXtalk && 'xtalk' in cellData) {{
-                            const xtalkDiv = document.createElement('div');
-                            xtalkDiv.className = 'peak';
-                            xtalkDiv.style.color = '#6b3fa0';
-                            xtalkDiv.style.background = '#e1bee7';
-                            xtalkDiv.textContent = `XTalk: ${{cellData.xtalk}}`;
-                            dataDiv.appendChild(xtalkDiv);
-                            hasData = true;
-                        }}
-
-                        if (!hasData) {{
-                            dataDiv.innerHTML = '<div class="no-data">No data</div>';
-                        }}
-                    }} else {{
-                        dataDiv.innerHTML = '<div class="no-data">No data</div>';
-                    }}
-
-                    cell.appendChild(dataDiv);
-                    grid.appendChild(cell);
-                }}
-            }}
+            if (rows * cols > VIRTUAL_GRID_ZONES) {
+                dataView.renderCell = (cell, row, col) => renderDataCell(cell, frame, row, col, rows, cols, analysis);
+                showVirtualGrid(dataView, rows, cols, JSON.stringify([displayOptions, numPeaksToShow]));
+            } else {
+                clearGrid(dataView);
+
+                // Set grid layout
+                grid.style.gridTemplateColumns = `repeat(${cols}, 1fr)`;
+
+                // Create cells
+                for (let row = 0; row < rows; row++) {
+                    for (let col = 0; col < cols; col++) {
+                        const cell = document.createElement('div');
+                        cell.className = 'cell';
+                        renderDataCell(cell, frame, row, col, rows, cols, analysis);
+                        grid.appendChild(cell);
+                    }
+                }
+            }
 
             // Update histogram display
             updateHistogramDisplay();
-        }}
+        }
 
         // Create histogram chart using simple SVG
-        function createHistogramChart(bins, width, height, color = '#4CAF50', showTicks = false) {{
-            if (!bins || bins.length === 0) {{
-                return `<div style="width:${{width}}px;height:${{height}}px;display:flex;align-items:center;justify-content:center;color:#999;">No data</div>`;
-            }}
+        function createHistogramChart(bins, width, height, color = '#4CAF50', showTicks = false) {
+            if (!bins || bins.length === 0) {
+                return `<div style="width:${width}px;height:${height}px;display:flex;align-items:center;justify-content:center;color:#999;">No data</div>`;
+            }
 
             const maxValue = Math.max(...bins);
             // Use smaller padding for thumbnails, larger for detailed charts
@@ -1080,158 +2287,171 @@ def generate_html(json_file, output_file=None):
             const barGap = Math.max(0.5, barWidth * 0.1);
             const actualBarWidth = Math.max(1, barWidth - barGap);
 
-            let svg = `<svg width="${{width}}" height="${{height}}" xmlns="http://www.w3.org/2000/svg">`;
+            let svg = `<svg width="${width}" height="${height}" xmlns="http://www.w3.org/2000/svg">`;
 
             // Y-axis
-            svg += `<line x1="${{padding}}" y1="${{padding}}" x2="${{padding}}" y2="${{height - padding}}" stroke="#333" stroke-width="1"/>`;
+            svg += `<line x1="${padding}" y1="${padding}" x2="${padding}" y2="${height - padding}" stroke="#333" stroke-width="1"/>`;
 
             // X-axis
-            svg += `<line x1="${{padding}}" y1="${{height - padding}}" x2="${{width - padding}}" y2="${{height - padding}}" stroke="#333" stroke-width="1"/>`;
+            svg += `<line x1="${padding}" y1="${height - padding}" x2="${width - padding}" y2="${height - padding}" stroke="#333" stroke-width="1"/>`;
 
             // Bars
-            bins.forEach((value, index) => {{
+            bins.forEach((value, index) => {
                 const barHeight = maxValue > 0 ? (value / maxValue) * chartHeight : 0;
                 const x = padding + index * barWidth;
                 const y = height - padding - barHeight;
 
-                if (barHeight > 0) {{
-                    svg += `<rect x="${{x}}" y="${{y}}" width="${{actualBarWidth}}" height="${{barHeight}}" fill="${{color}}" stroke="#333" stroke-width="0.5"/>`;
-                }}
-            }});
+                if (barHeight > 0) {
+                    svg += `<rect x="${x}" y="${y}" width="${actualBarWidth}" height="${barHeight}" fill="${color}" stroke="#333" stroke-width="0.5"/>`;
+                }
+            });
 
             // X-axis ticks and labels
-            if (showTicks) {{
+            if (showTicks) {
                 const xTickCount = Math.min(10, bins.length);
                 const xTickStep = Math.ceil(bins.length / xTickCount);
-                for (let i = 0; i <= bins.length; i += xTickStep) {{
+                for (let i = 0; i <= bins.length; i += xTickStep) {
                     const x = padding + i * barWidth;
-                    svg += `<line x1="${{x}}" y1="${{height - padding}}" x2="${{x}}" y2="${{height - padding + 3}}" stroke="#333" stroke-width="1"/>`;
-                    svg += `<text x="${{x}}" y="${{height - padding + 15}}" text-anchor="middle" font-size="10" fill="#666">${{i}}</text>`;
-                }}
-            }}
+                    svg += `<line x1="${x}" y1="${height - padding}" x2="${x}" y2="${height - padding + 3}" stroke="#333" stroke-width="1"/>`;
+                    svg += `<text x="${x}" y="${height - padding + 15}" text-anchor="middle" font-size="10" fill="#666">${i}</text>`;
+                }
+            }
 
             // Y-axis ticks and labels
-            if (showTicks) {{
+            if (showTicks) {
                 const yTickCount = 5;
-                for (let i = 0; i <= yTickCount; i++) {{
+                for (let i = 0; i <= yTickCount; i++) {
                     const value = Math.round((maxValue / yTickCount) * i);
                     const y = height - padding - (value / maxValue) * chartHeight;
-                    svg += `<line x1="${{padding - 3}}" y1="${{y}}" x2="${{padding}}" y2="${{y}}" stroke="#333" stroke-width="1"/>`;
-                    svg += `<text x="${{padding - 5}}" y="${{y + 3}}" text-anchor="end" font-size="10" fill="#666">${{value}}</text>`;
-                }}
-            }}
+                    svg += `<line x1="${padding - 3}" y1="${y}" x2="${padding}" y2="${y}" stroke="#333" stroke-width="1"/>`;
+                    svg += `<text x="${padding - 5}" y="${y + 3}" text-anchor="end" font-size="10" fill="#666">${value}</text>`;
+                }
+            }
 
             // Axis labels
-            svg += `<text x="${{width / 2}}" y="${{height - 5}}" text-anchor="middle" font-size="10" fill="#666">bin</text>`;
-            svg += `<text x="${{5}}" y="${{height / 2}}" text-anchor="middle" font-size="10" fill="#666" transform="rotate(-90, ${{5}}, ${{height / 2}})">count</text>`;
+            svg += `<text x="${width / 2}" y="${height - 5}" text-anchor="middle" font-size="10" fill="#666">bin</text>`;
+            svg += `<text x="${5}" y="${height / 2}" text-anchor="middle" font-size="10" fill="#666" transform="rotate(-90, ${5}, ${height / 2})">count</text>`;
 
             svg += `</svg>`;
             return svg;
-        }}
+        }
+
+        // Fill a zone cell of the histogram grid (a new or a recycled element)
+        function renderHistoCell(cell, frame, row, col, histoType) {
+            cell.innerHTML = '';
+            cell.onclick = null;
+
+            const header = document.createElement('div');
+            header.className = 'histo-cell-header';
+            header.textContent = `(${col},${row})`;
+            cell.appendChild(header);
+
+            const chartContainer = document.createElement('div');
+            chartContainer.className = 'histo-chart';
+
+            let binData = [];
+            let color = '#999';
+
+            if (histoType === 'mp') {
+                // Get histogram from mp_histo[row][col]
+                if (frame.mp_histo && frame.mp_histo[row] && frame.mp_histo[row][col]) {
+                    const histoData = frame.mp_histo[row][col];
+                    if (histoData && histoData.bin && isBinArray(histoData.bin)) {
+                        binData = histoData.bin;
+                    }
+                    color = '#4CAF50';
+                }
+            } else if (histoType === 'ref') {
+                // Get histogram from ref_histo[row] (one per row, not per column)
+                if (frame.ref_histo && frame.ref_histo[row]) {
+                    const histoData = frame.ref_histo[row];
+                    if (histoData && histoData.bin && isBinArray(histoData.bin)) {
+                        binData = histoData.bin;
+                    }
+                    color = '#2196F3';
+                }
+            }
+
+            if (binData.length > 0) {
+                chartContainer.innerHTML = createHistogramChart(binData, 120, 60, color);
+                // Add click event to open modal
+                cell.onclick = () => openModal(histoType.toUpperCase(), row, col, binData, color);
+            } else {
+                chartContainer.innerHTML = '<div style="width:120px;height:60px;display:flex;align-items:center;justify-content:center;color:#999;font-size:9px;">No data</div>';
+            }
+
+            cell.appendChild(chartContainer);
+        }
 
         // Update histogram display
-        function updateHistogramDisplay() {{
+        function updateHistogramDisplay() {
             const frame = data[currentFrame];
             const histoContainer = document.getElementById('histoContainer');
             const histoGrid = document.getElementById('histoGrid');
 
-            if (!displayOptions.showHistogram || !hasHistogram) {{
+            if (!displayOptions.showHistogram || !hasHistogram) {
                 histoContainer.style.display = 'none';
                 return;
-            }}
+            }
 
             histoContainer.style.display = 'block';
-            histoGrid.innerHTML = '';
 
             // Get resolution from results
             let rows = 0;
             let cols = 0;
-            if (frame.results && frame.results.length > 0) {{
+            if (frame.results && frame.results.length > 0) {
                 rows = frame.results.length;
                 cols = frame.results[0] ? frame.results[0].length : 0;
-            }}
+            }
 
             const histoType = displayOptions.histoType;
 
-            // Set grid layout to match resolution
-            histoGrid.style.gridTemplateColumns = `repeat(${{cols}}, 1fr)`;
-
-            // Create cells for each position (row, col)
-            for (let row = 0; row < rows; row++) {{
-                for (let col = 0; col < cols; col++) {{
-                    const cell = document.createElement('div');
-                    cell.className = 'histo-cell';
-
-                    const header = document.createElement('div');
-                    header.className = 'histo-cell-header';
-                    header.textContent = `(${{col}},${{row}})`;
-                    cell.appendChild(header);
-
-                    const chartContainer = document.createElement('div');
-                    chartContainer.className = 'histo-chart';
-
-                    let binData = [];
-                    let color = '#999';
-
-                    if (histoType === 'mp') {{
-                        // Get histogram from mp_histo[row][col]
-                        if (frame.mp_histo && frame.mp_histo[row] && frame.mp_histo[row][col]) {{
-                            const histoData = frame.mp_histo[row][col];
-                            if (histoData && histoData.bin && Array.isArray(histoData.bin)) {{
-                                binData = histoData.bin;
-                            }}
-                            color = '#4CAF50';
-                        }}
-                    }} else if (histoType === 'ref') {{
-                        // Get histogram from ref_histo[row] (one per row, not per column)
-                        if (frame.ref_histo && frame.ref_histo[row]) {{
-                            const histoData = frame.ref_histo[row];
-                            if (histoData && histoData.bin && Array.isArray(histoData.bin)) {{
-                                binData = histoData.bin;
-                            }}
-                            color = '#2196F3';
-                        }}
-                    }}
-
-                    if (binData.length > 0) {{
-                        chartContainer.innerHTML = createHistogramChart(binData, 120, 60, color);
-                        // Add click event to open modal
-                        cell.onclick = () => openModal(histoType.toUpperCase(), row, col, binData, color);
-                    }} else {{
-                        chartContainer.innerHTML = '<div style="width:120px;height:60px;display:flex;align-items:center;justify-content:center;color:#999;font-size:9px;">No data</div>';
-                    }}
-
-                    cell.appendChild(chartContainer);
-                    histoGrid.appendChild(cell);
-                }}
-            }}
-        }}
+            if (rows * cols > VIRTUAL_GRID_ZONES) {
+                histoView.renderCell = (cell, row, col) => renderHistoCell(cell, frame, row, col, histoType);
+                showVirtualGrid(histoView, rows, cols, histoType);
+            } else {
+                clearGrid(histoView);
+
+                // Set grid layout to match resolution
+                histoGrid.style.gridTemplateColumns = `repeat(${cols}, 1fr)`;
+
+                // Create cells for each position (row, col)
+                for (let row = 0; row < rows; row++) {
+                    for (let col = 0; col < cols; col++) {
+                        const cell = document.createElement('div');
+                        cell.className = 'histo-cell';
+                        renderHistoCell(cell, frame, row, col, histoType);
+                        histoGrid.appendChild(cell);
+                    }
+                }
+            }
+        }
 
         // Open modal with enlarged histogram
-        function openModal(type, row, col, bins, color) {{
+        function openModal(type, row, col, bins, color) {
             const modal = document.getElementById('histoModal');
             const modalTitle = document.getElementById('modalTitle');
             const modalChart = document.getElementById('modalChart');
 
             const frame = data[currentFrame];
 
-            modalTitle.textContent = `${{type}} Histogram (${{col}},${{row}})`;
+            modalTitle.textContent = `${type} Histogram (${col},${row})`;
 
             // Create chart with ticks
             modalChart.innerHTML = createHistogramChart(bins, 800, 600, color, true);
 
             // Add annotation for highest peak (bin and count)
-            if (bins && bins.length > 0) {{
+            if (bins && bins.length > 0) {
                 let maxCount = 0;
                 let maxBinIndex = 0;
 
                 // Find the highest peak
-                bins.forEach((value, index) => {{
-                    if (value > maxCount) {{
+                bins.forEach((value, index) => {
+                    if (value > maxCount) {
                         maxCount = value;
                         maxBinIndex = index;
-                    }}
-                }});
+                    }
+                });
 
                 // Calculate position for annotation
                 const width = 800;
@@ -1247,8 +2467,8 @@ def generate_html(json_file, output_file=None):
                 // Add annotation on top of the highest peak
                 const annotation = `<div style="
                     position: absolute;
-                    left: ${{x}}px;
-                    top: ${{y - 35}}px;
+                    left: ${x}px;
+                    top: ${y - 35}px;
                     transform: translateX(-50%);
                     background-color: #ffeb3b;
                     color: #333;
@@ -1259,103 +2479,152 @@ def generate_html(json_file, output_file=None):
                     box-shadow: 0 2px 4px rgba(0,0,0,0.2);
                     white-space: nowrap;
                     z-index: 10;
-                ">bin: ${{maxBinIndex}}, count: ${{maxCount}}</div>`;
+                ">bin: ${maxBinIndex}, count: ${maxCount}</div>`;
 
                 modalChart.innerHTML += annotation;
-            }}
+            }
 
             // Add distance and SNR information
             let peakInfo = '';
-            if (frame.results && frame.results[row] && frame.results[row][col]) {{
+            if (frame.results && frame.results[row] && frame.results[row][col]) {
                 const cellData = frame.results[row][col];
-                if (cellData.peaks && cellData.peaks.length > 0) {{
+                if (cellData.peaks && cellData.peaks.length > 0) {
                     peakInfo = '<div style="margin-top: 20px; padding: 15px; background-color: #f5f5f5; border-radius: 5px; font-size: 12px;">';
                     peakInfo += '<strong>Peak Information:</strong><br><br>';
 
-                    cellData.peaks.forEach((peak, idx) => {{
+                    cellData.peaks.forEach((peak, idx) => {
                         const distance = peak.distance;
                         const snr = peak.snr;
 
-                        const distanceText = `${{distance}}`;
+                        const distanceText = `${distance}`;
 
-                        peakInfo += `<span style="color: ${{snr > 20 ? '#006400' : snr > 10 ? '#8B4500' : '#8B0000'}};">`;
-                        peakInfo += `<strong>Peak ${{idx + 1}}:</strong> Distance = ${{distanceText}}, SNR = ${{snr}}</span><br>`;
-                    }});
+                        peakInfo += `<span style="color: ${snr > 20 ? '#006400' : snr > 10 ? '#8B4500' : '#8B0000'};">`;
+                        peakInfo += `<strong>Peak ${idx + 1}:</strong> Distance = ${distanceText}, SNR = ${snr}</span><br>`;
+                    });
 
                     peakInfo += '</div>';
-                }}
-            }}
+                }
+            }
 
-            if (peakInfo) {{
+            if (peakInfo) {
                 modalChart.innerHTML += peakInfo;
-            }}
+            }
 
             modal.classList.add('show');
-        }}
+        }
 
         // Close modal
-        function closeModal() {{
+        function closeModal() {
             const modal = document.getElementById('histoModal');
             modal.classList.remove('show');
-        }}
+        }
 
         // Close modal when clicking outside
-        window.onclick = function(event) {{
+        window.onclick = function(event) {
             const modal = document.getElementById('histoModal');
-            if (event.target === modal) {{
+            if (event.target === modal) {
                 closeModal();
-            }}
-        }}
+            }
+        }
 
-        function prevFrame() {{
-            if (currentFrame > 0) {{
+        function prevFrame() {
+            if (currentFrame > 0) {
                 currentFrame--;
                 updateDisplay();
-            }}
-        }}
+            }
+        }
 
-        function nextFrame() {{
-            if (currentFrame < data.length - 1) {{
+        function nextFrame() {
+            if (currentFrame < data.length - 1) {
                 currentFrame++;
                 updateDisplay();
-            }}
-        }}
+            }
+        }
 
         // Keyboard navigation
-        document.addEventListener('keydown', function(e) {{
+        document.addEventListener('keydown', function(e) {
             if (e.key === 'ArrowLeft') prevFrame();
             if (e.key === 'ArrowRight') nextFrame();
-            if (e.key === 'Home') {{
+            if (e.key === 'Home') {
                 currentFrame = 0;
                 updateDisplay();
-            }}
-            if (e.key === 'End') {{
+            }
+            if (e.key === 'End') {
                 currentFrame = data.length - 1;
                 updateDisplay();
-            }}
-        }});
-    </script>
-</body>
-</html>
+            }
+        });
 """
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-
-    print(f"HTML viewer generated: {output_file}")
-    print(f"Total frames: {len(result_set)}")
-    print("Open the HTML file in a web browser to view the data.")
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generate HTML visualization from TMF8829 JSON log')
     parser.add_argument('-i', '--input', required=True, help='Path to JSON file (or .json.gz) or directory containing JSON files')
     parser.add_argument('-o', '--output', help='Output HTML file path or directory (optional)')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress the log in a background thread overlapping with parsing')
+    parser.add_argument('--histo-codec', action='store_true',
+                        help='Embed histograms delta/varint encoded for a smaller HTML file (requires numpy)')
+    parser.add_argument('--zone-stats', type=int, nargs='?', const=0, metavar='WINDOW',
+                        help='Embed per-zone mean/std/median/valid rate heatmaps over all frames '
+                             'or windows of WINDOW frames (requires numpy)')
+    parser.add_argument('--compare', metavar='LOG_B',
+                        help='Compare the input (A) with a second log (B): difference heatmaps and summary '
+                             '(requires numpy)')
+    parser.add_argument('--align', choices=('index', 'frame_number', 'time'), default='index',
+                        help='Frame alignment of --compare (default: index)')
+    parser.add_argument('--histo-analysis', action='store_true',
+                        help='Embed histogram background/peak/width heatmaps and the firmware distance '
+                             'cross-check (requires numpy)')
+    parser.add_argument('--point-cloud', action='store_true',
+                        help='Embed float32 x/y/z buffers of all peaks for a WebGL 3D point cloud view '
+                             '(requires numpy)')
+    parser.add_argument('--sprites', nargs='?', const='distance', choices=('distance', 'snr'), metavar='FIELD',
+                        help='Embed a distance (default) or snr heatmap thumbnail of every frame for the slider '
+                             'preview and filmstrip (requires numpy)')
+    parser.add_argument('--timing', action='store_true',
+                        help='Embed the frame rate, interval, read latency, dropped frames, temperature and '
+                             'warnings report with a per-frame timeline (see timing.py)')
+    parser.add_argument('--salvage', action='store_true',
+                        help='Show the complete frames of a truncated or damaged log, e.g. one still being '
+                             'recorded, instead of failing (see salvage_log.py)')
+    parser.add_argument('--site', metavar='DIR',
+                        help='Write a multi-page site instead of one HTML file: pages of --shard-size frames '
+                             'sharing one viewer.css/viewer.js, and index.html (see viewer_site.py)')
+    parser.add_argument('--shard-size', type=int, default=1000, metavar='FRAMES',
+                        help='Frames per page of --site (default: 1000)')
+    parser.add_argument('-j', '--workers', type=int, help='Processes writing the pages of --site (default: number of CPUs)')
+    profiling.add_arguments(parser)
     args = parser.parse_args()
+    profiler = profiling.from_args(args, 'json_to_html')
+
+    if args.compare and os.path.isdir(args.input):
+        parser.error('--compare requires a single input file')
+    if args.site and (os.path.isdir(args.input) or args.compare):
+        parser.error('--site requires a single input file and no --compare')
+    if args.shard_size < 1:
+        parser.error('--shard-size must be at least 1')
 
     # Check if -i is a directory or a file
-    if os.path.isdir(args.input):
-        process_directory(args.input, args.output)
-    elif os.path.isfile(args.input):
-        generate_html(args.input, args.output)
-    else:
-        print(f"Error: {args.input} is not a valid file or directory")
+    with profiler.hot_path():
+        if args.site and os.path.isfile(args.input):
+            import viewer_site
+            written, unchanged = viewer_site.generate_site(
+                args.input, args.site, args.shard_size, args.workers, args.threaded,
+                {'histo_codec': args.histo_codec, 'zone_stats': args.zone_stats,
+                 'histo_analysis': args.histo_analysis, 'point_cloud': args.point_cloud, 'sprites': args.sprites,
+                 'timing': args.timing},
+                profiler, args.salvage)
+            print(f"✓ Viewer site: {os.path.join(args.site, viewer_site.INDEX)}")
+            print(f"  {profiler.frames} frames, {written} page(s) written, {unchanged} unchanged")
+            profiler.report()
+        elif os.path.isdir(args.input):
+            process_directory(args.input, args.output, args.histo_codec, profiler, args.threaded,
+                              args.zone_stats, args.histo_analysis, args.point_cloud, args.sprites, args.timing,
+                              args.salvage)
+        elif os.path.isfile(args.input):
+            generate_html(args.input, args.output, args.histo_codec, profiler, args.threaded, args.zone_stats,
+                          args.histo_analysis, args.compare, args.align, args.point_cloud, args.sprites,
+                          args.timing, args.salvage)
+        else:
+            print(f"Error: {args.input} is not a valid file or directory")
+    profiler.close()
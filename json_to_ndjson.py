@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Convert TMF8829 JSON logs to the NDJSON layout and back
+
+NDJSON logs hold a header line and one minified frame per line, .ndjson.gz
+files are made of independent gzip members. They can be loaded in parallel
+and are accepted by all tools in place of the JSON log. Converting back
+gives the JSON log as written by the logger (indent=4).
+'''
+
+import argparse
+import os
+import time
+
+import tmf8829log
+
+
+def default_output(input_file, to_ndjson):
+    """Output name next to the input: .json(.gz) <-> .ndjson(.gz)"""
+    compressed = input_file.endswith('.gz')
+    base = input_file[:-3] if compressed else input_file
+    base = os.path.splitext(base)[0]
+    return base + ('.ndjson' if to_ndjson else '.json') + ('.gz' if compressed else '')
+
+
+def convert(input_file, output_file=None, member_frames=tmf8829log.ndjson.MEMBER_FRAMES, workers=None):
+    """Convert a JSON log to NDJSON or an NDJSON log to JSON
+
+    The direction follows the content of the input file.
+
+    Args:
+        input_file: Path to .json/.json.gz or .ndjson/.ndjson.gz log
+        output_file: Path of the converted log (default: next to the input)
+        member_frames: frames per gzip member of .ndjson.gz output
+        workers: processes used to load an NDJSON log (default: one per CPU)
+    """
+    to_ndjson = not tmf8829log.is_ndjson(input_file)
+    if output_file is None:
+        output_file = default_output(input_file, to_ndjson)
+
+    start = time.perf_counter()
+    log = tmf8829log.load(input_file, workers=workers)
+    loaded = time.perf_counter()
+    if to_ndjson:
+        tmf8829log.write_ndjson(log, output_file, member_frames=member_frames)
+    else:
+        with tmf8829log.open_output(output_file) as f:
+            tmf8829log.write_log(log, f)
+    end = time.perf_counter()
+
+    mb = 1024 * 1024
+    print(f"✓ {input_file} ({os.path.getsize(input_file) / mb:.2f} MB) -> "
+          f"{output_file} ({os.path.getsize(output_file) / mb:.2f} MB)")
+    print(f"  {len(log)} frames, load {loaded - start:.3f} s, write {end - loaded:.3f} s")
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert TMF8829 JSON logs to NDJSON and back')
+    parser.add_argument('-i', '--input', required=True, nargs='+',
+                        help='Log files (.json, .json.gz, .ndjson, .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Output file (only with a single input)')
+    parser.add_argument('-m', '--member-frames', type=int, default=tmf8829log.ndjson.MEMBER_FRAMES,
+                        help='Frames per gzip member of .ndjson.gz output '
+                             f'(default: {tmf8829log.ndjson.MEMBER_FRAMES})')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='Processes used to load NDJSON logs (default: number of CPUs)')
+    args = parser.parse_args()
+
+    if args.output and len(args.input) > 1:
+        parser.error('-o/--output requires a single input file')
+    for input_file in args.input:
+        convert(input_file, args.output, args.member_frames, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Export a TMF8829 JSON log into a SQLite database
+
+Tables:
+    log         key, value: top-level entries (configuration, info) as JSON text
+    frames      frame_id, one column per info entry (frame_number, read_time, ...)
+    zones       frame_id, zone, row, col, one column per zone value (noise, xtalk, ...)
+    peaks       frame_id, zone, peak, one column per peak value (distance, signal, snr, x, y, z)
+    histograms  frame_id, name (mp_histo/ref_histo), data: zlib compressed JSON
+    zone_peaks  view joining frames, zones and peaks
+
+zone is the row major zone index (row * cols + col). The log is streamed
+frame by frame and inserted in batches, indexes on frame_number, zone and
+distance are created once all rows are in.
+
+Example:
+    SELECT frame_number, distance, snr FROM zone_peaks
+    WHERE row = 7 AND col = 3 AND distance < 500 AND snr > 20
+'''
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zlib
+from itertools import repeat
+
+import profiling
+import tmf8829log
+
+BATCH_FRAMES = 64       # frames inserted per executemany/transaction
+
+_SQL_TYPES = {int: 'INTEGER', float: 'REAL', str: 'TEXT'}
+_KIND_TYPES = {'int': 'INTEGER'}    # every other layout kind holds numbers as REAL
+
+_SCHEMA = '''
+CREATE TABLE log (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE frames (frame_id INTEGER PRIMARY KEY);
+CREATE TABLE zones (frame_id INTEGER NOT NULL, zone INTEGER NOT NULL, row INTEGER, col INTEGER,
+                    PRIMARY KEY (frame_id, zone)) WITHOUT ROWID;
+CREATE TABLE peaks (frame_id INTEGER NOT NULL, zone INTEGER NOT NULL, peak INTEGER NOT NULL,
+                    PRIMARY KEY (frame_id, zone, peak)) WITHOUT ROWID;
+CREATE TABLE histograms (frame_id INTEGER NOT NULL, name TEXT NOT NULL, data BLOB,
+                         PRIMARY KEY (frame_id, name)) WITHOUT ROWID;
+'''
+
+_INDEXES = '''
+CREATE INDEX frames_frame_number ON frames (frame_number);
+CREATE INDEX zones_zone ON zones (zone, frame_id);
+CREATE INDEX peaks_zone_distance ON peaks (zone, distance);
+CREATE INDEX peaks_distance ON peaks (distance);
+CREATE VIEW zone_peaks AS
+    SELECT frames.frame_number, zones.row, zones.col, peaks.*
+    FROM peaks JOIN zones USING (frame_id, zone) JOIN frames USING (frame_id);
+'''
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _Table:
+    """Insert helper adding columns as new keys show up in the log"""
+
+    def __init__(self, db, name, key_columns):
+        self.db = db
+        self.name = name
+        self.key_columns = key_columns
+        self.columns = list(key_columns)
+        self.rows = {}          # column tuple -> pending rows
+        self.count = 0
+
+    def add_columns(self, columns):
+        """Make sure the table has columns, a list of (name, SQL type)"""
+        for name, sql_type in columns:
+            if name not in self.columns:
+                self.db.execute(f"ALTER TABLE {self.name} ADD COLUMN {_quote(name)} {sql_type}")
+                self.columns.append(name)
+
+    def pending(self, names):
+        """List collecting rows for the given value columns (after the key columns)"""
+        rows = self.rows.get(names)
+        if rows is None:
+            rows = self.rows[names] = []
+        return rows
+
+    def flush(self):
+        for names, rows in self.rows.items():
+            if not rows:
+                continue
+            columns = ', '.join(_quote(name) for name in self.key_columns + list(names))
+            marks = ', '.join('?' * (len(self.key_columns) + len(names)))
+            self.db.executemany(f"INSERT INTO {self.name} ({columns}) VALUES ({marks})", rows)
+            self.count += len(rows)
+            rows.clear()
+
+
+def _info_columns(info):
+    columns = []
+    for key, value in info.items():
+        columns.append((key, _SQL_TYPES.get(type(value), 'TEXT')))
+    return columns
+
+
+def _result_type(value):
+    """Results hold numbers, some logged as text (x, y, z), REAL affinity converts those"""
+    return 'INTEGER' if type(value) is int else 'REAL'
+
+
+def _info_value(value):
+    return value if type(value) in _SQL_TYPES or value is None else json.dumps(value)
+
+
+class SqliteExport:
+    """Insert frames of a log into a new SQLite database
+
+    Args:
+        db_file: database to create (an existing file is replaced)
+        histograms: store mp_histo/ref_histo payloads
+    """
+
+    def __init__(self, db_file, histograms=True):
+        if os.path.exists(db_file):
+            os.remove(db_file)
+        self.db_file = db_file
+        self.histograms = histograms
+        self.db = sqlite3.connect(db_file, isolation_level=None)
+        # A failed export is simply repeated, no journal needed while loading
+        self.db.execute('PRAGMA journal_mode = OFF')
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.db.execute('PRAGMA cache_size = -65536')
+        self.db.executescript(_SCHEMA)
+        self.frames = _Table(self.db, 'frames', ['frame_id'])
+        self.zones = _Table(self.db, 'zones', ['frame_id', 'zone', 'row', 'col'])
+        self.peaks = _Table(self.db, 'peaks', ['frame_id', 'zone', 'peak'])
+        self.histos = _Table(self.db, 'histograms', ['frame_id', 'name', 'data'])
+        self._tables = (self.frames, self.zones, self.peaks, self.histos)
+        self._grid = {}         # (rows, cols) -> (row list, col list) in zone order
+        self._batch = 0
+        self.frame_id = 0
+        self.db.execute('BEGIN')
+
+    def _positions(self, rows, cols):
+        positions = self._grid.get((rows, cols))
+        if positions is None:
+            positions = self._grid[(rows, cols)] = (
+                [index // cols for index in range(rows * cols)], [index % cols for index in range(rows * cols)])
+        return positions
+
+    def add_frame(self, frame):
+        """Queue the rows of one frame, written every BATCH_FRAMES frames"""
+        self.frame_id += 1
+        frame_id = self.frame_id
+        info = frame.info or {}
+        self.frames.add_columns(_info_columns(info))
+        self.frames.pending(tuple(info)).append([frame_id] + [_info_value(value) for value in info.values()])
+
+        if frame.layout is not None:
+            self._add_packed_results(frame_id, frame)
+        elif frame.rows:
+            self._add_results(frame_id, frame.results)
+
+        if self.histograms:
+            for name in tmf8829log.HISTOGRAM_KEYS:
+                if name in frame:
+                    data = frame.histogram_json(name)
+                    self.histos.pending(()).append((frame_id, name, zlib.compress(data)))
+
+        self._batch += 1
+        if self._batch >= BATCH_FRAMES:
+            self.commit()
+
+    def _add_packed_results(self, frame_id, frame):
+        layout = frame.layout
+        count = layout.rows * layout.cols
+        rows, cols = self._positions(layout.rows, layout.cols)
+
+        zone_names = tuple(key for key, _ in layout.zone_fields)
+        self.zones.add_columns([(key, _KIND_TYPES.get(kind, 'REAL')) for key, kind in layout.zone_fields])
+        self.zones.pending(zone_names).extend(zip(repeat(frame_id), range(count), rows, cols,
+                                                  *[frame.column(key) for key in zone_names]))
+
+        if not layout.peak_fields:
+            return
+        peak_names = tuple(key for key, _ in layout.peak_fields)
+        self.peaks.add_columns([(key, _KIND_TYPES.get(kind, 'REAL')) for key, kind in layout.peak_fields])
+        pending = self.peaks.pending(peak_names)
+        counts = frame.peak_counts
+        uniform = isinstance(counts, int)
+        for peak in range(counts if uniform else max(counts, default=0)):
+            values = zip(repeat(frame_id), range(count), repeat(peak),
+                         *[frame.column(key, peak) for key in peak_names])
+            if uniform:
+                pending.extend(values)
+            else:
+                # Zones without this peak give None
+                pending.extend(row for row in values if row[3] is not None)
+
+    def _add_results(self, frame_id, results):
+        """Irregular results grids are inserted zone by zone"""
+        for row_index, row in enumerate(results):
+            for col_index, zone in enumerate(row):
+                index = row_index * len(row) + col_index
+                values = {key: value for key, value in zone.items() if key != 'peaks'}
+                self.zones.add_columns([(key, _result_type(value)) for key, value in values.items()])
+                self.zones.pending(tuple(values)).append(
+                    [frame_id, index, row_index, col_index] + [_info_value(value) for value in values.values()])
+                for peak_index, peak in enumerate(zone.get('peaks') or []):
+                    self.peaks.add_columns([(key, _result_type(value)) for key, value in peak.items()])
+                    self.peaks.pending(tuple(peak)).append(
+                        [frame_id, index, peak_index] + [_info_value(value) for value in peak.values()])
+
+    def commit(self):
+        for table in self._tables:
+            table.flush()
+        self.db.execute('COMMIT')
+        self.db.execute('BEGIN')
+        self._batch = 0
+
+    def close(self, log):
+        """Write the pending rows and the log header, then create the indexes"""
+        for key in log.keys:
+            if key != 'Result_Set':
+                self.db.execute('INSERT INTO log VALUES (?, ?)', (key, json.dumps(log.header[key])))
+        self.commit()
+        self.db.execute('COMMIT')
+        # Index columns may be missing in logs without results
+        self.frames.add_columns([('frame_number', 'INTEGER')])
+        self.peaks.add_columns([('distance', 'INTEGER')])
+        self.db.executescript(_INDEXES)
+        self.db.execute('ANALYZE')
+        self.db.close()
+
+
+def export_sqlite(json_file, db_file, histograms=True, profiler=None):
+    """Stream a log into a SQLite database
+
+    Args:
+        json_file: Path to JSON file (or .json.gz, .ndjson, .ndjson.gz)
+        db_file: database to create
+        histograms: store mp_histo/ref_histo payloads
+        profiler: profiling.Profiler collecting phase timings (optional)
+
+    Returns:
+        number of inserted rows
+    """
+    if profiler is None:
+        profiler = profiling.Profiler('json_to_sqlite')
+    profiler.reset(json_file)
+
+    export = SqliteExport(db_file, histograms)
+    log = tmf8829log.Log(keys=[])
+    frames = tmf8829log.iter_frames(json_file, log)
+    insert_time = 0.0
+    start = time.perf_counter()
+    for frame in frames:
+        insert_start = time.perf_counter()
+        export.add_frame(frame)
+        insert_time += time.perf_counter() - insert_start
+    parse_time = time.perf_counter() - start - insert_time
+
+    insert_start = time.perf_counter()
+    export.close(log)
+    insert_time += time.perf_counter() - insert_start
+
+    rows = sum(table.count for table in export._tables)
+    profiler.frames = export.frame_id
+    profiler.add_input(json_file, log.decompressed_bytes)
+    profiler.add_output(db_file)
+    profiler.add_time('parse', parse_time)
+    profiler.add_time('insert', insert_time)
+
+    print(f"✓ {json_file} -> {db_file}")
+    print(f"  {export.frame_id} frames, {export.zones.count} zones, {export.peaks.count} peaks, "
+          f"{export.histos.count} histograms")
+    print(f"  parse {parse_time:.3f} s, insert {insert_time:.3f} s "
+          f"({rows / insert_time if insert_time else 0:,.0f} rows/s)")
+    profiler.report()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a TMF8829 JSON log into a SQLite database')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Database file (default: <log>.sqlite)')
+    parser.add_argument('--no-histograms', action='store_true', help='Do not store mp_histo/ref_histo')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    output = args.output
+    if output is None:
+        output = tmf8829log.split_log_name(args.input)[0] + '.sqlite'
+
+    profiler = profiling.from_args(args, 'json_to_sqlite')
+    with profiler.hot_path():
+        export_sqlite(args.input, output, not args.no_histograms, profiler)
+    profiler.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Convert a TMF8829 JSON log into several outputs with a single parse
+
+The log is read once and every frame is handed to the selected sinks: HTML
+viewer, CSV, split parts and statistics. Each sink runs in its own thread
+behind a bounded queue, so a slow sink holds back the reader instead of
+letting frames pile up in memory.
+'''
+
+import argparse
+import csv
+import json
+import math
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+
+import json_to_csv
+import json_to_html
+import profiling
+import tmf8829log
+
+
+def _basename(json_file):
+    """Log file name without .json/.json.gz/.ndjson/.ndjson.gz"""
+    stem, ext = tmf8829log.split_log_name(json_file)
+    return stem if ext else os.path.splitext(stem)[0]
+
+
+class HtmlSink:
+    """HTML viewer as written by json_to_html.py"""
+
+    name = 'html'
+
+    def __init__(self, output_file, histo_codec=False):
+        self.output_file = output_file
+        self.histo_codec = histo_codec
+        # The viewer embeds all frames, keep the compact Frame objects until the end
+        self._log = tmf8829log.Log(keys=[])
+
+    def frame(self, frame):
+        self._log.frames.append(frame)
+
+    def close(self, log):
+        self._log.header = log.header
+        self._log.keys = log.keys
+        json_to_html.write_html(self._log, self.output_file, self.histo_codec)
+        return [self.output_file]
+
+
+class CsvSink:
+    """CSV file as written by json_to_csv.py
+
+    The configuration section comes first in the CSV but last in the log, so
+    the frame rows are spooled to a temporary file. The logger version is
+    also only known at the end: the fields of the frames are checked against
+    all known versions while they stream in, the version when the log ends.
+    """
+
+    name = 'csv'
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self._spool = tempfile.TemporaryFile('w+', encoding='UTF8', newline='')
+        self._csvout = csv.writer(self._spool, delimiter=',')
+        self._schema = tmf8829log.Schema()
+
+    def frame(self, frame):
+        json_to_csv.writeFrame(frame, self._csvout, self._schema)
+
+    def close(self, log):
+        self._schema.set_version(tmf8829log.logger_version(log.device_info))
+        with open(self.output_file, 'w', encoding='UTF8', newline='') as f:
+            f.write("sep=,\n")
+            json_to_csv.dumpSection(log.header, "configuration", "#CONFIG", csv.writer(f, delimiter=','))
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, f)
+        self._spool.close()
+        return [self.output_file]
+
+
+class SplitSink:
+    """Parts of frames_per_file frames as written by split_json.py
+
+    Frames of each part are spooled until the end of the log, where the
+    configuration and info entries that follow Result_Set are known. NDJSON
+    logs are split into NDJSON parts.
+    """
+
+    name = 'split'
+
+    def __init__(self, input_file, output_dir, frames_per_file=50, threaded=False):
+        self.frames_per_file = frames_per_file
+        self.threaded = threaded
+        self.compressed = input_file.endswith('.gz')
+        self.ndjson = tmf8829log.is_ndjson(input_file)
+        input_basename = os.path.splitext(os.path.basename(input_file))[0]
+        output_ext = ('.ndjson' if self.ndjson else '.json') + ('.gz' if self.compressed else '')
+        self.pattern = os.path.join(output_dir, f"{input_basename}_part{{}}{output_ext}")
+        self._parts = []
+        self._count = 0
+
+    def frame(self, frame):
+        first = self._count % self.frames_per_file == 0
+        if self.ndjson:
+            if first:
+                self._parts.append(tempfile.TemporaryFile('w+b'))
+            self._parts[-1].write(tmf8829log.ndjson.frame_line(frame))
+        else:
+            if first:
+                self._parts.append(tempfile.TemporaryFile('w+', encoding='utf-8'))
+            self._parts[-1].write(tmf8829log.format_frame(frame, first, indent=2, ensure_ascii=False))
+        self._count += 1
+
+    def close(self, log):
+        outputs = []
+        for index, spool in enumerate(self._parts):
+            output_file = self.pattern.format(index + 1)
+            spool.seek(0)
+            if self.ndjson:
+                with tmf8829log.NdjsonWriter(output_file, log) as writer:
+                    for line in spool:
+                        writer.write_line(line)
+            else:
+                with tmf8829log.open_output(output_file, self.threaded) as f:
+                    tmf8829log.write_log(log, f, indent=2, ensure_ascii=False, result_set=spool)
+            spool.close()
+            outputs.append(output_file)
+        return outputs
+
+
+class StatsSink:
+    """Per-zone statistics over all frames, written as JSON
+
+    distance, signal and snr of the first peak are accumulated per zone
+    (count, mean, standard deviation, min, max). A zone counts as detected in
+    a frame if its distance is above zero.
+    """
+
+    name = 'stats'
+    FIELDS = ('distance', 'signal', 'snr')
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.frames = 0
+        self.frame_numbers = []
+        self.warnings = 0
+        self.temperature = None
+        self.rows = self.cols = 0
+        self.detections = None
+        self._sums = {}
+
+    def frame(self, frame):
+        self.frames += 1
+        info = frame.info or {}
+        if 'frame_number' in info:
+            self.frame_numbers.append(info['frame_number'])
+        self.warnings += info.get('warnings', 0)
+        if 'temperature' in info:
+            t = info['temperature']
+            self.temperature = (t, t) if self.temperature is None else \
+                (min(self.temperature[0], t), max(self.temperature[1], t))
+
+        if not frame.rows:
+            return
+        if self.detections is None:
+            self.rows, self.cols = frame.rows, frame.cols
+            zones = self.rows * self.cols
+            self.detections = [0] * zones
+            for field in self.FIELDS:
+                self._sums[field] = ([0] * zones, [0.0] * zones, [0.0] * zones,
+                                     [math.inf] * zones, [-math.inf] * zones)
+        if (frame.rows, frame.cols) != (self.rows, self.cols):
+            return
+
+        for index, distance in enumerate(frame.column('distance')):
+            if distance is not None and distance > 0:
+                self.detections[index] += 1
+        for field in self.FIELDS:
+            count, total, squares, low, high = self._sums[field]
+            for index, value in enumerate(frame.column(field)):
+                if value is None:
+                    continue
+                count[index] += 1
+                total[index] += value
+                squares[index] += value * value
+                if value < low[index]:
+                    low[index] = value
+                if value > high[index]:
+                    high[index] = value
+
+    def summary(self):
+        """Return the statistics as a JSON serializable dict"""
+        numbers = self.frame_numbers
+        steps = [b - a for a, b in zip(numbers, numbers[1:])]
+        step = max(set(steps), key=steps.count) if steps else None
+        zones = {}
+        for field, (count, total, squares, low, high) in self._sums.items():
+            mean = [t / c if c else None for t, c in zip(total, count)]
+            std = [math.sqrt(max(q / c - m * m, 0.0)) if c else None for q, c, m in zip(squares, count, mean)]
+            zones[field] = {
+                'mean': [round(v, 3) if v is not None else None for v in mean],
+                'std': [round(v, 3) if v is not None else None for v in std],
+                'min': [v if c else None for v, c in zip(low, count)],
+                'max': [v if c else None for v, c in zip(high, count)],
+            }
+        return {
+            'frames': self.frames,
+            'frame_number': {'first': numbers[0], 'last': numbers[-1]} if numbers else None,
+            'frame_step': step,
+            'gaps': sum(1 for s in steps if s != step),
+            'warnings': self.warnings,
+            'temperature': {'min': self.temperature[0], 'max': self.temperature[1]} if self.temperature else None,
+            'resolution': {'rows': self.rows, 'cols': self.cols},
+            'detection_rate': [round(d / self.frames, 4) for d in self.detections] if self.detections else [],
+            'zones': zones,
+        }
+
+    def close(self, log):
+        with open(self.output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+        return [self.output_file]
+
+
+class _Stage(threading.Thread):
+    """Worker thread feeding one sink from a bounded queue"""
+
+    def __init__(self, sink, queue_size):
+        super().__init__(name=f"sink-{sink.name}", daemon=True)
+        self.sink = sink
+        self.queue = queue.Queue(queue_size)
+        self.busy = 0.0         # time spent in the sink
+        self.blocked = 0.0      # time the reader waited for room in the queue
+        self.outputs = []
+        self.error = None
+
+    def put(self, item):
+        if self.queue.full():
+            start = time.perf_counter()
+            self.queue.put(item)
+            self.blocked += time.perf_counter() - start
+        else:
+            self.queue.put(item)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if self.error is not None:
+                # Keep draining after a failure so the reader never blocks
+                if isinstance(item, tmf8829log.Log):
+                    return
+                continue
+            start = time.perf_counter()
+            try:
+                if isinstance(item, tmf8829log.Log):
+                    self.outputs = self.sink.close(item)
+                else:
+                    self.sink.frame(item)
+            except Exception:
+                self.error = traceback.format_exc()
+            self.busy += time.perf_counter() - start
+            if isinstance(item, tmf8829log.Log):
+                return
+
+
+def run_pipeline(input_file, sinks, queue_size=64, profiler=None, threaded=False):
+    """Read a log once and feed every frame to all sinks
+
+    Args:
+        input_file: Path to JSON file (or .json.gz)
+        sinks: sink objects with frame(frame) and close(log) methods
+        queue_size: frames buffered per sink before the reader waits
+        profiler: profiling.Profiler collecting phase timings (optional)
+        threaded: decompress the log in a background thread
+
+    Returns:
+        True if all sinks succeeded
+    """
+    if profiler is None:
+        profiler = profiling.Profiler('pipeline')
+    profiler.reset(input_file)
+
+    stages = [_Stage(sink, queue_size) for sink in sinks]
+    for stage in stages:
+        stage.start()
+
+    log = tmf8829log.Log(keys=[])
+    start = time.perf_counter()
+    frames = 0
+    for frame in tmf8829log.iter_frames(input_file, log, threaded):
+        frames += 1
+        for stage in stages:
+            stage.put(frame)
+    for stage in stages:
+        stage.put(log)
+    read_time = time.perf_counter() - start
+    for stage in stages:
+        stage.join()
+
+    profiler.frames = frames
+    profiler.add_input(input_file, log.decompressed_bytes)
+    profiler.add_time('parse', read_time - sum(stage.blocked for stage in stages))
+    print(f"Read {frames} frames from {input_file} in {read_time:.3f} s")
+
+    success = True
+    for stage in stages:
+        profiler.add_time(f"sink {stage.sink.name}", stage.busy)
+        if stage.error is not None:
+            success = False
+            print(f"  {stage.sink.name}: failed\n{stage.error}")
+            continue
+        print(f"  {stage.sink.name}: {stage.busy:.3f} s busy, reader waited {stage.blocked:.3f} s")
+        for output_file in stage.outputs:
+            profiler.add_output(output_file)
+            print(f"    ✓ {output_file}")
+    profiler.report()
+    return success
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a TMF8829 JSON log to several outputs with a single parse')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports both .json and .json.gz)')
+    parser.add_argument('--html', nargs='?', const='', metavar='FILE',
+                        help='Write the HTML viewer (default: <log>_viewer.html)')
+    parser.add_argument('--histo-codec', action='store_true',
+                        help='Embed histograms delta/varint encoded in the HTML viewer (requires numpy)')
+    parser.add_argument('--csv', nargs='?', const='', metavar='FILE', help='Write the CSV file (default: <log>.csv)')
+    parser.add_argument('--split', nargs='?', const='', metavar='DIR',
+                        help='Write parts of --frames-per-file frames into DIR (default: same as input file)')
+    parser.add_argument('-n', '--frames-per-file', type=int, default=50,
+                        help='Number of frames per part for --split (default: 50)')
+    parser.add_argument('--stats', nargs='?', const='', metavar='FILE',
+                        help='Write per-zone statistics as JSON (default: <log>_stats.json)')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress the log and compress split parts in background threads')
+    parser.add_argument('-q', '--queue-size', type=int, default=64,
+                        help='Frames buffered per output before reading waits (default: 64)')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    sinks = []
+    if args.html is not None:
+        sinks.append(HtmlSink(args.html or json_to_html.default_output(args.input), args.histo_codec))
+    if args.csv is not None:
+        sinks.append(CsvSink(args.csv or _basename(args.input) + '.csv'))
+    if args.split is not None:
+        output_dir = args.split or os.path.dirname(args.input)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        sinks.append(SplitSink(args.input, output_dir, args.frames_per_file, args.threaded))
+    if args.stats is not None:
+        sinks.append(StatsSink(args.stats or _basename(args.input) + '_stats.json'))
+    if not sinks:
+        parser.error('select at least one output: --html, --csv, --split or --stats')
+
+    profiler = profiling.from_args(args, 'pipeline')
+    with profiler.hot_path():
+        success = run_pipeline(args.input, sinks, args.queue_size, profiler, args.threaded)
+    profiler.close()
+    if not success:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Point clouds of the x/y/z peak coordinates of a TMF8829 log
+
+Every frame becomes one float32 vertex buffer with a point per zone and
+peak (x, y, z in mm, logged as text) and one float32 value per point
+(distance and snr) for colouring. Peaks without a target (distance 0) and
+missing peaks are kept in place with value -1, so all frames share one
+buffer layout. Logs without x/y/z get them from the distance and the zone
+geometry of their configuration (geometry.py). json_to_html.py
+--point-cloud embeds the buffers for the WebGL view of the viewer.
+
+With -o the peaks with a target are exported as binary little-endian PLY
+or PCD files for other point cloud tools, streamed frame by frame:
+
+    -o capture.ply      one file with the points of all frames
+    -o frames/          one file per frame, frames/<log>_000000.ply, ...
+
+Every vertex has the properties x, y, z, distance, snr, signal (float),
+zone (row * cols + col), peak and frame (the frame_number). NDJSON logs
+are converted in parallel processes (-j). Requires numpy.
+'''
+
+import argparse
+import base64
+import functools
+import os
+import time
+
+import numpy as np
+
+import geometry
+import tmf8829log
+from frame_store import COLUMN_DTYPES, FrameStore
+
+VALUE_FIELDS = ('distance', 'snr')
+STORE_FIELDS = ('x', 'y', 'z') + VALUE_FIELDS
+MISSING = -1.0      # value of points without a target
+
+FORMATS = ('ply', 'pcd')
+# Vertex record of the exports, packed little-endian
+VERTEX_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('distance', '<f4'), ('snr', '<f4'),
+                         ('signal', '<f4'), ('zone', '<u2'), ('peak', 'u1'), ('frame', '<i4')])
+FLOAT_FIELDS = ('x', 'y', 'z', 'distance', 'snr', 'signal')
+_PLY_TYPES = {'<f4': 'float', '<u2': 'ushort', '|u1': 'uchar', '<i4': 'int'}
+_PCD_TYPES = {'f': 'F', 'u': 'U', 'i': 'I'}
+_COUNT_WIDTH = 10   # digits reserved for the point count of streamed files
+
+
+class PointCloud:
+    """x/y/z and colour values of all peaks of all frames
+
+    Attributes:
+        rows, cols, peaks: zone grid and peaks per zone
+        xyz: float32 array (frames, zones * peaks, 3), 0 where there is no target
+        values: dict field -> float32 array (frames, zones * peaks), MISSING where there is no target
+        valid: bool array (frames, zones * peaks)
+        frame_numbers: frame_number of every frame (-1 if missing)
+    """
+
+    def __init__(self, rows, cols, peaks, xyz, values, valid, frame_numbers):
+        self.rows = rows
+        self.cols = cols
+        self.peaks = peaks
+        self.xyz = xyz
+        self.values = values
+        self.valid = valid
+        self.frame_numbers = frame_numbers
+
+    @property
+    def frames(self):
+        return len(self.xyz)
+
+    @classmethod
+    def from_store(cls, store, configuration=None):
+        """Build the point cloud of a FrameStore with distance (and x, y, z) peak fields
+
+        Args:
+            store: FrameStore, x/y/z are computed from the distance if missing
+            configuration: configuration of the log (default: store.header)
+        """
+        if 'distance' not in store.peak_fields:
+            raise ValueError("The log has no 'distance' peak values")
+        geometry.fill_xyz(store, configuration)
+        distance = store.peak_fields['distance']
+        frames, zones, peaks = distance.shape
+        with np.errstate(invalid='ignore'):
+            valid = distance > 0
+        xyz = np.stack([store.peak_fields[name] for name in ('x', 'y', 'z')], axis=-1)
+        valid &= np.isfinite(xyz).all(axis=-1)
+        xyz = np.where(valid[..., None], xyz, 0).astype(np.float32).reshape(frames, zones * peaks, 3)
+        values = {}
+        for name in VALUE_FIELDS:
+            if name in store.peak_fields:
+                values[name] = np.where(valid, store.peak_fields[name], MISSING).astype(np.float32).reshape(
+                    frames, zones * peaks)
+        return cls(store.rows, store.cols, peaks, xyz, values, valid.reshape(frames, zones * peaks),
+                   store.frame_numbers)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_store(FrameStore.load(path, fields=STORE_FIELDS))
+
+    def bounds(self):
+        """(center, radius) of the valid points, robust against single outliers"""
+        points = self.xyz[self.valid]
+        if not len(points):
+            return np.zeros(3), 1.0
+        low, high = np.percentile(points, [1, 99], axis=0)
+        return (low + high) / 2, float(max(np.linalg.norm(high - low) / 2, 1.0))
+
+    def viewer_payload(self):
+        """Buffers and ranges for the WebGL view of json_to_html.py"""
+        center, radius = self.bounds()
+        values = {}
+        for name, data in self.values.items():
+            finite = data[self.valid]
+            values[name] = {
+                'range': [float(finite.min()), float(finite.max())] if finite.size else [0.0, 1.0],
+                'data': base64.b64encode(data.astype('<f4').tobytes()).decode('ascii'),
+            }
+        return {
+            'points': self.xyz.shape[1],
+            'center': [float(v) for v in center],
+            'radius': radius,
+            'xyz': base64.b64encode(self.xyz.astype('<f4').tobytes()).decode('ascii'),
+            'values': values,
+        }
+
+
+def frame_vertices(frame, configuration=None):
+    """Vertices of the peaks with a target (distance > 0) of one frame
+
+    Args:
+        frame: tmf8829log.Frame
+        configuration: configuration of the log, for x/y/z computed from the
+                       distance if the frame has none (see geometry.py)
+
+    Returns:
+        array of VERTEX_DTYPE, fields missing in the log are NaN
+    """
+    number = frame.frame_number
+    number = -1 if number is None else number
+    layout = frame.layout
+    if layout is None:
+        return _unpacked_vertices(frame, number, configuration)
+    if not frame.rows or 'distance' not in layout.peak_keys:
+        return np.empty(0, VERTEX_DTYPE)
+
+    counts = frame.peak_counts
+    zones = frame.rows * frame.cols
+    if isinstance(counts, int):
+        zone = np.repeat(np.arange(zones), counts)
+        peak = np.tile(np.arange(counts), zones)
+    else:
+        counts = np.frombuffer(counts, dtype=np.uint8)
+        zone = np.repeat(np.arange(zones), counts)
+        peak = np.arange(len(zone)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    column = frame.packed_column('distance')
+    target = np.frombuffer(column, dtype=COLUMN_DTYPES[column.typecode]) > 0
+    vertices = np.empty(int(target.sum()), VERTEX_DTYPE)
+    for name in FLOAT_FIELDS:
+        column = frame.packed_column(name) if name in layout.peak_keys else None
+        if column is None:
+            vertices[name] = np.nan
+        else:
+            vertices[name] = np.frombuffer(column, dtype=COLUMN_DTYPES[column.typecode])[target]
+    vertices['zone'] = zone[target]
+    vertices['peak'] = peak[target]
+    vertices['frame'] = number
+    if 'x' not in layout.peak_keys:
+        _compute_xyz(vertices, configuration, frame.rows, frame.cols)
+    return vertices
+
+
+def _compute_xyz(vertices, configuration, rows, cols):
+    """x/y/z of vertices from their distance and zone"""
+    directions = geometry.zone_geometry(configuration, rows, cols).directions[vertices['zone']]
+    for index, name in enumerate(('x', 'y', 'z')):
+        vertices[name] = vertices['distance'] * directions[:, index]
+
+
+def _unpacked_vertices(frame, number, configuration):
+    """frame_vertices() of a frame whose results could not be packed"""
+    points = []
+    results = frame.results or []
+    for row_index, row in enumerate(results):
+        for col_index, zone in enumerate(row):
+            for peak_index, peak in enumerate((zone or {}).get('peaks') or []):
+                if not peak.get('distance', 0) > 0:
+                    continue
+                values = [float(peak[name]) if name in peak else np.nan for name in FLOAT_FIELDS]
+                points.append(tuple(values) + (row_index * len(row) + col_index, peak_index, number))
+    vertices = np.array(points, VERTEX_DTYPE)
+    missing = np.isnan(vertices['x'])
+    if missing.any():
+        cols = max((len(row) for row in results), default=0)
+        computed = vertices[missing]
+        _compute_xyz(computed, configuration, len(results), cols)
+        vertices[missing] = computed
+    return vertices
+
+
+def _chunk_vertices(frames, configuration=None):
+    """Worker of tmf8829log.ndjson.map_chunks(): vertices of every frame of a chunk"""
+    return [frame_vertices(frame, configuration) for frame in frames]
+
+
+def iter_vertices(path, workers=None, threaded=False):
+    """Yield the vertices of every frame of a log in order
+
+    Args:
+        path: log file (.json, .json.gz, .ndjson, .ndjson.gz)
+        workers: processes converting NDJSON logs (default: number of CPUs),
+                 JSON logs are read sequentially
+        threaded: decompress JSON logs in a background thread
+    """
+    # configuration follows Result_Set in JSON logs, so it is read in a
+    # header pass before the frames for the x/y/z of logs without them
+    configuration = tmf8829log.salvage.read_header(path).get('configuration')
+    if (workers or os.cpu_count() or 1) > 1 and tmf8829log.is_ndjson(path):
+        function = functools.partial(_chunk_vertices, configuration=configuration)
+        for chunk in tmf8829log.ndjson.map_chunks(path, function, workers):
+            yield from chunk
+    else:
+        for frame in tmf8829log.iter_frames(path, tmf8829log.Log(keys=[]), threaded):
+            yield frame_vertices(frame, configuration)
+
+
+def export_header(fmt, count, comment=None, width=None):
+    """Header of a binary little-endian PLY or PCD file with count vertices
+
+    Args:
+        fmt: 'ply' or 'pcd'
+        count: number of vertices
+        comment: text written as header comment
+        width: pad the count with spaces to this width, so that the header
+               can be rewritten in place once the count is known
+    """
+    number = str(count).rjust(width or 0)
+    if fmt == 'ply':
+        lines = ['ply', 'format binary_little_endian 1.0']
+        if comment:
+            lines.append(f'comment {comment}')
+        lines.append(f'element vertex {number}')
+        lines += [f'property {_PLY_TYPES[VERTEX_DTYPE[name].str]} {name}' for name in VERTEX_DTYPE.names]
+        lines.append('end_header')
+    else:
+        fields = [VERTEX_DTYPE[name] for name in VERTEX_DTYPE.names]
+        lines = ['# .PCD v0.7 - Point Cloud Data file format']
+        if comment:
+            lines.append(f'# {comment}')
+        lines += [
+            'VERSION 0.7',
+            'FIELDS ' + ' '.join(VERTEX_DTYPE.names),
+            'SIZE ' + ' '.join(str(field.itemsize) for field in fields),
+            'TYPE ' + ' '.join(_PCD_TYPES[field.kind] for field in fields),
+            'COUNT ' + ' '.join('1' for _ in fields),
+            f'WIDTH {number}',
+            'HEIGHT 1',
+            'VIEWPOINT 0 0 0 1 0 0 0',
+            f'POINTS {number}',
+            'DATA binary',
+        ]
+    return ('\n'.join(lines) + '\n').encode('ascii')
+
+
+def export_point_cloud(path, output, fmt=None, workers=None, threaded=False):
+    """Export the peaks with a target of a log as binary PLY or PCD
+
+    Args:
+        path: log file
+        output: .ply/.pcd file for one stream with all frames, otherwise a
+                directory receiving one file per frame
+        fmt: 'ply' or 'pcd' (default: by the extension of output, else ply)
+        workers: processes converting NDJSON logs (default: number of CPUs)
+        threaded: decompress JSON logs in a background thread
+
+    Returns:
+        (frames, vertices) written
+    """
+    extension = os.path.splitext(output)[1].lower()[1:]
+    fmt = fmt or (extension if extension in FORMATS else 'ply')
+    name = os.path.basename(path)
+    frames = vertices = 0
+
+    if extension in FORMATS:
+        # One stream: the vertex count in the header is rewritten at the end
+        with open(output, 'wb') as f:
+            f.write(export_header(fmt, 0, name, _COUNT_WIDTH))
+            for frame in iter_vertices(path, workers, threaded):
+                f.write(frame.data)
+                frames += 1
+                vertices += len(frame)
+            f.seek(0)
+            f.write(export_header(fmt, vertices, name, _COUNT_WIDTH))
+        return frames, vertices
+
+    os.makedirs(output, exist_ok=True)
+    stem = name.split('.')[0]
+    for frame in iter_vertices(path, workers, threaded):
+        with open(os.path.join(output, f'{stem}_{frames:06d}.{fmt}'), 'wb') as f:
+            f.write(export_header(fmt, len(frame), f'{name} frame {frames}'))
+            f.write(frame.data)
+        frames += 1
+        vertices += len(frame)
+    return frames, vertices
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Point cloud of the x/y/z values of a TMF8829 log: '
+                                                 'summary or binary PLY/PCD export')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output',
+                        help='Export to a .ply/.pcd file (all frames) or a directory (one file per frame)')
+    parser.add_argument('-f', '--format', choices=FORMATS,
+                        help='Export format (default: by the output extension, else ply)')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='Processes converting NDJSON logs (default: number of CPUs)')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress JSON logs in a background thread')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.output:
+        frames, vertices = export_point_cloud(args.input, args.output, args.format, args.workers, args.threaded)
+        elapsed = time.perf_counter() - start
+        size = sum(entry.stat().st_size for entry in os.scandir(args.output)) if os.path.isdir(args.output) \
+            else os.path.getsize(args.output)
+        print(f"✓ {args.input} -> {args.output}")
+        print(f"  {frames} frames, {vertices} points, {size / (1024 * 1024):.2f} MB")
+        print(f"  {elapsed:.3f} s ({frames / elapsed if elapsed else 0:,.0f} frames/s)")
+        return
+
+    cloud = PointCloud.load(args.input)
+    elapsed = time.perf_counter() - start
+    center, radius = cloud.bounds()
+    print(f"{cloud.frames} frames, {cloud.cols}x{cloud.rows} zones, {cloud.peaks} peak(s) per zone")
+    print(f"  points with target: {int(cloud.valid.sum())} of {cloud.valid.size}")
+    print(f"  center {center.round(1).tolist()} mm, radius {radius:.1f} mm")
+    print(f"  built in {elapsed:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Phase-level profiling shared by the TMF8829 JSON log tools
+
+Every tool times its phases (read = open/decompress, parse, transform,
+serialize, write) through a Profiler. With --profile the tool prints a
+human-readable report per converted file, --profile-json appends the same
+data as one JSON record per line and --cprofile dumps cProfile statistics of
+the conversion hot path.
+'''
+
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:             # not available on Windows
+    resource = None
+
+
+def add_arguments(parser):
+    """Add the profiling options to an argparse parser"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', action='store_true',
+                       help='Print time per phase, bytes in/out, frames/s and peak memory')
+    group.add_argument('--profile-json', metavar='FILE',
+                       help='Append the profile as one JSON record per line to FILE (implies --profile)')
+    group.add_argument('--profile-memory', action='store_true',
+                       help='Trace peak Python memory per phase with tracemalloc (slower, implies --profile)')
+    group.add_argument('--cprofile', metavar='FILE',
+                       help='Dump cProfile statistics of the conversion hot path to FILE')
+
+
+def from_args(args, tool):
+    """Create a Profiler from the options added by add_arguments()"""
+    return Profiler(tool,
+                    enabled=args.profile or bool(args.profile_json) or args.profile_memory,
+                    json_file=args.profile_json,
+                    trace_memory=args.profile_memory,
+                    cprofile_file=args.cprofile)
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, None if unknown"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class Profiler:
+    """Collects phase timings and throughput figures of one tool run
+
+    A disabled Profiler (the default) keeps the bookkeeping calls cheap, so the
+    tools can call it unconditionally.
+    """
+
+    def __init__(self, tool='', enabled=False, json_file=None, trace_memory=False, cprofile_file=None):
+        self.tool = tool
+        self.enabled = enabled
+        self.json_file = json_file
+        self.trace_memory = trace_memory and enabled
+        self.cprofile_file = cprofile_file
+        self._cprofile = None
+        self.reset()
+
+    def reset(self, input_file=None):
+        """Start a new record, e.g. for the next file of a batch"""
+        self.input_file = input_file
+        self.phases = {}
+        self.bytes_in = 0
+        self.bytes_decompressed = 0
+        self.bytes_out = 0
+        self.frames = 0
+        self._start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the enclosed block as phase name (repeated phases add up)"""
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.add_time(name, time.perf_counter() - start)
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                entry['peak_traced_bytes'] = max(entry['peak_traced_bytes'] or 0, peak)
+
+    def add_time(self, name, seconds):
+        """Add time measured elsewhere (e.g. in a worker thread) to phase name"""
+        entry = self.phases.setdefault(name, {'seconds': 0.0, 'peak_traced_bytes': None})
+        entry['seconds'] += seconds
+        return entry
+
+    @contextlib.contextmanager
+    def hot_path(self):
+        """Run the enclosed block under cProfile if a dump file was requested"""
+        if not self.cprofile_file:
+            yield
+            return
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+        try:
+            yield
+        finally:
+            self._cprofile.disable()
+
+    def add_input(self, path, decompressed=0):
+        """Account an input file and the number of bytes it decompressed to"""
+        if os.path.isfile(path):
+            self.bytes_in += os.path.getsize(path)
+        self.bytes_decompressed += decompressed
+
+    def add_output(self, path):
+        """Account an output file"""
+        if os.path.isfile(path):
+            self.bytes_out += os.path.getsize(path)
+
+    def record(self):
+        """Return the profile as a JSON serializable dict"""
+        total = time.perf_counter() - self._start
+        return {
+            'tool': self.tool,
+            'input': self.input_file,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'total_s': round(total, 6),
+            'phases': {name: {'seconds': round(entry['seconds'], 6),
+                              'peak_traced_bytes': entry['peak_traced_bytes']}
+                       for name, entry in self.phases.items()},
+            'bytes_in': self.bytes_in,
+            'bytes_decompressed': self.bytes_decompressed,
+            'bytes_out': self.bytes_out,
+            'frames': self.frames,
+            'frames_per_s': round(self.frames / total, 3) if total > 0 else None,
+            'peak_rss_bytes': peak_rss(),
+        }
+
+    def report(self):
+        """Print the report and append the JSON record if enabled"""
+        if not self.enabled:
+            return
+        record = self.record()
+        total = record['total_s']
+        mb = 1024 * 1024
+
+        print(f"Profile {self.tool}: {self.input_file}")
+        print(f"  {'phase':<12}{'time [s]':>10}{'share':>8}" + (f"{'peak traced':>14}" if self.trace_memory else ''))
+        for name, entry in record['phases'].items():
+            line = f"  {name:<12}{entry['seconds']:>10.3f}{entry['seconds'] / total * 100 if total else 0:>7.1f}%"
+            if self.trace_memory:
+                line += f"{(entry['peak_traced_bytes'] or 0) / mb:>11.1f} MB"
+            print(line)
+        print(f"  {'total':<12}{total:>10.3f}")
+        print(f"  Bytes in:  {record['bytes_in'] / mb:.2f} MB ({record['bytes_decompressed'] / mb:.2f} MB decompressed)")
+        print(f"  Bytes out: {record['bytes_out'] / mb:.2f} MB")
+        print(f"  Frames:    {record['frames']} ({record['frames_per_s'] or 0:.1f} frames/s)")
+        if record['peak_rss_bytes'] is not None:
+            print(f"  Peak RSS:  {record['peak_rss_bytes'] / mb:.1f} MB")
+
+        if self.json_file:
+            with open(self.json_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def close(self):
+        """Write the cProfile dump and stop memory tracing"""
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(self.cprofile_file)
+            print(f"cProfile statistics written to {self.cprofile_file}")
+            self._cprofile = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Repair a truncated or damaged TMF8829 log
+
+A log whose recording stopped unexpectedly ends in the middle of Result_Set
+(and of its gzip stream), so json.load() and all tools fail on it. This
+script reads it with the incremental parser, reports where it is damaged
+and writes every complete frame up to the damage into a valid log:
+
+    python salvage_log.py -i tmf8829_log_1770799073.json.gz
+    python salvage_log.py -i cut.json.gz --header-from previous_log.json.gz
+    python salvage_log.py -i cut.json.gz --check
+
+Frames are copied as the JSON text found in the file, without parsing them,
+so a log is repaired at about the speed it decompresses. configuration and
+info follow Result_Set and are lost with a truncation; --header-from takes
+them from another log recorded with the same setup.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import tmf8829log
+
+# Frames of Result_Set as indented by json.dump(..., indent=4)
+FRAME_PAD = '\n' + ' ' * 8
+
+
+def default_output(input_file):
+    """log.json.gz -> log_salvaged.json.gz"""
+    stem, ext = tmf8829log.split_log_name(input_file)
+    return stem + '_salvaged' + (ext or '.json')
+
+
+def salvage_log(input_file, output_file, header_from=None, threaded=False):
+    """Write the complete frames of a damaged log into a valid log
+
+    The output has the layout its name selects (JSON or NDJSON). Frames of a
+    log in the same layout are copied as text, others are parsed and
+    serialized. Frames are spooled to a temporary file until the top-level
+    entries are known.
+
+    Args:
+        input_file: damaged log (.json, .json.gz, .ndjson or .ndjson.gz)
+        output_file: repaired log
+        header_from: log whose top-level entries replace the missing ones
+        threaded: compress the output in a background thread (the input is
+                  always decompressed in one, see tmf8829log.iter_salvaged())
+
+    Returns:
+        (tmf8829log.Damage, keys of the entries taken from header_from)
+    """
+    ndjson = output_file.endswith(('.ndjson', '.ndjson.gz'))
+    raw = ndjson == tmf8829log.is_ndjson(input_file)
+    log = tmf8829log.Log(keys=[])
+    damage = tmf8829log.Damage(input_file)
+    with tempfile.TemporaryFile('w+b' if ndjson else 'w+', **({} if ndjson else {'encoding': 'utf-8'})) as spool:
+        for index, frame in enumerate(tmf8829log.iter_salvaged(input_file, log, damage, raw)):
+            if ndjson:
+                spool.write(frame + b'\n' if raw else tmf8829log.ndjson.frame_line(frame))
+            elif raw:
+                spool.write((',' if index else '') + FRAME_PAD + frame.decode('utf-8'))
+            else:
+                spool.write(tmf8829log.format_frame(frame, index == 0))
+
+        borrowed = tmf8829log.borrow_header(log, header_from) if header_from else []
+        if 'Result_Set' not in log.keys:
+            log.keys.insert(0, 'Result_Set')
+
+        spool.seek(0)
+        if ndjson:
+            with tmf8829log.NdjsonWriter(output_file, log) as writer:
+                for line in spool:
+                    writer.write_line(line)
+        else:
+            with tmf8829log.open_output(output_file, threaded) as f:
+                tmf8829log.write_log(log, f, result_set=spool)
+    return damage, borrowed
+
+
+def check_log(input_file):
+    """Damage of a log, read without writing anything"""
+    damage = tmf8829log.Damage(input_file)
+    for _ in tmf8829log.iter_salvaged(input_file, tmf8829log.Log(keys=[]), damage, raw=True):
+        pass
+    return damage
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Repair a truncated or damaged TMF8829 log')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Repaired log (default: <log>_salvaged.<ext>)')
+    parser.add_argument('--header-from', metavar='LOG',
+                        help='Take configuration and info missing in the log from this log')
+    parser.add_argument('--check', action='store_true',
+                        help='Only report the damage, exit status 1 if the log is damaged')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Compress the repaired log in a background thread')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    if args.check:
+        damage = check_log(args.input)
+        print('\n'.join(damage.describe()))
+        sys.exit(1 if damage.damaged else 0)
+
+    output = args.output or default_output(args.input)
+    damage, borrowed = salvage_log(args.input, output, args.header_from, args.threaded)
+    elapsed = time.perf_counter() - start
+
+    print('\n'.join(damage.describe()))
+    if borrowed:
+        print(f"  {', '.join(borrowed)} taken from {args.header_from}")
+    print(f"✓ {args.input} -> {output}")
+    print(f"  {damage.frames} frames, {damage.offset / 1e6:.1f} MB of JSON in {elapsed:.3f} s "
+          f"({damage.offset / 1e6 / elapsed if elapsed else 0:,.0f} MB/s)")
+
+if __name__ == "__main__":
+    main()
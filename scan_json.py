@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Summarize a TMF8829 JSON log file without a full parse
+
+One streaming pass collects the header, the info block of every frame and
+the shape of the results. results/mp_histo/ref_histo payloads are skipped
+without building Python objects.
+'''
+
+import argparse
+import collections
+import io
+import json
+import os
+import time
+from array import array
+
+from tmf8829log import ndjson
+from tmf8829log.config_blob import check_blob, compact_configuration, decode_blob
+from tmf8829log.json_stream import JsonScanner, open_binary
+
+
+def _results_shape(scanner):
+    """Consume a results array and return (rows, cols, first zone dict)"""
+    rows = 0
+    cols = 0
+    first_zone = None
+    for row in scanner.iter_array():
+        rows += 1
+        if row == 0:
+            for col in scanner.iter_array():
+                cols += 1
+                if col == 0:
+                    first_zone = scanner.read_value()
+                else:
+                    scanner.skip_value()
+        else:
+            scanner.skip_value()
+    return rows, cols, first_zone
+
+
+def scan_log(json_file, threaded=False, header=None):
+    """Scan a log file and return its summary as a dict
+
+    Args:
+        json_file: Path to JSON file (or .json.gz, .ndjson, .ndjson.gz)
+        threaded: decompress in a background thread while scanning
+        header: dict receiving the complete top-level entries (configuration, info)
+
+    Raises:
+        ValueError: the file is JSON but not a log (no Result_Set)
+    """
+    start = time.perf_counter()
+
+    if header is None:
+        header = {}
+    frame_numbers = array('q')
+    read_times = array('q')
+    systick_t0 = array('q')
+    temperatures = array('d')
+    warning_frames = 0
+    warning_total = 0
+    histogram_frames = collections.Counter()
+    frames = 0
+    rows = cols = 0
+    first_zone = None
+
+    def scan_frame(scanner):
+        nonlocal frames, rows, cols, first_zone, warning_frames, warning_total
+        frames += 1
+        for frame_key in scanner.iter_object():
+            if frame_key == 'info':
+                info = scanner.read_value()
+                if 'frame_number' in info:
+                    frame_numbers.append(info['frame_number'])
+                if 'read_time' in info:
+                    read_times.append(info['read_time'])
+                if 'systick_t0' in info:
+                    systick_t0.append(info['systick_t0'])
+                if 'temperature' in info:
+                    temperatures.append(info['temperature'])
+                if info.get('warnings', 0) > 0:
+                    warning_frames += 1
+                    warning_total += info['warnings']
+            elif frame_key == 'results' and first_zone is None:
+                rows, cols, first_zone = _results_shape(scanner)
+            elif frame_key in ('mp_histo', 'ref_histo'):
+                if not scanner.is_empty():
+                    histogram_frames[frame_key] += 1
+                scanner.skip_value()
+            else:
+                scanner.skip_value()
+
+    if ndjson.is_ndjson(json_file):
+        # Header line, then one frame per line
+        lines = ndjson.iter_lines(json_file, threaded)
+        line = next(lines, b'')
+        decompressed = len(line) + 1
+        header.update(ndjson.read_header(line, json_file)['header'])
+        for line in lines:
+            decompressed += len(line) + 1
+            if line.strip():
+                scan_frame(JsonScanner(io.BytesIO(line)))
+    else:
+        has_results = False
+        with open_binary(json_file, threaded) as f:
+            scanner = JsonScanner(f)
+            for key in scanner.iter_object():
+                if key != 'Result_Set':
+                    header[key] = scanner.read_value()
+                    continue
+                has_results = True
+                for _ in scanner.iter_array():
+                    scan_frame(scanner)
+            decompressed = scanner.tell()
+        if not has_results:
+            # Other JSON files, e.g. the reports and sidecars written by the tools
+            raise ValueError(f"{json_file} is not a TMF8829 log: no Result_Set")
+
+    # Register fields of the blob fill in named entries the logger did not write
+    configuration = compact_configuration(header.get('configuration', {}))
+    try:
+        blob = decode_blob(header.get('configuration', {}).get('blob'))
+    except ValueError:
+        blob = None
+    info_list = header.get('info', [])
+    device_info = info_list[0] if isinstance(info_list, list) and info_list else info_list if isinstance(info_list, dict) else {}
+
+    # Frame numbers advance by a fixed step, every other difference is a gap
+    diffs = [b - a for a, b in zip(frame_numbers, frame_numbers[1:])]
+    step = collections.Counter(diffs).most_common(1)[0][0] if diffs else None
+    gaps = []
+    out_of_order = 0
+    for index, diff in enumerate(diffs):
+        if diff <= 0:
+            out_of_order += 1
+        elif diff != step:
+            gaps.append({'after': frame_numbers[index], 'next': frame_numbers[index + 1],
+                         'missing': diff // step - 1 if step and step > 0 else None})
+
+    def span(values):
+        if not values:
+            return None
+        return {'first': values[0], 'last': values[-1], 'min': min(values), 'max': max(values),
+                'span': values[-1] - values[0]}
+
+    time_span = span(read_times)
+    frame_rate = None
+    if time_span and time_span['span'] > 0 and len(read_times) > 1:
+        # read_time ticks are microseconds
+        frame_rate = (len(read_times) - 1) / (time_span['span'] / 1e6)
+
+    peaks = first_zone.get('peaks', []) if isinstance(first_zone, dict) else []
+    return {
+        'file': json_file,
+        'file_bytes': os.path.getsize(json_file),
+        'decompressed_bytes': decompressed,
+        'scan_seconds': round(time.perf_counter() - start, 6),
+        'device': device_info,
+        'configuration': {key: configuration.get(key) for key in
+                          ('period', 'iterations', 'high_accuracy_iterations', 'nr_peaks', 'histograms',
+                           'confidence_threshold', 'mp_top_x', 'mp_top_y', 'mp_bottom_x', 'mp_bottom_y')
+                          if key in configuration},
+        'config_blob': {'bytes': len(blob), 'sha1': blob.sha1,
+                        'mismatches': sorted(check_blob(header['configuration']))} if blob else None,
+        'frames': frames,
+        'frame_number': span(frame_numbers),
+        'frame_step': step,
+        'gaps': gaps,
+        'missing_frames': sum(g['missing'] or 0 for g in gaps),
+        'out_of_order': out_of_order,
+        'read_time': time_span,
+        'systick_t0': span(systick_t0),
+        'frame_rate': round(frame_rate, 3) if frame_rate else None,
+        'warning_frames': warning_frames,
+        'warnings_total': warning_total,
+        'temperature': {'min': min(temperatures), 'max': max(temperatures)} if temperatures else None,
+        'resolution': {'cols': cols, 'rows': rows} if rows else None,
+        'peaks_per_zone': len(peaks),
+        'zone_fields': sorted(k for k in first_zone if k != 'peaks') if isinstance(first_zone, dict) else [],
+        'peak_fields': list(peaks[0]) if peaks else [],
+        'histogram_frames': {key: histogram_frames.get(key, 0) for key in ('mp_histo', 'ref_histo')},
+    }
+
+
+def print_summary(summary):
+    """Print a scan summary in human-readable form"""
+    mb = 1024 * 1024
+    print(f"Scan of {summary['file']} ({summary['file_bytes'] / mb:.2f} MB, "
+          f"{summary['decompressed_bytes'] / mb:.2f} MB decompressed) in {summary['scan_seconds']:.3f} s")
+
+    device = summary['device']
+    def version(key):
+        value = device.get(key)
+        return '.'.join(str(v) for v in value) if isinstance(value, list) else value if value not in (None, '') else 'N/A'
+    print(f"  Device:        FW {version('fw version')} | Logger {version('logger version')} | "
+          f"Serial {version('serial number')}")
+    if summary['configuration']:
+        print("  Configuration: " + ' | '.join(f"{k} {v}" for k, v in summary['configuration'].items()))
+    blob = summary['config_blob']
+    if blob:
+        check = f"differs from {', '.join(blob['mismatches'])}" if blob['mismatches'] else 'matches the entries'
+        print(f"  Config blob:   {blob['bytes']} bytes, sha1 {blob['sha1'][:12]}, {check}")
+
+    numbers = summary['frame_number']
+    if numbers:
+        print(f"  Frames:        {summary['frames']} (frame_number {numbers['first']} .. {numbers['last']}, "
+              f"step {summary['frame_step']})")
+    else:
+        print(f"  Frames:        {summary['frames']}")
+    gaps = summary['gaps']
+    print(f"  Gaps:          {len(gaps)} ({summary['missing_frames']} frames missing)"
+          + (f", {summary['out_of_order']} out of order" if summary['out_of_order'] else ''))
+    for gap in gaps[:10]:
+        print(f"                 {gap['after']} -> {gap['next']}")
+    if len(gaps) > 10:
+        print(f"                 ... {len(gaps) - 10} more")
+
+    read_time = summary['read_time']
+    if read_time:
+        rate = f", {summary['frame_rate']:.1f} frames/s" if summary['frame_rate'] else ''
+        print(f"  Time span:     {read_time['span'] / 1e6:.3f} s (read_time {read_time['first']} .. {read_time['last']}{rate})")
+    print(f"  Warnings:      {summary['warning_frames']} frame(s), {summary['warnings_total']} total")
+    if summary['temperature']:
+        print(f"  Temperature:   {summary['temperature']['min']:g} .. {summary['temperature']['max']:g} °C")
+    if summary['resolution']:
+        print(f"  Resolution:    {summary['resolution']['cols']}x{summary['resolution']['rows']}, "
+              f"{summary['peaks_per_zone']} peak(s) per zone ({', '.join(summary['peak_fields'])})")
+    histo = summary['histogram_frames']
+    print(f"  Histograms:    mp_histo in {histo['mp_histo']} frame(s), ref_histo in {histo['ref_histo']} frame(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize TMF8829 JSON log files without a full parse')
+    parser.add_argument('-i', '--input', required=True, nargs='+',
+                        help='Path(s) to JSON file(s) (supports both .json and .json.gz)')
+    parser.add_argument('--json', action='store_true', help='Print the summaries as JSON')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress in a background thread overlapping with scanning')
+    args = parser.parse_args()
+
+    summaries = [scan_log(json_file, args.threaded) for json_file in args.input]
+    if args.json:
+        print(json.dumps(summaries if len(summaries) > 1 else summaries[0], indent=2))
+    else:
+        for summary in summaries:
+            print_summary(summary)
+
+if __name__ == "__main__":
+    main()
@@ -11,33 +11,40 @@
 Split TMF8829 JSON log file into multiple parts
 '''
 
-import json
 import argparse
 import os
-import gzip
 
-def split_json(input_file, output_dir=None, frames_per_file=50):
+import profiling
+import tmf8829log
+
+def split_json(input_file, output_dir=None, frames_per_file=50, profiler=None, threaded=False, salvage=False):
     """Split JSON file into multiple parts
 
     Args:
         input_file: Path to input JSON file (can be .json.gz for compressed files)
         output_dir: Directory to save output files (default: same as input file)
         frames_per_file: Number of frames per output file (default: 50)
+        profiler: profiling.Profiler collecting phase timings (optional)
+        threaded: run decompression and compression in background threads
+        salvage: split the complete frames of a truncated or damaged log
     """
-    # Determine if input file is compressed
-    is_compressed = input_file.endswith('.gz')
-
-    # Load the original JSON file
-    open_func = gzip.open if is_compressed else open
-    mode = 'rt' if is_compressed else 'r'
+    if profiler is None:
+        profiler = profiling.Profiler('split_json')
+    profiler.reset(input_file)
 
-    with open_func(input_file, mode, encoding='utf-8') as f:
-        data = json.load(f)
+    # Determine if input file is compressed, NDJSON logs are split into NDJSON parts
+    is_compressed = input_file.endswith('.gz')
+    is_ndjson = tmf8829log.is_ndjson(input_file)
 
-    # Get result set
-    result_set = data.get('Result_Set', [])
+    # Load the original JSON file, the results of the frames are packed on first use
+    with profiler.phase('parse'):
+        log = tmf8829log.load(input_file, threaded, salvage=salvage)
+    profiler.add_input(input_file, log.decompressed_bytes)
+    if log.damage is not None and log.damage.damaged:
+        print('\n'.join(log.damage.describe()))
 
-    total_frames = len(result_set)
+    total_frames = len(log)
+    profiler.frames = total_frames
 
     print(f"Total frames in original file: {total_frames}")
     print(f"Frames per output file: {frames_per_file}")
@@ -59,26 +66,26 @@ def split_json(input_file, output_dir=None, frames_per_file=50):
     total_size = 0
 
     # Determine output extension
-    output_ext = '.json.gz' if is_compressed else '.json'
+    output_ext = '.ndjson' if is_ndjson else '.json'
+    if is_compressed:
+        output_ext += '.gz'
 
     # Split into multiple parts
     for i in range(num_parts):
         start_idx = i * frames_per_file
         end_idx = min((i + 1) * frames_per_file, total_frames)
 
-        # Create data for this part
-        data_part = data.copy()
-        data_part['Result_Set'] = result_set[start_idx:end_idx]
-
         # Create output filename
         output_file = os.path.join(output_dir, f"{input_basename}_part{i+1}{output_ext}")
 
-        # Write the part (compressed if input was compressed)
-        write_func = gzip.open if is_compressed else open
-        write_mode = 'wt' if is_compressed else 'w'
-
-        with write_func(output_file, write_mode, encoding='utf-8') as f:
-            json.dump(data_part, f, indent=2, ensure_ascii=False)
+        # Write the part (compressed if input was compressed), one frame at a time
+        with profiler.phase('write'):
+            if is_ndjson:
+                tmf8829log.write_ndjson(log, output_file, start_idx, end_idx)
+            else:
+                with tmf8829log.open_output(output_file, threaded) as f:
+                    tmf8829log.write_log(log, f, start_idx, end_idx, indent=2, ensure_ascii=False)
+        profiler.add_output(output_file)
 
         # Get file size
         file_size = os.path.getsize(output_file) / (1024 * 1024)
@@ -102,6 +109,7 @@ def split_json(input_file, output_dir=None, frames_per_file=50):
         end_idx = min((i + 1) * frames_per_file, total_frames)
         print(f"  Part {i+1}: {end_idx - start_idx} frames ({file_size:.2f} MB)")
     print(f"  Total output size: {total_size:.2f} MB")
+    profiler.report()
 
 def main():
     parser = argparse.ArgumentParser(description='Split TMF8829 JSON log file into multiple parts')
@@ -110,9 +118,17 @@ def main():
     parser.add_argument('-o', '--output-dir', help='Output directory (default: same as input file)')
     parser.add_argument('-n', '--frames-per-file', type=int, default=50,
                        help='Number of frames per output file (default: 50)')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress, compress and write in background threads overlapping with parsing')
+    parser.add_argument('--salvage', action='store_true',
+                        help='Split the complete frames of a truncated or damaged log instead of failing')
+    profiling.add_arguments(parser)
     args = parser.parse_args()
+    profiler = profiling.from_args(args, 'split_json')
 
-    split_json(args.input, args.output_dir, args.frames_per_file)
+    with profiler.hot_path():
+        split_json(args.input, args.output_dir, args.frames_per_file, profiler, args.threaded, args.salvage)
+    profiler.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Heatmap thumbnails of every frame packed into PNG sprite sheets
+
+Every frame becomes a tile with one pixel (or scale x scale pixels) per
+zone, coloured by the distance or SNR of its first peak on the blue (low)
+to red (high) scale of the viewer heatmaps, over the range of the whole
+capture. Zones without a target are light grey. The tiles are packed row by
+row into sheets of at most MAX_SHEET x MAX_SHEET pixels and encoded as PNG
+with zlib, the whole sheet at once with NumPy (no imaging library needed).
+
+json_to_html.py --sprites embeds the sheets for a hover preview on the
+frame slider and a filmstrip; sprites.py writes them as PNG files with a
+JSON index next to the log. Requires numpy.
+'''
+
+import argparse
+import base64
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+import tmf8829log
+from frame_store import FrameStore
+
+FIELDS = ('distance', 'snr')
+MAX_SHEET = 4096                    # pixels, sheets stay below the image size limits of browsers
+MISSING_COLOR = (221, 221, 221)     # zones without a target
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def heat_lut(size=256):
+    """RGB colours (size, 3) uint8 of hsl((1 - t) * 240, 75%, 55%), t = 0..1 (hues of heatColor() in the viewer)"""
+    hue = (1 - np.linspace(0, 1, size)) * 240
+    lightness, saturation = 0.55, 0.75
+    chroma = (1 - abs(2 * lightness - 1)) * saturation
+    # hsl -> rgb: f(n) = l - a * max(-1, min(k - 3, 9 - k, 1)), k = (n + h / 30) mod 12
+    k = (np.array([0, 8, 4])[None, :] + hue[:, None] / 30) % 12
+    rgb = lightness - chroma / 2 * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+    return np.round(rgb * 255).astype(np.uint8)
+
+
+def png_chunk(tag, data):
+    """PNG chunk: length, tag, data, CRC"""
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def png_header(width, height):
+    """PNG signature and IHDR chunk of an 8-bit RGB image"""
+    return PNG_SIGNATURE + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+
+def deflate_image(image, level=6):
+    """zlib stream of the filtered rows of an image (height, width, 3) uint8, the IDAT data of a PNG
+
+    All rows use the Up filter (difference to the row above), computed for
+    the whole image at once; tiles stacked vertically compress well with it.
+    """
+    height, width, _ = image.shape
+    rows = image.reshape(height, width * 3)
+    filtered = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+    return zlib.compress(filtered.tobytes(), level)
+
+
+def encode_png(image, level=6):
+    """PNG (8-bit RGB) of an image array (height, width, 3) uint8"""
+    height, width, _ = image.shape
+    return (png_header(width, height) + png_chunk(b'IDAT', deflate_image(image, level))
+            + png_chunk(b'IEND', b''))
+
+
+class SpriteSheets:
+    """Heatmap tiles of all frames packed into PNG sheets
+
+    Attributes:
+        field: 'distance' or 'snr'
+        range: (low, high) of the colour scale
+        tile_width, tile_height: tile size in pixels
+        per_row: tiles per row of a sheet
+        per_sheet: tiles per sheet
+        sheets: list of (width, height, png bytes)
+        frames: number of tiles
+    """
+
+    def __init__(self, field, value_range, tile_width, tile_height, per_row, per_sheet, sheets, frames):
+        self.field = field
+        self.range = value_range
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.per_row = per_row
+        self.per_sheet = per_sheet
+        self.sheets = sheets
+        self.frames = frames
+
+    @property
+    def size(self):
+        """Bytes of all PNG sheets"""
+        return sum(len(png) for _, _, png in self.sheets)
+
+    def index(self, files=None):
+        """Layout of the sheets as dict (files: names of the sheet files, else they are omitted)"""
+        index = {
+            'field': self.field,
+            'range': [float(value) for value in self.range],
+            'frames': self.frames,
+            'tileWidth': self.tile_width,
+            'tileHeight': self.tile_height,
+            'perRow': self.per_row,
+            'perSheet': self.per_sheet,
+            'sheets': [{'width': width, 'height': height} for width, height, _ in self.sheets],
+        }
+        if files:
+            for sheet, name in zip(index['sheets'], files):
+                sheet['file'] = name
+        return index
+
+    def viewer_payload(self):
+        """index() with the sheets as base64 PNG for json_to_html.py"""
+        payload = self.index()
+        for sheet, (_, _, png) in zip(payload['sheets'], self.sheets):
+            sheet['png'] = base64.b64encode(png).decode('ascii')
+        return payload
+
+    def save(self, directory, stem):
+        """Write stem_sprites_N.png and stem_sprites.json into directory, return the index path"""
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for number, (_, _, png) in enumerate(self.sheets):
+            files.append(f'{stem}_sprites_{number}.png')
+            with open(os.path.join(directory, files[-1]), 'wb') as f:
+                f.write(png)
+        path = os.path.join(directory, f'{stem}_sprites.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.index(files), f, indent=2)
+        return path
+
+
+def render_tiles(store, field='distance', value_range=None, scale=1):
+    """Heatmap tiles (frames, rows * scale, cols * scale, 3) uint8 of the first peak of a field
+
+    Args:
+        store: FrameStore with distance (and the field) peak values
+        field: 'distance' or 'snr'
+        value_range: (low, high) of the colour scale (default: 1st to 99th
+                     percentile of the capture)
+        scale: pixels per zone
+
+    Returns:
+        (tiles, (low, high))
+    """
+    if field not in store.peak_fields or 'distance' not in store.peak_fields:
+        raise ValueError(f"The log has no '{field}' peak values")
+    values = store.field(field, 0)
+    with np.errstate(invalid='ignore'):
+        target = store.field('distance', 0) > 0
+    if value_range is None:
+        finite = values[target]
+        value_range = tuple(np.percentile(finite, [1, 99])) if finite.size else (0.0, 1.0)
+    low, high = value_range
+    lut = heat_lut()
+    with np.errstate(invalid='ignore'):
+        level = np.clip((values - low) / max(high - low, 1e-9), 0, 1)
+    level = np.where(target, level, 0)
+    tiles = lut[np.round(level * (len(lut) - 1)).astype(np.intp)]
+    tiles[~target] = MISSING_COLOR
+    tiles = tiles.reshape(store.frames, store.rows, store.cols, 3)
+    if scale > 1:
+        tiles = tiles.repeat(scale, axis=1).repeat(scale, axis=2)
+    return tiles, (float(low), float(high))
+
+
+def pack_sheets(tiles, max_sheet=MAX_SHEET, level=6):
+    """Pack tiles (frames, height, width, 3) row by row into PNG sheets
+
+    Returns:
+        (per_row, per_sheet, [(width, height, png), ...])
+    """
+    frames, tile_height, tile_width, _ = tiles.shape
+    per_row = max(1, min(frames, max_sheet // tile_width))
+    per_sheet = per_row * max(1, max_sheet // tile_height)
+    sheets = []
+    for start in range(0, frames, per_sheet):
+        part = tiles[start:start + per_sheet]
+        tile_rows = -(-len(part) // per_row)
+        if len(part) < tile_rows * per_row:
+            pad = np.full((tile_rows * per_row - len(part),) + part.shape[1:], 255, dtype=np.uint8)
+            part = np.concatenate([part, pad])
+        # (tile_rows, per_row, h, w, 3) -> (tile_rows, h, per_row, w, 3) -> image
+        image = part.reshape(tile_rows, per_row, tile_height, tile_width, 3).transpose(0, 2, 1, 3, 4)
+        image = image.reshape(tile_rows * tile_height, per_row * tile_width, 3)
+        sheets.append((image.shape[1], image.shape[0], encode_png(image, level)))
+    return per_row, per_sheet, sheets
+
+
+def build_sprites(store, field='distance', value_range=None, scale=1, max_sheet=MAX_SHEET):
+    """SpriteSheets of a FrameStore (see render_tiles() and pack_sheets())"""
+    if field not in FIELDS:
+        raise ValueError(f"Sprites are rendered from {' or '.join(FIELDS)}, not '{field}'")
+    tiles, value_range = render_tiles(store, field, value_range, scale)
+    per_row, per_sheet, sheets = pack_sheets(tiles, max_sheet)
+    return SpriteSheets(field, value_range, tiles.shape[2], tiles.shape[1], per_row, per_sheet, sheets, len(tiles))
+
+
+def _stem(path):
+    stem, ext = tmf8829log.split_log_name(os.path.basename(path))
+    return stem if ext else os.path.splitext(stem)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Heatmap thumbnails of all frames of a TMF8829 log as PNG '
+                                                 'sprite sheets')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Output directory (default: next to the log)')
+    parser.add_argument('-f', '--field', choices=FIELDS, default='distance',
+                        help='Peak field of the heatmaps (default: distance)')
+    parser.add_argument('--scale', type=int, default=1, help='Pixels per zone (default: 1)')
+    parser.add_argument('--range', type=float, nargs=2, metavar=('LOW', 'HIGH'),
+                        help='Colour scale (default: 1st to 99th percentile of the capture)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = FrameStore.load(args.input, fields=('distance', args.field), peaks=1)
+    loaded = time.perf_counter()
+    sprites = build_sprites(store, args.field, args.range, args.scale)
+    rendered = time.perf_counter()
+    path = sprites.save(args.output or os.path.dirname(os.path.abspath(args.input)), _stem(args.input))
+
+    print(f"✓ {args.input} -> {path}")
+    print(f"  {sprites.frames} tiles of {sprites.tile_width}x{sprites.tile_height} px in "
+          f"{len(sprites.sheets)} sheet(s), {sprites.size / 1024:.1f} KB, "
+          f"{args.field} {sprites.range[0]:.0f} … {sprites.range[1]:.0f}")
+    print(f"  load {loaded - start:.3f} s, render and encode {rendered - loaded:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+A/B comparison: a frame pair whose mp_histo differs in shape is left out of
+the histogram layers instead of failing the comparison
+'''
+
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import compare_logs  # noqa: E402
+import tmf8829log  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'tmf8829_log_1770799073.json.gz')
+
+
+def test_histogram_shape_change_in_later_pair():
+    log_a = tmf8829log.load(SAMPLE)
+    log_b = tmf8829log.load(SAMPLE)
+    frame = log_b.frames[5].to_dict()
+    frame['mp_histo'] = frame['mp_histo'][:8]
+    log_b.frames[5] = tmf8829log.Frame.from_dict(frame)
+
+    difference = compare_logs.compare_logs(log_a, log_b).diffs['histogram difference']
+    macro_pixels = len(log_a.frames[0]['mp_histo'])
+    compared = ~np.isnan(difference[:, :macro_pixels]).all(axis=1)
+    assert not compared[5]
+    assert compared.sum() == len(log_a) - 1
+    assert np.nanmax(difference) == 0
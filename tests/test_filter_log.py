@@ -0,0 +1,55 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Temporal filter of the sample log: samples rejected by --min-snr alone hold
+the last accepted value of their zone
+'''
+
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import filter_log  # noqa: E402
+import tmf8829log  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'tmf8829_log_1770799073.json.gz')
+MIN_SNR = 40
+
+
+def test_min_snr_holds_last_accepted(tmp_path):
+    output = str(tmp_path / 'filtered.json.gz')
+    temporal_filter = filter_log.TemporalFilter(('distance',), min_snr=MIN_SNR)
+    filter_log.filter_log(SAMPLE, output, temporal_filter)
+    assert temporal_filter.rejected and temporal_filter.changed
+
+    original = tmf8829log.load(SAMPLE).frames
+    filtered = tmf8829log.load(output).frames
+    assert len(filtered) == len(original)
+    last = {}
+    held = 0
+    for before, after in zip(original, filtered):
+        distances = before.column('distance')
+        snrs = before.column('snr')
+        for zone, (distance, snr, value) in enumerate(zip(distances, snrs, after.column('distance'))):
+            if not distance or distance <= 0:
+                assert value == distance
+            elif snr >= MIN_SNR:
+                assert value == distance
+                last[zone] = distance
+            elif zone in last:
+                assert value == last[zone]
+                held += value != distance
+            else:
+                assert value == distance
+    assert held
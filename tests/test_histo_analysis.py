@@ -0,0 +1,47 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Histogram analysis of the sample log: the histogram peaks must agree with the
+firmware distances of the zones their macro pixels belong to
+'''
+
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import histo_analysis  # noqa: E402
+import tmf8829log  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'tmf8829_log_1770799073.json.gz')
+
+
+def test_parse_histogram_keeps_order():
+    raw = b'[[{"bin":[1,2,3]},{"bin":[4,5,6]}],[{"bin":[7,8,9]},{"bin":[10,11,12]}]]'
+    assert histo_analysis.parse_histogram(raw, 12).tolist() == list(range(1, 13))
+    with pytest.raises(ValueError):
+        histo_analysis.parse_histogram(raw, 16)
+
+
+def test_sample_cross_check():
+    analysis = histo_analysis.analyze_histograms(tmf8829log.load(SAMPLE).frames)
+    assert (analysis.rows, analysis.cols, analysis.macro_pixels) == (16, 16, 16)
+
+    analysis.cross_check()
+    assert analysis.calibration is not None
+    mm_per_bin, _ = analysis.calibration
+    assert 100 < mm_per_bin < 150
+    compared = ~np.isnan(analysis.fw_distance)
+    assert compared[..., 0].mean() > 0.9
+    assert np.nanmedian(np.abs(analysis.residual[compared])) < 0.1 * mm_per_bin
+    assert analysis.mismatch.sum() <= 0.01 * compared.sum()
@@ -0,0 +1,69 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Point cloud exports of a log without x/y/z: the JSON and NDJSON layouts of
+the same log give the same vertices
+
+configuration follows Result_Set in JSON logs, the x/y/z computed from the
+distance must still use its macro pixel window.
+'''
+
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import generate_log  # noqa: E402
+import json_to_ndjson  # noqa: E402
+import point_cloud  # noqa: E402
+from tmf8829log import format_json  # noqa: E402
+
+WINDOW = {'mp_top_x': 4, 'mp_bottom_x': 11, 'mp_top_y': 4, 'mp_bottom_y': 11}
+
+
+@pytest.fixture
+def log_without_xyz(tmp_path):
+    """JSON log of 8x8 zones without x/y/z and the macro pixel window 4..11"""
+    generator = generate_log.LogGenerator(cols=8, rows=8, histograms=False)
+    frames = []
+    for index in range(5):
+        frame = generator.frame(index)
+        for row in frame['results']:
+            for zone in row:
+                for peak in zone['peaks']:
+                    for name in ('x', 'y', 'z'):
+                        del peak[name]
+        frames.append(frame)
+    configuration = generate_log.make_configuration(cols=8, rows=8, histograms=False)
+    configuration.update(WINDOW)
+    path = tmp_path / 'window.json'
+    path.write_text(format_json({'Result_Set': frames, 'configuration': configuration,
+                                 'info': [{'logger version': '4'}]}) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_json_and_ndjson_vertices_match(log_without_xyz, tmp_path):
+    ndjson_file = json_to_ndjson.convert(log_without_xyz, str(tmp_path / 'window.ndjson'), workers=1)
+    from_json = np.concatenate(list(point_cloud.iter_vertices(log_without_xyz, workers=1)))
+    for workers in (1, 2):
+        from_ndjson = np.concatenate(list(point_cloud.iter_vertices(ndjson_file, workers=workers)))
+        assert from_json.tobytes() == from_ndjson.tobytes()
+
+    # Same x/y/z as the geometry engine of the frame store
+    cloud = point_cloud.PointCloud.load(log_without_xyz)
+    assert len(from_json) == int(cloud.valid.sum())
+    xyz = np.stack([from_json[name] for name in ('x', 'y', 'z')], axis=-1)
+    np.testing.assert_allclose(xyz, cloud.xyz[cloud.valid], atol=0.01)
+    default = np.concatenate([point_cloud.frame_vertices(frame) for frame in
+                              point_cloud.tmf8829log.load(log_without_xyz).frames])
+    assert np.abs(default['x'] - from_json['x']).max() > 1
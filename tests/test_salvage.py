@@ -0,0 +1,138 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Salvage of truncated logs: exactly the complete leading frames of the
+original are recovered, and Damage tells where the log stops
+
+The sample log is cut inside Result_Set as plain JSON, as gzip stream and
+as NDJSON.
+'''
+
+import gzip
+import io
+import os
+import sys
+import zlib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import salvage_log  # noqa: E402
+import tmf8829log  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'tmf8829_log_1770799073.json.gz')
+
+
+@pytest.fixture(scope='module')
+def sample():
+    """(JSON text of the sample, end offset of every frame, frames as JSON)"""
+    data = gzip.decompress(open(SAMPLE, 'rb').read())
+    scanner = tmf8829log.JsonScanner(io.BytesIO(data))
+    ends = []
+    for key in scanner.iter_object():
+        if key != 'Result_Set':
+            scanner.skip_value()
+            continue
+        for _ in scanner.iter_array():
+            scanner.skip_value()
+            ends.append(scanner.tell())
+    return data, ends, [frame.to_json() for frame in tmf8829log.load(SAMPLE).frames]
+
+
+def cut_points(ends):
+    """Cuts before, at and after frame ends and in the middle of frames"""
+    points = {ends[0] // 2, ends[-1] - 1}
+    for index in (0, 1, len(ends) // 2, len(ends) - 2):
+        points.update((ends[index] - 1, ends[index], ends[index] + 1, (ends[index] + ends[index + 1]) // 2))
+    return sorted(points)
+
+
+def check_frames(log, expected, frames):
+    assert [frame.to_json() for frame in log.frames] == frames[:expected]
+
+
+def test_truncated_json(sample, tmp_path):
+    data, ends, frames = sample
+    path = str(tmp_path / 'cut.json')
+    for cut in cut_points(ends):
+        with open(path, 'wb') as f:
+            f.write(data[:cut])
+        expected = sum(end <= cut for end in ends)
+        log = tmf8829log.load(path, salvage=True)
+        check_frames(log, expected, frames)
+        damage = log.damage
+        assert damage.damaged and damage.frames == expected
+        assert damage.offset == (ends[expected - 1] if expected else 0)
+        assert damage.error_offset == cut
+        assert damage.compressed is None
+        assert damage.missing == ['configuration', 'info']
+
+
+def test_truncated_gzip(sample, tmp_path):
+    data, ends, frames = sample
+    compressed = gzip.compress(data)
+    path = str(tmp_path / 'cut.json.gz')
+    for cut in (len(compressed) // 5, len(compressed) // 2, len(compressed) * 4 // 5):
+        with open(path, 'wb') as f:
+            f.write(compressed[:cut])
+        available = len(zlib.decompressobj(31).decompress(compressed[:cut]))
+        expected = sum(end <= available for end in ends)
+        log = tmf8829log.load(path, salvage=True)
+        check_frames(log, expected, frames)
+        damage = log.damage
+        assert damage.frames == expected
+        assert damage.offset == (ends[expected - 1] if expected else 0)
+        assert damage.error_offset == available
+        assert damage.compressed is not None and damage.compressed_offset == cut
+
+
+def test_truncated_ndjson(sample, tmp_path):
+    _, _, frames = sample
+    full = str(tmp_path / 'full.ndjson')
+    tmf8829log.write_ndjson(tmf8829log.load(SAMPLE), full)
+    with open(full, 'rb') as f:
+        data = f.read()
+    # End of every frame line without and with its newline
+    lines = data.split(b'\n')
+    ends = []
+    offset = len(lines[0]) + 1
+    for line in lines[1:]:
+        if line:
+            ends.append(offset + len(line))
+        offset += len(line) + 1
+    assert len(ends) == len(frames)
+
+    path = str(tmp_path / 'cut.ndjson')
+    for cut in cut_points(ends):
+        with open(path, 'wb') as f:
+            f.write(data[:cut])
+        expected = sum(end <= cut for end in ends)
+        log = tmf8829log.load(path, salvage=True)
+        check_frames(log, expected, frames)
+        damage = log.damage
+        assert damage.frames == expected
+        last = ends[expected - 1] if expected else len(lines[0]) + 1
+        assert damage.offset == min(cut, last + 1 if expected else last)
+
+
+def test_salvage_log_writes_leading_frames(sample, tmp_path):
+    data, ends, frames = sample
+    path = str(tmp_path / 'cut.json')
+    cut = (ends[5] + ends[6]) // 2
+    with open(path, 'wb') as f:
+        f.write(data[:cut])
+    for name in ('salvaged.json', 'salvaged.ndjson.gz'):
+        output = str(tmp_path / name)
+        damage, borrowed = salvage_log.salvage_log(path, output, header_from=SAMPLE)
+        assert damage.frames == 6 and damage.offset == ends[5]
+        assert borrowed == ['configuration', 'info']
+        log = tmf8829log.load(output, workers=1)
+        check_frames(log, 6, frames)
+        assert salvage_log.check_log(output).damaged is False
@@ -0,0 +1,74 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Viewers of salvaged logs: the scripts of the generated pages must parse
+
+A truncated log has no configuration and info entries, which takes the
+fallback paths of the embedded data. The scripts are checked with node.
+'''
+
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import json_to_html  # noqa: E402
+import viewer_site  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'tmf8829_log_1770799073.json.gz')
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='node is needed to parse the viewer script')
+
+
+@pytest.fixture
+def truncated_log(tmp_path):
+    """The sample log cut in the middle of Result_Set, gzip stream without end-of-stream marker"""
+    data = open(SAMPLE, 'rb').read()
+    path = tmp_path / 'cut.json.gz'
+    path.write_bytes(data[:len(data) // 2])
+    with pytest.raises(EOFError):
+        gzip.decompress(path.read_bytes())
+    return str(path)
+
+
+def check_scripts(html_file, tmp_path):
+    """Check every inline script of a page with node --check"""
+    with open(html_file, encoding='utf-8') as f:
+        scripts = re.findall(r'<script>(.*?)</script>', f.read(), re.S)
+    assert scripts
+    for index, script in enumerate(scripts):
+        path = tmp_path / f'script{index}.js'
+        path.write_text(script, encoding='utf-8')
+        result = subprocess.run(['node', '--check', str(path)], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+
+def test_salvaged_viewer_parses(truncated_log, tmp_path):
+    output = str(tmp_path / 'viewer.html')
+    json_to_html.generate_html(truncated_log, output, salvage=True, timing=True)
+    with open(output, encoding='utf-8') as f:
+        assert 'const deviceInfo = {};' in f.read()
+    check_scripts(output, tmp_path)
+
+
+def test_salvaged_site_parses(truncated_log, tmp_path):
+    site = tmp_path / 'site'
+    viewer_site.generate_site(truncated_log, str(site), shard_frames=5, workers=1, salvage=True)
+    pages = sorted(site.glob('frames_*.html'))
+    assert pages
+    for page in pages:
+        check_scripts(page, tmp_path)
+    result = subprocess.run(['node', '--check', str(site / 'viewer.js')], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
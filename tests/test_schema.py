@@ -0,0 +1,63 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Schema.set_version(): the fields and csv order follow the new logger version
+'''
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tmf8829log  # noqa: E402
+from tmf8829log import schema as schema_module  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, 'tmf8829_log_1770799073.json.gz')
+
+
+@pytest.fixture
+def frame():
+    return tmf8829log.load(SAMPLE).frames[0]
+
+
+@pytest.fixture
+def version_4(monkeypatch):
+    """Logger version 4 with the peak fields in another csv order"""
+    zone_fields, peak_fields = schema_module.LOGGER_FIELDS['3']
+    peak_fields = ('snr',) + tuple(name for name in peak_fields if name != 'snr')
+    monkeypatch.setitem(schema_module.LOGGER_FIELDS, '4', (zone_fields, peak_fields))
+    return zone_fields, peak_fields
+
+
+def test_set_version_3_to_4(frame, version_4):
+    zone_fields, peak_fields = version_4
+    schema = tmf8829log.Schema('3')
+    assert schema.decoder(frame).peak_names[0] == 'distance'
+    assert schema.fields(('distance', 'snr'), peak=True)[0] == ['distance', 'snr']
+
+    schema.set_version('4')
+    assert schema.version == '4'
+    assert schema.zone_names == zone_fields
+    assert schema.peak_names == peak_fields
+    decoder = schema.decoder(frame)
+    assert decoder.peak_names == list(peak_fields)
+    assert decoder.header(frame)[3:5] == ['snr0', 'distance0']
+    assert schema.fields(('distance', 'snr'), peak=True)[0] == ['snr', 'distance']
+
+
+def test_set_version_unknown_field(frame, monkeypatch):
+    monkeypatch.setitem(schema_module.LOGGER_FIELDS, '4', (('noise', 'xtalk'), ('distance', 'snr')))
+    schema = tmf8829log.Schema('3')
+    schema.decoder(frame)
+    with pytest.raises(tmf8829log.SchemaError):
+        schema.set_version('4')
+    assert schema.version == '3'
+    assert 'signal' in schema.peak_names
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Timing and frame-drop analysis of a TMF8829 log from the frame info blocks
+
+One streaming pass reads only the info block of every frame (frame_number,
+read_time, systick_t0, systick_t1, temperature, warnings); results and
+histograms are skipped without building Python objects, like scan_json.py.
+The report covers:
+
+    frame rate      effective (frames over the read_time span) and nominal
+                    (configuration period)
+    interval        distribution of the read_time differences (ms), jitter
+                    as their standard deviation
+    read latency    distribution of read_time - systick_t0 (ms)
+    dropped frames  runs of missing frame numbers (the most common
+                    frame_number difference is the step)
+    temperature     range, drift (last - first) and linear trend per minute
+    warnings        bursts of consecutive frames with warnings
+
+timing.py prints the report or writes it as JSON for CI dashboards;
+json_to_html.py --timing embeds it with a per-frame timeline (float32
+series) that the viewer draws above the grid. Only the standard library
+is used.
+'''
+
+import argparse
+import base64
+import collections
+import io
+import json
+import math
+import statistics
+import sys
+import time
+from array import array
+
+from tmf8829log import ndjson
+from tmf8829log.json_stream import JsonScanner, open_binary
+
+BURST_FRAMES = 3        # consecutive frames with warnings that count as a burst
+SERIES = ('interval', 'latency', 'dropped', 'temperature', 'warnings')
+
+
+def iter_info(json_file, threaded=False, header=None):
+    """Yield the info dict of every frame of a log ({} for frames without info)
+
+    Args:
+        json_file: Path to JSON file (or .json.gz, .ndjson, .ndjson.gz)
+        threaded: decompress in a background thread while scanning
+        header: dict receiving the top-level entries (configuration, info)
+    """
+    if header is None:
+        header = {}
+
+    def frame_info(scanner):
+        info = {}
+        for key in scanner.iter_object():
+            if key == 'info':
+                info = scanner.read_value()
+            else:
+                scanner.skip_value()
+        return info
+
+    if ndjson.is_ndjson(json_file):
+        lines = ndjson.iter_lines(json_file, threaded)
+        header.update(ndjson.read_header(next(lines, b''), json_file)['header'])
+        for line in lines:
+            if line.strip():
+                yield frame_info(JsonScanner(io.BytesIO(line)))
+    else:
+        with open_binary(json_file, threaded) as f:
+            scanner = JsonScanner(f)
+            for key in scanner.iter_object():
+                if key != 'Result_Set':
+                    header[key] = scanner.read_value()
+                    continue
+                for _ in scanner.iter_array():
+                    yield frame_info(scanner)
+
+
+def _number(info, key):
+    value = info.get(key)
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else math.nan
+
+
+def _percentile(ordered, q):
+    """q-th percentile (0..100) of sorted values, linear interpolation"""
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def distribution(values):
+    """mean/std/min/p50/p95/p99/max of the finite values, None if there are none"""
+    ordered = sorted(value for value in values if math.isfinite(value))
+    if not ordered:
+        return None
+    result = {'count': len(ordered), 'mean': statistics.fmean(ordered),
+              'std': statistics.pstdev(ordered) if len(ordered) > 1 else 0.0, 'min': ordered[0]}
+    for q in (50, 95, 99):
+        result[f'p{q}'] = _percentile(ordered, q)
+    result['max'] = ordered[-1]
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in result.items()}
+
+
+class TimingAnalysis:
+    """Timing of a log fed one info block at a time
+
+    Attributes:
+        frame_numbers: int64 array, -1 for frames without frame_number
+        read_times, systick_t0, temperatures: float64 arrays, NaN if missing
+        warnings: int64 array of the warnings of every frame
+    """
+
+    def __init__(self, configuration=None, burst_frames=BURST_FRAMES):
+        self.configuration = configuration or {}
+        self.burst_frames = burst_frames
+        self.frame_numbers = array('q')
+        self.read_times = array('d')
+        self.systick_t0 = array('d')
+        self.temperatures = array('d')
+        self.warnings = array('q')
+
+    def add(self, info):
+        """Add the info dict of the next frame"""
+        info = info or {}
+        number = info.get('frame_number')
+        self.frame_numbers.append(number if isinstance(number, int) else -1)
+        self.read_times.append(_number(info, 'read_time'))
+        self.systick_t0.append(_number(info, 'systick_t0'))
+        self.temperatures.append(_number(info, 'temperature'))
+        warnings = info.get('warnings')
+        self.warnings.append(warnings if isinstance(warnings, int) else 0)
+
+    @classmethod
+    def from_log(cls, json_file, threaded=False, burst_frames=BURST_FRAMES):
+        """Stream the info blocks of a log file"""
+        header = {}
+        analysis = cls(burst_frames=burst_frames)
+        for info in iter_info(json_file, threaded, header):
+            analysis.add(info)
+        # The configuration may follow Result_Set
+        analysis.configuration = header.get('configuration', {})
+        return analysis
+
+    @property
+    def frames(self):
+        return len(self.frame_numbers)
+
+    def frame_step(self):
+        """Most common positive frame_number difference"""
+        diffs = collections.Counter(b - a for a, b in zip(self.frame_numbers, self.frame_numbers[1:])
+                                    if a >= 0 and b >= 0 and b > a)
+        return diffs.most_common(1)[0][0] if diffs else None
+
+    def dropped(self):
+        """Missing frames before every frame (list of int), and the number of out-of-order frames"""
+        step = self.frame_step()
+        dropped = [0] * self.frames
+        out_of_order = 0
+        for index in range(1, self.frames):
+            a, b = self.frame_numbers[index - 1], self.frame_numbers[index]
+            if a < 0 or b < 0:
+                continue
+            if b <= a:
+                out_of_order += 1
+            elif step and b - a > step:
+                dropped[index] = (b - a) // step - 1
+        return dropped, out_of_order
+
+    def intervals(self):
+        """read_time difference to the previous frame in ms (NaN for the first frame)"""
+        times = self.read_times
+        return [math.nan] + [(b - a) / 1000 for a, b in zip(times, times[1:])]
+
+    def latencies(self):
+        """read_time - systick_t0 of every frame in ms"""
+        return [(read - tick) / 1000 for read, tick in zip(self.read_times, self.systick_t0)]
+
+    def warning_bursts(self):
+        """Runs of at least burst_frames consecutive frames with warnings: [(first index, frames, warnings)]"""
+        bursts = []
+        start = None
+        for index, count in enumerate(list(self.warnings) + [0]):
+            if count > 0 and start is None:
+                start = index
+            elif count <= 0 and start is not None:
+                if index - start >= self.burst_frames:
+                    bursts.append((start, index - start, sum(self.warnings[start:index])))
+                start = None
+        return bursts
+
+    def temperature_trend(self):
+        """first/last/min/max/drift and least squares slope (°C per minute over read_time)"""
+        samples = [(t, c) for t, c in zip(self.read_times, self.temperatures) if math.isfinite(c)]
+        if not samples:
+            return None
+        values = [c for _, c in samples]
+        trend = {'first': values[0], 'last': values[-1], 'min': min(values), 'max': max(values),
+                 'drift': values[-1] - values[0], 'per_minute': None}
+        timed = [(t / 6e7, c) for t, c in samples if math.isfinite(t)]
+        if len(timed) > 1 and timed[-1][0] != timed[0][0]:
+            mean_t = statistics.fmean(t for t, _ in timed)
+            mean_c = statistics.fmean(c for _, c in timed)
+            variance = sum((t - mean_t) ** 2 for t, _ in timed)
+            if variance > 0:
+                trend['per_minute'] = round(sum((t - mean_t) * (c - mean_c) for t, c in timed) / variance, 4)
+        return trend
+
+    def report(self):
+        """Summary of the timing as dict (JSON serializable)"""
+        dropped, out_of_order = self.dropped()
+        runs = [{'index': index, 'after': self.frame_numbers[index - 1], 'next': self.frame_numbers[index],
+                 'missing': missing} for index, missing in enumerate(dropped) if missing]
+        times = [t for t in self.read_times if math.isfinite(t)]
+        span = (times[-1] - times[0]) / 1e6 if len(times) > 1 else None
+        period = self.configuration.get('period')
+        intervals = distribution(self.intervals())
+        bursts = self.warning_bursts()
+        return {
+            'frames': self.frames,
+            'frame_step': self.frame_step(),
+            'duration_s': round(span, 3) if span else None,
+            'frame_rate': round((len(times) - 1) / span, 3) if span else None,
+            'nominal_rate': round(1000 / period, 3) if isinstance(period, (int, float)) and period > 0 else None,
+            'interval_ms': intervals,
+            'jitter_ms': intervals['std'] if intervals else None,
+            'latency_ms': distribution(self.latencies()),
+            'dropped': {'frames': sum(dropped), 'runs': len(runs),
+                        'longest_run': max((run['missing'] for run in runs), default=0),
+                        'out_of_order': out_of_order, 'gaps': runs},
+            'temperature': self.temperature_trend(),
+            'warnings': {'frames': sum(1 for count in self.warnings if count > 0), 'total': sum(self.warnings),
+                         'bursts': [{'index': start, 'frames': frames, 'warnings': total}
+                                    for start, frames, total in bursts],
+                         'longest_burst': max((frames for _, frames, _ in bursts), default=0)},
+        }
+
+    def timeline(self):
+        """Per-frame series (SERIES) as base64 little-endian float32, NaN where unknown"""
+        dropped, _ = self.dropped()
+        series = {
+            'interval': self.intervals(),
+            'latency': self.latencies(),
+            'dropped': dropped,
+            'temperature': self.temperatures,
+            'warnings': self.warnings,
+        }
+        encoded = {}
+        for name in SERIES:
+            values = array('f', series[name])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            encoded[name] = base64.b64encode(values.tobytes()).decode('ascii')
+        return encoded
+
+    def viewer_payload(self):
+        """report() and timeline() for the HTML viewer, see json_to_html.write_html()"""
+        return {'report': self.report(), 'timeline': self.timeline()}
+
+
+def print_report(report):
+    """Print a timing report in human-readable form"""
+    def ms(stats):
+        if not stats:
+            return 'N/A'
+        return (f"p50 {stats['p50']:.1f} | p95 {stats['p95']:.1f} | p99 {stats['p99']:.1f} | "
+                f"{stats['min']:.1f} .. {stats['max']:.1f} ms")
+
+    rate = f"{report['frame_rate']:.2f} frames/s" if report['frame_rate'] else 'N/A'
+    if report['nominal_rate']:
+        rate += f" (nominal {report['nominal_rate']:.2f})"
+    print(f"  Frames:        {report['frames']} (step {report['frame_step']}), "
+          f"{report['duration_s'] or 0:.3f} s, {rate}")
+    print(f"  Interval:      {ms(report['interval_ms'])}")
+    if report['jitter_ms'] is not None:
+        print(f"  Jitter:        {report['jitter_ms']:.2f} ms (std of the interval)")
+    print(f"  Read latency:  {ms(report['latency_ms'])}")
+    dropped = report['dropped']
+    print(f"  Dropped:       {dropped['frames']} frame(s) in {dropped['runs']} run(s), "
+          f"longest {dropped['longest_run']}" + (f", {dropped['out_of_order']} out of order"
+                                                 if dropped['out_of_order'] else ''))
+    for gap in dropped['gaps'][:10]:
+        print(f"                 frame {gap['index']}: {gap['after']} -> {gap['next']} ({gap['missing']} missing)")
+    if len(dropped['gaps']) > 10:
+        print(f"                 ... {len(dropped['gaps']) - 10} more")
+    temperature = report['temperature']
+    if temperature:
+        trend = f", {temperature['per_minute']:+.3f} °C/min" if temperature['per_minute'] is not None else ''
+        print(f"  Temperature:   {temperature['min']:g} .. {temperature['max']:g} °C, "
+              f"drift {temperature['drift']:+g} °C{trend}")
+    warnings = report['warnings']
+    print(f"  Warnings:      {warnings['frames']} frame(s), {warnings['total']} total, "
+          f"{len(warnings['bursts'])} burst(s), longest {warnings['longest_burst']} frames")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Timing and frame-drop analysis of TMF8829 logs from the frame '
+                                                 'info blocks')
+    parser.add_argument('-i', '--input', required=True, nargs='+',
+                        help='Path(s) to JSON file(s) (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Write the report(s) as JSON file')
+    parser.add_argument('--json', action='store_true', help='Print the report(s) as JSON')
+    parser.add_argument('--burst', type=int, default=BURST_FRAMES, metavar='FRAMES',
+                        help=f'Consecutive frames with warnings that count as a burst (default: {BURST_FRAMES})')
+    parser.add_argument('--threaded', action='store_true',
+                        help='Decompress in a background thread overlapping with scanning')
+    args = parser.parse_args()
+
+    reports = []
+    for json_file in args.input:
+        start = time.perf_counter()
+        report = TimingAnalysis.from_log(json_file, args.threaded, args.burst).report()
+        reports.append({'file': json_file, 'scan_seconds': round(time.perf_counter() - start, 6), **report})
+
+    result = reports if len(reports) > 1 else reports[0]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for report in reports:
+            print(f"Timing of {report['file']} (scanned in {report['scan_seconds']:.3f} s)")
+            print_report(report)
+        if args.output:
+            print(f"✓ Report saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+TMF8829 JSON log library
+
+    import tmf8829log
+
+    log = tmf8829log.load('tmf8829_log_1770799073.json.gz')
+    frame = log[0]
+    frame.info['frame_number']
+    frame.column('distance')        # distances of all zones, row major
+    frame.zone(7, 8)['noise']
+    frame['mp_histo']               # decoded on access
+    log.config_blob.registers()     # configuration registers of the blob
+
+    log = tmf8829log.load('cut.json.gz', salvage=True)
+    log.damage.describe()           # where a truncated log stops
+'''
+
+from .config_blob import ConfigBlob, check_blob, compact_configuration, decode_blob
+from .frame import HISTOGRAM_KEYS, Frame, Layout, Zone
+from .json_stream import JsonScanner, TruncatedJsonError, open_binary
+from .log import LOG_EXTENSIONS, Log, iter_frames, load, split_log_name
+from .ndjson import NdjsonWriter, is_ndjson, write_ndjson
+from .salvage import Damage, borrow_header, iter_salvaged
+from .schema import CsvDecoder, Schema, SchemaError, logger_version
+from .threaded_io import DeflateWriter, InflateReader, open_output
+from .writer import compact_frame, format_frame, format_json, write_log
@@ -0,0 +1,155 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Configuration blob of a TMF8829 log
+
+configuration.blob holds the configuration registers of the device as a list
+of hex strings ('0x21', '0x00', ...). decode_blob() turns it into a ConfigBlob
+once: the bytes, their SHA-1 and the register fields. Blobs are interned by
+their SHA-1, so all logs recorded with the same configuration share one
+ConfigBlob and its decoded registers.
+
+    blob = tmf8829log.decode_blob(log.configuration['blob'])
+    blob.hex()                      # compact form, '210008073f...'
+    blob.registers()['period']      # 33
+
+REGISTERS lists the fields whose offset in the blob is known: the value of
+the named configuration entry the logger writes next to the blob occurs at
+exactly one offset. Entries whose value matches several offsets (such as
+int_threshold_high 0xffff) are left out rather than guessed. check_blob()
+reports entries that disagree with the blob.
+'''
+
+import base64
+import hashlib
+
+# name, byte offset, size in bytes (little endian, unsigned), only unambiguous offsets
+REGISTERS = (
+    ('period', 0, 2),
+    ('iterations', 2, 2),
+    ('spad_select', 5, 1),
+    ('dead_time', 7, 1),
+    ('pulse_width', 16, 1),
+    ('current', 17, 1),
+    ('vcsel_period', 20, 1),
+    ('histogram_bins', 30, 2),
+    ('high_accuracy_iterations', 40, 2),
+    ('min_distance_uq', 54, 1),
+    ('i2c_slave_address', 110, 1),
+    ('xtalk_edge', 130, 1),
+    ('motion_distance', 142, 2),
+    ('detect_snr', 144, 1),
+)
+
+_BLOBS = {}
+
+
+class ConfigBlob:
+    """Configuration registers of a log as bytes, shared by all logs with the same blob
+
+    Attributes:
+        data: the blob as bytes
+        sha1: hex SHA-1 of data
+    """
+
+    __slots__ = ('data', 'sha1', '_registers')
+
+    def __init__(self, data, sha1):
+        self.data = data
+        self.sha1 = sha1
+        self._registers = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        return isinstance(other, ConfigBlob) and other.data == self.data
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __reduce__(self):
+        # Unpickled blobs are interned in the receiving process
+        return decode_blob, (self.data,)
+
+    def hex(self):
+        """Compact form, two hex digits per byte"""
+        return self.data.hex()
+
+    def base64(self):
+        return base64.b64encode(self.data).decode('ascii')
+
+    def to_list(self):
+        """Form of the log, ['0x21', '0x00', ...]"""
+        return ['0x%02x' % value for value in self.data]
+
+    def registers(self):
+        """Fields of REGISTERS inside the blob as dict (decoded once per blob)"""
+        if self._registers is None:
+            self._registers = {name: int.from_bytes(self.data[offset:offset + size], 'little')
+                               for name, offset, size in REGISTERS if offset + size <= len(self.data)}
+        return dict(self._registers)
+
+    def __repr__(self):
+        return f"ConfigBlob({len(self.data)} bytes, sha1 {self.sha1[:12]})"
+
+
+def decode_blob(blob):
+    """ConfigBlob of a blob, the same object for every blob with the same content
+
+    Args:
+        blob: list of hex strings or integers as in the log, a hex string
+              (see ConfigBlob.hex()), bytes or a ConfigBlob
+
+    Returns:
+        ConfigBlob, None if blob is None
+    """
+    if blob is None or isinstance(blob, ConfigBlob):
+        return blob
+    if isinstance(blob, (bytes, bytearray)):
+        data = bytes(blob)
+    elif isinstance(blob, str):
+        data = bytes.fromhex(blob[2:] if blob[:2] in ('0x', '0X') else blob)
+    else:
+        try:
+            data = bytes(value if isinstance(value, int) else int(value, 16) for value in blob)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Not a configuration blob: {e}") from None
+    sha1 = hashlib.sha1(data).hexdigest()
+    shared = _BLOBS.get(sha1)
+    if shared is None:
+        shared = _BLOBS[sha1] = ConfigBlob(data, sha1)
+    return shared
+
+
+def compact_configuration(configuration):
+    """Copy of a configuration with the blob as hex string
+
+    Register fields of the blob that have no named entry are added, so tools
+    reading the compact form get the structured configuration of logs that
+    only carry the blob.
+    """
+    compact = dict(configuration or {})
+    try:
+        blob = decode_blob(compact.get('blob'))
+    except ValueError:
+        return compact
+    if blob is not None:
+        compact['blob'] = blob.hex()
+        for name, value in blob.registers().items():
+            compact.setdefault(name, value)
+    return compact
+
+
+def check_blob(configuration):
+    """Named configuration entries that disagree with the blob: {name: (entry, register)}"""
+    blob = decode_blob(configuration.get('blob'))
+    if blob is None:
+        return {}
+    return {name: (configuration[name], value) for name, value in blob.registers().items()
+            if isinstance(configuration.get(name), int) and configuration[name] != value}
@@ -0,0 +1,625 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Compact in-memory frames of a TMF8829 log
+
+A Frame keeps its results and histograms as compact JSON bytes. They are
+turned into the nested lists and dicts of the log only when they are accessed,
+and serialized again without being decoded, so a loaded frame needs a
+fraction of the memory of its dict representation. The results are packed
+into typed columns (one array per zone or peak field) when a field is first
+requested as a column.
+'''
+
+import json
+import re
+from array import array
+from collections.abc import Mapping
+from itertools import chain
+from operator import itemgetter
+
+HISTOGRAM_KEYS = ('mp_histo', 'ref_histo')
+
+_NUMERIC_TEXT = re.compile(r'-?\d+\.(\d+)')
+_INT = {int}
+_FLOAT = {float}
+_PEAKS = itemgetter('peaks')
+_WHITESPACE = b' \t\r\n'
+_WORD = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.+-'
+
+
+def _kind(value):
+    """Storage kind of a results value: 'int', 'float', a format spec such as
+    '.2f' for numbers logged as text, or None if it cannot be stored in a column"""
+    kind = type(value)
+    if kind is int:
+        return 'int'
+    if kind is float:
+        return 'float'
+    if kind is str:
+        m = _NUMERIC_TEXT.fullmatch(value)
+        if m is not None:
+            return f".{len(m.group(1))}f"
+    return None
+
+
+def _column(values, kind):
+    """Pack a list of values into an array, None if a value does not fit kind"""
+    try:
+        if kind == 'int':
+            if _INT.issuperset(map(type, values)):
+                return array('q', values)
+        elif kind == 'float':
+            if _FLOAT.issuperset(map(type, values)):
+                return array('d', values)
+        else:
+            column = array('d', map(float, values))
+            # The text must come back unchanged (which also rejects values other than text)
+            if list(map(('{:' + kind + '}').format, column)) == values:
+                return column
+    except (OverflowError, ValueError):
+        pass
+    return None
+
+
+def _values(column, kind):
+    """Unpack an array created by _column() into a list of log values"""
+    if kind == 'int' or kind == 'float':
+        return column.tolist()
+    return list(map(('{:' + kind + '}').format, column))
+
+
+def compact_json(raw):
+    """Strip the indentation of a JSON histogram payload
+
+    Only done when the payload has no strings besides its "bin" keys, where
+    whitespace would be significant.
+    """
+    if b'"' in raw.replace(b'"bin"', b''):
+        return raw
+    return raw.translate(None, _WHITESPACE)
+
+
+def _compact_results(raw):
+    """Strip the indentation of a JSON results grid, None if a string (key or
+    numeric text) holds other characters than letters, digits and '_.+-'"""
+    if b''.join(raw.split(b'"')[1::2]).translate(None, _WORD):
+        return None
+    return raw.translate(None, _WHITESPACE)
+
+
+def _with_separators(text, separators):
+    """Compact JSON text (no strings with separators) with the separators of json.dumps()"""
+    if separators == (',', ':'):
+        return text
+    item_separator, key_separator = separators or (', ', ': ')
+    return text.replace(',', item_separator).replace(':', key_separator)
+
+
+class Layout:
+    """Grid size, key order and value kinds of the results of a frame
+
+    Frames with the same layout share one instance. The layout is detected
+    once from the first zone of a log and reused for the following frames as
+    long as they match it; its decoder extracts every field of all zones with
+    one precompiled getter instead of looking up the keys value by value.
+    """
+
+    __slots__ = ('rows', 'cols', 'zone_keys', 'zone_fields', 'peak_keys', 'peak_fields', '_peaks_at',
+                 '_zone_getters', '_peak_getters')
+
+    def __init__(self, rows, cols, zone_keys, zone_fields, peak_keys, peak_fields):
+        self.rows = rows
+        self.cols = cols
+        self.zone_keys = zone_keys          # keys of a zone dict in log order
+        self.zone_fields = zone_fields      # ((key, kind), ...) of the scalar zone values
+        self.peak_keys = peak_keys
+        self.peak_fields = peak_fields      # ((key, kind), ...) of the peak values
+        self._peaks_at = zone_keys.index('peaks') if 'peaks' in zone_keys else None
+        self._zone_getters = tuple(itemgetter(key) for key, _ in zone_fields)
+        self._peak_getters = tuple(itemgetter(key) for key, _ in peak_fields)
+
+    def __reduce__(self):
+        # The getters are rebuilt when unpickled
+        return Layout, self.key()
+
+    @classmethod
+    def detect(cls, results):
+        """Derive the layout from the first zone of a results grid, None if not possible"""
+        try:
+            rows = len(results)
+            cols = len(results[0])
+            zone = results[0][0]
+            zone_keys = tuple(zone)
+        except (TypeError, IndexError, KeyError):
+            return None
+
+        zone_fields = []
+        for key in zone_keys:
+            if key == 'peaks':
+                continue
+            kind = _kind(zone[key])
+            if kind is None:
+                return None
+            zone_fields.append((key, kind))
+
+        peak_keys = ()
+        peak_fields = []
+        if 'peaks' in zone_keys:
+            peaks = zone['peaks']
+            if not isinstance(peaks, list) or not peaks or not isinstance(peaks[0], dict):
+                return None
+            peak_keys = tuple(peaks[0])
+            for key in peak_keys:
+                kind = _kind(peaks[0][key])
+                if kind is None:
+                    return None
+                peak_fields.append((key, kind))
+
+        return cls(rows, cols, zone_keys, tuple(zone_fields), peak_keys, tuple(peak_fields))
+
+    def key(self):
+        return (self.rows, self.cols, self.zone_keys, self.zone_fields, self.peak_keys, self.peak_fields)
+
+    @property
+    def fields(self):
+        """All column fields, zone fields first"""
+        return self.zone_fields + self.peak_fields
+
+    def pack(self, results):
+        """Turn a results grid into columns
+
+        Returns:
+            (tuple of arrays, peak counts) or None if the grid does not match
+            the layout. Peak counts is an int if every zone has the same number
+            of peaks, otherwise an array with one count per zone.
+        """
+        if type(results) is not list or len(results) != self.rows:
+            return None
+        cols = self.cols
+        # Whole-grid passes in C: key order of every zone and peak, then one map() per field
+        try:
+            if not all(type(row) is list and len(row) == cols for row in results):
+                return None
+            zones = list(chain.from_iterable(results))
+            if not all(map(self.zone_keys.__eq__, map(tuple, zones))):
+                return None
+            field_values = [list(map(getter, zones)) for getter in self._zone_getters]
+            counts = []
+            if self._peaks_at is not None:
+                peak_lists = list(map(_PEAKS, zones))
+                if not all(type(peaks) is list for peaks in peak_lists):
+                    return None
+                counts = list(map(len, peak_lists))
+                peaks = list(chain.from_iterable(peak_lists))
+                if not all(map(self.peak_keys.__eq__, map(tuple, peaks))):
+                    return None
+                field_values += [list(map(getter, peaks)) for getter in self._peak_getters]
+        except TypeError:
+            # A zone or peak that is not a dict
+            return None
+
+        columns = []
+        for values, (_, kind) in zip(field_values, self.fields):
+            column = _column(values, kind)
+            if column is None:
+                return None
+            columns.append(column)
+
+        if counts and min(counts) == max(counts):
+            counts = counts[0]
+        elif counts:
+            if max(counts) > 255:
+                return None
+            counts = array('B', counts)
+        else:
+            counts = 0
+        return tuple(columns), counts
+
+    def unpack(self, columns, counts):
+        """Rebuild the results grid from columns"""
+        n_zone = len(self.zone_fields)
+        zone_rows = list(zip(*[_values(column, kind) for column, (_, kind) in
+                               zip(columns[:n_zone], self.zone_fields)]))
+        if not zone_rows:
+            zone_rows = [()] * (self.rows * self.cols)
+
+        if self._peaks_at is not None:
+            peak_keys = self.peak_keys
+            peaks = [dict(zip(peak_keys, values)) for values in
+                     zip(*[_values(column, kind) for column, (_, kind) in
+                           zip(columns[n_zone:], self.peak_fields)])]
+            if isinstance(counts, int):
+                grouped = [peaks[i:i + counts] for i in range(0, len(peaks), counts)] if counts else \
+                          [[] for _ in zone_rows]
+            else:
+                grouped = []
+                start = 0
+                for count in counts:
+                    grouped.append(peaks[start:start + count])
+                    start += count
+            at = self._peaks_at
+            zones = [dict(zip(self.zone_keys, values[:at] + (zone_peaks,) + values[at:]))
+                     for values, zone_peaks in zip(zone_rows, grouped)]
+        else:
+            zones = [dict(zip(self.zone_keys, values)) for values in zone_rows]
+
+        cols = self.cols
+        return [zones[i:i + cols] for i in range(0, len(zones), cols)]
+
+
+class Zone:
+    """View of one zone of a frame"""
+
+    __slots__ = ('frame', 'row', 'col')
+
+    def __init__(self, frame, row, col):
+        self.frame = frame
+        self.row = row
+        self.col = col
+
+    @property
+    def index(self):
+        """Zone number in row major order"""
+        return self.row * self.frame.layout.cols + self.col if self.frame.layout else None
+
+    def __getitem__(self, key):
+        return self.frame._zone_value(self.row, self.col, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def peaks(self):
+        return self['peaks']
+
+    def to_dict(self):
+        return self.frame.results[self.row][self.col]
+
+    def __repr__(self):
+        return f"Zone(row={self.row}, col={self.col})"
+
+
+class Frame(Mapping):
+    """One frame of a log with lazily rebuilt results and histograms
+
+    A Frame behaves like the read-only frame dict of the log: frame['info'],
+    frame['results'], frame['mp_histo'], 'mp_histo' in frame, frame.items().
+    results and the histograms are rebuilt on every access, keep the returned
+    object when it is used repeatedly.
+
+    Args:
+        keys: frame keys in log order
+        info: info dict of the frame
+        results: results grid (list of rows of zone dicts), its JSON text
+                 (bytes, packed into columns on first use) or None
+        histograms: dict histogram key -> JSON bytes of the payload
+        extra: dict with any other frame entries
+        cache: dict shared between the frames of a log to deduplicate
+               layouts and key tuples, and holding the layout of the
+               previous frame
+    """
+
+    __slots__ = ('info', '_layout', '_keys', '_columns', '_counts', '_results', '_results_json', '_cache',
+                 '_histograms', '_extra')
+
+    def __init__(self, keys, info=None, results=None, histograms=None, extra=None, cache=None):
+        if cache is None:
+            cache = {}
+        self._keys = cache.setdefault(('keys', keys), keys)
+        self.info = info
+        self._layout = None
+        self._columns = None
+        self._counts = 0
+        self._results = None
+        self._results_json = None
+        self._cache = None          # set while the results wait to be packed
+        self._extra = extra or None
+        self._histograms = tuple(histograms.get(key) if histograms else None for key in HISTOGRAM_KEYS)
+
+        if results is None:
+            return
+        if isinstance(results, bytes):
+            compact = _compact_results(results)
+            if compact is not None:
+                # Packed on first use, to_json() returns the text as it is
+                self._results_json = compact
+                self._cache = cache
+                return
+            results = json.loads(results)
+        self._pack(results, cache)
+
+    def _pack(self, results, cache):
+        # The layout of the previous frame first, detected again only when the frame differs from it
+        layout = cache.get('layout')
+        packed = layout.pack(results) if layout is not None else None
+        if packed is None:
+            layout = Layout.detect(results)
+            packed = layout.pack(results) if layout is not None else None
+            if packed is None:
+                # Irregular results are kept as they are
+                self._results = results
+                return
+            layout = cache['layout'] = cache.setdefault(('layout', layout.key()), layout)
+        self._columns, self._counts = packed
+        self._layout = layout
+
+    def pack(self):
+        """Pack results read as JSON text into columns now instead of on first use"""
+        cache = self._cache
+        if cache is not None:
+            # _cache is cleared only once the columns are set: a thread reading
+            # the frame meanwhile packs it as well instead of seeing no results
+            self._pack(json.loads(self._results_json), cache)
+            self._cache = None
+
+    @property
+    def layout(self):
+        """Layout of the packed results, None if the results are missing or irregular"""
+        if self._cache is not None:
+            self.pack()
+        return self._layout
+
+    @property
+    def packed(self):
+        """True if the results are held as columns (results read as JSON text
+        are packed on first use of layout or a column)"""
+        return self._layout is not None
+
+    @classmethod
+    def from_dict(cls, frame, cache=None):
+        """Create a Frame from a frame dict of a log"""
+        histograms = {key: json.dumps(frame[key], separators=(',', ':')).encode('utf-8')
+                      for key in HISTOGRAM_KEYS if key in frame}
+        extra = {key: value for key, value in frame.items()
+                 if key not in HISTOGRAM_KEYS and key not in ('info', 'results')}
+        return cls(tuple(frame), frame.get('info'), frame.get('results'), histograms, extra, cache)
+
+    # Mapping interface
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key == 'info':
+            return self.info
+        if key == 'results':
+            return self.results
+        if key in HISTOGRAM_KEYS:
+            return self.histogram(key)
+        return self._extra[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def to_dict(self, histograms=True):
+        """Return the frame as the dict stored in the log
+
+        Args:
+            histograms: include mp_histo and ref_histo
+        """
+        return {key: self[key] for key in self._keys if histograms or key not in HISTOGRAM_KEYS}
+
+    def to_json(self, histograms=True, separators=None):
+        """Return json.dumps(self.to_dict(histograms), separators=separators)
+        without decoding the histograms or results read as JSON text"""
+        item_separator, key_separator = separators or (', ', ': ')
+        parts = []
+        for key in self._keys:
+            if key in HISTOGRAM_KEYS:
+                if not histograms:
+                    continue
+                raw = self._histograms[HISTOGRAM_KEYS.index(key)]
+                if b'"' in raw.replace(b'"bin"', b''):
+                    text = json.dumps(json.loads(raw), separators=separators)
+                else:
+                    # Compact payload: only the separators differ from json.dumps
+                    text = _with_separators(raw.decode('ascii'), separators)
+            elif key == 'results' and self._results_json is not None:
+                text = _with_separators(self._results_json.decode('ascii'), separators)
+            else:
+                text = json.dumps(self[key], separators=separators)
+            parts.append(json.dumps(key) + key_separator + text)
+        return '{' + item_separator.join(parts) + '}'
+
+    # Results
+
+    @property
+    def frame_number(self):
+        return self.info.get('frame_number') if self.info else None
+
+    @property
+    def results(self):
+        """Results grid as in the log (rebuilt on every access)"""
+        if 'results' not in self._keys:
+            return None
+        if self._results is not None:
+            return self._results
+        if self._results_json is not None:
+            return json.loads(self._results_json)
+        return self.layout.unpack(self._columns, self._counts)
+
+    @property
+    def rows(self):
+        if self.layout is not None:
+            return self.layout.rows
+        return len(self._results) if self._results else 0
+
+    @property
+    def cols(self):
+        if self.layout is not None:
+            return self.layout.cols
+        return len(self._results[0]) if self._results else 0
+
+    def zone(self, row, col):
+        """View of the zone at row, col"""
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            raise IndexError(f"Zone {row},{col} outside of {self.rows}x{self.cols}")
+        return Zone(self, row, col)
+
+    def zones(self):
+        """Iterate over all zones in row major order"""
+        for row in range(self.rows):
+            for col in range(self.cols):
+                yield Zone(self, row, col)
+
+    def column(self, key, peak=0):
+        """Values of one results field for all zones in row major order
+
+        Args:
+            key: zone field (e.g. 'noise') or peak field (e.g. 'distance')
+            peak: peak index for peak fields, zones without this peak give None
+
+        Returns:
+            array('q') / array('d') for packed frames, otherwise a list.
+            Numbers logged as text (x, y, z) are returned as floats.
+        """
+        layout = self.layout
+        if layout is None:
+            values = []
+            for row in self._results or []:
+                for zone in row:
+                    if key in zone and key != 'peaks':
+                        values.append(zone[key])
+                    else:
+                        peaks = zone.get('peaks') or []
+                        values.append(peaks[peak].get(key) if peak < len(peaks) else None)
+            return values
+
+        for index, (name, _) in enumerate(layout.zone_fields):
+            if name == key:
+                return self._columns[index]
+        for index, (name, _) in enumerate(layout.peak_fields):
+            if name == key:
+                column = self._columns[len(layout.zone_fields) + index]
+                counts = self._counts
+                if isinstance(counts, int):
+                    if peak >= counts:
+                        return [None] * (layout.rows * layout.cols)
+                    return column[peak::counts]
+                values = []
+                start = 0
+                for count in counts:
+                    values.append(column[start + peak] if peak < count else None)
+                    start += count
+                return values
+        raise KeyError(key)
+
+    @property
+    def peak_counts(self):
+        """Peaks per zone of a packed frame: an int if all zones have the same
+        number of peaks, otherwise an array with one count per zone. None if
+        the results are not packed."""
+        return self._counts if self.layout is not None else None
+
+    def packed_column(self, key):
+        """Packed array of a results field without copying
+
+        Zone fields hold one value per zone, peak fields the values of all
+        peaks zone by zone (see peak_counts). None if the results are not
+        packed or have no such field.
+        """
+        layout = self.layout
+        if layout is None:
+            return None
+        for index, (name, _) in enumerate(layout.fields):
+            if name == key:
+                return self._columns[index]
+        return None
+
+    def replace_columns(self, columns):
+        """Copy of a packed frame with other values for some results fields
+
+        Args:
+            columns: dict field -> array of the same type and length as its
+                     packed_column()
+
+        Returns:
+            Frame sharing everything else (info, histograms) with this frame
+        """
+        if self.layout is None:
+            raise ValueError("Only packed frames can replace columns")
+        replaced = list(self._columns)
+        for index, (name, _) in enumerate(self.layout.fields):
+            if name in columns:
+                column = columns[name]
+                old = replaced[index]
+                if column.typecode != old.typecode or len(column) != len(old):
+                    raise ValueError(f"Column {name} does not match the packed column")
+                replaced[index] = column
+        frame = Frame.__new__(Frame)
+        for slot in Frame.__slots__:
+            setattr(frame, slot, getattr(self, slot))
+        frame._columns = tuple(replaced)
+        frame._results_json = None
+        return frame
+
+    def _zone_value(self, row, col, key):
+        layout = self.layout
+        if layout is None:
+            return self._results[row][col][key]
+        index = row * layout.cols + col
+        for position, (name, kind) in enumerate(layout.zone_fields):
+            if name == key:
+                return _values(self._columns[position][index:index + 1], kind)[0]
+        if key != 'peaks' or 'peaks' not in layout.zone_keys:
+            raise KeyError(key)
+
+        counts = self._counts
+        if isinstance(counts, int):
+            start, count = index * counts, counts
+        else:
+            start, count = sum(counts[:index]), counts[index]
+        offset = len(layout.zone_fields)
+        values = [_values(column[start:start + count], kind) for column, (_, kind) in
+                  zip(self._columns[offset:], layout.peak_fields)]
+        return [dict(zip(layout.peak_keys, peak)) for peak in zip(*values)]
+
+    # Histograms
+
+    def has_histogram(self, key='mp_histo'):
+        """True if the frame carries a non-empty histogram payload"""
+        raw = self._histograms[HISTOGRAM_KEYS.index(key)]
+        return raw is not None and raw not in (b'[]', b'{}')
+
+    def histogram(self, key='mp_histo'):
+        """Decode a histogram payload (decoded again on every access)"""
+        raw = self._histograms[HISTOGRAM_KEYS.index(key)]
+        return None if raw is None else json.loads(raw)
+
+    def histogram_json(self, key='mp_histo'):
+        """Compact JSON bytes of a histogram payload without decoding it"""
+        return self._histograms[HISTOGRAM_KEYS.index(key)]
+
+    @property
+    def mp_histo(self):
+        return self.histogram('mp_histo')
+
+    @property
+    def ref_histo(self):
+        return self.histogram('ref_histo')
+
+    def nbytes(self):
+        """Approximate memory held by the frame's payload in bytes"""
+        size = sum(len(raw) for raw in self._histograms if raw is not None)
+        if self._results_json is not None:
+            size += len(self._results_json)
+        if self._columns is not None:
+            size += sum(column.itemsize * len(column) for column in self._columns)
+        return size
+
+    def __repr__(self):
+        return f"Frame(frame_number={self.frame_number}, {self.rows}x{self.cols}, keys={list(self._keys)})"
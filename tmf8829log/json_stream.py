@@ -0,0 +1,325 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Incremental JSON scanner for large TMF8829 log files
+
+JsonScanner walks a JSON document from a binary stream chunk by chunk. It can
+descend into objects and arrays, parse single values, or skip whole values
+without building Python objects. Skipping only looks at brackets and string
+delimiters, so large payloads such as mp_histo pass at close to
+decompression speed.
+'''
+
+import gzip
+import json
+import re
+
+from .threaded_io import InflateReader
+
+CHUNK_SIZE = 1 << 20
+WINDOW = 1 << 12        # first window examined when skipping containers
+MAX_WINDOW = 1 << 18    # windows grow up to this size while the container goes on
+SMALL_WINDOW = 1024     # below this size a window is walked token by token
+
+_WS = re.compile(rb'[ \t\r\n]*')
+_STRUCT = re.compile(rb'[\[\]{}"]')
+_STRING_TAIL = re.compile(rb'(?:[^"\\]|\\.)*"', re.S)
+_SCALAR = re.compile(rb'[^ \t\r\n,\]}]*')
+_SIMPLE_STRING = re.compile(rb'"[^"]*"')
+_NOT_STRUCT = bytes(c for c in range(256) if c not in b'[]{}"\\')
+
+_OPEN = b'[{'
+_QUOTE = ord('"')
+
+
+class TruncatedJsonError(ValueError):
+    """The document ended in the middle of a value"""
+
+    def __init__(self, offset):
+        super().__init__(f"JSON document is truncated at byte {offset}")
+        self.offset = offset
+
+
+def open_binary(path, threaded=False):
+    """Open a log file for binary reading, transparently decompressing .gz
+
+    With threaded=True reading and decompression run in an InflateReader
+    thread, overlapping with the parsing in the calling thread.
+    """
+    if threaded:
+        return InflateReader(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class JsonScanner:
+    """Pull scanner over a binary file object
+
+    Typical use:
+
+        scanner = JsonScanner(f)
+        for key in scanner.iter_object():
+            if key == 'info':
+                info = scanner.read_value()
+            else:
+                scanner.skip_value()
+
+    Every key yielded by iter_object() and every element announced by
+    iter_array() must be consumed with read_value(), read_raw(), skip_value()
+    or a nested iter_*() call before the iteration continues.
+    """
+
+    def __init__(self, fileobj, chunk_size=CHUNK_SIZE):
+        self._file = fileobj
+        self.chunk_size = chunk_size
+        self._buf = b''
+        self._pos = 0
+        self._base = 0          # absolute offset of _buf[0]
+        self._mark = None       # absolute offset that must stay in the buffer
+        self._depth = 0         # nesting level entered through iter_object/iter_array
+        self.eof = False
+
+    def tell(self):
+        """Absolute offset of the next unread byte of the document"""
+        return self._base + self._pos
+
+    def _fill(self):
+        """Append the next chunk to the buffer, return False at end of input"""
+        if self.eof:
+            return False
+        keep = self._pos if self._mark is None else min(self._pos, self._mark - self._base)
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self._buf = self._buf[keep:] + chunk
+        self._base += keep
+        self._pos -= keep
+        return True
+
+    def _truncated(self):
+        raise TruncatedJsonError(self._base + len(self._buf))
+
+    def peek(self):
+        """Skip whitespace and return the next byte (as int) or None at end of input"""
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char):
+        if self.peek() != char:
+            if self.peek() is None:
+                self._truncated()
+            raise ValueError(f"Expected '{chr(char)}' at byte {self.tell()}")
+        self._pos += 1
+
+    def _skip_string(self):
+        """Skip a string starting at the current position (the opening quote)"""
+        while True:
+            m = _STRING_TAIL.match(self._buf, self._pos + 1)
+            if m is not None:
+                self._pos = m.end()
+                return
+            if not self._fill():
+                self._truncated()
+
+    def read_string(self):
+        """Read a string value (e.g. an object key)"""
+        if self.peek() != _QUOTE:
+            self._expect(_QUOTE)
+        start = self._pos
+        self._mark = self._base + start
+        try:
+            self._skip_string()
+        finally:
+            start = self._mark - self._base
+            self._mark = None
+        raw = self._buf[start:self._pos]
+        if b'\\' in raw:
+            return json.loads(raw)
+        return raw[1:-1].decode('utf-8')
+
+    def skip_value(self):
+        """Skip the next value without building Python objects"""
+        char = self.peek()
+        if char is None:
+            self._truncated()
+
+        if char == _QUOTE:
+            self._skip_string()
+            return
+
+        if char in _OPEN:
+            self._pos += 1
+            self._skip_container(1)
+            return
+
+        # Number, true, false or null
+        while True:
+            end = _SCALAR.match(self._buf, self._pos).end()
+            if end < len(self._buf) or not self._fill():
+                break
+        if end == self._pos:
+            raise ValueError(f"Unexpected character at byte {self.tell()}")
+        if end == len(self._buf) and self._depth:
+            # A scalar running into the end of input inside a container is cut off
+            self._truncated()
+        self._pos = end
+
+    def _walk(self, depth, end):
+        """Track brackets token by token up to end, return the remaining depth"""
+        end += self._base           # strings may refill the buffer, keep end absolute
+        while self._pos < end - self._base:
+            m = _STRUCT.search(self._buf, self._pos, end - self._base)
+            if m is None:
+                self._pos = end - self._base
+                break
+            self._pos = m.start()
+            char = self._buf[self._pos]
+            if char == _QUOTE:
+                self._skip_string()
+                continue
+            self._pos += 1
+            depth += 1 if char in _OPEN else -1
+            if depth == 0:
+                break
+        return depth
+
+    def _skip_container(self, depth):
+        """Skip the rest of a container, depth levels deep
+
+        Whole windows are skipped by reducing them to their unmatched
+        brackets, which runs in C. The window holding the closing bracket is
+        halved until it is small enough to walk token by token.
+        """
+        size = WINDOW
+        found = False           # the closing bracket is known to be near
+        while depth:
+            if len(self._buf) - self._pos < size and not self.eof:
+                self._fill()
+                continue
+            end = min(len(self._buf), self._pos + size)
+            if end == self._pos:
+                self._truncated()
+
+            # Keep only brackets, quotes and backslashes of the window
+            window = self._buf[self._pos:end].translate(None, _NOT_STRUCT)
+            if window.count(b'"') % 2 and b'\\' not in window:
+                # Move the window end out of a string
+                quote = self._buf.find(b'"', end)
+                if quote == -1:
+                    if self.eof:
+                        # The input ends inside a string, the container may close before it
+                        depth = self._walk(depth, end)
+                        continue
+                    self._fill()
+                    continue
+                window += self._buf[end:quote + 1].translate(None, _NOT_STRUCT)
+                end = quote + 1
+
+            if size <= SMALL_WINDOW or b'\\' in window:
+                # Escaped quotes break quote counting, walk token by token
+                depth = self._walk(depth, end)
+                size = WINDOW
+                found = False
+                continue
+
+            # Reduce the window to its unmatched brackets, e.g. ']]}{['
+            window = window.replace(b'""', b'')
+            if b'"' in window:
+                window = _SIMPLE_STRING.sub(b'', window)
+            while True:
+                reduced = window.replace(b'[]', b'').replace(b'{}', b'')
+                if len(reduced) == len(window):
+                    break
+                window = reduced
+            closes = len(window) - len(window.lstrip(b']}'))
+            if closes < depth:
+                # The container cannot end inside this window
+                depth += len(window) - 2 * closes
+                self._pos = end
+                if not found:
+                    size = min(2 * size, MAX_WINDOW)
+            else:
+                found = True
+                size //= 2
+
+    def is_empty(self):
+        """Return True if the next value is an empty array or object
+
+        The value itself is not consumed.
+        """
+        if self.peek() not in _OPEN:
+            return False
+        while True:
+            end = _WS.match(self._buf, self._pos + 1).end()
+            if end < len(self._buf):
+                return self._buf[end] in b']}'
+            if not self._fill():
+                self._truncated()
+
+    def read_raw(self):
+        """Return the raw bytes of the next value"""
+        self.peek()
+        self._mark = self._base + self._pos
+        try:
+            self.skip_value()
+        finally:
+            start = self._mark - self._base
+            self._mark = None
+        return self._buf[start:self._pos]
+
+    def read_value(self):
+        """Parse and return the next value"""
+        return json.loads(self.read_raw())
+
+    def iter_object(self):
+        """Iterate over the keys of the next object"""
+        self._expect(ord('{'))
+        if self.peek() == ord('}'):
+            self._pos += 1
+            return
+        self._depth += 1
+        while True:
+            key = self.read_string()
+            self._expect(ord(':'))
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == ord('}'):
+                self._depth -= 1
+                return
+            if char != ord(','):
+                if char is None:
+                    self._truncated()
+                raise ValueError(f"Expected ',' or '}}' at byte {self.tell() - 1}")
+
+    def iter_array(self):
+        """Iterate over the next array, yielding the element index"""
+        self._expect(ord('['))
+        if self.peek() == ord(']'):
+            self._pos += 1
+            return
+        self._depth += 1
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.peek()
+            self._pos += 1
+            if char == ord(']'):
+                self._depth -= 1
+                return
+            if char != ord(','):
+                if char is None:
+                    self._truncated()
+                raise ValueError(f"Expected ',' or ']' at byte {self.tell() - 1}")
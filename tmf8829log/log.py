@@ -0,0 +1,193 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Loading and saving of complete TMF8829 logs
+'''
+
+from .config_blob import decode_blob
+from .frame import HISTOGRAM_KEYS, Frame, compact_json
+from .json_stream import JsonScanner, open_binary
+from .threaded_io import open_output
+from .writer import write_log
+
+LOG_EXTENSIONS = ('.ndjson.gz', '.json.gz', '.ndjson', '.json')
+
+
+def split_log_name(path):
+    """('dir/log', '.json.gz') of 'dir/log.json.gz', the extension is '' if
+    path has none of LOG_EXTENSIONS"""
+    for ext in LOG_EXTENSIONS:
+        if path.endswith(ext):
+            return path[:-len(ext)], ext
+    return path, ''
+
+
+class Log:
+    """A TMF8829 log with compact frames
+
+    Attributes:
+        header: top-level entries other than Result_Set (configuration, info)
+        keys: top-level keys in file order
+        frames: list of Frame
+        path: file the log was loaded from (None if built in memory)
+        decompressed_bytes: size of the JSON document that was loaded
+        damage: salvage.Damage of a log loaded with salvage=True, else None
+    """
+
+    def __init__(self, header=None, keys=None):
+        self.header = dict(header or {})
+        self.keys = list(keys) if keys is not None else ['Result_Set'] + list(self.header)
+        self.frames = []
+        self.path = None
+        self.decompressed_bytes = 0
+        self.damage = None
+        self._cache = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a Log from a parsed JSON log"""
+        log = cls({key: value for key, value in data.items() if key != 'Result_Set'}, data)
+        for frame in data.get('Result_Set', []):
+            log.append(frame)
+        return log
+
+    def append(self, frame):
+        """Append a frame dict (converted to a compact Frame) or a Frame"""
+        if not isinstance(frame, Frame):
+            frame = Frame.from_dict(frame, self._cache)
+        self.frames.append(frame)
+        return frame
+
+    @property
+    def configuration(self):
+        return self.header.get('configuration', {})
+
+    @property
+    def config_blob(self):
+        """configuration.blob as shared ConfigBlob (None if the log has none)"""
+        return decode_blob(self.configuration.get('blob'))
+
+    @property
+    def device_info(self):
+        """The info entry of the log (stored as a list with one element)"""
+        info = self.header.get('info', [])
+        if isinstance(info, list):
+            return info[0] if info else {}
+        return info if isinstance(info, dict) else {}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def to_dict(self, start=None, stop=None):
+        """Return the log (or the frames start:stop of it) as nested dicts"""
+        return {key: [frame.to_dict() for frame in self.frames[start:stop]] if key == 'Result_Set'
+                else self.header[key] for key in self.keys}
+
+    def save(self, path, start=None, stop=None, indent=4, ensure_ascii=True, threaded=False):
+        """Write the log as JSON (gzip compressed if path ends with .gz)
+
+        The file is identical to json.dump(log.to_dict(start, stop), indent=indent)
+        followed by a newline, frames are serialized one at a time. With
+        threaded=True compression runs in a background thread. Paths ending
+        with .ndjson or .ndjson.gz are written in NDJSON layout (see ndjson.py).
+        """
+        if path.endswith(('.ndjson', '.ndjson.gz')):
+            from . import ndjson
+            ndjson.write_ndjson(self, path, start, stop)
+            return
+        with open_output(path, threaded) as f:
+            write_log(self, f, start, stop, indent, ensure_ascii)
+
+    def __repr__(self):
+        return f"Log({self.path!r}, {len(self.frames)} frames)"
+
+
+def _read_frame(scanner, cache):
+    """Read one frame object from the scanner into a Frame"""
+    keys = []
+    info = None
+    results = None
+    histograms = {}
+    extra = {}
+    for key in scanner.iter_object():
+        keys.append(key)
+        if key in HISTOGRAM_KEYS:
+            histograms[key] = compact_json(scanner.read_raw())
+        elif key == 'info':
+            info = scanner.read_value()
+        elif key == 'results':
+            results = scanner.read_raw()
+        else:
+            extra[key] = scanner.read_value()
+    return Frame(tuple(keys), info, results, histograms, extra, cache)
+
+
+def iter_frames(path, log, threaded=False):
+    """Read a log file (.json or .json.gz) and yield its frames one by one
+
+    The top-level entries are stored into log.header/log.keys as they are
+    read. configuration and info usually follow Result_Set in the file, so the
+    header is only complete once the generator is exhausted.
+
+    NDJSON logs (see ndjson.py) are recognized by their first line.
+
+    Args:
+        path: log file
+        log: Log receiving header and keys
+        threaded: decompress in a background thread (see threaded_io)
+    """
+    from . import ndjson
+    if ndjson.is_ndjson(path):
+        yield from ndjson.iter_frames(path, log, threaded)
+        return
+    log.path = path
+    with open_binary(path, threaded) as f:
+        scanner = JsonScanner(f)
+        for key in scanner.iter_object():
+            log.keys.append(key)
+            if key != 'Result_Set':
+                log.header[key] = scanner.read_value()
+                continue
+            for _ in scanner.iter_array():
+                yield _read_frame(scanner, log._cache)
+        log.decompressed_bytes = scanner.tell()
+
+
+def load(path, threaded=False, workers=None, salvage=False):
+    """Load a log file (.json or .json.gz) frame by frame
+
+    The frames are created while the file is read, so the nested dicts of the
+    whole log never exist in memory at once; their results are packed into
+    columns on first use (see Frame.pack()). With threaded=True the file is
+    decompressed in a background thread. NDJSON logs are parsed in a pool of
+    workers processes (default: one per CPU).
+
+    With salvage=True a truncated or damaged log is loaded up to its last
+    complete frame instead of raising, log.damage tells where it stops (see
+    salvage.py).
+    """
+    from . import ndjson
+    if salvage:
+        from .salvage import Damage, iter_salvaged
+        log = Log(keys=[])
+        log.damage = Damage(path)
+        log.frames.extend(iter_salvaged(path, log, log.damage))
+        if 'Result_Set' not in log.keys:
+            log.keys.insert(0, 'Result_Set')
+        return log
+    if ndjson.is_ndjson(path):
+        return ndjson.load(path, workers)
+    log = Log(keys=[])
+    log.frames.extend(iter_frames(path, log, threaded))
+    return log
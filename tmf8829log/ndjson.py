@@ -0,0 +1,340 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+NDJSON layout of TMF8829 logs with parallel loading
+
+The first line holds the top-level entries other than Result_Set, every
+following line one minified frame:
+
+    {"format":"tmf8829-ndjson","version":1,"keys":[...],"header":{"configuration":...,"info":...}}
+    {"info":{...},"results":[...],"mp_histo":{...},"ref_histo":{...}}
+    ...
+
+.ndjson.gz files consist of independent gzip members holding whole lines
+(the header alone in the first one). Every member records its compressed size
+in a gzip extra field like BGZF does, so a reader finds the member boundaries
+without decompressing and the members can be parsed in separate processes.
+The file stays a regular gzip file for zcat and gzip.open.
+'''
+
+import collections
+import concurrent.futures
+import gzip
+import io
+import json
+import os
+import struct
+import zlib
+
+from .frame import Frame
+from .json_stream import JsonScanner, open_binary
+from .log import Log, _read_frame
+
+FORMAT = 'tmf8829-ndjson'
+VERSION = 1
+MEMBER_FRAMES = 64          # frames per gzip member
+CHUNK_SIZE = 1 << 20
+
+_MAGIC = b'{"format":"' + FORMAT.encode('ascii') + b'"'
+_SEPARATORS = (',', ':')
+_EXTRA_ID = b'TM'           # gzip extra subfield holding the member size
+# gzip member header: magic, deflate, FEXTRA, mtime 0, XFL 2 (level 9), OS unknown
+_HEADER = struct.Struct('<4sIBBH2sHI')
+_TRAILER = struct.Struct('<II')
+
+
+def is_ndjson(path):
+    """True if path holds a log in NDJSON layout (checked by content, not by name)"""
+    with open_binary(path) as f:
+        try:
+            return f.read(len(_MAGIC)) == _MAGIC
+        except (OSError, EOFError):
+            return False
+
+
+def header_line(log):
+    """First line of the NDJSON layout of a log (bytes, with newline)"""
+    header = {'format': FORMAT, 'version': VERSION, 'keys': log.keys,
+              'header': {key: log.header[key] for key in log.keys if key != 'Result_Set'}}
+    return json.dumps(header, separators=_SEPARATORS).encode('utf-8') + b'\n'
+
+
+def frame_line(frame):
+    """One frame (Frame or frame dict) as a minified line (bytes, with newline)"""
+    if isinstance(frame, Frame):
+        text = frame.to_json(separators=_SEPARATORS)
+    else:
+        text = json.dumps(frame, separators=_SEPARATORS)
+    return text.encode('utf-8') + b'\n'
+
+
+def gzip_member(data, compresslevel=9):
+    """Compress data into one gzip member carrying its own size"""
+    deflate = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = deflate.compress(data) + deflate.flush()
+    size = _HEADER.size + len(body) + _TRAILER.size
+    header = _HEADER.pack(b'\x1f\x8b\x08\x04', 0, 2, 255, 8, _EXTRA_ID, 4, size)
+    return header + body + _TRAILER.pack(zlib.crc32(data), len(data) & 0xffffffff)
+
+
+class NdjsonWriter:
+    """Write a log in NDJSON layout line by line
+
+    The header line must be known up front. Frames are collected into gzip
+    members of member_frames lines when path ends with .gz.
+
+    Args:
+        path: output file (.ndjson or .ndjson.gz)
+        log: Log providing header and keys
+        member_frames: frames per gzip member
+        compresslevel: zlib level of the gzip members
+    """
+
+    def __init__(self, path, log, member_frames=MEMBER_FRAMES, compresslevel=9):
+        self.name = path
+        self.member_frames = member_frames
+        self.compresslevel = compresslevel
+        self.compressed = path.endswith('.gz')
+        self._lines = []
+        self._file = open(path, 'wb')
+        self._write(header_line(log))
+        self._flush()
+
+    def _write(self, line):
+        if self.compressed:
+            self._lines.append(line)
+        else:
+            self._file.write(line)
+
+    def _flush(self):
+        if self._lines:
+            self._file.write(gzip_member(b''.join(self._lines), self.compresslevel))
+            self._lines = []
+
+    def write_frame(self, frame):
+        self.write_line(frame_line(frame))
+
+    def write_line(self, line):
+        """Write a line created by frame_line()"""
+        self._write(line)
+        if len(self._lines) >= self.member_frames:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_ndjson(log, path, start=None, stop=None, member_frames=MEMBER_FRAMES):
+    """Write a log, or the frames start:stop of it, in NDJSON layout"""
+    with NdjsonWriter(path, log, member_frames) as writer:
+        for frame in log.frames[start:stop]:
+            writer.write_frame(frame)
+
+
+def iter_lines(path, threaded=False):
+    """Yield the lines of an NDJSON log without their newline, header line first"""
+    with open_binary(path, threaded) as f:
+        pending = b''
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+
+def read_header(line, path):
+    """Parse the header line of an NDJSON log"""
+    header = json.loads(line)
+    if header.get('format') != FORMAT:
+        raise ValueError(f"{path} is not a TMF8829 NDJSON log")
+    if header.get('version', VERSION) > VERSION:
+        raise ValueError(f"{path} has NDJSON layout version {header['version']}, "
+                         f"only up to {VERSION} is supported")
+    return header
+
+
+def _set_header(log, header):
+    log.keys.extend(header['keys'])
+    log.header.update(header['header'])
+
+
+def _parse_lines(lines):
+    cache = {}
+    frames = [_read_frame(JsonScanner(io.BytesIO(line)), cache) for line in lines if line.strip()]
+    for frame in frames:
+        # Packed in the worker, not when the frames are used
+        frame.pack()
+    return frames
+
+
+def iter_frames(path, log, threaded=False):
+    """Read an NDJSON log line by line, see log.iter_frames()"""
+    log.path = path
+    lines = iter_lines(path, threaded)
+    line = next(lines, b'')
+    size = len(line) + 1
+    _set_header(log, read_header(line, path))
+    for line in lines:
+        size += len(line) + 1
+        if line.strip():
+            yield _read_frame(JsonScanner(io.BytesIO(line)), log._cache)
+    log.decompressed_bytes = size
+
+
+def _members(f):
+    """Offsets and sizes of the gzip members of a file written by NdjsonWriter
+
+    Returns None if a member does not carry its size.
+    """
+    members = []
+    offset = 0
+    while True:
+        f.seek(offset)
+        raw = f.read(_HEADER.size)
+        if not raw:
+            return members
+        if len(raw) < _HEADER.size:
+            return None
+        magic, _, _, _, xlen, subfield, length, size = _HEADER.unpack(raw)
+        if magic != b'\x1f\x8b\x08\x04' or xlen != 8 or subfield != _EXTRA_ID or length != 4:
+            return None
+        members.append((offset, size))
+        offset += size
+
+
+def _chunks(path, workers):
+    """Split the frame lines of a file into (begin, end) byte ranges for the workers
+
+    Plain files are cut at arbitrary bytes, the worker owns the lines starting
+    in its range. Compressed files are cut at member boundaries. Returns None
+    if the members of a compressed file cannot be located.
+    """
+    with open(path, 'rb') as f:
+        if not path.endswith('.gz'):
+            start = len(f.readline())
+            end = f.seek(0, os.SEEK_END)
+            step = max((end - start) // (workers * 4), CHUNK_SIZE)
+            return [(begin, min(begin + step, end)) for begin in range(start, end, step)]
+        members = _members(f)
+    if not members:
+        return None
+    # The first member holds the header line
+    members = members[1:]
+    target = max(sum(size for _, size in members) // (workers * 4), CHUNK_SIZE)
+    chunks = []
+    for offset, size in members:
+        if chunks and chunks[-1][1] - chunks[-1][0] < target:
+            chunks[-1] = (chunks[-1][0], offset + size)
+        else:
+            chunks.append((offset, offset + size))
+    return chunks
+
+
+def _parse_chunk(path, begin, end):
+    """Worker: parse the frames of one byte range, return (frames, decompressed bytes)"""
+    with open(path, 'rb') as f:
+        if path.endswith('.gz'):
+            f.seek(begin)
+            data = gzip.decompress(f.read(end - begin))
+        else:
+            if begin:
+                # The line running into the range belongs to the previous range
+                f.seek(begin - 1)
+                f.readline()
+            data = []
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                data.append(line)
+            data = b''.join(data)
+    return _parse_lines(data.split(b'\n')), len(data)
+
+
+def _map_chunk(function, path, begin, end):
+    """Worker: function() of the frames of one byte range"""
+    frames, _ = _parse_chunk(path, begin, end)
+    return function(frames)
+
+
+def map_chunks(path, function, workers=None):
+    """Apply a function to the frames of an NDJSON log chunk by chunk in a process pool
+
+    Args:
+        path: .ndjson or .ndjson.gz file
+        function: picklable callable taking the list of frames of one chunk
+        workers: number of processes (default: number of CPUs), 1 runs in
+                 the calling process
+
+    Yields:
+        the results in file order; at most two chunks per worker are in
+        flight, so results are not piled up if the caller is slower.
+        Files that cannot be split are passed as a single chunk.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(path, workers) if workers > 1 else None
+    if not chunks or len(chunks) == 1:
+        yield function(list(iter_frames(path, Log(keys=[]))))
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(min(workers, len(chunks))) as pool:
+        pending = collections.deque()
+        for begin, end in chunks:
+            pending.append(pool.submit(_map_chunk, function, path, begin, end))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load(path, workers=None):
+    """Load an NDJSON log, parsing chunks of lines in a process pool
+
+    Args:
+        path: .ndjson or .ndjson.gz file
+        workers: number of processes (default: number of CPUs), 1 parses in
+                 the calling process
+
+    .ndjson.gz files not written by NdjsonWriter (e.g. recompressed with gzip)
+    have no member sizes and are read sequentially.
+    """
+    log = Log(keys=[])
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(path, workers) if workers > 1 else None
+    if not chunks or len(chunks) == 1:
+        log.frames.extend(iter_frames(path, log))
+        return log
+
+    log.path = path
+    with open_binary(path) as f:
+        line = f.readline()
+    _set_header(log, read_header(line, path))
+    log.decompressed_bytes = len(line)
+    with concurrent.futures.ProcessPoolExecutor(min(workers, len(chunks))) as pool:
+        futures = [pool.submit(_parse_chunk, path, begin, end) for begin, end in chunks]
+        for future in futures:
+            frames, size = future.result()
+            log.decompressed_bytes += size
+            for frame in frames:
+                # Share layouts and key tuples between the frames of all chunks
+                frame._keys = log._cache.setdefault(('keys', frame._keys), frame._keys)
+                if frame.layout is not None:
+                    frame._layout = log._cache.setdefault(('layout', frame.layout.key()), frame.layout)
+                log.frames.append(frame)
+    return log
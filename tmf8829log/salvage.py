@@ -0,0 +1,240 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Salvage of truncated or damaged TMF8829 logs
+
+A recording that stops unexpectedly (logger crash, full disk, a log that is
+still being written) leaves a file that ends in the middle of Result_Set,
+often with a gzip stream that has no end-of-stream marker. json.load() and
+gzip then fail and nothing of the log can be opened.
+
+iter_salvaged() reads such a file with the incremental parser and keeps
+every complete frame up to the damage. Damage records where the log stops,
+in the JSON document and in the compressed file:
+
+    log = tmf8829log.load('cut.json.gz', salvage=True)
+    print('\\n'.join(log.damage.describe()))
+
+configuration and info follow Result_Set in JSON logs, so they are lost with
+a truncation; borrow_header() takes them from another log recorded with the
+same setup. salvage_log.py writes the salvaged frames into a valid log.
+'''
+
+import io
+import json
+import re
+
+from .json_stream import JsonScanner, TruncatedJsonError, open_binary
+from .log import _read_frame
+from .threaded_io import CHUNK_SIZE, InflateReader
+
+# Top-level entries of a complete log
+LOG_KEYS = ('Result_Set', 'configuration', 'info')
+
+_FRAME_NUMBER = re.compile(rb'"frame_number"\s*:\s*(-?\d+)')
+
+
+class Damage:
+    """Where a log read by iter_salvaged() is damaged
+
+    Attributes:
+        path: the log file
+        frames: complete frames recovered
+        last_frame_number: frame_number of the last complete frame (None if unknown)
+        offset: byte offset in the JSON document (decompressed) after the last
+                complete frame or top-level entry
+        error: what is wrong with the JSON document (None if it is complete)
+        error_offset: byte offset in the JSON document where error was found
+        compressed: what is wrong with the gzip stream (None if it is complete)
+        compressed_offset: byte offset in the .gz file where inflation stopped
+        missing: keys of LOG_KEYS that the log lacks
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self.last_frame_number = None
+        self.offset = 0
+        self.error = None
+        self.error_offset = None
+        self.compressed = None
+        self.compressed_offset = None
+        self.missing = []
+
+    @property
+    def damaged(self):
+        return self.error is not None or self.compressed is not None or bool(self.missing)
+
+    def describe(self):
+        """Report as lines of text"""
+        if not self.damaged:
+            return [f"{self.path}: complete, {self.frames} frames"]
+        last = f", the last has frame_number {self.last_frame_number}" if self.last_frame_number is not None else ''
+        lines = [f"{self.path}: damaged, {self.frames} complete frames recovered{last}"]
+        if self.compressed is not None:
+            lines.append(f"  gzip: {self.compressed} (at byte {self.compressed_offset} of the compressed file)")
+        if self.error is not None:
+            lines.append(f"  JSON: {self.error}, the last complete entry ends at byte {self.offset}")
+        if self.missing:
+            lines.append(f"  missing: {', '.join(self.missing)}")
+        return lines
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"Damage({self.path!r}, {self.frames} frames, damaged={self.damaged})"
+
+
+def _raw_frame_number(raw):
+    match = _FRAME_NUMBER.search(raw)
+    return int(match.group(1)) if match else None
+
+
+def _salvage_json(f, log, damage, raw):
+    scanner = JsonScanner(f)
+    try:
+        for key in scanner.iter_object():
+            if key != 'Result_Set':
+                # An entry is only kept once its value is complete
+                value = scanner.read_value()
+                log.keys.append(key)
+                log.header[key] = value
+                damage.offset = scanner.tell()
+                continue
+            log.keys.append(key)
+            for _ in scanner.iter_array():
+                if raw:
+                    frame = scanner.read_raw()
+                    if b'\x00' in frame:
+                        # Zero filled blocks of a crashed file system pass the bracket matching
+                        raise ValueError(f"NUL bytes in the frame ending at byte {scanner.tell()}")
+                    number = _raw_frame_number(frame)
+                else:
+                    frame = _read_frame(scanner, log._cache)
+                    number = frame.frame_number
+                damage.offset = scanner.tell()
+                damage.frames += 1
+                damage.last_frame_number = number
+                yield frame
+        damage.offset = scanner.tell()
+    except TruncatedJsonError as e:
+        damage.error = str(e)
+        damage.error_offset = e.offset
+    except ValueError as e:
+        damage.error = str(e)
+        damage.error_offset = scanner.tell()
+
+
+def _lines(f):
+    """Yield (line, terminated) for the lines of a binary file"""
+    pending = b''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line, True
+    if pending:
+        yield pending, False
+
+
+def _salvage_ndjson(f, path, log, damage, raw):
+    from . import ndjson
+    offset = 0
+    try:
+        for index, (line, terminated) in enumerate(_lines(f)):
+            end = offset + len(line) + terminated
+            if index == 0:
+                ndjson._set_header(log, ndjson.read_header(line, path))
+            elif line.strip():
+                if raw:
+                    # Lines are written whole, only the last one can be cut off
+                    if b'\x00' in line or not terminated:
+                        json.loads(line)
+                    frame = line
+                    number = _raw_frame_number(line)
+                else:
+                    frame = _read_frame(JsonScanner(io.BytesIO(line)), log._cache)
+                    number = frame.frame_number
+                damage.offset = end
+                damage.frames += 1
+                damage.last_frame_number = number
+                yield frame
+            offset = damage.offset = end
+    except TruncatedJsonError as e:
+        damage.error = f"Line at byte {offset} is truncated after {e.offset} bytes"
+        damage.error_offset = offset + e.offset
+    except ValueError as e:
+        damage.error = f"Line at byte {offset}: {e}"
+        damage.error_offset = offset
+
+
+def iter_salvaged(path, log, damage, raw=False):
+    """Yield the complete frames of a log that may be cut off or damaged
+
+    Like iter_frames(), but the end of the data, a cut or corrupt gzip stream
+    and bytes that are not JSON end the log instead of raising. The file is
+    read by an InflateReader with tolerant=True, so decompression runs in a
+    background thread like with threaded=True.
+
+    Args:
+        path: log file (.json, .json.gz, .ndjson or .ndjson.gz)
+        log: Log receiving the complete top-level entries
+        damage: Damage filled in while reading, final once the generator is exhausted
+        raw: yield the JSON text of every frame as found in the file (bytes,
+             one line of NDJSON logs) instead of parsing it into a Frame
+    """
+    from . import ndjson
+    log.path = path
+    with InflateReader(path, tolerant=True) as f:
+        if ndjson.is_ndjson(path):
+            yield from _salvage_ndjson(f, path, log, damage, raw)
+        else:
+            yield from _salvage_json(f, log, damage, raw)
+        damage.compressed = f.damage
+        damage.compressed_offset = f.damage_offset
+    log.decompressed_bytes = damage.offset
+    damage.missing = [key for key in LOG_KEYS if key not in log.keys]
+
+
+def read_header(path):
+    """Top-level entries other than Result_Set of a log, without parsing its frames"""
+    from . import ndjson
+    if ndjson.is_ndjson(path):
+        with open_binary(path) as f:
+            return ndjson.read_header(f.readline(), path)['header']
+    header = {}
+    with open_binary(path) as f:
+        scanner = JsonScanner(f)
+        for key in scanner.iter_object():
+            if key == 'Result_Set':
+                scanner.skip_value()
+            else:
+                header[key] = scanner.read_value()
+    return header
+
+
+def borrow_header(log, path):
+    """Add the top-level entries a salvaged log lacks from another log
+
+    The configuration and info of a log recorded with the same setup stand
+    in for the entries lost with the end of a truncated log.
+
+    Returns:
+        keys of the entries taken over
+    """
+    borrowed = []
+    for key, value in read_header(path).items():
+        if key not in log.header:
+            log.header[key] = value
+            log.keys.append(key)
+            borrowed.append(key)
+    return borrowed
@@ -0,0 +1,253 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Schemas of TMF8829 logs: logger version and results fields
+
+A log is checked once, from the logger version of its info entry and the
+layout of its first frame with results, against the fields known for that
+logger version (LOGGER_FIELDS). Unknown versions and unknown fields raise
+SchemaError instead of being skipped.
+
+For every layout a CsvDecoder is built once. It holds the positions of the
+csv fields among the packed columns of the layout, so the rows of a frame are
+assembled from the columns without looking up keys value by value:
+
+    schema = tmf8829log.Schema.detect(log)
+    for frame in log:
+        decoder = schema.decoder(frame)
+        csvout.writerow(decoder.header(frame))
+        csvout.writerows(decoder.rows(frame))
+
+Frames whose results are not packed (read as JSON text and not used as
+columns, or not a regular grid, see Layout) are written from their dicts:
+Schema.fields() checks the fields of every distinct key order of a zone or
+peak once and returns a getter of the csv fields.
+'''
+
+from itertools import chain
+from operator import itemgetter
+
+from .frame import _values
+
+# logger version: (zone fields, peak fields), in csv column order
+LOGGER_FIELDS = {
+    '3': (('noise', 'xtalk'), ('distance', 'snr', 'signal', 'x', 'y', 'z')),
+    '4': (('noise', 'xtalk'), ('distance', 'snr', 'signal', 'x', 'y', 'z')),
+}
+
+
+class SchemaError(ValueError):
+    """The logger version or the results layout of a log is not known"""
+
+
+def logger_version(device_info):
+    """Logger version of the info entry of a log as in LOGGER_FIELDS ('4', '0x0003' -> '3'), None if missing"""
+    version = (device_info or {}).get('logger version')
+    if version is None:
+        return None
+    version = str(version).strip()
+    if not version:
+        return None
+    try:
+        return str(int(version, 16 if version[:2] in ('0x', '0X') else 10))
+    except ValueError:
+        return version
+
+
+def _tuple_getter(names):
+    """itemgetter that returns a tuple for any number of names"""
+    if len(names) == 1:
+        name = names[0]
+        return lambda values: (values[name],)
+    return itemgetter(*names) if names else lambda values: ()
+
+
+class CsvDecoder:
+    """csv header and rows of the frames of one layout (see json_to_csv.py)
+
+    Attributes:
+        layout: tmf8829log.Layout of the frames
+        zone_names, peak_names: fields written per zone and per peak, in csv order
+    """
+
+    def __init__(self, layout, zone_names, peak_names):
+        self.layout = layout
+        zone_kinds = dict(layout.zone_fields)
+        peak_kinds = dict(layout.peak_fields)
+        self.zone_names = [name for name in zone_names if name in zone_kinds]
+        self.peak_names = [name for name in peak_names if name in peak_kinds]
+        self._zone_fields = [(name, zone_kinds[name]) for name in self.zone_names]
+        self._peak_fields = [(name, peak_kinds[name]) for name in self.peak_names]
+        self._labels = [(f"#PIXEL{pixel:04}",) for pixel in range(layout.rows * layout.cols)]
+
+    def header(self, frame):
+        """Header row of a frame: the fields of every peak of its first zone"""
+        counts = frame.peak_counts
+        peaks = counts if isinstance(counts, int) else counts[0]
+        return (['#PIXEL'] + self.zone_names +
+                [f"{name}{i}" for i in range(peaks) for name in self.peak_names])
+
+    def rows(self, frame):
+        """One row per zone: label, zone fields, fields of each of its peaks"""
+        zones = list(zip(*[_values(frame.packed_column(name), kind) for name, kind in self._zone_fields]))
+        if not zones:
+            zones = [()] * len(self._labels)
+        rows = [label + zone for label, zone in zip(self._labels, zones)]
+        if not self._peak_fields:
+            return rows
+
+        columns = [_values(frame.packed_column(name), kind) for name, kind in self._peak_fields]
+        counts = frame.peak_counts
+        if isinstance(counts, int):
+            # Same number of peaks in every zone: peak j of all zones is every counts-th value
+            peaks = zip(*[column[peak::counts] for peak in range(counts) for column in columns])
+            return [row + values for row, values in zip(rows, peaks)]
+        peaks = list(zip(*columns))
+        result = []
+        start = 0
+        for row, count in zip(rows, counts):
+            result.append(row + tuple(chain.from_iterable(peaks[start:start + count])))
+            start += count
+        return result
+
+
+class Schema:
+    """Logger version and results fields of a log
+
+    Args:
+        version: logger version (see logger_version()), None if the log has
+                 no info entry: the fields of all versions are accepted
+
+    Raises:
+        SchemaError: unknown logger version
+    """
+
+    def __init__(self, version=None):
+        if version is not None and version not in LOGGER_FIELDS:
+            raise SchemaError(f"Unknown logger version {version!r}, known versions: "
+                              f"{', '.join(sorted(LOGGER_FIELDS))}")
+        self.version = version
+        known = [LOGGER_FIELDS[version]] if version is not None else LOGGER_FIELDS.values()
+        self.zone_names = tuple(dict.fromkeys(chain.from_iterable(zone for zone, _ in known)))
+        self.peak_names = tuple(dict.fromkeys(chain.from_iterable(peak for _, peak in known)))
+        self._decoders = {}
+        self._irregular = set()        # (zone names, peak names) of frames without a layout
+        self._fields = {}              # (keys, peak) -> (csv names, getter) of zone and peak dicts
+
+    @classmethod
+    def detect(cls, log):
+        """Schema of a loaded log, checked against its first frame with results
+
+        Raises:
+            SchemaError: unknown logger version or results layout
+        """
+        schema = cls(logger_version(log.device_info))
+        for frame in log:
+            if 'results' in frame:
+                if schema.decoder(frame) is None:
+                    schema.check_results(frame['results'], frame.frame_number)
+                break
+        return schema
+
+    def decoder(self, frame):
+        """CsvDecoder of the layout of a frame with results, built once per layout
+
+        Returns:
+            CsvDecoder, None if the results are not a regular grid (see
+            check_results())
+
+        Raises:
+            SchemaError: the results have fields unknown for the logger version
+        """
+        layout = frame.layout
+        if layout is None:
+            return None
+        decoder = self._decoders.get(layout)
+        if decoder is not None:
+            return decoder
+        unknown = self._unknown_fields([name for name, _ in layout.zone_fields],
+                                       [name for name, _ in layout.peak_fields])
+        if unknown:
+            raise SchemaError(f"Frame {frame.frame_number}: results field(s) {', '.join(unknown)} unknown for "
+                              f"logger version {self.version or 'any'}")
+        decoder = self._decoders[layout] = CsvDecoder(layout, self.zone_names, self.peak_names)
+        return decoder
+
+    def check_results(self, results, frame_number=None):
+        """Check the fields of results that are not a regular grid, zone by zone
+
+        Raises:
+            SchemaError: a zone or peak has a field unknown for the logger version
+        """
+        zone_names = set()
+        peak_names = set()
+        for row in results:
+            for zone in row:
+                zone_names.update(zone)
+                for peak in zone.get('peaks') or ():
+                    peak_names.update(peak)
+        zone_names.discard('peaks')
+        fields = (tuple(sorted(zone_names)), tuple(sorted(peak_names)))
+        if fields in self._irregular:
+            return
+        unknown = self._unknown_fields(*fields)
+        if unknown:
+            raise SchemaError(f"Frame {frame_number}: results field(s) {', '.join(unknown)} unknown for "
+                              f"logger version {self.version or 'any'}")
+        self._irregular.add(fields)
+
+    def fields(self, keys, peak=False, frame_number=None):
+        """csv fields of a zone dict (or of a peak dict with peak=True) with these keys
+
+        Checked once per key order, for results written from their dicts.
+
+        Returns:
+            (names in csv order, getter returning their values as a tuple)
+
+        Raises:
+            SchemaError: a key is unknown for the logger version
+        """
+        entry = self._fields.get((keys, peak))
+        if entry is not None:
+            return entry
+        names = [key for key in keys if key != 'peaks']
+        unknown = self._unknown_fields([], names) if peak else self._unknown_fields(names, [])
+        if unknown:
+            raise SchemaError(f"Frame {frame_number}: results field(s) {', '.join(unknown)} unknown for "
+                              f"logger version {self.version or 'any'}")
+        names = [name for name in (self.peak_names if peak else self.zone_names) if name in keys]
+        entry = self._fields[(keys, peak)] = (names, _tuple_getter(names))
+        return entry
+
+    def set_version(self, version):
+        """Check the logger version once it is known (in JSON logs the info entry
+        follows Result_Set) together with the layouts decoded so far, and take
+        over the fields of that version
+
+        Raises:
+            SchemaError: unknown logger version, or fields of a layout unknown for it
+        """
+        schema = Schema(version)
+        fields = [([name for name, _ in layout.zone_fields], [name for name, _ in layout.peak_fields])
+                  for layout in self._decoders]
+        fields += [([], list(keys)) if peak else ([key for key in keys if key != 'peaks'], [])
+                   for keys, peak in self._fields]
+        for zone_names, peak_names in fields + list(self._irregular):
+            unknown = schema._unknown_fields(zone_names, peak_names)
+            if unknown:
+                raise SchemaError(f"Results field(s) {', '.join(unknown)} unknown for logger version {version}")
+        self.version = version
+        self.zone_names = schema.zone_names
+        self.peak_names = schema.peak_names
+        # Decoders and getters hold the csv order of the previous version, they are rebuilt on demand
+        self._decoders.clear()
+        self._fields.clear()
+
+    def _unknown_fields(self, zone_names, peak_names):
+        return ([name for name in zone_names if name not in self.zone_names] +
+                [name for name in peak_names if name not in self.peak_names])
@@ -0,0 +1,270 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Background threads for gzip inflation and deflation
+
+zlib releases the GIL while it (de)compresses, so moving it to a worker
+thread lets decompression overlap with JSON parsing and compression overlap
+with serialization. Both sides are connected by bounded queues: a producer
+that runs ahead waits until the consumer catches up.
+
+InflateReader is a drop-in for gzip.open(path, 'rb') as used by JsonScanner,
+DeflateWriter for gzip.open(path, 'wt') / open(path, 'w').
+'''
+
+import gzip
+import os
+import queue
+import threading
+import zlib
+
+CHUNK_SIZE = 1 << 20
+QUEUE_SIZE = 8
+GZIP_WBITS = 31                 # zlib window bits selecting the gzip container
+
+
+class InflateReader:
+    """Binary file object reading (and decompressing .gz) in a worker thread
+
+    Concatenated gzip members are read one after the other like gzip.open does.
+
+    Args:
+        path: file to read
+        chunk_size: size of the blocks passed between the threads
+        queue_size: number of blocks buffered ahead of the reader
+        tolerant: a gzip stream that is cut off or corrupt ends the input
+                  after the last data that could be inflated instead of
+                  raising EOFError or zlib.error (see salvage.py)
+
+    Attributes:
+        damage: with tolerant=True, what was wrong with the gzip stream (None
+                if it was complete), set once read() returned b''
+        damage_offset: position in the compressed file where inflation stopped
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE, tolerant=False):
+        self.name = path
+        self.chunk_size = chunk_size
+        self.tolerant = tolerant
+        self.damage = None
+        self.damage_offset = None
+        self._queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._pending = b''
+        self._done = False
+        self._file = open(path, 'rb')
+        self._thread = threading.Thread(target=self._run, name='inflate', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            if self.name.endswith('.gz'):
+                self._inflate()
+            else:
+                while True:
+                    data = self._file.read(self.chunk_size)
+                    if not data or not self._put(data):
+                        break
+            self._put(b'')
+        except BaseException as e:          # handed to the reading thread
+            self._put(e)
+
+    def _inflate(self):
+        inflate = zlib.decompressobj(GZIP_WBITS)
+        in_member = False
+        between = False                 # after the end of a member
+        data = b''
+        while not self._stop.is_set():
+            if not data:
+                data = self._file.read(self.chunk_size)
+                if not data:
+                    break
+            if between:
+                # Trailing zero padding is ignored like gzip does, also when it spans several reads
+                data = data.lstrip(b'\x00')
+                if not data:
+                    continue
+                between = False
+            in_member = True
+            try:
+                out = inflate.decompress(data, self.chunk_size)
+            except zlib.error as e:
+                if not self.tolerant:
+                    raise
+                self._damaged(f"Corrupt gzip data ({e})", self._file.tell() - len(data))
+                return
+            data = inflate.unconsumed_tail
+            if out and not self._put(out):
+                return
+            if inflate.eof:
+                # Next gzip member
+                data = inflate.unused_data
+                inflate = zlib.decompressobj(GZIP_WBITS)
+                in_member = False
+                between = True
+        if in_member:
+            out = inflate.flush()
+            if out:
+                self._put(out)
+            if not inflate.eof:
+                if not self.tolerant:
+                    raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+                self._damaged("Compressed file ended before the end-of-stream marker was reached",
+                              self._file.tell())
+
+    def _damaged(self, message, offset):
+        # Set before the end of input is queued, so the reader sees it after read() returned b''
+        self.damage = message
+        self.damage_offset = offset
+
+    def read(self, size=-1):
+        """Read up to size bytes (everything if size < 0), b'' at end of input"""
+        chunks = [self._pending]
+        length = len(self._pending)
+        while (size < 0 or length < size) and not self._done:
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._done = True
+                raise item
+            if not item:
+                self._done = True
+                break
+            chunks.append(item)
+            length += len(item)
+        data = b''.join(chunks)
+        if size < 0 or len(data) <= size:
+            self._pending = b''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+    def close(self):
+        self._stop.set()
+        # Unblock the worker if it waits for room in the queue
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DeflateWriter:
+    """Text file object writing (and compressing .gz) in a worker thread
+
+    Writes are collected into blocks of chunk_size characters, encoded and
+    handed to the worker, which compresses (level 9 by default like gzip.open)
+    and writes them. The gzip header carries no file name and mtime 0, so
+    equal content gives equal files.
+
+    Args:
+        path: file to write, compressed if it ends with .gz
+        encoding: text encoding
+        newline: like open(): None translates '\\n' to os.linesep, '' or '\\n' writes as is
+        compresslevel: zlib level of .gz output
+        chunk_size, queue_size: see InflateReader
+    """
+
+    def __init__(self, path, encoding='utf-8', newline=None, compresslevel=9,
+                 chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+        self.name = path
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self._linesep = os.linesep if newline is None else (newline or '\n')
+        self._parts = []
+        self._length = 0
+        self._error = None
+        self._closed = False
+        self._deflate = zlib.compressobj(compresslevel, zlib.DEFLATED, GZIP_WBITS) \
+            if path.endswith('.gz') else None
+        self._file = open(path, 'wb')
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name='deflate', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if self._error is not None:
+                if data is None:
+                    return
+                continue                    # drain so the writer never blocks
+            try:
+                if data is None:
+                    if self._deflate is not None:
+                        self._file.write(self._deflate.flush())
+                    return
+                if self._deflate is not None:
+                    data = self._deflate.compress(data)
+                self._file.write(data)
+            except BaseException as e:
+                self._error = e
+
+    def _flush_block(self):
+        if self._error is not None:
+            raise self._error
+        text = ''.join(self._parts)
+        if self._linesep != '\n':
+            text = text.replace('\n', self._linesep)
+        self._queue.put(text.encode(self.encoding))
+        self._parts = []
+        self._length = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._length += len(text)
+        if self._length >= self.chunk_size:
+            self._flush_block()
+        return len(text)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._parts:
+                self._flush_block()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_output(path, threaded=False, encoding='utf-8', newline=None, compresslevel=9):
+    """Open a text output file, gzip compressed if path ends with .gz
+
+    With threaded=True compression and writing run in a DeflateWriter thread.
+    """
+    if threaded:
+        return DeflateWriter(path, encoding, newline, compresslevel)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', compresslevel, encoding=encoding, newline=newline)
+    return open(path, 'w', encoding=encoding, newline=newline)
@@ -0,0 +1,128 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Streaming JSON writer for TMF8829 logs
+
+The output is byte-identical to json.dump(..., indent=indent) of the complete
+log followed by a newline, like the log files of the logger, but only one
+frame is turned into dicts at a time.
+'''
+
+import json
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+_PADS = {}
+
+
+def _pads(indent):
+    pads = _PADS.get(indent)
+    if pads is None:
+        pads = _PADS[indent] = ['\n' + ' ' * (indent * level) for level in range(32)]
+    return pads
+
+
+def format_json(obj, level=0, indent=4, ensure_ascii=True):
+    """Serialize obj exactly like json.dumps(obj, indent=indent) nested at the given level
+
+    Scalars, dict keys and lists of plain integers (histogram bins) or strings
+    (configuration blob) take fast paths, which makes this several times faster
+    than the pure Python indent encoder of json.
+    """
+    kind = type(obj)
+    if kind is int:
+        return int.__repr__(obj)
+    encode = encode_basestring_ascii if ensure_ascii else encode_basestring
+    if kind is str:
+        return encode(obj)
+    pads = _pads(indent)
+    pad = pads[level + 1]
+    if kind is dict:
+        if not obj:
+            return '{}'
+        return '{' + ','.join([pad + encode(key) + ': ' + format_json(value, level + 1, indent, ensure_ascii)
+                               for key, value in obj.items()]) + pads[level] + '}'
+    if kind is list:
+        if not obj:
+            return '[]'
+        if all(type(value) is int for value in obj):
+            return '[' + pad + (',' + pad).join(map(int.__repr__, obj)) + pads[level] + ']'
+        if all(type(value) is str for value in obj):
+            # e.g. the configuration blob, ['0x21', '0x00', ...]
+            return '[' + pad + (',' + pad).join(map(encode, obj)) + pads[level] + ']'
+        return '[' + ','.join([pad + format_json(value, level + 1, indent, ensure_ascii)
+                               for value in obj]) + pads[level] + ']'
+    return json.dumps(obj, ensure_ascii=ensure_ascii)
+
+
+def format_frame(frame, first=False, indent=4, ensure_ascii=True):
+    """Text of one frame as an element of Result_Set (see write_log)
+
+    Args:
+        frame: Frame or frame dict
+        first: True for the first frame of Result_Set (no leading comma)
+    """
+    if not isinstance(frame, dict):
+        frame = frame.to_dict()
+    return ('' if first else ',') + _pads(indent)[2] + format_json(frame, 2, indent, ensure_ascii)
+
+
+def compact_frame(frame, first=False, indent=4):
+    """Text of one frame as a minified element of Result_Set (see write_log)
+
+    Several times faster than format_frame(): the histograms and results a
+    Frame was read with are copied as their compact JSON text, everything
+    else goes through the C encoder of json. Only the frame itself is on one
+    line, it starts on a line of its own indented like in format_frame().
+    """
+    if isinstance(frame, dict):
+        text = json.dumps(frame, separators=(',', ':'))
+    else:
+        text = frame.to_json(separators=(',', ':'))
+    return ('' if first else ',') + _pads(indent)[2] + text
+
+
+def write_log(log, f, start=None, stop=None, indent=4, ensure_ascii=True, result_set=None):
+    """Write a log, or the frames start:stop of it, to a text file
+
+    Args:
+        log: tmf8829log.Log
+        f: file object opened for writing text
+        start, stop: slice of the frames to write (default: all)
+        indent: indentation as for json.dump
+        ensure_ascii: as for json.dump
+        result_set: text file positioned at its start holding frames written
+                    with format_frame() or compact_frame(), used instead of log.frames
+    """
+    pads = _pads(indent)
+    encode = encode_basestring_ascii if ensure_ascii else encode_basestring
+
+    f.write('{')
+    for position, key in enumerate(log.keys):
+        f.write((',' if position else '') + pads[1] + encode(key) + ': ')
+        if key != 'Result_Set':
+            f.write(format_json(log.header[key], 1, indent, ensure_ascii))
+        elif result_set is not None:
+            chunk = result_set.read(1 << 20)
+            if not chunk:
+                f.write('[]')
+                continue
+            f.write('[')
+            while chunk:
+                f.write(chunk)
+                chunk = result_set.read(1 << 20)
+            f.write(pads[1] + ']')
+        else:
+            frames = log.frames[start:stop]
+            if not frames:
+                f.write('[]')
+                continue
+            f.write('[')
+            for index, frame in enumerate(frames):
+                f.write(format_frame(frame, index == 0, indent, ensure_ascii))
+            f.write(pads[1] + ']')
+    f.write(pads[0] + '}\n' if log.keys else '}\n')
@@ -0,0 +1,276 @@
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Multi-page viewer site of a long TMF8829 log
+
+The frames of the log are split into pages of a fixed number of frames
+(shards). All pages share one viewer bundle, viewer.css and viewer.js,
+which the browser loads once and caches, instead of inlining the style and
+script of json_to_html.py in every page. index.html lists the shards with
+summary statistics and links; every page links to its neighbours.
+
+Shards are written by a pool of worker processes. site.json records a
+fingerprint of every shard (its frames, header, options and links), so
+running again on a log that has grown only rewrites the shards that changed,
+usually the last one and the new ones.
+'''
+
+import concurrent.futures
+import hashlib
+import html
+import json
+import os
+import pickle
+import statistics
+import time
+
+import tmf8829log
+from json_to_html import viewer_script, viewer_style, write_html
+
+SHARD_FRAMES = 1000
+MANIFEST = 'site.json'
+BUNDLE = ('viewer.css', 'viewer.js')
+INDEX = 'index.html'
+
+
+def shard_ranges(frame_count, shard_frames=SHARD_FRAMES):
+    """(start, stop) frame indices of the shards of a log"""
+    return [(start, min(start + shard_frames, frame_count)) for start in range(0, frame_count, shard_frames)]
+
+
+def shard_file(start):
+    """Page of the shard starting at frame index start"""
+    return f'frames_{start:07d}.html'
+
+
+def shard_digest(frames, header, options, navigation, version):
+    """Fingerprint of everything a shard page is made of
+
+    The packed frames are hashed as pickles, which is much cheaper than
+    their JSON text.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([header, options, navigation, version], sort_keys=True, default=str).encode())
+    for frame in frames:
+        digest.update(pickle.dumps(frame, protocol=4))
+    return digest.hexdigest()
+
+
+def shard_summary(frames):
+    """Statistics of the frames of a shard for the index page (dict, None for missing values)"""
+    numbers = [frame.frame_number for frame in frames if frame.frame_number is not None]
+    infos = [frame.info or {} for frame in frames]
+    read_times = [info['read_time'] for info in infos if isinstance(info.get('read_time'), (int, float))]
+    temperatures = [info['temperature'] for info in infos if isinstance(info.get('temperature'), (int, float))]
+    distances = []
+    snrs = []
+    packed = 0
+    for frame in frames:
+        layout = frame.layout
+        if layout is None or 'distance' not in layout.peak_keys:
+            continue
+        packed += 1
+        distance = frame.packed_column('distance')
+        snr = frame.packed_column('snr') if 'snr' in layout.peak_keys else [None] * len(distance)
+        for d, c in zip(distance, snr):
+            if d > 0:
+                distances.append(d)
+                if c is not None:
+                    snrs.append(c)
+    return {
+        'frames': len(frames),
+        'frameNumbers': [min(numbers), max(numbers)] if numbers else None,
+        'duration': (max(read_times) - min(read_times)) / 1e6 if len(read_times) > 1 else None,
+        'warnings': sum(1 for info in infos if (info.get('warnings') or 0) > 0),
+        'temperature': [min(temperatures), max(temperatures)] if temperatures else None,
+        'targets': len(distances) / packed if packed else None,
+        'distance': statistics.median(distances) if distances else None,
+        'snr': statistics.fmean(snrs) if snrs else None,
+    }
+
+
+def _navigation(shards, number):
+    """Links of a shard page to the index and its neighbours"""
+    # Only the existence of the next shard, not its size, so the pages stay unchanged while the log grows
+    start, stop = shards[number]
+    links = ['<a href="index.html">Index</a>']
+    if number > 0:
+        links.append(f'<a href="{shard_file(shards[number - 1][0])}">◀ Previous</a>')
+    links.append(f'<strong>Frames {start}–{stop - 1}</strong>')
+    if number + 1 < len(shards):
+        links.append(f'<a href="{shard_file(stop)}">Next ▶</a>')
+    return f'    <div style="margin: 0 0 10px; font-size: 14px;">{" | ".join(links)}</div>\n'
+
+
+def _write_shard(header, keys, frames, path, options, bundle, navigation):
+    """Write one shard page (runs in a worker process), return its shard_summary()"""
+    log = tmf8829log.Log(header, keys)
+    log.frames = frames
+    write_html(log, path, bundle=bundle, navigation=navigation, **options)
+    return shard_summary(frames)
+
+
+def write_bundle(output_dir):
+    """Write viewer.css and viewer.js if they changed
+
+    Returns:
+        ((CSS URL, JavaScript URL), version): the URLs carry the version of
+        the bundle, so browsers cache it until it changes
+    """
+    contents = (viewer_style(), viewer_script())
+    version = hashlib.sha1(''.join(contents).encode()).hexdigest()[:12]
+    for name, content in zip(BUNDLE, contents):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                if f.read() == content:
+                    continue
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    return tuple(f'{name}?v={version}' for name in BUNDLE), version
+
+
+def _format(value, digits=0):
+    if value is None:
+        return '-'
+    if isinstance(value, list):
+        return ' … '.join(_format(item, digits) for item in value)
+    return f'{value:.{digits}f}'
+
+
+def write_index(output_dir, source, shards, summaries, shard_frames):
+    """Write index.html: one row with summary statistics and a link per shard"""
+    rows = []
+    for (start, stop), summary in zip(shards, summaries):
+        rows.append(
+            f'            <tr><td><a href="{shard_file(start)}">{start}–{stop - 1}</a></td>'
+            f'<td>{_format(summary["frameNumbers"])}</td><td>{_format(summary["duration"], 1)}</td>'
+            f'<td>{summary["warnings"]}</td><td>{_format(summary["temperature"])}</td>'
+            f'<td>{_format(summary["targets"], 1)}</td><td>{_format(summary["distance"])}</td>'
+            f'<td>{_format(summary["snr"], 1)}</td></tr>')
+    frame_count = shards[-1][1] if shards else 0
+    content = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>TMF8829 viewer - {html.escape(source)}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; }}
+        table {{ border-collapse: collapse; font-size: 13px; }}
+        th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+        th {{ background: #f0f0f0; }}
+        tr:hover td {{ background: #f5fff5; }}
+    </style>
+</head>
+<body>
+    <h2>{html.escape(source)}</h2>
+    <p>{frame_count} frames in {len(shards)} page(s) of {shard_frames} frames</p>
+    <table>
+        <thead>
+            <tr><th>Frames</th><th>Frame numbers</th><th>Duration (s)</th><th>Warnings</th>
+                <th>Temperature (°C)</th><th>Targets / frame</th><th>Median distance</th><th>Mean SNR</th></tr>
+        </thead>
+        <tbody>
+{chr(10).join(rows)}
+        </tbody>
+    </table>
+</body>
+</html>
+"""
+    path = os.path.join(output_dir, INDEX)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return path
+
+
+def generate_site(json_file, output_dir, shard_frames=SHARD_FRAMES, workers=None, threaded=False, options=None,
+                  profiler=None, salvage=False):
+    """Write or update the viewer site of a log
+
+    Args:
+        json_file: log file (.json, .json.gz, .ndjson or .ndjson.gz)
+        output_dir: directory of the site
+        shard_frames: frames per page
+        workers: processes writing pages (default: number of CPUs, 1: no pool)
+        threaded: decompress the log in a background thread
+        options: keyword arguments of write_html() for every page, e.g.
+                 {'histo_codec': True, 'sprites': 'distance'}
+        profiler: profiling.Profiler timing the parse phase (optional)
+        salvage: use the complete frames of a truncated log, e.g. one that is
+                 still being recorded (see tmf8829log.salvage)
+
+    Returns:
+        (pages written, pages unchanged)
+    """
+    if shard_frames < 1:
+        raise ValueError('A page needs at least one frame')
+    options = dict(options or {})
+    os.makedirs(output_dir, exist_ok=True)
+
+    if profiler is not None:
+        profiler.reset(json_file)
+        with profiler.phase('parse'):
+            log = tmf8829log.load(json_file, threaded, salvage=salvage)
+        profiler.add_input(json_file, log.decompressed_bytes)
+        profiler.frames = len(log)
+    else:
+        log = tmf8829log.load(json_file, threaded, salvage=salvage)
+    if log.damage is not None and log.damage.damaged:
+        print('\n'.join(log.damage.describe()))
+
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = {shard['file']: shard for shard in json.load(f).get('shards', [])}
+
+    bundle, version = write_bundle(output_dir)
+    shards = shard_ranges(len(log), shard_frames)
+    entries = []
+    jobs = []
+    for number, (start, stop) in enumerate(shards):
+        navigation = _navigation(shards, number)
+        name = shard_file(start)
+        digest = shard_digest(log.frames[start:stop], log.header, options, navigation, version)
+        old = previous.get(name)
+        entries.append({'file': name, 'start': start, 'stop': stop, 'digest': digest,
+                        'summary': old['summary'] if old else None})
+        if not old or old['digest'] != digest or not os.path.exists(os.path.join(output_dir, name)):
+            jobs.append((number, (log.header, log.keys, log.frames[start:stop], os.path.join(output_dir, name),
+                                  options, bundle, navigation)))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        for number, args in jobs:
+            entries[number]['summary'] = _write_shard(*args)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            # At most two shards per worker in flight: the frames are pickled to the workers
+            pending = {}
+            for number, args in jobs:
+                if len(pending) >= 2 * workers:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        entries[pending.pop(future)]['summary'] = future.result()
+                pending[pool.submit(_write_shard, *args)] = number
+            for future in concurrent.futures.as_completed(pending):
+                entries[pending[future]]['summary'] = future.result()
+
+    # Pages of shards that no longer exist (a shorter log or another page size)
+    current = {entry['file'] for entry in entries}
+    for name in previous:
+        if name not in current and os.path.exists(os.path.join(output_dir, name)):
+            os.remove(os.path.join(output_dir, name))
+
+    write_index(output_dir, os.path.basename(json_file), shards, [entry['summary'] for entry in entries],
+                shard_frames)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'log': os.path.basename(json_file), 'shardFrames': shard_frames, 'options': options,
+                   'bundle': version, 'updated': time.strftime('%Y-%m-%d %H:%M:%S'), 'shards': entries}, f,
+                  indent=2)
+    return len(jobs), len(shards) - len(jobs)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# *****************************************************************************
+# * Copyright by ams OSRAM AG                                                 *
+# * All rights are reserved.                                                  *
+# *                                                                           *
+# *FOR FULL LICENSE TEXT SEE LICENSES.TXT                                     *
+# *****************************************************************************
+
+'''
+Per-zone temporal statistics of a TMF8829 log
+
+Mean, standard deviation, median and valid rate of distance, snr, signal,
+noise and xtalk for every zone, over the whole capture or over windows of
+frames. A peak value counts as valid if the distance of the peak is above
+zero, zone values (noise, xtalk) whenever the frame has results. All
+statistics are computed on a FrameStore with whole-array NumPy operations:
+mean, standard deviation and valid rate from cumulative sums over the
+frames, the median by sorting the samples of blocks of windows, so memory
+stays in the order of the store itself for any window and step.
+
+The results are saved as compressed .npz arrays (one (windows, rows, cols)
+array per field and statistic) and embedded by json_to_html.py --zone-stats
+as heatmap layers of the viewer. Requires numpy.
+'''
+
+import argparse
+import base64
+import time
+
+import numpy as np
+
+import tmf8829log
+from frame_store import FrameStore
+
+FIELDS = ('distance', 'snr', 'signal', 'noise', 'xtalk')
+STATS = ('mean', 'std', 'median', 'valid_rate')
+PEAK_VALIDITY = 'distance'      # peak values count where this peak field is above zero
+
+
+class ZoneStats:
+    """Statistics per window, field and zone
+
+    Attributes:
+        rows, cols: zone grid
+        window, step: window length and distance of window starts in frames
+        starts: index of the first frame of each window
+        values: dict (field, statistic) -> float32 array (windows, rows, cols)
+    """
+
+    def __init__(self, rows, cols, window, step, starts, values):
+        self.rows = rows
+        self.cols = cols
+        self.window = window
+        self.step = step
+        self.starts = starts
+        self.values = values
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def save(self, path):
+        """Save as compressed .npz with arrays '<field>_<statistic>', 'starts', 'window'"""
+        arrays = {f"{field}_{stat}": value for (field, stat), value in self.values.items()}
+        np.savez_compressed(path, starts=self.starts, window=np.int64(self.window), step=np.int64(self.step),
+                            **arrays)
+
+    def viewer_layers(self):
+        """Heatmap layers for the HTML viewer, see json_to_html.write_html()"""
+        layers = []
+        for (field, stat), value in self.values.items():
+            layers.append({
+                'name': f"{field} {stat.replace('_', ' ')}",
+                'window': self.window,
+                'step': self.step,
+                'count': len(self.starts),
+                'digits': 3 if stat == 'valid_rate' else 1,
+                'data': base64.b64encode(value.astype('<f4').tobytes()).decode('ascii'),
+            })
+        return layers
+
+
+def _window_sums(values, starts, window):
+    """Sums over the frames start .. start + window - 1 of (frames, zones) values, from cumulative sums"""
+    total = np.zeros((len(values) + 1,) + values.shape[1:], dtype=np.float64)
+    np.cumsum(values, axis=0, out=total[1:])
+    return total[starts + window] - total[starts]
+
+
+def _median(values, valid, count, starts, window):
+    """Median of the valid samples of every window
+
+    Windows are sorted a block at a time, a block holds about as many
+    samples as the whole capture.
+    """
+    median = np.full(count.shape, np.nan)
+    block = max(1, len(values) // window)
+    for first in range(0, len(starts), block):
+        chunk = starts[first:first + block]
+        span = slice(chunk[0], chunk[-1] + window)
+        samples = np.where(valid[span], values[span], np.inf)
+        # Invalid samples sort to the end, the median sits in the first count entries
+        ordered = np.sort(np.lib.stride_tricks.sliding_window_view(samples, window, axis=0)[chunk - chunk[0]],
+                          axis=-1)
+        n = count[first:first + block].astype(np.int64)
+        low = np.take_along_axis(ordered, np.maximum(n - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+        high = np.take_along_axis(ordered, (n // 2)[..., None], axis=-1)[..., 0]
+        median[first:first + block] = np.where(n > 0, (low.astype(np.float64) + high) / 2, np.nan)
+    return median
+
+
+def _reduce(values, valid, present, starts, window):
+    """Statistics of (frames, zones) samples over the windows starting at starts
+
+    Args:
+        values: samples, anything where valid is False is ignored
+        valid: bool array of the valid samples
+        present: number of frames with results per window (windows, 1)
+    """
+    count = _window_sums(valid, starts, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Sums around the zone mean of the capture instead of zero keep the variance precise
+        filled = np.where(valid, values, 0).astype(np.float64)
+        center = np.nan_to_num(filled.sum(axis=0) / valid.sum(axis=0))
+        filled = np.where(valid, filled - center, 0)
+        mean = _window_sums(filled, starts, window) / count
+        std = np.sqrt(np.maximum(_window_sums(filled * filled, starts, window) / count - mean * mean, 0))
+        mean += center
+        median = _median(values, valid, count, starts, window)
+        valid_rate = count / present
+    return {'mean': mean, 'std': std, 'median': median, 'valid_rate': valid_rate}
+
+
+def compute_zone_stats(store, window=None, step=None, peak=0, fields=FIELDS):
+    """Compute per-zone statistics
+
+    Args:
+        store: FrameStore
+        window: frames per window, None for the whole capture
+        step: frames between window starts (default: window, non-overlapping)
+        peak: peak index used for the peak fields
+        fields: fields to analyse, missing ones are skipped
+
+    Returns:
+        ZoneStats
+    """
+    frames = store.frames
+    if frames == 0 or not store.zones:
+        raise ValueError("The log has no frames with results")
+    if window is None:
+        window = step = frames
+    else:
+        window = min(window, frames)
+        step = step or window
+    starts = np.arange(0, frames - window + 1, step, dtype=np.int64)
+
+    peak_valid = None
+    if PEAK_VALIDITY in store.peak_fields:
+        validity = store.field(PEAK_VALIDITY, peak)
+        with np.errstate(invalid='ignore'):
+            peak_valid = validity > 0
+    present = _window_sums(store.present[:, None], starts, window)
+
+    values = {}
+    for field in fields:
+        if field in store.zone_fields:
+            samples = store.zone_fields[field]
+            valid = ~np.isnan(samples)
+        elif field in store.peak_fields:
+            samples = store.field(field, peak)
+            valid = ~np.isnan(samples) if peak_valid is None else peak_valid & ~np.isnan(samples)
+        else:
+            continue
+        stats = _reduce(samples, valid, present, starts, window)
+        for name in STATS:
+            values[(field, name)] = stats[name].astype(np.float32).reshape(-1, store.rows, store.cols)
+
+    return ZoneStats(store.rows, store.cols, window, step, starts, values)
+
+
+def print_zone_stats(stats, window_index=0):
+    """Print the statistics of one window as grids"""
+    start = stats.starts[window_index]
+    print(f"Frames {start} to {start + stats.window - 1} ({stats.rows}x{stats.cols} zones)")
+    for (field, stat), value in stats.values.items():
+        grid = value[window_index]
+        digits = 3 if stat == 'valid_rate' else 1
+        with np.errstate(invalid='ignore'):
+            print(f"\n{field} {stat}: min {np.nanmin(grid):.{digits}f} max {np.nanmax(grid):.{digits}f}")
+        for row in grid:
+            print(' '.join(f"{v:8.{digits}f}" if not np.isnan(v) else '       -' for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-zone statistics over all frames of a TMF8829 log')
+    parser.add_argument('-i', '--input', required=True,
+                        help='Path to JSON file (supports .json, .json.gz, .ndjson and .ndjson.gz)')
+    parser.add_argument('-o', '--output', help='Save the statistics as .npz (default: <log>_zone_stats.npz)')
+    parser.add_argument('-w', '--window', type=int, help='Frames per window (default: whole capture)')
+    parser.add_argument('-s', '--step', type=int, help='Frames between window starts (default: window)')
+    parser.add_argument('-p', '--peak', type=int, default=0, help='Peak index for distance/snr/signal (default: 0)')
+    parser.add_argument('-f', '--fields', nargs='+', default=list(FIELDS), help='Fields to analyse')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print the grids')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = FrameStore.load(args.input, fields=set(args.fields) | {PEAK_VALIDITY}, peaks=args.peak + 1)
+    loaded = time.perf_counter()
+    stats = compute_zone_stats(store, args.window, args.step, args.peak, args.fields)
+    computed = time.perf_counter()
+
+    output = args.output
+    if output is None:
+        output = tmf8829log.split_log_name(args.input)[0] + '_zone_stats.npz'
+    stats.save(output)
+
+    if not args.quiet:
+        print_zone_stats(stats)
+    print(f"\n✓ {output}: {len(stats.starts)} window(s) of {stats.window} frames, "
+          f"{store.frames} frames loaded in {loaded - start:.3f} s, statistics in {computed - loaded:.3f} s")
+
+if __name__ == "__main__":
+    main()